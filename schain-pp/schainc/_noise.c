@@ -1,6 +1,8 @@
 #include <Python.h>
 #include <numpy/arrayobject.h>
 #include <math.h>
+#include <stdlib.h>
+#include <string.h>
 
 
 static PyObject *hildebrand_sekhon(PyObject *self, PyObject *args) {
@@ -51,8 +53,291 @@ static PyObject *hildebrand_sekhon(PyObject *self, PyObject *args) {
 }
 
 
+/* same order as numpy.sort: NaN values go to the end */
+#define HS_LT(a, b) ((a) < (b) || ((b) != (b) && (a) == (a)))
+
+static void hs_heapsort(double *v, npy_intp n) {
+  npy_intp i, j, k;
+  double t;
+
+  for (k = n/2; k > 0; k--) {
+    t = v[k-1];
+    for (i = k; i*2 <= n; i = j) {
+      j = i*2;
+      if (j < n && HS_LT(v[j-1], v[j])) j++;
+      if (!HS_LT(t, v[j-1])) break;
+      v[i-1] = v[j-1];
+    }
+    v[i-1] = t;
+  }
+  for (; n > 1;) {
+    t = v[n-1];
+    v[n-1] = v[0];
+    n -= 1;
+    for (i = 1; i*2 <= n; i = j) {
+      j = i*2;
+      if (j < n && HS_LT(v[j-1], v[j])) j++;
+      if (!HS_LT(t, v[j-1])) break;
+      v[i-1] = v[j-1];
+    }
+    v[i-1] = t;
+  }
+}
+
+/* median of three of v[lo], v[mid], v[hi], they are left sorted */
+static double hs_pivot(double *v, npy_intp lo, npy_intp hi) {
+  npy_intp mid = lo + (hi - lo) / 2;
+  double t;
+
+  if (HS_LT(v[mid], v[lo])) { t = v[mid]; v[mid] = v[lo]; v[lo] = t; }
+  if (HS_LT(v[hi], v[lo])) { t = v[hi]; v[hi] = v[lo]; v[lo] = t; }
+  if (HS_LT(v[hi], v[mid])) { t = v[hi]; v[hi] = v[mid]; v[mid] = t; }
+
+  return v[mid];
+}
+
+/* introsort of v[lo:hi] */
+static void hs_sort(double *v, npy_intp lo, npy_intp hi) {
+  int depth = 0;
+  npy_intp n, i, j;
+  double p, t;
+
+  for (n = hi - lo; n > 1; n >>= 1) depth += 2;
+  hi = hi - 1;
+
+  while (hi - lo > 16) {
+    if (depth-- == 0) {
+      hs_heapsort(v + lo, hi - lo + 1);
+      return;
+    }
+    p = hs_pivot(v, lo, hi);
+    i = lo;
+    j = hi;
+    while (i <= j) {
+      while (HS_LT(v[i], p)) i++;
+      while (HS_LT(p, v[j])) j--;
+      if (i <= j) {
+        t = v[i]; v[i] = v[j]; v[j] = t;
+        i++;
+        j--;
+      }
+    }
+    /* the smaller part first */
+    if (j - lo < hi - i) {
+      hs_sort(v, lo, j + 1);
+      lo = i;
+    } else {
+      hs_sort(v, i, hi + 1);
+      hi = j;
+    }
+  }
+
+  for (i = lo + 1; i <= hi; i++) {
+    t = v[i];
+    for (j = i; j > lo && HS_LT(t, v[j-1]); j--) v[j] = v[j-1];
+    v[j] = t;
+  }
+}
+
+/*
+ * LSD radix sort of v[0:n] (11 bits per pass) with the NaN values moved to
+ * the end first, aux is a buffer of n doubles
+ */
+#define HS_RADIX_BITS 11
+#define HS_RADIX_SIZE (1 << HS_RADIX_BITS)
+#define HS_RADIX_PASSES 6
+
+static npy_uint64 hs_key(double x) {
+  npy_uint64 u;
+  memcpy(&u, &x, sizeof(u));
+  return (u >> 63) ? ~u : (u | 0x8000000000000000ULL);
+}
+
+static void hs_radix(double *v, double *aux, npy_intp n) {
+  npy_intp count[HS_RADIX_PASSES][HS_RADIX_SIZE];
+  npy_intp i, j, sum, tmp;
+  npy_uint64 key;
+  double *src, *dst, *swap, tmp_value;
+  int pass, shift;
+
+  /* NaN values at the end as numpy.sort */
+  for (i = 0, j = n; i < j; ) {
+    if (v[i] != v[i]) {
+      j--;
+      tmp_value = v[i]; v[i] = v[j]; v[j] = tmp_value;
+    } else {
+      i++;
+    }
+  }
+  n = j;
+  if (n == 0) return;
+
+  memset(count, 0, sizeof(count));
+  for (i = 0; i < n; i++) {
+    key = hs_key(v[i]);
+    for (pass = 0; pass < HS_RADIX_PASSES; pass++) {
+      count[pass][(key >> (pass*HS_RADIX_BITS)) & (HS_RADIX_SIZE - 1)]++;
+    }
+  }
+
+  src = v;
+  dst = aux;
+  for (pass = 0; pass < HS_RADIX_PASSES; pass++) {
+    shift = pass*HS_RADIX_BITS;
+    /* skip the digits that are equal for all the values */
+    if (count[pass][(hs_key(v[0]) >> shift) & (HS_RADIX_SIZE - 1)] == n) continue;
+    for (i = 0, sum = 0; i < HS_RADIX_SIZE; i++) {
+      tmp = count[pass][i];
+      count[pass][i] = sum;
+      sum += tmp;
+    }
+    for (i = 0; i < n; i++) {
+      key = hs_key(src[i]);
+      dst[count[pass][(key >> shift) & (HS_RADIX_SIZE - 1)]++] = src[i];
+    }
+    swap = src; src = dst; dst = swap;
+  }
+
+  if (src != v) memcpy(v, src, n*sizeof(double));
+}
+
+/* partial selection: leaves v[lo:k] <= v[k:hi] */
+static void hs_select(double *v, npy_intp lo, npy_intp hi, npy_intp k) {
+  int depth = 64;
+  double p, t;
+  npy_intp i, j;
+
+  hi = hi - 1;
+  while ((k > lo) && (k <= hi)) {
+    if (depth-- == 0) {
+      hs_sort(v, lo, hi + 1);
+      return;
+    }
+    p = hs_pivot(v, lo, hi);
+    i = lo;
+    j = hi;
+    while (i <= j) {
+      while (HS_LT(v[i], p)) i++;
+      while (HS_LT(p, v[j])) j--;
+      if (i <= j) {
+        t = v[i]; v[i] = v[j]; v[j] = t;
+        i++;
+        j--;
+      }
+    }
+    if (k <= j) hi = j;
+    else if (k >= i) lo = i;
+    else return;
+  }
+}
+
+/*
+ * Same loop as hildebrand_sekhon, long arrays are sorted with a radix sort,
+ * short ones by chunks (selection of the next chunk + sort of it) only up to
+ * the point where the loop stops.
+ */
+#define HS_RADIX_MIN 512
+
+static double hs_row(double *sortdata, double *aux, npy_intp lenOfData, double navg) {
+  double nums_min = lenOfData*0.2;
+  if (nums_min <= 5) nums_min = 5;
+  npy_intp chunk = lenOfData/4;
+  if (chunk < (npy_intp)nums_min + 2) chunk = (npy_intp)nums_min + 2;
+  npy_intp sorted = 0;
+  npy_intp k;
+  if (lenOfData >= HS_RADIX_MIN) {
+    hs_radix(sortdata, aux, lenOfData);
+    sorted = lenOfData;
+  }
+  double sump = 0;
+  double sumq = 0;
+  long j = 0;
+  int cont = 1;
+  double rtest = 0;
+  while ((cont == 1) && (j < lenOfData)) {
+    if (j == sorted) {
+      k = sorted + chunk;
+      if (k > lenOfData) k = lenOfData;
+      hs_select(sortdata, sorted, lenOfData, k);
+      hs_sort(sortdata, sorted, k);
+      sorted = k;
+    }
+    sump = sump + sortdata[j];
+    sumq = sumq + pow(sortdata[j], 2);
+    if (j > nums_min) {
+      rtest = (double)j/(j-1) + 1/navg;
+      if ((sumq*j) > (rtest*pow(sump, 2))) {
+        j = j - 1;
+        sump = sump - sortdata[j];
+        sumq = sumq - pow(sortdata[j],2);
+        cont = 0;
+      }
+    }
+    j = j + 1;
+  }
+
+  return sump / j;
+}
+
+/*
+ * Noise of every row of a 2-D array (the rows do not need to be sorted),
+ * the GIL is released while the rows are processed.
+ */
+static PyObject *hildebrand_sekhon_batch(PyObject *self, PyObject *args) {
+  double navg;
+  PyObject *data_obj;
+  PyArrayObject *data_array, *noise_array;
+
+  if (!PyArg_ParseTuple(args, "Od", &data_obj, &navg)) {
+      return NULL;
+  }
+
+  data_array = (PyArrayObject*)PyArray_FROM_OTF(data_obj, NPY_FLOAT64, NPY_IN_ARRAY);
+
+  if (data_array == NULL) {
+      return NULL;
+  }
+
+  if (PyArray_NDIM(data_array) != 2) {
+      Py_DECREF(data_array);
+      PyErr_SetString(PyExc_ValueError, "data should be a 2-D array (rows, points)");
+      return NULL;
+  }
+
+  npy_intp nRows = PyArray_DIM(data_array, 0);
+  npy_intp lenOfData = PyArray_DIM(data_array, 1);
+
+  noise_array = (PyArrayObject*)PyArray_SimpleNew(1, &nRows, NPY_FLOAT64);
+  double *buffer = (double*)malloc((lenOfData > 0 ? 2*lenOfData : 1)*sizeof(double));
+
+  if ((noise_array == NULL) || (buffer == NULL)) {
+      Py_DECREF(data_array);
+      Py_XDECREF(noise_array);
+      free(buffer);
+      return PyErr_NoMemory();
+  }
+
+  double *data = (double*)PyArray_DATA(data_array);
+  double *noise = (double*)PyArray_DATA(noise_array);
+  npy_intp i;
+
+  Py_BEGIN_ALLOW_THREADS
+  for (i = 0; i < nRows; i++) {
+    memcpy(buffer, data + i*lenOfData, lenOfData*sizeof(double));
+    noise[i] = hs_row(buffer, buffer + lenOfData, lenOfData, navg);
+  }
+  Py_END_ALLOW_THREADS
+
+  free(buffer);
+  Py_DECREF(data_array);
+
+  return (PyObject*)noise_array;
+}
+
+
 static PyMethodDef noiseMethods[] = {
   { "hildebrand_sekhon", hildebrand_sekhon, METH_VARARGS, "Get noise with hildebrand_sekhon algorithm" },
+  { "hildebrand_sekhon_batch", hildebrand_sekhon_batch, METH_VARARGS, "Get noise of each row of a 2-D array with hildebrand_sekhon algorithm" },
   { NULL, NULL, 0, NULL }
 };
 
@@ -12,6 +12,7 @@ from pydoc import locate
 from fuzzywuzzy import process
 from schainpy.cli import templates
 import inspect
+import time
 try:
     from queue import Queue
 except:
@@ -89,9 +90,13 @@ PREFIX = 'experiment'
 
 @click.command()
 @click.option('--version', '-v', is_flag=True, callback=print_version, help='SChain version', type=str)
+@click.option('--filefmt', default='*%Y%j***', help='Format of the file names (index)')
+@click.option('--folderfmt', default='*%Y%j', help='Format of the folder names (index)')
+@click.option('--walk/--no-walk', default=True, help='Index the subfolders of the path (index)')
+@click.option('--index-file', default=None, help='Index file, ~/.schainpy/catalog_<hash>.json by default (index)')
 @click.argument('command', default='run', required=True)
 @click.argument('nextcommand', default=None, required=False, type=str)
-def main(command, nextcommand, version):
+def main(command, nextcommand, version, filefmt, folderfmt, walk, index_file):
     """COMMAND LINE INTERFACE FOR SIGNAL CHAIN - JICAMARCA RADIO OBSERVATORY V3.0\n
         Available commands:\n
         xml: runs a schain XML generated file\n
@@ -99,7 +104,9 @@ def main(command, nextcommand, version):
         generate: generates a template schain script\n
         list: return a list of available procs and operations\n
         search: return avilable operations, procs or arguments of the given
-                operation/proc\n"""
+                operation/proc\n
+        index: builds or updates the file catalog of a data path used by the
+               readers with catalog=1\n"""
     if command == 'xml':
         runFromXML(nextcommand)
     elif command == 'generate':
@@ -112,6 +119,8 @@ def main(command, nextcommand, version):
         search(nextcommand)
     elif command == 'list':
         cmdlist(nextcommand)
+    elif command == 'index':
+        index(nextcommand, filefmt, folderfmt, walk, index_file)
     else:
         log.error('Command {} is not defined'.format(command))
 
@@ -164,6 +173,22 @@ def search(nextcommand):
             similar = [t[0] for t in process.extract(nextcommand, allModules, limit=12) if t[1]>80]
             log.success('Possible modules are: {}'.format(', '.join(similar)), '')
 
+def index(path, filefmt, folderfmt, walk, index_file):
+    from schainpy.model.io.jroIO_base import FileCatalog
+
+    if path is None:
+        log.error('Missing argument, path of the data to index', '')
+        return
+
+    t0 = time.time()
+    catalog = FileCatalog(path, filefmt, folderfmt, walk, index_file)
+    catalog.refresh()
+    info = catalog.summary()
+    log.success('Index {} updated in {:.2f} s: {} folders, {} files, {:.1f} GB, {} - {}'.format(
+        catalog.index_file, time.time()-t0, info['folders'], info['files'],
+        info['size']/1e9, info['first'], info['last']), '')
+
+
 def runschain(nextcommand):
     if nextcommand is None:
         currentfiles = glob.glob('./{}_*.py'.format(PREFIX))
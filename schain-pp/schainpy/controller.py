@@ -7,22 +7,31 @@
 The API is provide through class: Project
 """
 
+import os
 import re
 import sys
 import ast
+import csv
+import json
 import datetime
 import traceback
 import time
 import multiprocessing
 import signal as sig
 from multiprocessing import Process, Queue, active_children
+from queue import Empty
 from threading import Thread
 from xml.etree.ElementTree import ElementTree, Element, SubElement
 
 from schainpy.admin import Alarm, SchainWarning
 from schainpy.model import *
+from schainpy.model.proc.jroproc_base import TRANSPORT, QUEUE_SIZE, PROFILE, PROFILE_FILE, PRECISION, POLICY, OperationStats, \
+    SharedBlock, parsePolicy
+from schainpy.model.graphics.jroplot_service import PLOT_WORKERS, PlotService
 from schainpy.utils import log
 
+SCHEDULERS = ('sequential', 'parallel')
+
 if 'darwin' in sys.platform and sys.version_info[0] == 3 and sys.version_info[1] > 7:
     multiprocessing.set_start_method('fork')
 
@@ -148,15 +157,17 @@ class ConfBase():
 class OperationConf(ConfBase):
 
     ELEMENTNAME = 'Operation'
-    xml_labels = ['id', 'name']
+    xml_labels = ['id', 'name', 'transport', 'policy']
 
-    def setup(self, id, name, priority, project_id, err_queue):
+    def setup(self, id, name, priority, project_id, err_queue, transport=None, policy=None):
 
         self.id = str(id)
         self.project_id = project_id
         self.name = name
         self.type = 'other'
         self.err_queue = err_queue
+        self.transport = transport
+        self.policy = policy
 
     def readXml(self, element, project_id, err_queue):
 
@@ -165,17 +176,41 @@ class OperationConf(ConfBase):
         self.type = 'other'
         self.project_id = str(project_id)
         self.err_queue = err_queue
+        self.transport = None if element.get('transport') in (None, 'None') else element.get('transport')
+        self.policy = None if element.get('policy') in (None, 'None') else element.get('policy')
 
         for elm in element.iter('Parameter'):
             self.addParameter(elm.get('name'), elm.get('value'))
 
-    def createObject(self):
+    def createObject(self, transport=None, stats=False, service=None):
+        '''
+        Instancia de operaciones, `transport` is the project default used
+        by external operations when the operation does not define one, the
+        plots run in the workers of `service` (PlotService) if given. The
+        writers always use the block policy (every block is written) and the
+        operations without add_frame (not plots) can not add the coalesced
+        frames, for them coalesce is changed to keep-latest.
+        '''
 
         className = eval(self.name)
 
         if 'Plot' in self.name or 'Writer' in self.name or 'Send' in self.name or 'print' in self.name:
             kwargs = self.getKwargs()
-            opObj = className(self.id, self.id, self.project_id, self.err_queue, **kwargs)
+            if service is not None and 'Plot' in self.name:
+                opObj = service.addOperation(self.id, self.name, kwargs)
+            else:
+                opObj = className(self.id, self.id, self.project_id, self.err_queue, **kwargs)
+            opObj.setTransport(self.transport or transport or TRANSPORT)
+            policy = self.policy or POLICY
+            if policy and 'Writer' in self.name and policy != 'block':
+                log.warning('Writers keep every block, policy {} ignored'.format(policy), self.name)
+            elif policy and parsePolicy(policy)[0] == 'coalesce' and not hasattr(className, 'add_frame'):
+                log.warning('No add_frame to coalesce frames, policy {} changed to keep-latest'.format(policy), self.name)
+                opObj.setPolicy('keep-latest')
+            elif policy:
+                opObj.setPolicy(policy)
+            if stats:
+                opObj.enableStats()
             opObj.start()
             self.type = 'external'
         else:
@@ -187,9 +222,9 @@ class OperationConf(ConfBase):
 class ProcUnitConf(ConfBase):
 
     ELEMENTNAME = 'ProcUnit'
-    xml_labels = ['id', 'inputId', 'name']
+    xml_labels = ['id', 'inputId', 'name', 'group']
 
-    def setup(self, project_id, id, name, datatype, inputId, err_queue):
+    def setup(self, project_id, id, name, datatype, inputId, err_queue, group=None):
         '''
         '''
 
@@ -211,9 +246,18 @@ class ProcUnitConf(ConfBase):
         self.datatype = datatype
         self.inputId = inputId
         self.err_queue = err_queue
+        self.group = group
         self.operations = []
         self.parameters = {}
 
+    def getInputIds(self):
+
+        if self.inputId is None:
+            return []
+        if isinstance(self.inputId, list):
+            return self.inputId
+        return [self.inputId]
+
     def removeOperation(self, id):
 
         i = [1 if x.id==id else 0 for x in self.operations]
@@ -225,13 +269,14 @@ class ProcUnitConf(ConfBase):
             if conf.id == id:
                 return conf
 
-    def addOperation(self, name, optype='self'):
+    def addOperation(self, name, optype='self', transport=None, policy=None):
         '''
         '''
 
         id = self.getNewId()
         conf = OperationConf()
-        conf.setup(id, name=name, priority='0', project_id=self.project_id, err_queue=self.err_queue)
+        conf.setup(id, name=name, priority='0', project_id=self.project_id, err_queue=self.err_queue, transport=transport,
+                   policy=policy)
         self.operations.append(conf)
 
         return conf
@@ -241,6 +286,7 @@ class ProcUnitConf(ConfBase):
         self.id = element.get('id')
         self.name = element.get('name')
         self.inputId = None if element.get('inputId') == 'None' else element.get('inputId')
+        self.group = None if element.get('group') in (None, 'None') else element.get('group')
         self.datatype = element.get('datatype', self.name.replace(self.ELEMENTNAME.replace('Unit', ''), ''))
         self.project_id = str(project_id)
         self.err_queue = err_queue
@@ -255,7 +301,7 @@ class ProcUnitConf(ConfBase):
                 conf.readXml(elm, project_id, err_queue)
                 self.operations.append(conf)
 
-    def createObjects(self):
+    def createObjects(self, transport=None, stats=False, service=None):
         '''
         Instancia de unidades de procesamiento.
         '''
@@ -264,11 +310,13 @@ class ProcUnitConf(ConfBase):
         kwargs = self.getKwargs()
         procUnitObj = className()
         procUnitObj.name = self.name
+        if stats:
+            procUnitObj.enableStats(self.id)
         log.success('creating process...', self.name)
 
         for conf in self.operations:
 
-            opObj = conf.createObject()
+            opObj = conf.createObject(transport, stats, service)
 
             log.success('adding operation: {}, type:{}'.format(
                 conf.name,
@@ -295,11 +343,12 @@ class ReadUnitConf(ProcUnitConf):
         self.datatype = None
         self.name = None
         self.inputId = None
+        self.group = None
         self.operations = []
         self.parameters = {}
 
     def setup(self, project_id, id, name, datatype, err_queue, path='', startDate='', endDate='',
-              startTime='', endTime='', server=None, **kwargs):
+              startTime='', endTime='', server=None, group=None, **kwargs):
 
         if datatype == None and name == None:
             raise ValueError('datatype or name should be defined')
@@ -321,6 +370,7 @@ class ReadUnitConf(ProcUnitConf):
         self.name = name
         self.datatype = datatype
         self.err_queue = err_queue
+        self.group = group
 
         self.addParameter(name='path', value=path, format='str')
         self.addParameter(name='startDate', value=startDate)
@@ -332,6 +382,151 @@ class ReadUnitConf(ProcUnitConf):
             self.addParameter(name=key, value=value)
 
 
+class UnitWorker(Process):
+    '''
+    Run a group of processing units in its own process, the data between
+    workers is sent through bounded queues following the inputId graph.
+
+    inputs  : {unit id: [(input index, queue or None if local)]}
+    outputs : {unit id: [queues of units in other workers]}
+    '''
+
+    def __init__(self, name, confs, inputs, outputs, err_queue, transport=None, copy_mode=None,
+                 stats_queue=None, precision=None, plot_workers=None):
+
+        Process.__init__(self)
+        self.name = name
+        self.confs = confs
+        self.inputs = inputs
+        self.outputs = outputs
+        self.err_queue = err_queue
+        self.transport = transport
+        self.copy_mode = copy_mode
+        self.stats_queue = stats_queue
+        self.precision = precision
+        self.plot_workers = plot_workers
+
+    def setInputs(self, conf, objects):
+
+        obj = conf.object
+        obj.inputs = []
+
+        for i, (index, queue) in enumerate(self.inputs[conf.id]):
+            attr = 'dataIn' if i == 0 else 'dataIn{}'.format(i)
+            obj.inputs.append(attr)
+            if queue is None:
+                setattr(obj, attr, objects[conf.getInputIds()[index]].dataOut)
+
+    def getInputs(self, conf):
+
+        for i, (index, queue) in enumerate(self.inputs[conf.id]):
+            if queue is not None:
+                attr = 'dataIn' if i == 0 else 'dataIn{}'.format(i)
+                data = queue.get()
+                if isinstance(data, SharedBlock):
+                    data = data.attach()
+                setattr(conf.object, attr, data)
+
+    def putOutputs(self, conf):
+
+        if not self.outputs[conf.id]:
+            return
+
+        if conf.object.copy_mode == 'cow':
+            # serializado una vez para todas las colas, antes de que la unidad
+            # vuelva a modificar sus arreglos
+            data = SharedBlock.pack(conf.object.dataOut)
+        else:
+            data = conf.object.dataOut.copy()
+
+        for queue in self.outputs[conf.id]:
+            queue.put(data)
+
+    def getPending(self, conf):
+        '''
+        Remote inputs of a finished unit whose last (error) block has not
+        been received yet
+        '''
+
+        pending = []
+
+        for i, (index, queue) in enumerate(self.inputs[conf.id]):
+            attr = 'dataIn' if i == 0 else 'dataIn{}'.format(i)
+            if queue is not None and not getattr(conf.object, attr).error:
+                pending.append(queue)
+
+        return pending
+
+    def drain(self, queues, block=False):
+        '''
+        Consume the inputs of a finished unit until the upstream worker
+        sends its last block, so it never blocks on a full queue
+        '''
+
+        pending = []
+
+        for queue in queues:
+            while True:
+                try:
+                    data = queue.get(block=block)
+                except Empty:
+                    pending.append(queue)
+                    break
+                if isinstance(data, SharedBlock):
+                    data = data.attach()
+                if data.error:
+                    break
+
+        return pending
+
+    def run(self):
+
+        sig.signal(sig.SIGTERM, handler)
+        self.err_queue.put('#_start_#')
+
+        try:
+            objects = {}
+            service = PlotService(self.plot_workers) if self.plot_workers else None
+            for conf in self.confs:
+                conf.createObjects(self.transport, self.stats_queue is not None, service)
+                if self.copy_mode:
+                    conf.object.setCopyMode(self.copy_mode)
+                if self.precision:
+                    conf.object.setPrecision(self.precision)
+                objects[conf.id] = conf.object
+            if service is not None:
+                service.start()
+            for conf in self.confs:
+                self.setInputs(conf, objects)
+
+            done = {}
+            while len(done) < len(self.confs):
+                for conf in self.confs:
+                    if conf.id in done:
+                        done[conf.id] = self.drain(done[conf.id])
+                        continue
+                    self.getInputs(conf)
+                    ok = conf.run()
+                    if ok:
+                        self.putOutputs(conf)
+                    if ok == 'Error':
+                        done[conf.id] = self.getPending(conf)
+                    elif not ok:
+                        break
+
+            for conf in self.confs:
+                self.drain(done[conf.id], block=True)
+                conf.object.closeShared()
+
+            if self.stats_queue is not None:
+                self.stats_queue.put([row for conf in self.confs for row in conf.object.getStats()])
+        except:
+            self.err_queue.put('{}|{}'.format(self.name, traceback.format_exc()))
+            return
+
+        self.err_queue.put('#_end_#|{}'.format(os.getpid()))
+
+
 class Project(Process):
     """API to create signal chain projects"""
 
@@ -351,6 +546,13 @@ class Project(Process):
         # self.err_queue = Queue()
         self.err_queue = None
         self.started = False
+        self.transport = None
+        self.copy_mode = None
+        self.scheduler = None
+        self.profile = False
+        self.profile_file = None
+        self.precision = None
+        self.plot_workers = None
 
     def getNewId(self):
 
@@ -387,15 +589,38 @@ class Project(Process):
 
         self.configurations = new_confs
 
-    def setup(self, id=1, name='', description='', email=None, alarm=[]):
+    def setup(self, id=1, name='', description='', email=None, alarm=[], transport=None, copy_mode=None,
+              scheduler=None, profile=False, precision=None, plot_workers=None, profile_file=None):
 
         self.id = str(id)
         self.description = description
         self.email = email
         self.alarm = alarm
+        self.transport = transport
+        self.copy_mode = copy_mode
+        self.setScheduler(scheduler)
+        self.profile = profile
+        self.profile_file = profile_file
+        self.precision = precision
+        self.plot_workers = plot_workers
         if name:
             self.name = '{} ({})'.format(Process.__name__, name)
 
+    def setScheduler(self, scheduler):
+        '''
+        'sequential' (default, all the units in one process) or 'parallel'
+        (one process per unit or group of units). The parallel scheduler is
+        off by default: every block is copied between processes, it only
+        pays off with a free core per worker and heavy units, with fewer
+        cores it is slower (0.85x of sequential in bench_scheduler.py on one
+        core).
+        '''
+
+        if scheduler is not None and scheduler not in SCHEDULERS:
+            raise ValueError('scheduler should be one of {}'.format(SCHEDULERS))
+
+        self.scheduler = scheduler
+
     def update(self, **kwargs):
 
         for key, value in kwargs.items():
@@ -407,11 +632,18 @@ class Project(Process):
         p.id = self.id
         p.name = self.name
         p.description = self.description
+        p.transport = self.transport
+        p.copy_mode = self.copy_mode
+        p.scheduler = self.scheduler
+        p.profile = self.profile
+        p.profile_file = self.profile_file
+        p.precision = self.precision
+        p.plot_workers = self.plot_workers
         p.configurations = self.configurations.copy()
 
         return p
 
-    def addReadUnit(self, id=None, datatype=None, name=None, **kwargs):
+    def addReadUnit(self, id=None, datatype=None, name=None, group=None, **kwargs):
 
         '''
         '''
@@ -422,12 +654,12 @@ class Project(Process):
             idReadUnit = str(id)
 
         conf = ReadUnitConf()
-        conf.setup(self.id, idReadUnit, name, datatype, self.err_queue, **kwargs)
+        conf.setup(self.id, idReadUnit, name, datatype, self.err_queue, group=group, **kwargs)
         self.configurations[conf.id] = conf
 
         return conf
 
-    def addProcUnit(self, id=None, inputId='0', datatype=None, name=None):
+    def addProcUnit(self, id=None, inputId='0', datatype=None, name=None, group=None):
 
         '''
         '''
@@ -438,7 +670,7 @@ class Project(Process):
             idProcUnit = id
 
         conf = ProcUnitConf()
-        conf.setup(self.id, idProcUnit, name, datatype, inputId, self.err_queue)
+        conf.setup(self.id, idProcUnit, name, datatype, inputId, self.err_queue, group)
         self.configurations[conf.id] = conf
 
         return conf
@@ -478,6 +710,20 @@ class Project(Process):
         xml.set('id', str(self.id))
         xml.set('name', self.name)
         xml.set('description', self.description)
+        if self.transport:
+            xml.set('transport', self.transport)
+        if self.copy_mode:
+            xml.set('copy_mode', self.copy_mode)
+        if self.scheduler:
+            xml.set('scheduler', self.scheduler)
+        if self.profile:
+            xml.set('profile', '1')
+        if self.profile_file:
+            xml.set('profile_file', self.profile_file)
+        if self.precision:
+            xml.set('precision', self.precision)
+        if self.plot_workers:
+            xml.set('plot_workers', str(self.plot_workers))
 
         for conf in self.configurations.values():
             conf.makeXml(xml)
@@ -529,6 +775,13 @@ class Project(Process):
         self.id = self.xml.get('id')
         self.name = self.xml.get('name')
         self.description = self.xml.get('description')
+        self.transport = self.xml.get('transport')
+        self.copy_mode = self.xml.get('copy_mode')
+        self.setScheduler(self.xml.get('scheduler'))
+        self.profile = self.xml.get('profile', '').lower() in ('1', 'true', 'yes')
+        self.profile_file = self.xml.get('profile_file')
+        self.precision = self.xml.get('precision')
+        self.plot_workers = int(self.xml.get('plot_workers', 0)) or None
 
         for element in self.xml:
             if element.tag == 'ReadUnit':
@@ -558,19 +811,28 @@ class Project(Process):
 
         return text
 
-    def createObjects(self):
+    def createObjects(self, stats=False):
 
+        plot_workers = self.plot_workers or PLOT_WORKERS
+        service = PlotService(plot_workers) if plot_workers else None
         keys = list(self.configurations.keys())
         keys.sort()
         for key in keys:
             conf = self.configurations[key]
-            conf.createObjects()
+            conf.createObjects(self.transport, stats, service)
+            if self.copy_mode:
+                conf.object.setCopyMode(self.copy_mode)
+            if self.precision:
+                conf.object.setPrecision(self.precision)
             if conf.inputId is not None:
                 if isinstance(conf.inputId, list):
                     conf.object.setInput([self.configurations[x].object for x in conf.inputId])
                 else:
                     conf.object.setInput([self.configurations[conf.inputId].object])
 
+        if service is not None:
+            service.start()
+
     def monitor(self):
 
         t = Thread(target=self._monitor, args=(self.err_queue, self.ctx))
@@ -663,14 +925,171 @@ class Project(Process):
             if n == 0:
                 err = True
 
+    def runWorkers(self, stats=False):
+        '''
+        Run each group of units (each unit if no group is given) in its own
+        process, the blocks are sent between them through bounded queues,
+        return the stats of the units if `stats` is enabled.
+        '''
+
+        groups = {}
+        owner = {}
+
+        for conf in self.getUnits():
+            key = conf.id if conf.group is None else conf.group
+            groups.setdefault(key, []).append(conf)
+            owner[conf.id] = key
+
+        inputs = {conf.id: [] for conf in self.getUnits()}
+        outputs = {conf.id: [] for conf in self.getUnits()}
+
+        for conf in self.getUnits():
+            for index, inputId in enumerate(conf.getInputIds()):
+                if owner[inputId] == owner[conf.id]:
+                    inputs[conf.id].append((index, None))
+                else:
+                    queue = Queue(maxsize=QUEUE_SIZE)
+                    inputs[conf.id].append((index, queue))
+                    outputs[inputId].append(queue)
+
+        if len(groups) > (os.cpu_count() or 1):
+            log.warning('{} unit workers on {} cores, the parallel scheduler may be slower than sequential'.format(
+                len(groups), os.cpu_count() or 1), self.name)
+
+        err_queue = Queue()
+        stats_queue = Queue() if stats else None
+        workers = []
+
+        for key, confs in groups.items():
+            names = '+'.join(conf.name for conf in confs)
+            worker = UnitWorker(names, confs, inputs, outputs, err_queue,
+                                self.transport, self.copy_mode, stats_queue, self.precision,
+                                self.plot_workers or PLOT_WORKERS)
+            worker.start()
+            workers.append(worker)
+
+        procs = len(workers)
+        ended = set()
+        lost = set()
+        while procs > 0:
+            try:
+                msg = err_queue.get(timeout=1)
+            except Empty:
+                # a worker that exits without posting its end (segfault,
+                # killed) is given one more poll for the messages in transit
+                dead = [worker for worker in workers if worker.exitcode is not None and worker.pid not in ended]
+                if any(worker.pid in lost for worker in dead):
+                    for worker in dead:
+                        log.error('{} exited with code {}'.format(worker.name, worker.exitcode), self.name)
+                    for worker in workers:
+                        worker.terminate()
+                    break
+                lost.update(worker.pid for worker in dead)
+                continue
+            if '#_start_#' in msg:
+                continue
+            elif '#_end_#' in msg:
+                ended.add(int(msg.split('|', 1)[1]))
+                procs -= 1
+            else:
+                name, err = msg.split('|', 1)
+                if 'SchainWarning' in err:
+                    log.warning(err.split('SchainWarning:')[-1].split('\n')[0].strip(), name)
+                elif 'SchainError' in err:
+                    log.error(err.split('SchainError:')[-1].split('\n')[0].strip(), name)
+                else:
+                    log.error(err, name)
+                for worker in workers:
+                    worker.terminate()
+                break
+
+        rows = []
+        if stats and procs == 0:
+            for worker in workers:
+                rows.extend(stats_queue.get())
+            rows.sort(key=lambda row: row['id'])
+
+        for worker in workers:
+            worker.join()
+
+        return rows
+
+    def printStats(self, rows, elapsed):
+        '''
+        Summary table of the time spent by each unit and operation
+        '''
+
+        line = '{:>6} {:<28} {:<8} {:>7} {:>9} {:>9} {:>9} {:>9} {:>9} {:>9} {:>9} {:>8} {:>9} {:>8}'
+        log.success('Stats of {} (Time: {:4.2f}s)'.format(self.name, elapsed), '')
+        log.log(line.format('id', 'name', 'type', 'blocks', 'wall[s]', 'cpu[s]', 'wait[s]',
+                            'send[s]', 'in[MB]', 'out[MB]', 'blocks/s', 'dropped', 'coalesced', 'rss[MB]'), '')
+
+        for row in rows:
+            log.log(line.format(
+                row['id'],
+                row['name'] if row['type'] == 'unit' else '  {}'.format(row['name']),
+                row['type'],
+                row['blocks'],
+                '{:.3f}'.format(row['wall']),
+                '{:.3f}'.format(row['cpu']),
+                '{:.3f}'.format(row['wait']),
+                '{:.3f}'.format(row['send']),
+                '{:.1f}'.format(row['bytes_in']/1e6),
+                '{:.1f}'.format(row['bytes_out']/1e6),
+                '{:.2f}'.format(row['blocks_s']),
+                row['dropped'],
+                row['coalesced'],
+                '{:.0f}'.format(row['maxrss']),
+                ), '')
+
+    def writeStats(self, rows, elapsed, filename):
+        '''
+        Save the stats as JSON or CSV (by the extension of filename)
+        '''
+
+        if filename.lower().endswith('.csv'):
+            with open(filename, 'w', newline='') as fp:
+                writer = csv.DictWriter(fp, fieldnames=OperationStats.fields)
+                writer.writeheader()
+                writer.writerows(rows)
+        else:
+            with open(filename, 'w') as fp:
+                json.dump({
+                    'project': self.name,
+                    'id': self.id,
+                    'scheduler': self.scheduler or 'sequential',
+                    'transport': self.transport or TRANSPORT,
+                    'precision': self.precision or PRECISION or None,
+                    'elapsed': elapsed,
+                    'stats': rows,
+                    }, fp, indent=2)
+
+        log.success('Stats saved in {}'.format(filename), '')
+
     def run(self):
 
         log.success('\nStarting Project {} [id={}]'.format(self.name, self.id), tag='')
         self.started = True
         self.start_time = time.time()
-        self.createObjects()
         sig.signal(sig.SIGTERM, handler)
-        self.runProcs()
+        # profile (SCHAIN_PROFILE) enables the stats, profile_file
+        # (SCHAIN_PROFILE_FILE) also saves them (.json or .csv)
+        filename = self.profile_file or PROFILE_FILE
+        profile = bool(self.profile or PROFILE or filename)
+        if self.scheduler == 'parallel':
+            rows = self.runWorkers(profile)
+        else:
+            self.createObjects(profile)
+            self.runProcs()
+            rows = []
+            for conf in self.getUnits():
+                conf.object.closeShared()
+                rows.extend(conf.object.getStats())
+        if profile:
+            elapsed = time.time() - self.start_time
+            self.printStats(rows, elapsed)
+            if filename:
+                self.writeStats(rows, elapsed, filename)
         log.success('{} Done (Time: {:4.2f}s)'.format(
             self.name,
             time.time()-self.start_time), '')
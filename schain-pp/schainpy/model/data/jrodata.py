@@ -14,12 +14,25 @@ import copy
 import numpy
 import datetime
 import json
+from concurrent.futures import ThreadPoolExecutor
 
 import schainpy.admin
 from schainpy.utils import log
 from .jroheaderIO import SystemHeader, RadarControllerHeader
 from schainpy.model.data import _noise
 
+# Indice de las variables meteorologicas en data_param (WeatherRadar)
+WEATHER_VARS = {
+    'S': 0,
+    'V': 1,
+    'W': 2,
+    'SNR': 3,
+    'Z': 4,
+    'D': 5,
+    'P': 6,
+    'R': 7,
+}
+
 
 def getNumpyDtype(dataTypeCode):
 
@@ -110,6 +123,56 @@ def hildebrand_sekhon(data, navg):
     return _noise.hildebrand_sekhon(sortdata, navg)
 
 
+def hildebrand_sekhon_batch(data, navg, axis=-1, threads=1, executor=None):
+    """
+    Noise level of several arrays in one call (e.g. every channel or every
+    height of a spectra), same result as hildebrand_sekhon for each one. The
+    data does not need to be sorted, only the part used by the estimator is
+    sorted by the C extension (without the GIL).
+
+    Inputs:
+        data    :    N-D array
+        navg    :    numbers of averages
+        axis    :    axis or tuple of axes of each estimation (None: all)
+        threads :    number of threads used to process the estimations
+        executor:    executor of the threads, owned by the caller (who shuts it
+                     down), by default one is created and shut down in the call
+
+    Return:
+        noise   :    noise's levels, shape of data without `axis`
+    """
+
+    data = numpy.asarray(data)
+
+    if axis is None:
+        axis = tuple(range(data.ndim))
+    elif numpy.isscalar(axis):
+        axis = (axis, )
+
+    axis = [a % data.ndim for a in axis]
+    keep = [a for a in range(data.ndim) if a not in axis]
+    shape = [data.shape[a] for a in keep]
+    size = int(numpy.prod([data.shape[a] for a in axis]))
+
+    rows = numpy.ascontiguousarray(data.transpose(keep + axis), dtype=numpy.float64)
+    rows = rows.reshape(int(numpy.prod(shape)), size)
+
+    threads = min(threads, len(rows))
+
+    if threads > 1:
+        chunks = numpy.array_split(rows, threads)
+        estimate = lambda x: _noise.hildebrand_sekhon_batch(x, navg)
+        if executor is None:
+            with ThreadPoolExecutor(threads) as pool:
+                noise = numpy.concatenate(list(pool.map(estimate, chunks)))
+        else:
+            noise = numpy.concatenate(list(executor.map(estimate, chunks)))
+    else:
+        noise = _noise.hildebrand_sekhon_batch(rows, navg)
+
+    return noise.reshape(shape)
+
+
 class Beam:
 
     def __init__(self):
@@ -147,6 +210,32 @@ class GenericData(object):
 
         return copy.deepcopy(self)
 
+    def snapshot(self):
+        '''
+        Lightweight copy of the object for the external operations, numpy
+        arrays are not copied, the copy gets read-only views of them (the
+        arrays of this object stay writable). The copy must be serialized
+        before this object is modified again (see SharedBlock.pack).
+        '''
+
+        memo = {}
+
+        for value in self.__dict__.values():
+            if isinstance(value, numpy.ndarray):
+                view = value.view()
+                view.flags.writeable = False
+                memo[id(value)] = view
+
+        return copy.deepcopy(self, memo)
+
+    def select(self, **kwargs):
+        '''
+        Part of the object needed by an external operation configured with
+        `kwargs`, sent instead of the whole object (all of it by default)
+        '''
+
+        return self
+
     def isEmpty(self):
 
         return self.flagNoData
@@ -191,7 +280,8 @@ class JROData(GenericData):
     data = None
     nmodes = None
     h0 = 0
-    metadata_list = ['heightList', 'timeZone', 'type']
+    precision = 'double'  # 'double' (complex128) o 'single' (complex64)
+    metadata_list = ['heightList', 'timeZone', 'type', 'precision']
 
     def __str__(self):
 
@@ -371,7 +461,7 @@ class Voltage(JROData):
         self.flagDataAsBlock = False  # Asumo que la data es leida perfil a perfil
         self.profileIndex = 0
         self.metadata_list = ['type', 'heightList', 'timeZone', 'nProfiles', 'channelList', 'nCohInt',
-            'code', 'nCode', 'nBaud', 'ippSeconds', 'ipp']
+            'code', 'nCode', 'nBaud', 'ippSeconds', 'ipp', 'precision']
 
     def getNoisebyHildebrand(self, channel=None):
         """
@@ -388,15 +478,12 @@ class Voltage(JROData):
             data = self.data
             nChannels = self.nChannels
 
-        noise = numpy.zeros(nChannels)
-        power = data * numpy.conjugate(data)
+        power = (data * numpy.conjugate(data)).real
 
-        for thisChannel in range(nChannels):
-            if nChannels == 1:
-                daux = power[:].real
-            else:
-                daux = power[thisChannel, :].real
-            noise[thisChannel] = hildebrand_sekhon(daux, self.nCohInt)
+        if nChannels == 1:
+            noise = hildebrand_sekhon_batch(power, self.nCohInt, axis=None).reshape(1)
+        else:
+            noise = hildebrand_sekhon_batch(power, self.nCohInt, axis=tuple(range(1, power.ndim)))
 
         return noise
 
@@ -462,7 +549,7 @@ class Spectra(JROData):
         self.beacon_heiIndexList = []
         self.noise_estimation = None
         self.metadata_list = ['type', 'heightList', 'timeZone', 'pairsList', 'channelList', 'nCohInt',
-            'code', 'nCode', 'nBaud', 'ippSeconds', 'ipp','nIncohInt', 'nFFTPoints', 'nProfiles']
+            'code', 'nCode', 'nBaud', 'ippSeconds', 'ipp','nIncohInt', 'nFFTPoints', 'nProfiles', 'precision']
 
     def getNoisebyHildebrand(self, xmin_index=None, xmax_index=None, ymin_index=None, ymax_index=None):
         """
@@ -472,12 +559,8 @@ class Spectra(JROData):
             noiselevel
         """
 
-        noise = numpy.zeros(self.nChannels)
-
-        for channel in range(self.nChannels):
-            daux = self.data_spc[channel,
-                                 xmin_index:xmax_index, ymin_index:ymax_index]
-            noise[channel] = hildebrand_sekhon(daux, self.nIncohInt)
+        daux = self.data_spc[:, xmin_index:xmax_index, ymin_index:ymax_index]
+        noise = hildebrand_sekhon_batch(daux, self.nIncohInt, axis=(1, 2))
 
         return noise
 
@@ -859,6 +942,7 @@ class Parameters(Spectra):
     nAvg = None
     noise_estimation = None
     GauSPC = None  # Fit gaussian SPC
+    weather_vars = None  # Weather variables in data_param {name: index} (None: WEATHER_VARS)
 
     def __init__(self):
         '''
@@ -904,44 +988,100 @@ class Parameters(Spectra):
 
     noise = property(getNoise, setValue, "I'm the 'Noise' property.")
 
+    def getWeatherIndex(self, name):
+        '''
+        Index of the weather variable `name` in the second axis of data_param
+        '''
+
+        weather_vars = WEATHER_VARS if self.weather_vars is None else self.weather_vars
+
+        if name not in weather_vars:
+            raise ValueError('Weather variable {} not in data_param, available: {}'.format(
+                name, ','.join(weather_vars)))
+
+        return weather_vars[name]
+
+    def select(self, weather_var=None, attr_data=None, mask=None, **kwargs):
+        '''
+        Keep only the weather variables used by the operation: `weather_var`
+        (HDFWriter) or `attr_data` (WeatherParamsPlot) and the SNR if a mask
+        is given, so every consumer of a sweep receives only its slice.
+        '''
+
+        names = weather_var if weather_var is not None else attr_data
+
+        if self.weather_vars is None or names is None or self.data_param is None:
+            return self
+
+        if isinstance(names, str):
+            names = [names]
+        names = [name for name in names if name in self.weather_vars]
+        if not names:
+            return self
+        if mask and 'SNR' in self.weather_vars and 'SNR' not in names:
+            names.append('SNR')
+        if len(names) == len(self.weather_vars):
+            return self
+
+        obj = copy.copy(self)
+        obj.data_param = self.data_param[:, [self.weather_vars[name] for name in names]]
+        obj.weather_vars = {name: i for i, name in enumerate(names)}
+
+        return obj
+
 
 class PlotterData(object):
     '''
     Object to hold data to be plotted
+
+    Each product is kept in a preallocated buffer along the time axis with
+    the times sorted by construction, appending a new time is O(1) and
+    reading a product returns a (read only) view of the buffer, valid until
+    the next update. All the times since the last setup are kept as before,
+    if the buffers exceed `max_memory` MB the oldest times are dropped
+    (`max_memory=None` disables the limit).
     '''
 
     MAXNUMX = 1000
     MAXNUMY = 1000
 
-    def __init__(self, code, exp_code, localtime=True):
+    def __init__(self, code, exp_code, localtime=True, max_memory=1024):
 
         self.key = code
         self.exp_code = exp_code
         self.ready = False
         self.flagNoData = False
         self.localtime = localtime
-        self.data = {}
+        self.max_memory = max_memory
         self.meta = {}
-        self.__heights = []
+        self.__times = numpy.zeros(0)
+        self.__buffers = {}
+        self.__spare = {}
+        self.setup()
 
     def __str__(self):
-        dum = ['{}{}'.format(key, self.shape(key)) for key in self.data]
+        dum = ['{}{}'.format(key, self.shape(key)) for key in self.__buffers]
         return 'Data[{}][{}]'.format(';'.join(dum), len(self.times))
 
     def __len__(self):
-        return len(self.data)
+        return self.__end - self.__start
 
     def __getitem__(self, key):
-        if isinstance(key, int):
-            return self.data[self.times[key]]
+        if isinstance(key, (int, numpy.integer)):
+            return self.__item(self.__position(key))
         elif isinstance(key, str):
-            ret = numpy.array([self.data[x][key] for x in self.times])
+            buf = self.__buffers[key]
+            if isinstance(buf, list):
+                ret = numpy.array(buf)
+            else:
+                ret = buf[self.__start:self.__end]
+                ret.flags.writeable = False
             if ret.ndim > 1:
                 ret = numpy.swapaxes(ret, 0, 1)
             return ret
 
     def __contains__(self, key):
-        return key in self.data[self.min_time]
+        return key in self.__buffers
 
     def setup(self):
         '''
@@ -949,8 +1089,13 @@ class PlotterData(object):
         '''
         self.type = ''
         self.ready = False
-        del self.data
-        self.data = {}
+        # los buffers se reutilizan para los siguientes datos
+        for key, buf in self.__buffers.items():
+            if not isinstance(buf, list):
+                self.__spare[key] = buf
+        self.__buffers = {}
+        self.__start = 0
+        self.__end = 0
         self.__heights = []
         self.__all_heights = set()
 
@@ -959,8 +1104,10 @@ class PlotterData(object):
         Get the shape of the one-element data for the given key
         '''
 
-        if len(self.data[self.min_time][key]):
-            return self.data[self.min_time][key].shape
+        buf = self.__buffers[key]
+        value = buf[0] if isinstance(buf, list) else buf[self.__start]
+        if numpy.ndim(value) and len(value):
+            return value.shape
         return (0,)
 
     def update(self, data, tm, meta={}):
@@ -968,7 +1115,19 @@ class PlotterData(object):
         Update data object with new dataOut
         '''
 
-        self.data[tm] = data
+        pos, new = self.__insert(tm)
+
+        if pos is not None:
+            for key, value in data.items():
+                self.__put(key, pos, value)
+
+            if new:
+                for key in self.__buffers:
+                    if key not in data:
+                        self.__put(key, pos, None)
+
+            if 'yrange' in meta:
+                self.__setHeights(pos, meta['yrange'])
 
         for key, value in meta.items():
             setattr(self, key, value)
@@ -980,19 +1139,20 @@ class PlotterData(object):
 
         H = numpy.array(list(self.__all_heights))
         H.sort()
-        for key in self.data:
-            shape = self.shape(key)[:-1] + H.shape
-            for tm, obj in list(self.data[key].items()):
-                h = self.__heights[self.times.tolist().index(tm)]
-                if H.size == h.size:
-                    continue
+        heights = self.__heights
+
+        for key in list(self.__buffers):
+            values = [self.__get(key, self.__start + i) for i in range(len(self))]
+            if any(h is None or numpy.ndim(v) == 0 or v.shape[-1] != h.size for v, h in zip(values, heights)):
+                continue
+            if all(h.size == H.size for h in heights):
+                continue
+            del self.__buffers[key]
+            for i, (obj, h) in enumerate(zip(values, heights)):
                 index = numpy.where(numpy.in1d(H, h))[0]
-                dummy = numpy.zeros(shape) + numpy.nan
-                if len(shape) == 2:
-                    dummy[:, index] = obj
-                else:
-                    dummy[index] = obj
-                self.data[key][tm] = dummy
+                dummy = numpy.zeros(obj.shape[:-1] + H.shape) + numpy.nan
+                dummy[..., index] = obj
+                self.__put(key, self.__start + i, dummy)
 
         self.__heights = [H for tm in self.times]
 
@@ -1007,17 +1167,17 @@ class PlotterData(object):
         meta = {}
         meta['xrange'] = []
         dy = int(len(self.yrange)/self.MAXNUMY) + 1
-        tmp = self.data[tm][key]
+        tmp = self.__item(self.__find(tm))[key]
         shape = tmp.shape
         if len(shape) == 2:
-            data = self.roundFloats(self.data[tm][key][::, ::dy].tolist())
+            data = self.roundFloats(tmp[::, ::dy].tolist())
         elif len(shape) == 3:
-            dx = int(self.data[tm][key].shape[1]/self.MAXNUMX) + 1
+            dx = int(tmp.shape[1]/self.MAXNUMX) + 1
             data = self.roundFloats(
-                self.data[tm][key][::, ::dx, ::dy].tolist())
+                tmp[::, ::dx, ::dy].tolist())
             meta['xrange'] = self.roundFloats(self.xrange[2][::dx].tolist())
         else:
-            data = self.roundFloats(self.data[tm][key].tolist())
+            data = self.roundFloats(tmp.tolist())
 
         ret = {
             'plot': plot_name,
@@ -1041,9 +1201,9 @@ class PlotterData(object):
         Return the list of times of the current data
         '''
 
-        ret = [t for t in self.data]
-        ret.sort()
-        return numpy.array(ret)
+        ret = self.__times[self.__start:self.__end]
+        ret.flags.writeable = False
+        return ret
 
     @property
     def min_time(self):
@@ -1061,6 +1221,231 @@ class PlotterData(object):
 
         return self.times[-1]
 
+    @property
+    def maxlen(self):
+        '''
+        Maximum number of times to keep
+        '''
+
+        if not self.max_memory:
+            return None
+
+        nbytes = 0
+        for buf in self.__buffers.values():
+            if isinstance(buf, list):
+                nbytes += getattr(buf[-1], 'nbytes', 0) if buf else 0
+            else:
+                nbytes += buf[0].nbytes if buf.ndim > 1 else buf.itemsize
+        # se deja un 20% del buffer libre para compactar con poca frecuencia
+        return max(int(self.max_memory*1e6/max(nbytes, 1)*0.8), 1)
+
+    def __position(self, index):
+        '''
+        Position in the buffers of the index-th time (negative from the end)
+        '''
+
+        n = len(self)
+        if index < 0:
+            index += n
+        if index < 0 or index >= n:
+            raise IndexError('PlotterData index out of range')
+        return self.__start + index
+
+    def __find(self, tm):
+        '''
+        Position in the buffers of the time `tm`
+        '''
+
+        index = numpy.searchsorted(self.times, tm)
+        if index == len(self) or self.times[index] != tm:
+            raise KeyError(tm)
+        return self.__start + index
+
+    def __item(self, pos):
+
+        return {key: self.__get(key, pos) for key in self.__buffers}
+
+    def __get(self, key, pos):
+
+        buf = self.__buffers[key]
+        if isinstance(buf, list):
+            return buf[pos - self.__start]
+        value = buf[pos]
+        if isinstance(value, numpy.ndarray):
+            value.flags.writeable = False
+        return value
+
+    def __insert(self, tm):
+        '''
+        Position for the time `tm`, a new slot is added at the end (or in
+        order if the time is older than the last one) and replaced if the
+        time already exists. Returns the position and if it is a new slot,
+        the position is None if the time is older than all the kept times.
+        '''
+
+        n = len(self)
+        if n and tm <= self.__times[self.__end - 1]:
+            index = numpy.searchsorted(self.times, tm)
+            if self.__times[self.__start + index] == tm:
+                return self.__start + index, False
+            maxlen = self.maxlen
+            if index == 0 and maxlen is not None and n >= maxlen:
+                return None, False
+            # tiempo fuera de orden
+            dropped = self.__reserve()
+            index -= dropped
+            if index < 0:
+                index = 0
+            pos = self.__start + index
+            for buf in [self.__times] + list(self.__buffers.values()):
+                if isinstance(buf, list):
+                    buf.insert(index, None)
+                else:
+                    buf[pos + 1:self.__end + 1] = buf[pos:self.__end]
+            self.__heights.insert(index, None)
+            self.__times[pos] = tm
+            self.__end += 1
+            return pos, True
+
+        self.__reserve()
+        pos = self.__end
+        self.__times[pos] = tm
+        self.__end += 1
+        for buf in self.__buffers.values():
+            if isinstance(buf, list):
+                buf.append(None)
+        self.__heights.append(None)
+        return pos, True
+
+    def __reserve(self):
+        '''
+        Make room for one more time at the end of the buffers dropping the
+        oldest time if maxlen is reached, returns the number of dropped times.
+        '''
+
+        dropped = 0
+        maxlen = self.maxlen
+        if maxlen is not None and len(self) >= maxlen:
+            dropped = len(self) - maxlen + 1
+            self.__start += dropped
+            for buf in self.__buffers.values():
+                if isinstance(buf, list):
+                    del buf[:dropped]
+            del self.__heights[:dropped]
+
+        if self.__end < self.__times.size:
+            return dropped
+
+        n = len(self)
+        size = self.__times.size
+        if self.__start == 0 or n > size//2 and (maxlen is None or size < maxlen*1.25):
+            # crecer al doble
+            size = max(2*size, 16)
+            if maxlen is not None:
+                size = max(min(size, int(maxlen*1.25) + 1), n + 1)
+
+        times = self.__times
+        self.__times = self.__move(times, size, n)
+        for key, buf in self.__buffers.items():
+            if not isinstance(buf, list):
+                self.__buffers[key] = self.__move(buf, size, n)
+        self.__start = 0
+        self.__end = n
+
+        return dropped
+
+    def __move(self, buf, size, n):
+        '''
+        Move the current times of `buf` to the beginning of a buffer of
+        `size` times (the same buffer if it has that size)
+        '''
+
+        if buf.shape[0] == size:
+            buf[:n] = buf[self.__start:self.__end]
+            return buf
+
+        new = numpy.empty((size,) + buf.shape[1:], dtype=buf.dtype)
+        self.__missing(new)
+        new[:n] = buf[self.__start:self.__end]
+        return new
+
+    @staticmethod
+    def __missing(buf):
+        '''
+        Fill `buf` with the value used for times without data
+        '''
+
+        if buf.dtype.kind in 'fc':
+            buf.fill(numpy.nan)
+        elif buf.dtype.kind == 'O':
+            buf.fill(None)
+        else:
+            buf.fill(0)
+
+    def __put(self, key, pos, value):
+        '''
+        Store `value` of product `key` at position `pos`
+        '''
+
+        if value is None and key in self.__buffers:
+            # producto sin datos para este tiempo
+            buf = self.__buffers[key]
+            if isinstance(buf, list):
+                buf[pos - self.__start] = None
+            else:
+                self.__missing(buf[pos:pos + 1])
+            return
+
+        if not isinstance(value, numpy.ndarray):
+            try:
+                value = numpy.asarray(value)
+            except ValueError:
+                obj = numpy.empty((), dtype=object)
+                obj[()] = value
+                value = obj
+
+        buf = self.__buffers.get(key)
+
+        if buf is None:
+            if value.dtype.hasobject and value.ndim:
+                buf = [None]*len(self)
+            else:
+                buf = self.__spare.pop(key, None)
+                if buf is None or buf.shape != self.__times.shape + value.shape or buf.dtype != value.dtype:
+                    buf = numpy.empty(self.__times.shape + value.shape, dtype=value.dtype)
+                self.__missing(buf)
+            self.__buffers[key] = buf
+
+        if isinstance(buf, list):
+            buf[pos - self.__start] = value
+            return
+
+        if value.shape != buf.shape[1:] or (value.dtype.hasobject and value.ndim):
+            # cambia la dimension (p. ej. alturas o radiales), se guarda como lista
+            buf = [x.copy() if isinstance(x, numpy.ndarray) else x for x in buf[self.__start:self.__end]]
+            buf[pos - self.__start] = value
+            self.__buffers[key] = buf
+            return
+
+        if not numpy.can_cast(value.dtype, buf.dtype):
+            buf = buf.astype(numpy.result_type(buf.dtype, value.dtype))
+            self.__buffers[key] = buf
+
+        buf[pos] = value
+
+    def __setHeights(self, pos, heights):
+        '''
+        Save the heights of the time at `pos`, the same array is shared
+        while the heights do not change
+        '''
+
+        heights = numpy.asarray(heights)
+        last = next((h for h in reversed(self.__heights) if h is not None), None)
+        if last is None or last.shape != heights.shape or not numpy.array_equal(last, heights):
+            last = heights.copy()
+            self.__all_heights.update(last.ravel().tolist())
+        self.__heights[pos - self.__start] = last
+
     # @property
     # def heights(self):
     #     '''
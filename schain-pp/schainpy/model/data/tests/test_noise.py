@@ -0,0 +1,45 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy
+
+from schainpy.model.data.jrodata import hildebrand_sekhon, hildebrand_sekhon_batch
+
+navg = 10
+
+
+def getData():
+
+    rng = numpy.random.default_rng(0)
+    data = rng.exponential(navg, (4, 256, 20))
+    data[:, :80, :10] *= 20
+    return data
+
+
+def reference(data):
+
+    noise = numpy.zeros((data.shape[0], data.shape[2]))
+    for channel in range(data.shape[0]):
+        for height in range(data.shape[2]):
+            noise[channel, height] = hildebrand_sekhon(numpy.sort(data[channel, :, height]), navg)
+    return noise
+
+
+def test_batch_threads_no_leak():
+
+    data = getData()
+    count = threading.active_count()
+    noise = hildebrand_sekhon_batch(data, navg, axis=1, threads=4)
+
+    numpy.testing.assert_array_equal(noise, reference(data))
+    # los hilos se cierran al terminar la llamada
+    assert threading.active_count() == count
+
+
+def test_batch_threads_executor():
+
+    data = getData()
+    with ThreadPoolExecutor(2) as executor:
+        for n in range(3):
+            noise = hildebrand_sekhon_batch(data, navg, axis=1, threads=2, executor=executor)
+            numpy.testing.assert_array_equal(noise, reference(data))
@@ -0,0 +1,253 @@
+import json
+
+import numpy
+import pytest
+
+from schainpy.model.data.jrodata import PlotterData
+
+nChannels = 2
+nHeights = 100
+interval = 10.
+t0 = 1729000000.
+
+
+class OldPlotterData(object):
+    '''
+    Implementacion anterior de PlotterData (un diccionario por tiempo), se
+    usa como referencia
+    '''
+
+    MAXNUMX = 1000
+    MAXNUMY = 1000
+
+    def __init__(self, code, exp_code, localtime=True):
+
+        self.key = code
+        self.exp_code = exp_code
+        self.localtime = localtime
+        self.data = {}
+        self.meta = {}
+
+    def __len__(self):
+        return len(self.data)
+
+    def __getitem__(self, key):
+        if isinstance(key, int):
+            return self.data[self.times[key]]
+        elif isinstance(key, str):
+            ret = numpy.array([self.data[x][key] for x in self.times])
+            if ret.ndim > 1:
+                ret = numpy.swapaxes(ret, 0, 1)
+            return ret
+
+    def update(self, data, tm, meta={}):
+
+        self.data[tm] = data
+        for key, value in meta.items():
+            setattr(self, key, value)
+
+    def jsonify(self, tm, plot_name, plot_type, key=None, decimate=False):
+
+        if key is None:
+            key = self.key
+
+        meta = {}
+        meta['xrange'] = []
+        dy = int(len(self.yrange)/self.MAXNUMY) + 1
+        tmp = self.data[tm][key]
+        shape = tmp.shape
+        if len(shape) == 2:
+            data = PlotterData.roundFloats(self.data[tm][key][::, ::dy].tolist())
+        elif len(shape) == 3:
+            dx = int(self.data[tm][key].shape[1]/self.MAXNUMX) + 1
+            data = PlotterData.roundFloats(
+                self.data[tm][key][::, ::dx, ::dy].tolist())
+            meta['xrange'] = PlotterData.roundFloats(self.xrange[2][::dx].tolist())
+        else:
+            data = PlotterData.roundFloats(self.data[tm][key].tolist())
+
+        ret = {
+            'plot': plot_name,
+            'code': self.exp_code,
+            'time': float(tm),
+            'data': data,
+            }
+        meta['type'] = plot_type
+        meta['interval'] = float(self.interval)
+        meta['localtime'] = self.localtime
+        meta['yrange'] = PlotterData.roundFloats(self.lat[::dy].tolist())
+        meta['xrange'] = PlotterData.roundFloats(self.lon[::dy].tolist())
+        meta.update(self.meta)
+        ret['metadata'] = meta
+        return json.dumps(ret)
+
+    @property
+    def times(self):
+        ret = [t for t in self.data]
+        ret.sort()
+        return numpy.array(ret)
+
+
+def getFrames(n, seed=0):
+
+    rng = numpy.random.default_rng(seed)
+    for i in range(n):
+        frame = {
+            'rti': rng.normal(20, 5, (nChannels, nHeights)),
+            'noise': rng.normal(10, 1, nChannels),
+            'time': t0 + i*interval,
+            }
+        yield t0 + i*interval, frame
+
+
+def fill(times, frames, **kwargs):
+
+    new = PlotterData('rti', None, **kwargs)
+    old = OldPlotterData('rti', None)
+    meta = {'yrange': numpy.arange(nHeights)*0.15, 'interval': interval}
+    for tm in times:
+        # el diccionario viejo guarda la referencia, se pasa una copia
+        new.update(frames[tm], tm, meta)
+        old.update({key: numpy.copy(value) for key, value in frames[tm].items()}, tm, meta)
+    return new, old
+
+
+def check(new, old, times=None):
+    '''
+    Compara los productos y tiempos de ambas implementaciones, `times` son
+    los tiempos que deben quedar en el buffer (por defecto todos)
+    '''
+
+    if times is None:
+        times = old.times
+    numpy.testing.assert_array_equal(new.times, times)
+    assert len(new) == len(times)
+    index = numpy.searchsorted(old.times, times)
+    for key in ('rti', 'noise', 'time'):
+        expected = old[key]
+        if expected.ndim > 1:
+            expected = expected[:, index]
+        else:
+            expected = expected[index]
+        numpy.testing.assert_array_equal(new[key], expected)
+    for i in (0, -1):
+        for key, value in old.data[times[i]].items():
+            numpy.testing.assert_array_equal(new[i][key], value)
+
+
+def test_insert():
+
+    frames = dict(getFrames(50))
+    new, old = fill(sorted(frames), frames)
+
+    check(new, old)
+    assert new.min_time == t0 and new.max_time == t0 + 49*interval
+    assert new.shape('rti') == (nChannels, nHeights)
+    assert new.shape('noise') == (nChannels, )
+    assert 'rti' in new and 'snr' not in new
+    assert str(new) == 'Data[rti(2, 100);noise(2,);time(0,)][50]'
+    # las lecturas son vistas de solo lectura
+    with pytest.raises(ValueError):
+        new['rti'][0, 0, 0] = 0
+
+    # setup reinicia los tiempos y reutiliza los buffers
+    new.setup()
+    assert len(new) == 0
+    frames = dict(getFrames(5, seed=1))
+    _, old = fill(sorted(frames), frames)
+    for tm in sorted(frames):
+        new.update(frames[tm], tm)
+    check(new, old)
+
+
+def test_wrap_around():
+
+    frames = dict(getFrames(200))
+    times = sorted(frames)
+    # ~1.6 kB por tiempo, 0.021 MB dejan 10 tiempos (20% libre)
+    new, old = fill(times, frames, max_memory=0.021)
+
+    assert new.maxlen == 10
+    check(new, old, times[-10:])
+
+    # sin limite se guardan todos los tiempos como antes
+    new, old = fill(times, frames, max_memory=None)
+    assert new.maxlen is None
+    check(new, old)
+
+
+def test_out_of_order_times():
+
+    frames = dict(getFrames(60))
+    times = sorted(frames)
+    order = list(numpy.random.default_rng(2).permutation(times))
+    # tiempos repetidos reemplazan los datos
+    repeated = {tm: dict(frames[tm], rti=frames[tm]['rti'] + 1) for tm in order[:5]}
+    new, old = fill(order + list(repeated), dict(frames))
+    for tm, frame in repeated.items():
+        new.update(frame, tm)
+        old.update(frame, tm)
+
+    check(new, old)
+
+    # con el buffer lleno un tiempo anterior a todos se descarta
+    new, old = fill(times, frames, max_memory=0.021)
+    new.update(frames[times[0]], times[0])
+    check(new, old, times[-10:])
+    # uno dentro del rango desplaza al mas antiguo
+    middle = times[-5] - interval/2
+    frame = dict(frames[times[0]], time=middle)
+    new.update(frame, middle)
+    old.update(frame, middle)
+    check(new, old, sorted(times[-9:] + [middle]))
+
+
+def test_normalize_heights():
+
+    heights = numpy.arange(nHeights)*0.15
+    ranges = [heights[:80], heights[20:], heights[:80], heights[10:90]]
+    rng = numpy.random.default_rng(3)
+    data = PlotterData('rti', None)
+    values = []
+    for i, h in enumerate(ranges):
+        frame = {'rti': rng.normal(20, 5, (nChannels, h.size)), 'noise': rng.normal(10, 1, nChannels)}
+        values.append(frame)
+        data.update(frame, t0 + i*interval, {'yrange': h})
+
+    data.normalize_heights()
+
+    assert data.shape('rti') == (nChannels, nHeights)
+    rti = data['rti']
+    for i, h in enumerate(ranges):
+        index = numpy.where(numpy.in1d(heights, h))[0]
+        expected = numpy.full((nChannels, nHeights), numpy.nan)
+        expected[:, index] = values[i]['rti']
+        numpy.testing.assert_array_equal(rti[:, i], expected)
+    # los productos sin eje de alturas no cambian
+    numpy.testing.assert_array_equal(data['noise'], numpy.array([v['noise'] for v in values]).T)
+
+
+@pytest.mark.parametrize('shape', [(nChannels, ), (nChannels, nHeights), (nChannels, 36, nHeights)],
+                         ids=['1d', '2d', '3d'])
+def test_jsonify(shape):
+
+    rng = numpy.random.default_rng(4)
+    new = PlotterData('rti', 'exp')
+    old = OldPlotterData('rti', 'exp')
+    meta = {
+        'yrange': numpy.arange(nHeights)*0.15,
+        'xrange': (None, None, numpy.linspace(0, 360, 36, endpoint=False)),
+        'interval': interval,
+        'lat': numpy.linspace(-12, -11, nHeights),
+        'lon': numpy.linspace(-77, -76, nHeights),
+        }
+    for i in range(3):
+        frame = {'var': rng.normal(20, 5, shape)}
+        new.update(frame, t0 + i*interval, meta)
+        old.update(frame, t0 + i*interval, meta)
+    new.meta['colormap'] = old.meta['colormap'] = 'Jet'
+
+    for tm in old.times:
+        assert new.jsonify(tm, 'rti', 'rti', key='var') == old.jsonify(tm, 'rti', 'rti', key='var')
+    with pytest.raises(KeyError):
+        new.jsonify(t0 - interval, 'rti', 'rti', key='var')
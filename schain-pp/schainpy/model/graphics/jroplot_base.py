@@ -34,6 +34,11 @@ from mpl_toolkits.axes_grid1 import make_axes_locatable
 from matplotlib.ticker import FuncFormatter, LinearLocator, MultipleLocator
 import matplotlib.cbook as cbook
 import matplotlib.image  as image
+from matplotlib.artist import Artist
+from matplotlib.cm import ScalarMappable
+from matplotlib.colors import Normalize
+from matplotlib.collections import QuadMesh
+from matplotlib.backends.backend_agg import RendererAgg
 
 import cartopy.crs as ccrs
 
@@ -49,9 +54,20 @@ global file_logo
 file_logo =os.path.join(path,"LogoIGP.png")
 
 EARTH_RADIUS = 6.3710e3
+LOGOS = {}
 
 register_cmap()
 
+def get_logo(filename):
+    '''
+    Logo image, read once per process and reused in every saved figure
+    '''
+
+    if filename not in LOGOS:
+        with cbook.get_sample_data(filename) as file:
+            LOGOS[filename] = image.imread(file)
+    return LOGOS[filename]
+
 def ll2xy(lat1, lon1, lat2, lon2):
 
     p = 0.017453292519943295
@@ -149,6 +165,179 @@ def apply_throttle(value):
     return fnThrottled
 
 
+class RTIMesh(Artist, ScalarMappable):
+    '''
+    Incremental pcolormesh for RTI plots
+
+    Equivalent to `ax.pcolormesh(x, y, z.T)` (cells centered on x and y,
+    columns before a gap of more than 5 times the median interval masked as
+    in `Plot.fill_gaps`), but the mesh is rendered once into an offscreen
+    Agg layer and each `set_data` only draws the new columns (and the
+    previous last one, whose right edge moves), the layer is pasted in the
+    figure as an image. The whole history is drawn again only when the
+    axes, the colormap/limits or the old columns change (new window, gaps,
+    times out of order). Renderers that are not Agg (pdf, svg) get the
+    full mesh.
+
+    `func` is applied to the new columns of z before drawing (e.g. dB).
+    '''
+
+    zorder = 1
+
+    def __init__(self, ax, cmap=None, vmin=None, vmax=None, func=None):
+
+        Artist.__init__(self)
+        ScalarMappable.__init__(self, Normalize(vmin, vmax), cmap)
+        self.func = func
+        self.x = numpy.zeros(0)
+        self.y = None
+        self.z = None
+        self.gaps = numpy.zeros(0, dtype=bool)
+        self.valid = None
+        self.__layer = None
+        self.__key = None
+        self.__first = 0
+        ax.add_artist(self)
+
+    def changed(self):
+
+        ScalarMappable.changed(self)
+        self.__first = 0
+        self.__layer = None
+        self.stale = True
+
+    def set_data(self, x, y, z):
+        '''
+        Set the times `x`, heights `y` and data `z` (times x heights)
+        '''
+
+        x = numpy.asarray(x, dtype=float)
+        y = numpy.asarray(y, dtype=float)
+        n = len(self.x)
+
+        gaps = numpy.zeros(len(x), dtype=bool)
+        if len(x) > 1:
+            deltas = x[1:] - x[:-1]
+            gaps[:-1] = deltas > 5 * numpy.median(deltas)
+
+        if n < 2 or self.y is None or len(x) < n or not numpy.array_equal(y, self.y) or \
+            not numpy.array_equal(x[:n], self.x) or not numpy.array_equal(gaps[:n - 1], self.gaps[:n - 1]) or \
+            (gaps[n - 1] and not self.gaps[n - 1]):
+            first = 0
+        else:
+            first = n - 1
+            # la ultima columna se dibuja de nuevo (puede ser un tiempo
+            # repetido), si tiene celdas vacias que antes no se dibuja todo
+            if (self.valid & ~numpy.isfinite(self.__column(z, [n - 1]))[0]).any():
+                first = 0
+            # el borde derecho de la ultima columna dibujada se mueve, si el
+            # anterior cubre celdas vacias de las nuevas se dibuja todo
+            edges = self.edges(x[n - 2:])
+            right = self.x[-1] + (self.x[-1] - self.x[-2]) / 2.
+            cols = numpy.nonzero(edges[2:-1] < right)[0] + n
+            if len(cols) and (gaps[cols].any() or not numpy.isfinite(self.__column(z, cols)).all() or \
+                right > edges[-1]):
+                first = 0
+
+        self.__first = min(self.__first, first) if first else 0
+        if first == 0:
+            self.__layer = None
+        self.x = x.copy()
+        self.y = y.copy()
+        self.z = z
+        self.gaps = gaps
+        self.valid = numpy.isfinite(self.__column(z, [len(x) - 1]))[0]
+        # limites de los datos como en pcolormesh
+        xe, ye = self.edges(x), self.edges(y)
+        self.sticky_edges.x[:] = [xe.min(), xe.max()]
+        self.sticky_edges.y[:] = [ye.min(), ye.max()]
+        self.axes.update_datalim([(xe.min(), ye.min()), (xe.max(), ye.max())])
+        self.axes.autoscale_view()
+        self.stale = True
+
+    @staticmethod
+    def edges(x):
+        '''
+        Cell edges as in pcolormesh with shading='nearest'
+        '''
+
+        if len(x) < 2:
+            return numpy.hstack((x, x))
+        dx = numpy.diff(x) / 2.
+        return numpy.hstack((x[0] - dx[0], x[:-1] + dx, x[-1] + dx[-1]))
+
+    def __column(self, z, cols):
+
+        z = z[cols[0]:cols[-1] + 1]
+        if self.func is not None:
+            with numpy.errstate(all='ignore'):
+                z = self.func(z)
+        return z
+
+    def __mesh(self, first):
+        '''
+        QuadMesh of the columns from `first`
+        '''
+
+        xe = self.edges(self.x)[first:]
+        ye = self.edges(self.y)
+        z = self.z[first:]
+        if self.func is not None:
+            with numpy.errstate(all='ignore'):
+                z = self.func(z)
+        z = numpy.ma.masked_invalid(z)
+        z[self.gaps[first:]] = numpy.ma.masked
+        X, Y = numpy.meshgrid(xe, ye)
+        mesh = QuadMesh(numpy.stack([X, Y], axis=-1), antialiased=False, shading='flat',
+                        array=z.T.ravel(), cmap=self.cmap, norm=self.norm, edgecolors='none',
+                        snap=plt.rcParams['pcolormesh.snap'])
+        mesh.set_figure(self.figure)
+        mesh.axes = self.axes
+        mesh.set_transform(self.get_transform())
+        mesh.set_clip_path(self.axes.patch)
+        return mesh
+
+    def __opaque(self):
+        '''
+        Colors of the colormap fully opaque or transparent, the layer can be
+        pasted without changing the pixels
+        '''
+
+        cmap = self.get_cmap()
+        colors = numpy.vstack((cmap(numpy.linspace(0, 1, cmap.N)), cmap.get_bad(), cmap.get_under(), cmap.get_over()))
+        return numpy.isin(colors[:, 3], (0, 1)).all()
+
+    def draw(self, renderer):
+
+        if not self.get_visible() or self.z is None or len(self.x) == 0:
+            return
+
+        if not isinstance(renderer, RendererAgg) or not self.__opaque():
+            self.__mesh(0).draw(renderer)
+            self.stale = False
+            return
+
+        key = (renderer.width, renderer.height, renderer.dpi, self.axes.bbox.bounds,
+               self.axes.viewLim.bounds, self.axes.get_xscale(), self.axes.get_yscale())
+        if self.__layer is None or key != self.__key:
+            self.__layer = RendererAgg(renderer.width, renderer.height, renderer.dpi)
+            self.__key = key
+            self.__first = 0
+        if self.__first < len(self.x):
+            self.__mesh(self.__first).draw(self.__layer)
+            self.__first = len(self.x)
+
+        bbox = self.axes.bbox
+        height = int(renderer.height)
+        x0, x1 = max(int(bbox.x0), 0), min(int(numpy.ceil(bbox.x1)), int(renderer.width))
+        y0, y1 = max(height - int(numpy.ceil(bbox.y1)), 0), min(height - int(bbox.y0), height)
+        image = numpy.asarray(self.__layer.buffer_rgba())[y0:y1, x0:x1]
+        gc = renderer.new_gc()
+        renderer.draw_image(gc, x0, height - y1, numpy.ascontiguousarray(image[::-1]))
+        gc.restore()
+        self.stale = False
+
+
 @MPDecorator
 class Plot(Operation):
     """Base class for Schain plotting operations
@@ -256,7 +445,8 @@ class Plot(Operation):
         self.height_index = kwargs.get('height_index', None)
         self.__throttle_plot = apply_throttle(self.throttle)
         code = self.attr_data if self.attr_data else self.CODE
-        self.data = PlotterData(self.CODE, self.exp_code, self.localtime)
+        self.data = PlotterData(self.CODE, self.exp_code, self.localtime,
+                                kwargs.get('max_memory', 1024))
         self.ang_min = kwargs.get('ang_min', None)
         self.ang_max = kwargs.get('ang_max', None)
         self.mode  = kwargs.get('mode', None)
@@ -264,7 +454,9 @@ class Plot(Operation):
         self.mask0 = kwargs.get('mask0', False)
         self.index = kwargs.get('index', None)
         self.shapes = kwargs.get('shapes', './')
+        self.shapes_cache = kwargs.get('shapes_cache', None)
         self.map = kwargs.get('map', False)
+        self.raster = kwargs.get('raster', False)
         self.latitude = kwargs.get('latitude', -12)
         self.longitude = kwargs.get('longitude', -74)
 
@@ -510,10 +702,12 @@ class Plot(Operation):
         axes = self.pf_axes + self.cb_axes + self.axes[self.mode]
 
         for ax in axes:
-            ax.clear()
-            ax.firsttime = True
+            # la barra de colores se quita antes de limpiar los ejes
             if hasattr(ax, 'cbar') and ax.cbar:
                 ax.cbar.remove()
+                ax.cbar = None
+            ax.clear()
+            ax.firsttime = True
 
     def __plot(self):
         '''
@@ -591,16 +785,15 @@ class Plot(Operation):
                         label
                         )
                     )
-                with cbook.get_sample_data(file_logo) as file:
-                     IM_LOGO = image.imread(file)
-                     alto_logo = IM_LOGO.shape[0]  # Altura del logo en píxeles
-                     ancho_logo= IM_LOGO.shape[1] # ancho del logo en pixeles
-                     fig_height = fig.get_figheight() * fig.dpi
-                     fig_width = fig.get_figwidth() * fig.dpi
-                     #IM_X    = 94
-                     #IM_Y    = 90
-                     IM_X    = fig_width - ancho_logo - 160  # Pegado al borde derecho
-                     IM_Y    =  fig_height - alto_logo - 95  # Pegado al borde superior
+                IM_LOGO = get_logo(file_logo)
+                alto_logo = IM_LOGO.shape[0]  # Altura del logo en píxeles
+                ancho_logo= IM_LOGO.shape[1] # ancho del logo en pixeles
+                fig_height = fig.get_figheight() * fig.dpi
+                fig_width = fig.get_figwidth() * fig.dpi
+                #IM_X    = 94
+                #IM_Y    = 90
+                IM_X    = fig_width - ancho_logo - 160  # Pegado al borde derecho
+                IM_Y    =  fig_height - alto_logo - 95  # Pegado al borde superior
                 logo=fig.figimage(IM_LOGO,IM_X,IM_Y,zorder=3,alpha=0.7)
             else:
                 figname = os.path.join(
@@ -731,6 +924,15 @@ class Plot(Operation):
         Main plotting routine
         '''
 
+        self.add_frame(dataOut, **kwargs)
+        self.plot_frame()
+
+    def add_frame(self, dataOut, **kwargs):
+        '''
+        Setup in the first call and add dataOut to the buffer without
+        plotting, the frames coalesced by the plot workers are only added
+        '''
+
         if self.isConfig is False:
             self.__setup(**kwargs)
 
@@ -777,6 +979,11 @@ class Plot(Operation):
                 if self.xmin is not None and self.xmax is not None:
                     self.xrange = self.xmax - self.xmin
 
+    def plot_frame(self):
+        '''
+        Plot (and save) the figures with the data in the buffer
+        '''
+
         if self.throttle == 0:
             self.__plot()
         else:
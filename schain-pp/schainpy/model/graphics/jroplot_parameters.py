@@ -1,13 +1,18 @@
 import os
+import pickle
+import hashlib
 import datetime
 import warnings
 import numpy
 from mpl_toolkits.axisartist.grid_finder import FixedLocator, DictFormatter
 from matplotlib.patches import Circle
+from matplotlib.artist import Artist
+from matplotlib.backends.backend_agg import RendererAgg
 from cartopy.feature import ShapelyFeature
 import cartopy.io.shapereader as shpreader
+from shapely.geometry import box
 
-from schainpy.model.graphics.jroplot_base import Plot, plt, ccrs
+from schainpy.model.graphics.jroplot_base import Plot, RTIMesh, plt, ccrs
 from schainpy.model.graphics.jroplot_spectra import SpectraPlot, RTIPlot, CoherencePlot, SpectraCutPlot
 from schainpy.utils import log
 from schainpy.model.graphics.plotting_codes import cb_tables
@@ -15,6 +20,16 @@ from schainpy.model.graphics.plotting_codes import cb_tables
 
 EARTH_RADIUS = 6.3710e3
 
+SHAPEFILES = {
+    'districts': 'Distritos/PER_adm3.shp',
+    'provs': 'PER_ADM2/PER_ADM2.shp',
+    'caps': 'CAPITALES/cap_distrito.shp',
+    'vias': 'Carreteras/VIAS_NACIONAL_250000.shp',
+    }
+
+BASEMAPS = {}
+BASEMAP_CACHE = os.path.join(os.environ.get('XDG_CACHE_HOME', os.path.expanduser('~/.cache')), 'schain')
+
 
 def antenna_to_cartesian(ranges, azimuths, elevations):
     """
@@ -175,6 +190,300 @@ def km2deg(km):
 
     return numpy.rad2deg(km/EARTH_RADIUS)
 
+def get_basemap(path, longitude, latitude, extent, cache=None):
+    '''
+    Geometries of the map layers (districts, provinces, roads and capitals)
+    around the radar, the shapefiles in `path` are read, filtered and clipped
+    to a box of 2*`extent` degrees around (`longitude`, `latitude`) once per
+    process. If `cache` is given (a folder, or True for ~/.cache/schain) the
+    layers are also saved there and reused while the shapefiles (path, mtime
+    and size) and the radar location do not change.
+
+    The map axes use PlateCarree, the clipped lon/lat geometries are already
+    in the projection of the plot.
+    '''
+
+    files = [os.path.join(path, SHAPEFILES[key]) for key in sorted(SHAPEFILES)]
+    stamp = [(os.path.abspath(f), os.path.getmtime(f), os.path.getsize(f)) for f in files]
+    key = hashlib.sha1(repr((stamp, round(float(longitude), 6), round(float(latitude), 6),
+                             round(float(extent), 6))).encode()).hexdigest()[:16]
+
+    if key in BASEMAPS:
+        return BASEMAPS[key]
+
+    if cache is True:
+        cache = BASEMAP_CACHE
+    filename = os.path.join(cache, 'basemap_{}.pkl'.format(key)) if cache else None
+    if filename and os.path.exists(filename):
+        try:
+            with open(filename, 'rb') as fp:
+                BASEMAPS[key] = pickle.load(fp)
+            return BASEMAPS[key]
+        except Exception as e:
+            log.warning('Could not read {}: {}'.format(filename, e), 'get_basemap')
+
+    window = box(longitude - 2*extent, latitude - 2*extent, longitude + 2*extent, latitude + 2*extent)
+
+    def clip(records):
+        geoms = []
+        for record in records:
+            geom = record.geometry
+            if geom is None or not window.intersects(geom):
+                continue
+            geoms.append(geom if window.contains(geom) else geom.intersection(window))
+        return geoms
+
+    readers = {key: shpreader.BasicReader(os.path.join(path, SHAPEFILES[key]), encoding='latin1') for key in SHAPEFILES}
+    layers = {
+        'districts': clip(x for x in readers['districts'].records() if x.attributes['NAME_1']=='Piura'),
+        'provs': clip(readers['provs'].records()),
+        'vias': clip(readers['vias'].records()),
+        'caps': [(x.attributes['X'], x.attributes['Y'], x.attributes['NOMBRE']) for x in readers['caps'].records()
+                 if x.attributes['DEPARTA']=='JUNIN' and x.attributes['CATEGORIA']=='CIUDAD'],
+        }
+    for reader in readers.values():
+        reader.close()
+
+    if filename:
+        try:
+            if not os.path.exists(cache):
+                os.makedirs(cache)
+            with open(filename + '.tmp', 'wb') as fp:
+                pickle.dump(layers, fp, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(filename + '.tmp', filename)
+        except OSError as e:
+            log.warning('Could not save {}: {}'.format(filename, e), 'get_basemap')
+
+    BASEMAPS[key] = layers
+    return layers
+
+
+class RasterFrame(Artist):
+    '''
+    RGBA image of the whole figure pasted pixel by pixel (figimage resamples
+    the image in every draw)
+    '''
+
+    zorder = 0
+
+    def __init__(self, image):
+
+        Artist.__init__(self)
+        self.set_data(image)
+
+    def set_data(self, image):
+
+        # filas de abajo hacia arriba como draw_image
+        self.image = numpy.ascontiguousarray(image[::-1])
+        self.stale = True
+
+    def draw(self, renderer):
+
+        if not self.get_visible():
+            return
+        gc = renderer.new_gc()
+        renderer.draw_image(gc, 0, 0, self.image)
+        gc.restore()
+        self.stale = False
+
+
+class SweepRaster(object):
+    '''
+    Fast rendering of PPI sweeps without pcolormesh. The figure, drawn once
+    by matplotlib with the meshes of a sweep, gives the static layers: the
+    figure without the meshes and titles, and the overlay (map, grid, range
+    rings, spines and ticks, the artists above the meshes). For each axes a
+    lookup table gives the cell (radial, gate) of every pixel of the axes,
+    computed again only when the geometry of the sweep changes.
+
+    A sweep is colored with the colormap and norm of the meshes, placed in
+    the pixels with the table under the overlay, the titles are drawn on
+    top. The image is shown in the figure with RasterFrame (the
+    axes are hidden), so it is saved and shown as the matplotlib figure.
+    '''
+
+    def __init__(self, fig, axes, key=None):
+
+        self.fig = fig
+        self.axes = axes
+        self.key = key
+        self.meshes = [ax.plt for ax in axes]
+        self.titles = [text for ax in axes for text in (ax.title, ax._left_title, ax._right_title)]
+        self.geometry = None
+        self.luts = []
+
+        below = []
+        above = []
+        for ax, mesh in zip(axes, self.meshes):
+            # mismo orden de dibujo que Axes.draw
+            children = sorted([a for a in ax.get_children() if a is not ax.patch], key=lambda a: a.zorder)
+            n = children.index(mesh)
+            below += children[:n]
+            above += [a for a in children[n + 1:] if a not in self.titles]
+
+        # Axes.draw pone los titulos sobre las etiquetas (con los titulos
+        # ocultos no), set_title los regresa en cada barrido
+        self.fig.canvas.draw()
+        self.positions = [text.get_position() for text in self.titles]
+
+        # figura completa sin los barridos, overlay con alfa para los pixeles
+        # de los barridos y fondo solo si el colormap tiene transparencias
+        self.static = self.__render(self.meshes + self.titles)
+        overlay = self.__render([a for a in fig.get_children() if a not in axes] + [ax.patch for ax in axes] +
+                                below + self.meshes + self.titles)
+        self.alpha = overlay[..., 3].astype(numpy.float32)/255
+        self.overlay = overlay[..., :3]*self.alpha[..., None]
+        cmaps = [mesh.get_cmap() for mesh in self.meshes]
+        colors = numpy.vstack([cmap(numpy.linspace(0, 1, cmap.N)) for cmap in cmaps] +
+                              [(cmap.get_bad(), cmap.get_under(), cmap.get_over()) for cmap in cmaps])
+        if numpy.isin(colors[:, 3], (0, 1)).all():
+            self.background = None
+        else:
+            self.background = self.__render(self.meshes + above + self.titles)
+
+        self.renderer = RendererAgg(self.static.shape[1], self.static.shape[0], fig.dpi)
+        self.hidden = [ax for ax in fig.axes if ax.get_visible()]
+        for ax in self.hidden:
+            ax.set_visible(False)
+        self.frame = fig.add_artist(RasterFrame(self.static))
+
+    def __render(self, hide):
+        '''
+        Figure drawn with the artists `hide` hidden, RGBA array
+        '''
+
+        visible = [a.get_visible() for a in hide]
+        for a in hide:
+            a.set_visible(False)
+        self.fig.canvas.draw()
+        image = numpy.asarray(self.fig.canvas.buffer_rgba()).copy()
+        for a, value in zip(hide, visible):
+            a.set_visible(value)
+        return image
+
+    def remove(self):
+        '''
+        Show the axes again and remove the image from the figure
+        '''
+
+        for ax in self.hidden:
+            ax.set_visible(True)
+        self.frame.remove()
+
+    @staticmethod
+    def radials(azi, angle):
+        '''
+        Radial of each `angle` as in pcolormesh, the cells reach half the way
+        to the next radial, angles in the gaps of a sector are not valid
+        '''
+
+        azi = numpy.asarray(azi, dtype=float) % 360
+        order = numpy.argsort(azi, kind='stable')
+        a = azi[order]
+        gap = numpy.diff(numpy.append(a, a[0] + 360))
+        step = numpy.median(gap[gap > 0]) if (gap > 0).any() else 360
+        hole = gap > 2*step
+        upper = numpy.where(hole, numpy.roll(gap, 1), gap)/2
+        lower = numpy.where(numpy.roll(hole, 1), gap, numpy.roll(gap, 1))/2
+
+        angle = (angle - a[0]) % 360 + a[0]
+        k = numpy.searchsorted(a + gap/2, angle) % len(a)
+        delta = (angle - a[k] + 180) % 360 - 180
+        return order[k], (delta <= upper[k]) & (-delta <= lower[k])
+
+    def set_geometry(self, r, azi, ele, longitude, latitude):
+        '''
+        Lookup tables of the axes for the gates `r` [km] and the radials
+        (`azi`, `ele`) of the sweep, as the mesh of WeatherParamsPlot.get_mesh
+        '''
+
+        geometry = [numpy.array(a) for a in (r, azi, ele, longitude, latitude)]
+        if self.geometry is not None and all(numpy.array_equal(a, b) for a, b in zip(self.geometry, geometry)):
+            return
+        self.geometry = geometry
+
+        height, width = self.static.shape[:2]
+        len_aux = int(ele.shape[0]/4)
+        factor = EARTH_RADIUS/numpy.cos(numpy.radians(numpy.mean(ele[len_aux:-len_aux])))
+        edges = RTIMesh.edges(numpy.asarray(r, dtype=float))
+
+        self.luts = []
+        for ax in self.axes:
+            x0, y0, x1, y1 = ax.bbox.extents
+            cols = numpy.arange(max(int(x0), 0), min(int(numpy.ceil(x1)), width))
+            rows = numpy.arange(max(height - int(numpy.ceil(y1)), 0), min(height - int(y0), height))
+            # centro de los pixeles en coordenadas de los datos (lon, lat)
+            px = cols + 0.5
+            py = height - rows - 0.5
+            (xmin, xmax), (ymin, ymax) = ax.get_xlim(), ax.get_ylim()
+            lon = xmin + (px - x0)/(x1 - x0)*(xmax - xmin)
+            lat = ymin + (py - y0)/(y1 - y0)*(ymax - ymin)
+            X, Y = numpy.meshgrid(numpy.radians(lon - longitude)*factor, numpy.radians(lat - latitude)*factor)
+
+            gate = numpy.searchsorted(edges, numpy.hypot(X, Y), side='right') - 1
+            radial, valid = self.radials(azi, numpy.degrees(numpy.arctan2(X, Y)))
+            valid &= (gate >= 0) & (gate < len(r))
+            valid &= ((py >= y0) & (py < y1))[:, None] & ((px >= x0) & (px < x1))[None, :]
+
+            pix = (rows[:, None]*width + cols[None, :])[valid]
+            cell = radial[valid]*len(r) + gate[valid]
+            # pixeles sin overlay se copian, el resto se mezcla con el overlay
+            alpha = self.alpha.ravel()[pix]
+            plain = alpha == 0
+            self.luts.append((
+                (pix[plain], cell[plain], None, None),
+                (pix[~plain], cell[~plain], self.overlay.reshape(-1, 3)[pix[~plain]], 1 - alpha[~plain, None])
+                ))
+
+    def render(self, data):
+        '''
+        Image of the sweep, `data` is a list of (radials x gates) arrays,
+        one for each axes
+        '''
+
+        image = self.static.copy()
+        flat = image.reshape(-1, 4)
+
+        for mesh, z, lut in zip(self.meshes, data, self.luts):
+            colors = mesh.to_rgba(numpy.ma.masked_invalid(z))
+            colors = (colors.reshape(-1, 4)*255 + 0.5).astype(numpy.uint8)
+            for pix, cell, overlay, alpha in lut:
+                c = colors[cell]
+                drawn = c[:, 3] > 0
+                pix, c = pix[drawn], c[drawn]
+                rgb = c[:, :3].astype(numpy.float32)
+                partial = c[:, 3] < 255
+                if partial.any():
+                    a = c[partial, 3:]/255.
+                    rgb[partial] = rgb[partial]*a + self.background.reshape(-1, 4)[pix[partial], :3]*(1 - a)
+                if overlay is not None:
+                    rgb = overlay[drawn] + rgb*alpha[drawn]
+                flat[pix, :3] = numpy.round(rgb)
+
+        self.__titles(image)
+        self.frame.set_data(image)
+        return image
+
+    def __titles(self, image):
+        '''
+        Draw the titles of the axes on `image`
+        '''
+
+        self.renderer.clear()
+        height, width = image.shape[:2]
+        for text, position in zip(self.titles, self.positions):
+            if not text.get_visible() or not text.get_text():
+                continue
+            text.set_position(position)
+            text.draw(self.renderer)
+            x0, y0, x1, y1 = text.get_window_extent(self.renderer).extents
+            cols = slice(max(int(x0) - 1, 0), min(int(numpy.ceil(x1)) + 1, width))
+            rows = slice(max(height - int(numpy.ceil(y1)) - 1, 0), min(height - int(y0) + 1, height))
+            layer = numpy.asarray(self.renderer.buffer_rgba())[rows, cols]
+            alpha = layer[..., 3:]/255.
+            image[rows, cols, :3] = numpy.round(layer[..., :3]*alpha + image[rows, cols, :3]*(1 - alpha))
+            self.renderer.clear()
+
 
 
 class SpectralMomentsPlot(SpectraPlot):
@@ -347,39 +656,33 @@ class GenericRTIPlot(Plot):
         self.x = self.data.times
         self.y = self.data.yrange
         self.z = self.data['param']
-        self.z = 10*numpy.log10(self.z)
-        self.z = numpy.ma.masked_invalid(self.z)
 
         if self.decimation is None:
-            x, y, z = self.fill_gaps(self.x, self.y, self.z)
+            x, y, z = self.x, self.y, self.z
         else:
-            x, y, z = self.fill_gaps(*self.decimate())
+            x, y, z = self.decimate()
 
         for n, ax in enumerate(self.axes):
 
-            self.zmax = self.zmax if self.zmax is not None else numpy.max(
-                self.z[n])
-            self.zmin = self.zmin if self.zmin is not None else numpy.min(
-                self.z[n])
+            if self.zmax is None or self.zmin is None:
+                with numpy.errstate(divide='ignore', invalid='ignore'):
+                    zn = numpy.ma.masked_invalid(10*numpy.log10(self.z[n]))
+            self.zmax = self.zmax if self.zmax is not None else numpy.max(zn)
+            self.zmin = self.zmin if self.zmin is not None else numpy.min(zn)
 
-            if ax.firsttime:
-                if self.zlimits is not None:
-                    self.zmin, self.zmax = self.zlimits[n]
+            if self.zlimits is not None:
+                self.zmin, self.zmax = self.zlimits[n]
 
-                ax.plt = ax.pcolormesh(x, y, z[n].T * self.factors[n],
-                                       vmin=self.zmin,
-                                       vmax=self.zmax,
-                                       cmap=self.cmaps[n]
-                                       )
+            if ax.firsttime:
+                ax.plt = RTIMesh(ax,
+                                 vmin=self.zmin,
+                                 vmax=self.zmax,
+                                 cmap=self.cmaps[n],
+                                 func=lambda z, factor=self.factors[n]: 10*numpy.log10(z)*factor
+                                 )
             else:
-                if self.zlimits is not None:
-                    self.zmin, self.zmax = self.zlimits[n]
-                ax.collections.remove(ax.collections[0])
-                ax.plt = ax.pcolormesh(x, y, z[n].T * self.factors[n],
-                                       vmin=self.zmin,
-                                       vmax=self.zmax,
-                                       cmap=self.cmaps[n]
-                                       )
+                ax.plt.set_clim(self.zmin, self.zmax)
+            ax.plt.set_data(x, y, z[n])
 
 
 class PolarMapPlot(Plot):
@@ -549,20 +852,11 @@ class WeatherParamsPlot(Plot):
         self.indicador= 0
         self.last_data_ele = None
         self.val_mean      = None
+        self.sweep_mesh    = None
+        self.raster_sweep  = None
 
     def update(self, dataOut):
 
-        vars = {
-            'S' : 0,
-            'V' : 1,
-            'W' : 2,
-            'SNR' : 3,
-            'Z' : 4,
-            'D' : 5,
-            'P' : 6,
-            'R' : 7,
-        }
-
         data = {}
         meta = {}
 
@@ -575,13 +869,13 @@ class WeatherParamsPlot(Plot):
             tmp = getattr(dataOut, 'data_param')
         else:
             #print("-------------------self.attr_data[0]",self.attr_data[0])
-            if 'S' in self.attr_data[0]:
-                if self.attr_data[0]=='S':
-                    tmp = 10*numpy.log10(10.0*getattr(dataOut, 'data_param')[:,0,:]) ## /(factor))   ya no considerar factor se aplica factor jroproc_parametrs
-                if self.attr_data[0]=='SNR':
-                    tmp = 10*numpy.log10(getattr(dataOut, 'data_param')[:,3,:])
-            else:
-                tmp = getattr(dataOut, 'data_param')[:,vars[self.attr_data[0]],:]
+            tmp = getattr(dataOut, 'data_param')[:,dataOut.getWeatherIndex(self.attr_data[0]),:]
+            if self.attr_data[0]=='S':
+                tmp = 10*numpy.log10(10.0*tmp) ## /(factor))   ya no considerar factor se aplica factor jroproc_parametrs
+            elif self.attr_data[0]=='SNR':
+                tmp = 10*numpy.log10(tmp)
+            elif self.mask:
+                tmp = tmp.copy() # la mascara no modifica data_param, el barrido puede ser compartido
 
         if self.mask:
             #---------nuevo procesamiento mask----------------#
@@ -599,7 +893,7 @@ class WeatherParamsPlot(Plot):
             tmp[mask]  = numpy.nan
             """
             #-----------------------original---------------------#
-            mask = dataOut.data_param[:,3,:] < self.mask
+            mask = dataOut.data_param[:,dataOut.getWeatherIndex('SNR'),:] < self.mask
             tmp[mask] = numpy.nan
             mask = numpy.nansum((tmp, numpy.roll(tmp, 1),numpy.roll(tmp, -1)), axis=0) == tmp
             tmp[mask] = numpy.nan
@@ -640,6 +934,33 @@ class WeatherParamsPlot(Plot):
 
         return data, meta
 
+    def get_mesh(self, mode, r, azi, ele):
+        '''
+        Coordinates of the sweep, computed again only when its geometry
+        (range gates, azimuths, elevations) changes
+        '''
+
+        geometry = (r, ele) if mode == 'RHI' else (r, azi, ele)
+        key = (mode, self.longitude, self.latitude)
+        if self.sweep_mesh is not None and self.sweep_mesh[0] == key and \
+            all(numpy.array_equal(a, b) for a, b in zip(self.sweep_mesh[1], geometry)):
+            return self.sweep_mesh[2]
+
+        if mode == 'RHI':
+            r, theta = numpy.meshgrid(r, numpy.radians(ele))
+            x, y = r*numpy.cos(theta), r*numpy.sin(theta)
+        else:
+            r, theta = numpy.meshgrid(r, -numpy.radians(azi)+numpy.pi/2)
+            len_aux = int(ele.shape[0]/4)
+            mean = numpy.mean(ele[len_aux:-len_aux])
+            x, y = r*numpy.cos(theta)*numpy.cos(numpy.radians(mean)), r*numpy.sin(
+                    theta)*numpy.cos(numpy.radians(mean))
+            x = km2deg(x) + self.longitude
+            y = km2deg(y) + self.latitude
+
+        self.sweep_mesh = (key, [numpy.array(a) for a in geometry], (x, y))
+        return x, y
+
     def plot(self):
         data = self.data[-1]
         z = data['data']
@@ -653,10 +974,7 @@ class WeatherParamsPlot(Plot):
             data['mode_op'] = data['mode_op'].decode()
 
         if data['mode_op'] == 'RHI':
-            r, theta = numpy.meshgrid(r, numpy.radians(data['ele']))
-            len_aux = int(data['azi'].shape[0]/4)
-            mean = numpy.mean(data['azi'][len_aux:-len_aux])
-            x, y = r*numpy.cos(theta), r*numpy.sin(theta)
+            x, y = self.get_mesh(data['mode_op'], r, data['azi'], data['ele'])
             if self.yrange:
                 self.ylabel= 'Height [km]'
                 self.xlabel= 'Distance from radar [km]'
@@ -672,13 +990,7 @@ class WeatherParamsPlot(Plot):
                 self.xmax = numpy.nanmax(r)
 
         elif data['mode_op'] == 'PPI':
-            r, theta = numpy.meshgrid(r, -numpy.radians(data['azi'])+numpy.pi/2)
-            len_aux = int(data['ele'].shape[0]/4)
-            mean = numpy.mean(data['ele'][len_aux:-len_aux])
-            x, y = r*numpy.cos(theta)*numpy.cos(numpy.radians(mean)), r*numpy.sin(
-                    theta)*numpy.cos(numpy.radians(mean))
-            x = km2deg(x) + self.longitude
-            y = km2deg(y) + self.latitude
+            x, y = self.get_mesh(data['mode_op'], r, data['azi'], data['ele'])
             if self.xrange:
                 self.ylabel= 'Latitude'
                 self.xlabel= 'Longitude'
@@ -695,6 +1007,61 @@ class WeatherParamsPlot(Plot):
                 self.ymin = km2deg(-numpy.nanmax(r)) + self.latitude
                 self.ymax = km2deg(numpy.nanmax(r)) + self.latitude
 
+        if self.raster and self.oneFigure and data['mode_op'] == 'PPI':
+            self.plot_raster(data, x, y)
+        else:
+            self.plot_sweep(data, x, y)
+
+    def set_titles(self, data):
+
+        if data['mode_op'] == 'RHI':
+            len_aux = int(data['azi'].shape[0]/4)
+            mean = numpy.mean(data['azi'][len_aux:-len_aux])
+            if len(self.channels) !=1:
+                self.titles = ['RHI {} at AZ: {} CH {}'.format(self.labels[x], str(round(mean,1)), x) for x in self.channels]
+            else:
+                self.titles = ['RHI {} at AZ: {} CH {}'.format(self.labels[0], str(round(mean,1)), self.channels[0])]
+        elif data['mode_op'] == 'PPI':
+            len_aux = int(data['ele'].shape[0]/4)
+            mean = numpy.mean(data['ele'][len_aux:-len_aux])
+            if len(self.channels) !=1:
+                self.titles = ['PPI {} at EL: {} CH {}'.format(self.labels[x], str(round(mean,1)), x) for x in self.channels]
+            else:
+                self.titles = ['PPI {} at EL: {} CH {}'.format(self.labels[0], str(round(mean,1)), self.channels[0])]
+        self.mode_value = round(mean,1)
+
+    def plot_raster(self, data, x, y):
+        '''
+        PPI rendered with SweepRaster, the layers of the figure are drawn
+        again with matplotlib only when the limits or the colormap change
+        '''
+
+        fig = self.figures['PPI'][0]
+        axes = self.axes['PPI']
+        key = (self.xmin, self.xmax, self.ymin, self.ymax, self.zmin, self.zmax, self.colormap,
+               tuple(fig.get_size_inches()), fig.dpi)
+
+        if self.raster_sweep is None or self.raster_sweep.key != key:
+            if self.raster_sweep is not None:
+                self.raster_sweep.remove()
+            self.plot_sweep(data, x, y)
+            self.format()
+            self.raster_sweep = SweepRaster(fig, axes, key)
+        else:
+            self.set_titles(data)
+            self.format()
+
+        self.raster_sweep.set_geometry(data['r'], data['azi'], data['ele'], self.longitude, self.latitude)
+        self.raster_sweep.render(data['data'])
+
+    def plot_sweep(self, data, x, y):
+        '''
+        Sweep drawn with pcolormesh, map, grid and range rings
+        '''
+
+        z = data['data']
+        r = data['r']
+
         self.clear_figures()
 
         if data['mode_op'] == 'PPI':
@@ -707,6 +1074,8 @@ class WeatherParamsPlot(Plot):
         else:
             norm = None
 
+        self.set_titles(data)
+
         for i, ax in enumerate(axes):
 
             if norm is None:
@@ -714,22 +1083,6 @@ class WeatherParamsPlot(Plot):
             else:
                 ax.plt = ax.pcolormesh(x, y, z[i], cmap=self.colormap, norm=norm)
 
-            if data['mode_op'] == 'RHI':
-                len_aux = int(data['azi'].shape[0]/4)
-                mean = numpy.mean(data['azi'][len_aux:-len_aux])
-                if len(self.channels) !=1:
-                    self.titles = ['RHI {} at AZ: {} CH {}'.format(self.labels[x], str(round(mean,1)), x) for x in self.channels]
-                else:
-                    self.titles = ['RHI {} at AZ: {} CH {}'.format(self.labels[0], str(round(mean,1)), self.channels[0])]
-            elif data['mode_op'] == 'PPI':
-                len_aux = int(data['ele'].shape[0]/4)
-                mean = numpy.mean(data['ele'][len_aux:-len_aux])
-                if len(self.channels) !=1:
-                    self.titles = ['PPI {} at EL: {} CH {}'.format(self.labels[x], str(round(mean,1)), x) for x in self.channels]
-                else:
-                    self.titles = ['PPI {} at EL: {} CH {}'.format(self.labels[0], str(round(mean,1)), self.channels[0])]
-            self.mode_value = round(mean,1)
-
             if data['mode_op'] == 'PPI':
                 if self.map:
                     gl = ax.gridlines(crs=ccrs.PlateCarree(), draw_labels=True,
@@ -738,32 +1091,23 @@ class WeatherParamsPlot(Plot):
                     gl.ylabel_style = {'size': 8}
                     gl.xlabels_top = False
                     gl.ylabels_right = False
-                    shape_d = os.path.join(self.shapes,'Distritos/PER_adm3.shp')
-                    shape_p = os.path.join(self.shapes,'PER_ADM2/PER_ADM2.shp')
-                    capitales = os.path.join(self.shapes,'CAPITALES/cap_distrito.shp')
-                    vias = os.path.join(self.shapes,'Carreteras/VIAS_NACIONAL_250000.shp')
-                    reader_d = shpreader.BasicReader(shape_d, encoding='latin1')
-                    reader_p = shpreader.BasicReader(shape_p, encoding='latin1')
-                    reader_c = shpreader.BasicReader(capitales, encoding='latin1')
-                    reader_v = shpreader.BasicReader(vias, encoding='latin1')
-                    caps = [x for x in reader_c.records() if x.attributes['DEPARTA']=='JUNIN' and x.attributes['CATEGORIA']=='CIUDAD']
-                    districts = [x for x in reader_d.records() if x.attributes['NAME_1']=='Piura']
-                    provs = [x for x in reader_p.records()]
-                    vias = [x for x in reader_v.records()]
+                    # capas leidas y recortadas una vez por proceso
+                    extent = km2deg(self.xrange) if self.xrange else km2deg(numpy.nanmax(r))
+                    basemap = get_basemap(self.shapes, self.longitude, self.latitude, extent, self.shapes_cache)
 
                     # Display limits and streets
-                    shape_feature = ShapelyFeature([x.geometry for x in districts], ccrs.PlateCarree(), facecolor="none", edgecolor='grey', lw=0.5)
+                    shape_feature = ShapelyFeature(basemap['districts'], ccrs.PlateCarree(), facecolor="none", edgecolor='grey', lw=0.5)
                     ax.add_feature(shape_feature)
-                    shape_feature = ShapelyFeature([x.geometry for x in provs], ccrs.PlateCarree(), facecolor="none", edgecolor='white', lw=1)
+                    shape_feature = ShapelyFeature(basemap['provs'], ccrs.PlateCarree(), facecolor="none", edgecolor='white', lw=1)
                     ax.add_feature(shape_feature)
-                    shape_feature = ShapelyFeature([x.geometry for x in vias], ccrs.PlateCarree(), facecolor="none", edgecolor='yellow', lw=1)
+                    shape_feature = ShapelyFeature(basemap['vias'], ccrs.PlateCarree(), facecolor="none", edgecolor='yellow', lw=1)
                     ax.add_feature(shape_feature)
 
-                    for cap in caps:
-                        if cap.attributes['NOMBRE'] in ('CONCEPCIÓN', 'HUANCAYO', 'JAUJA', 'LA OROYA', 'CHUPACA'):
-                            ax.text(cap.attributes['X'], cap.attributes['Y'], cap.attributes['NOMBRE'], size=7, color='white', weight='bold')
-                        elif cap.attributes['NOMBRE'] in ('NEGRITOS', 'SAN LUCAS', 'QUERECOTILLO', 'TAMBO GRANDE', 'CHULUCANAS', 'CATACAOS', 'LA UNION'):
-                            ax.text(cap.attributes['X'], cap.attributes['Y'], cap.attributes['NOMBRE'].title(), size=6, color='white')
+                    for X, Y, name in basemap['caps']:
+                        if name in ('CONCEPCIÓN', 'HUANCAYO', 'JAUJA', 'LA OROYA', 'CHUPACA'):
+                            ax.text(X, Y, name, size=7, color='white', weight='bold')
+                        elif name in ('NEGRITOS', 'SAN LUCAS', 'QUERECOTILLO', 'TAMBO GRANDE', 'CHULUCANAS', 'CATACAOS', 'LA UNION'):
+                            ax.text(X, Y, name.title(), size=6, color='white')
                     ax.plot(-75.3199751, -12.041787, '*', color='orange')
                 else:
                     ax.grid(color='grey', alpha=0.5, linestyle='--', linewidth=1)
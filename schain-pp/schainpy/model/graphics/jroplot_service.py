@@ -0,0 +1,271 @@
+'''
+Headless plotting service, a pool of worker processes (Agg backend, save
+only) shared by the plot operations of a unit instead of one process per
+plot. Each operation keeps its figures, axes and logo in its worker, by
+default (policy 'coalesce') the frames that arrive while the worker is busy
+are coalesced (added to the buffer, only the last one is plotted) and the
+frames that do not fit in the queue of the worker are dropped.
+'''
+
+import os
+import time
+import queue
+import traceback
+from multiprocessing import Process, Queue
+
+from schainpy.model.proc.jroproc_base import QUEUE_SIZE, TRANSPORTS, OperationStats, SharedBlock, \
+    parsePolicy, coalesceFrames, undecorated
+from schainpy.utils import log
+
+PLOT_WORKERS = int(os.environ.get('SCHAIN_PLOT_WORKERS', '0'))
+POLICIES = ('block', 'coalesce')
+
+
+class PlotWorker(Process):
+    '''
+    Process that runs the plot operations assigned by the PlotService,
+    `operations` is a list of (id, class name, kwargs) and `policies` the
+    delivery policy of each id, both filled before start
+    '''
+
+    def __init__(self, name):
+
+        Process.__init__(self)
+        self.name = name
+        self.operations = []
+        self.policies = {}
+        self.queue = None
+        self.release_queue = Queue()
+        self.stats_queue = Queue()
+        self.stats = False
+        self.rows = {}
+
+    def getStats(self, id, timeout=30):
+        '''
+        Counters of operation `id`, read in the producer process
+        '''
+
+        while id not in self.rows:
+            row = self.stats_queue.get(timeout=timeout)
+            self.rows[row['id']] = row
+
+        return self.rows.pop(id)
+
+    def setupPlots(self):
+
+        import matplotlib.pyplot as plt
+        import schainpy.model as model
+
+        plt.switch_backend('Agg')
+        plots = {}
+
+        for id, name, kwargs in self.operations:
+            cls = getattr(model, name)
+            # sin el proceso del MPDecorator, la operacion corre en este worker
+            obj = undecorated(cls)()
+            # el id distingue las operaciones con el mismo CODE
+            obj.name = '{}Plot-{}'.format(obj.CODE.upper(), id)
+            kwargs = dict(kwargs, show=False)
+            if type(obj).run is cls.BaseClass.run:
+                add, run = type(obj).add_frame, type(obj).run
+            else:
+                # run propio (operaciones antiguas), no se combinan cuadros
+                add, run = None, type(obj).run
+            stats = OperationStats(id, obj.name, 'external')
+            plots[id] = (obj, kwargs, add, run, stats)
+
+        return plots
+
+    def run(self):
+
+        plots = self.setupPlots()
+        t0 = time.time()
+
+        while plots:
+
+            t1 = time.perf_counter()
+            items = [self.queue.get()]
+            wait = time.perf_counter() - t1
+            while True:
+                try:
+                    items.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            frames = {}
+            for id, dataOut in items:
+                if isinstance(dataOut, SharedBlock):
+                    dataOut = dataOut.attach(self.release_queue)
+                frames.setdefault(id, []).append(dataOut)
+
+            # la espera se reparte entre las operaciones que reciben cuadros
+            for id in frames:
+                plots[id][4].wait += wait/len(frames)
+
+            for id, data in frames.items():
+                obj, kwargs, add, run, stats = plots[id]
+                policy = self.policies.get(id, ('coalesce', 0.))
+                data, dropped = coalesceFrames(data, *policy)
+                stats.dropped += dropped
+                for dataOut, coalesced in data:
+                    if dataOut.error:
+                        break
+                    stats.start(dataOut)
+                    try:
+                        if not coalesced:
+                            run(obj, dataOut, **kwargs)
+                        elif add is not None:
+                            add(obj, dataOut, **kwargs)
+                    except:
+                        log.error(traceback.format_exc(), obj.name)
+                    stats.stop(dataOut)
+                    if add is not None:
+                        stats.coalesced += coalesced
+                    else:
+                        stats.dropped += coalesced
+                if data[-1][0].error:
+                    self.close(plots.pop(id), t0)
+
+    def close(self, plot, t0):
+
+        obj, kwargs, add, run, stats = plot
+        obj.close()
+        if self.stats:
+            self.stats_queue.put(stats.as_dict())
+        # los cuadros descartados por PlotQueue se reportan en el productor
+        if stats.coalesced:
+            log.warning('{} frames coalesced, plot worker busy'.format(stats.coalesced), obj.name)
+        log.success('Done...(Time:{:4.2f} secs)'.format(time.time()-t0), obj.name)
+
+
+class PlotQueue(object):
+    '''
+    Producer side of the queue of a worker, the frames are tagged with the
+    id of the operation and dropped if the worker is behind (queue full)
+    unless the policy is block, the last block (error) always waits. The
+    queue is shared by the operations of the worker, the frame dropped is
+    the new one (drop-oldest and keep-latest are not supported).
+    '''
+
+    def __init__(self, worker, id, name):
+
+        self.worker = worker
+        self.id = id
+        self.name = name
+        self.dropped = 0
+
+    def put(self, dataOut):
+
+        if not isinstance(dataOut, SharedBlock):
+            error = dataOut.error
+            dataOut = SharedBlock.pack(dataOut)
+            if error:
+                if self.dropped:
+                    log.warning('{} frames dropped, plot worker busy'.format(self.dropped), self.name)
+                self.worker.queue.put((self.id, dataOut))
+                return
+
+        if self.worker.policies.get(self.id, ('coalesce',))[0] == 'block':
+            self.worker.queue.put((self.id, dataOut))
+            return
+
+        try:
+            self.worker.queue.put_nowait((self.id, dataOut))
+        except queue.Full:
+            self.dropped += 1
+            if isinstance(dataOut, SharedBlock) and dataOut.name is not None:
+                self.worker.release_queue.put(dataOut.name)
+
+
+class PlotStatsQueue(object):
+
+    def __init__(self, worker, id):
+
+        self.worker = worker
+        self.id = id
+
+    def get(self, timeout=30):
+
+        return self.worker.getStats(self.id, timeout)
+
+
+class PlotClient(object):
+    '''
+    Plot operation running in a PlotWorker, used by the processing unit as
+    the MPDecorator process of the operation
+    '''
+
+    def __init__(self, worker, id, name):
+
+        self.worker = worker
+        self.id = id
+        self.name = name
+        self.queue = PlotQueue(worker, id, name)
+        self.transport = 'pickle'
+        self.release_queue = worker.release_queue
+        self.stats_queue = None
+
+    def setTransport(self, transport):
+
+        if transport not in TRANSPORTS:
+            raise ValueError('transport should be one of {}'.format(TRANSPORTS))
+
+        self.transport = transport
+
+    def setPolicy(self, policy):
+        '''
+        Only block and coalesce, the queue of the worker is shared by its
+        operations so the oldest frame of one operation can not be dropped
+        '''
+
+        name, window = parsePolicy(policy)
+        if name not in POLICIES:
+            raise ValueError('policy should be one of {} with plot workers'.format(POLICIES))
+
+        self.worker.policies[self.id] = (name, window)
+
+    def enableStats(self):
+
+        self.worker.stats = True
+        self.stats_queue = PlotStatsQueue(self.worker, self.id)
+
+    def start(self):
+        '''
+        The worker is started by the PlotService
+        '''
+
+        return
+
+    def join(self, timeout=None):
+
+        self.worker.join(timeout)
+
+
+class PlotService(object):
+    '''
+    Pool of `nworkers` plot workers, the operations are assigned round
+    robin and the workers are started after all operations are added (the
+    queue of a worker keeps QUEUE_SIZE frames for each of its operations)
+    '''
+
+    def __init__(self, nworkers):
+
+        self.workers = [PlotWorker('PlotWorker{}'.format(n)) for n in range(nworkers)]
+        self.count = 0
+
+    def addOperation(self, id, name, kwargs):
+
+        worker = self.workers[self.count % len(self.workers)]
+        worker.operations.append((id, name, kwargs))
+        self.count += 1
+
+        return PlotClient(worker, id, name)
+
+    def start(self):
+
+        for worker in self.workers:
+            if worker.operations:
+                worker.queue = Queue(maxsize=QUEUE_SIZE*len(worker.operations))
+                worker.start()
+                log.success('Plot worker started: {}'.format(
+                    ', '.join(name for id, name, kwargs in worker.operations)), worker.name)
@@ -9,7 +9,7 @@
 import os
 import numpy
 
-from schainpy.model.graphics.jroplot_base import Plot, plt, log
+from schainpy.model.graphics.jroplot_base import Plot, RTIMesh, plt, log
 
 
 class SpectraPlot(Plot):
@@ -248,39 +248,34 @@ class RTIPlot(Plot):
         self.x = self.data.times
         self.y = self.data.yrange
         self.z = self.data[self.CODE]
-        self.z = numpy.ma.masked_invalid(self.z)
 
+        # los huecos se enmascaran en RTIMesh solo para las columnas nuevas
         if self.decimation is None:
-            x, y, z = self.fill_gaps(self.x, self.y, self.z)
+            x, y, z = self.x, self.y, self.z
         else:
-            x, y, z = self.fill_gaps(*self.decimate())
+            x, y, z = self.decimate()
 
         for n, ax in enumerate(self.axes):
-            self.zmin = self.zmin if self.zmin else numpy.min(self.z)
-            self.zmax = self.zmax if self.zmax else numpy.max(self.z)
+            self.zmin = self.zmin if self.zmin else numpy.min(numpy.ma.masked_invalid(self.z))
+            self.zmax = self.zmax if self.zmax else numpy.max(numpy.ma.masked_invalid(self.z))
             data = self.data[-1]
             if ax.firsttime:
-                ax.plt = ax.pcolormesh(x, y, z[n].T,
-                                       vmin=self.zmin,
-                                       vmax=self.zmax,
-                                       cmap=plt.get_cmap(self.colormap)
-                                       )
+                ax.plt = RTIMesh(ax,
+                                 vmin=self.zmin,
+                                 vmax=self.zmax,
+                                 cmap=plt.get_cmap(self.colormap)
+                                 )
                 if self.showprofile:
                     ax.plot_profile = self.pf_axes[n].plot(
                         data['rti'][n], self.y)[0]
                     ax.plot_noise = self.pf_axes[n].plot(numpy.repeat(data['noise'][n], len(self.y)), self.y,
                                                          color="k", linestyle="dashed", lw=1)[0]
             else:
-                ax.collections.remove(ax.collections[0])
-                ax.plt = ax.pcolormesh(x, y, z[n].T,
-                                       vmin=self.zmin,
-                                       vmax=self.zmax,
-                                       cmap=plt.get_cmap(self.colormap)
-                                       )
                 if self.showprofile:
                     ax.plot_profile.set_data(data['rti'][n], self.y)
                     ax.plot_noise.set_data(numpy.repeat(
                         data['noise'][n], len(self.y)), self.y)
+            ax.plt.set_data(x, y, z[n])
 
 
 class CoherencePlot(RTIPlot):
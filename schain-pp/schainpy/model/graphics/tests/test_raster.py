@@ -0,0 +1,108 @@
+import io
+import os
+import datetime
+import contextlib
+
+os.environ.setdefault('BACKEND', 'Agg')
+
+import numpy
+import pytest
+
+from schainpy.model.data.jrodata import Parameters
+from schainpy.model.graphics.jroplot_base import Plot, plt
+from schainpy.model.graphics.jroplot_parameters import WeatherParamsPlot
+
+nRadials = 360
+nHeights = 400
+xrange = 60
+
+# pixels que difieren en mas de 16 en algun canal, sin y con tolerancia de
+# +-1 pixel (gates menores a un pixel muestreados en otro punto)
+MAX_DIFF = 4.0
+MAX_DIFF_NEAR = 1.0
+
+
+def getSweep(i):
+    '''
+    Celdas de tormenta (reflectividad suave, vacio bajo 5 dBZ)
+    '''
+
+    rng = numpy.random.default_rng(i)
+    azi = numpy.linspace(0, 360, nRadials, endpoint=False)
+    r = numpy.arange(nHeights)*xrange/nHeights
+    R, A = numpy.meshgrid(r, numpy.radians(azi))
+    x, y = R*numpy.sin(A), R*numpy.cos(A)
+
+    z = numpy.zeros((nRadials, nHeights))
+    for n in range(6):
+        x0, y0 = rng.uniform(-0.8*xrange, 0.8*xrange, 2)
+        width = rng.uniform(3, 10)
+        z += rng.uniform(30, 60)*numpy.exp(-((x - x0)**2 + (y - y0)**2)/(2*width**2))
+    z += rng.normal(0, 1, z.shape)
+    z[z < 5] = numpy.nan
+
+    dataOut = Parameters()
+    data = numpy.full((2, 8, nRadials, nHeights), numpy.nan)
+    data[:, 4] = z
+    data[:, 3] = 10
+    dataOut.data_param = data
+    dataOut.weather_vars = None
+    dataOut.heightList = r
+    dataOut.channelList = [0, 1]
+    dataOut.data_azi = azi
+    dataOut.data_ele = numpy.full(nRadials, 4.0)
+    dataOut.mode_op = 'PPI'
+    dataOut.paramInterval = 60
+    dataOut.utctime = datetime.datetime(2024, 10, 15, 12).timestamp() + 60*i
+    return dataOut
+
+
+def render(sweeps, raster):
+
+    plt.switch_backend('Agg')
+    # clase sin MPDecorator, se ejecuta en este proceso
+    plot = object.__new__(WeatherParamsPlot)
+    Plot.__bases__[0].__init__(plot)
+    kwargs = dict(show=False, save=False, channels=[0], zmin=-10, zmax=70, xrange=xrange, yrange=20,
+                  attr_data='Z', labels=['Z'], colormap='sophy_z', bgcolor='black', localtime=False,
+                  latitude=-5.2, longitude=-80.6, mode='PPI', raster=raster)
+
+    images = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for dataOut in sweeps:
+            Plot.__bases__[0].run(plot, dataOut, **kwargs)
+            fig = plot.figures['PPI'][0]
+            fig.canvas.draw()
+            images.append(numpy.asarray(fig.canvas.buffer_rgba())[..., :3].astype(int))
+    assert (plot.raster_sweep is not None) == raster
+    plt.close(plot.figures['PPI'][0])
+    plt.close(plot.figures['RHI'][0])
+    return images
+
+
+@pytest.fixture(scope='module')
+def images():
+
+    sweeps = [getSweep(i) for i in range(2)]
+    return render(sweeps, False), render(sweeps, True)
+
+
+def test_raster_same_size(images):
+
+    ref, raster = images
+    for a, b in zip(ref, raster):
+        assert a.shape == b.shape
+
+
+def test_raster_image_diff(images):
+
+    ref, raster = images
+    for a, b in zip(ref, raster):
+        diff = numpy.abs(a - b).max(axis=-1)
+        near = diff.copy()
+        for dy in (-1, 0, 1):
+            for dx in (-1, 0, 1):
+                shifted = numpy.roll(a, (dy, dx), axis=(0, 1))
+                near = numpy.minimum(near, numpy.abs(shifted - b).max(axis=-1))
+        assert 100*(diff > 16).mean() < MAX_DIFF
+        assert 100*(near > 16).mean() < MAX_DIFF_NEAR
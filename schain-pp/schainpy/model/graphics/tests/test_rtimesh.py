@@ -0,0 +1,88 @@
+import os
+
+os.environ.setdefault('BACKEND', 'Agg')
+
+import numpy
+import pytest
+
+from schainpy.model.graphics.jroplot_base import RTIMesh, plt
+
+nHeights = 50
+interval = 10.
+tmin = 1729000000.
+
+
+def getFigure():
+
+    plt.switch_backend('Agg')
+    fig, ax = plt.subplots(figsize=(6, 3), dpi=80)
+    ax.set_xlim(tmin, tmin + 200*interval)
+    ax.set_ylim(0, nHeights*0.15)
+    return fig, ax
+
+
+def pcolormesh(ax, x, y, z):
+    '''
+    pcolormesh nuevo en cada cuadro como el RTIPlot anterior
+    '''
+
+    z = numpy.ma.masked_invalid(z)
+    if len(x) > 1:
+        deltas = x[1:] - x[:-1]
+        z[numpy.where(deltas > 5*numpy.median(deltas))[0]] = numpy.ma.masked
+    return ax.pcolormesh(x, y, z.T, vmin=0, vmax=40, cmap=plt.get_cmap('jet'))
+
+
+def getFrames(case):
+    '''
+    Tiempos y datos de cada cuadro (la ultima columna es la nueva)
+    '''
+
+    rng = numpy.random.default_rng(0)
+    times = list(tmin + numpy.arange(20)*interval)
+    data = [rng.normal(20, 5, nHeights) for t in times]
+
+    for i in range(20, 40):
+        if case == 'gap' and i == 30:
+            times.append(times[-1] + 20*interval)
+        elif case == 'repeated' and i % 5 == 0:
+            times.append(times[-1])
+        else:
+            times.append(times[-1] + interval)
+        data.append(rng.normal(20, 5, nHeights))
+        if case == 'nan':
+            data[-1][rng.integers(0, nHeights, 5)] = numpy.nan
+        if case == 'unordered' and i % 7 == 0:
+            # un perfil atrasado se inserta entre los anteriores
+            times[-1] = times[-2] - interval/2
+            order = numpy.argsort(times, kind='stable')
+            times = [times[k] for k in order]
+            data = [data[k] for k in order]
+        yield numpy.array(times), numpy.array(data)
+
+
+@pytest.mark.parametrize('case', ['steady', 'gap', 'nan', 'repeated', 'unordered'])
+def test_rtimesh_as_pcolormesh(case):
+
+    y = numpy.arange(nHeights)*0.15
+    fig_old, ax_old = getFigure()
+    fig_new, ax_new = getFigure()
+    mesh = RTIMesh(ax_new, vmin=0, vmax=40, cmap=plt.get_cmap('jet'))
+    old = None
+
+    for x, z in getFrames(case):
+        if old is not None:
+            old.remove()
+        old = pcolormesh(ax_old, x, y, z)
+        ax_old.set_xlim(tmin, tmin + 200*interval)
+        ax_old.set_ylim(0, nHeights*0.15)
+        mesh.set_data(x, y, z)
+        ax_new.set_xlim(tmin, tmin + 200*interval)
+        ax_new.set_ylim(0, nHeights*0.15)
+        fig_old.canvas.draw()
+        fig_new.canvas.draw()
+        numpy.testing.assert_array_equal(
+            numpy.asarray(fig_new.canvas.buffer_rgba()), numpy.asarray(fig_old.canvas.buffer_rgba()))
+
+    plt.close(fig_old)
+    plt.close(fig_new)
@@ -0,0 +1,137 @@
+import io
+import os
+import glob
+import datetime
+import contextlib
+from multiprocessing import Queue
+
+os.environ.setdefault('BACKEND', 'Agg')
+
+import numpy
+import pytest
+
+from schainpy.controller import OperationConf
+from schainpy.model.data.jrodata import Parameters, WEATHER_VARS
+from schainpy.model.proc.jroproc_base import ProcessingUnit
+from schainpy.model.graphics import jroplot_base
+from schainpy.model.graphics.jroplot_service import PlotService
+
+# el logo se busca en la carpeta actual
+jroplot_base.file_logo = os.path.join(
+    os.path.dirname(jroplot_base.__file__), '..', '..', 'scripts', 'LogoIGP.png')
+
+nRadials = 36
+nHeights = 40
+nSweeps = 4
+xrange = 60
+VARIABLES = {'Z': (-10, 70), 'V': (-20, 20)}
+
+
+def getSweep(i):
+
+    rng = numpy.random.default_rng(i)
+    dataOut = Parameters()
+    data = rng.normal(0, 1, (2, 8, nRadials, nHeights))
+    data[:, 3] = 10
+    dataOut.data_param = data
+    dataOut.weather_vars = dict(WEATHER_VARS)
+    dataOut.heightList = numpy.arange(nHeights)*xrange/nHeights
+    dataOut.channelList = [0, 1]
+    dataOut.data_azi = numpy.linspace(0, 360, nRadials, endpoint=False)
+    dataOut.data_ele = numpy.full(nRadials, 4.0)
+    dataOut.mode_op = 'PPI'
+    dataOut.paramInterval = 60
+    dataOut.utctime = datetime.datetime(2024, 10, 15, 12).timestamp() + 60*i
+    dataOut.flagNoData = False
+    return dataOut
+
+
+class SweepUnit(ProcessingUnit):
+
+    def __init__(self, sweeps):
+
+        ProcessingUnit.__init__(self)
+        self.sweeps = iter(sweeps)
+
+    def run(self):
+
+        try:
+            self.dataOut = next(self.sweeps)
+        except StopIteration:
+            self.dataOut = Parameters()
+            self.dataOut.error = True
+            self.dataOut.flagNoData = True
+
+
+def getConf(n, var, policy, path):
+
+    zmin, zmax = VARIABLES[var]
+    conf = OperationConf()
+    conf.setup('1{}'.format(n + 1), 'WeatherParamsPlot', '0', '1', Queue(), policy=policy)
+    conf.parameters = dict(save=path, save_code=var, channels=[0], zmin=zmin, zmax=zmax,
+                           xrange=xrange, yrange=20, attr_data=var, labels=[var],
+                           localtime=False, mode='PPI', show=False)
+    return conf
+
+
+def runPlots(path, policy):
+    '''
+    Unidad con 2 WeatherParamsPlot en un solo worker, devuelve las figuras
+    guardadas y los contadores de cada operacion
+    '''
+
+    unit = SweepUnit([getSweep(i) for i in range(nSweeps)])
+    unit.enableStats('1')
+    service = PlotService(1)
+    ops = []
+    for n, var in enumerate(VARIABLES):
+        conf = getConf(n, var, policy, path)
+        ops.append(conf.createObject(stats=True, service=service))
+        unit.addOperation(conf, ops[-1])
+    service.start()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i in range(nSweeps + 1):
+            unit.call()
+        rows = unit.getStats(timeout=120)[1:]
+    for op in ops:
+        op.join(120)
+
+    # una figura por sweep en las subcarpetas, la ultima en `path`
+    saved = {}
+    for var in VARIABLES:
+        files = glob.glob(os.path.join(path, '**', '*{}*.png'.format(var)), recursive=True)
+        top = glob.glob(os.path.join(path, '*{}*.png'.format(var)))
+        saved[var] = len(files) - len(top)
+    return saved, dict(zip(VARIABLES, rows))
+
+
+def test_plot_workers_block(tmp_path):
+
+    saved, rows = runPlots(str(tmp_path), 'block')
+
+    for var in VARIABLES:
+        assert saved[var] == nSweeps
+        assert rows[var]['dropped'] == 0
+        assert rows[var]['coalesced'] == 0
+        assert rows[var]['calls'] == nSweeps
+    # nombre de cada operacion en el log y los contadores
+    assert rows['Z']['name'] != rows['V']['name']
+
+
+def test_plot_workers_coalesce(tmp_path):
+
+    saved, rows = runPlots(str(tmp_path), 'coalesce')
+
+    # los cuadros combinados o descartados no generan figura
+    for var in VARIABLES:
+        assert saved[var] >= 1
+        assert saved[var] + rows[var]['coalesced'] + rows[var]['dropped'] == nSweeps
+
+
+@pytest.mark.parametrize('policy', ['drop-oldest', 'keep-latest'])
+def test_plot_workers_policy(tmp_path, policy):
+
+    conf = getConf(0, 'Z', policy, str(tmp_path))
+    with pytest.raises(ValueError):
+        conf.createObject(stats=True, service=PlotService(1))
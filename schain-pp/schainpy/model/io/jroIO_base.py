@@ -6,8 +6,12 @@ Created on Jul 2, 2014
 import os
 import sys
 import glob
+import json
+import mmap
 import time
 import numpy
+import hashlib
+import calendar
 import fnmatch
 import inspect
 import time
@@ -424,6 +428,294 @@ def parse_format(s, fmt):
         fmt = fmt.replace(fmt[x:x+2], s[x:x+d])
     return fmt
 
+
+class FileCatalog(object):
+    '''
+    Persistent index of the data files of `path`: file -> (start, end, type,
+    size) for each folder. Only the folders whose mtime changed are listed
+    again (and the last one, its last file can still be growing), the index
+    is saved in `index_file` (~/.schainpy/catalog_<hash of path>.json by
+    default, outside of the data so its mtimes are not changed) so a new
+    start or an online poll does not walk the whole archive.
+
+    `query` gives the same files and order than Reader.find_folders and
+    Reader.find_files, dates are parsed from the names with `folderfmt` and
+    `filefmt`. The start of a file comes from its name and the end is the
+    start of the next file of the same type (the whole day if `filefmt` has
+    no time, None for the last file of a folder).
+    '''
+
+    VERSION = 1
+    __instances = {}
+
+    def __init__(self, path, filefmt, folderfmt, walk=True, index_file=None):
+
+        self.path = path
+        self.roots = path.split(',')
+        self.filefmt = filefmt
+        self.folderfmt = folderfmt
+        self.walk = walk
+        self.index_file = index_file or self.getIndexFile(self.roots)
+        self.index = {}
+        self.load()
+
+    @classmethod
+    def get(cls, path, filefmt, folderfmt, walk=True, index_file=None):
+        '''
+        Shared instance for the given path and formats
+        '''
+
+        key = (path, filefmt, folderfmt, walk, index_file)
+        if key not in cls.__instances:
+            cls.__instances[key] = cls(path, filefmt, folderfmt, walk, index_file)
+
+        return cls.__instances[key]
+
+    @staticmethod
+    def getIndexFile(roots):
+
+        name = hashlib.md5(','.join(os.path.abspath(x) for x in roots).encode()).hexdigest()
+        return os.path.join(os.path.expanduser('~'), '.schainpy', 'catalog_{}.json'.format(name))
+
+    @staticmethod
+    def parseDate(name, fmt):
+
+        try:
+            return datetime.datetime.strptime(parse_format(name, fmt), fmt)
+        except Exception:
+            return None
+
+    def load(self):
+
+        self.index = {'version': self.VERSION, 'roots': {}}
+
+        if not os.path.exists(self.index_file):
+            return
+        try:
+            with open(self.index_file) as fp:
+                index = json.load(fp)
+        except Exception:
+            log.warning('Invalid index {}, scanning {}'.format(self.index_file, self.path), 'FileCatalog')
+            return
+
+        if index.get('version') != self.VERSION or index.get('walk') != self.walk:
+            return
+
+        self.index = index
+        if index.get('filefmt') != self.filefmt or index.get('folderfmt') != self.folderfmt:
+            # solo cambian las fechas, se calculan de nuevo sin listar las carpetas
+            for root in index['roots'].values():
+                for name, entry in root['folders'].items():
+                    self.parseFolder(name, entry)
+
+    def save(self):
+
+        self.index.update(filefmt=self.filefmt, folderfmt=self.folderfmt, walk=self.walk)
+        folder = os.path.dirname(self.index_file)
+        try:
+            if folder and not os.path.exists(folder):
+                os.makedirs(folder)
+            tmp = '{}.{}'.format(self.index_file, os.getpid())
+            with open(tmp, 'w') as fp:
+                json.dump(self.index, fp)
+            os.replace(tmp, self.index_file)
+        except OSError as e:
+            log.warning('Can not save index {}: {}'.format(self.index_file, e), 'FileCatalog')
+
+    def scanFolder(self, path, name, mtime):
+        '''
+        List the files of a folder: [name, type, size, mtime, start, end]
+        '''
+
+        files = []
+        for f in os.scandir(path):
+            # como glob, se ignoran los archivos ocultos (el indice)
+            if f.name.startswith('.') or not f.is_file():
+                continue
+            st = f.stat()
+            files.append([f.name, os.path.splitext(f.name)[1], st.st_size, st.st_mtime, None, None])
+        files.sort()
+
+        entry = {'mtime': mtime, 'date': None, 'files': files}
+        self.parseFolder(name, entry)
+
+        return entry
+
+    def parseFolder(self, name, entry):
+        '''
+        Date of the folder and start/end (utc seconds of the time in the
+        name) of its files
+        '''
+
+        dt = self.parseDate(name, self.folderfmt) if name else None
+        entry['date'] = dt.date().toordinal() if dt else None
+
+        hasTime = any(d in self.filefmt for d in ('%H', '%M', '%S'))
+        nextStart = {}
+        for f in reversed(entry['files']):
+            dt = self.parseDate(f[0], self.filefmt)
+            if dt is None:
+                f[4:] = [None, None]
+                continue
+            start = calendar.timegm(dt.timetuple())
+            if not hasTime:
+                end = start + 86400
+            elif nextStart.get(f[1], start) > start:
+                end = nextStart[f[1]]
+            else:
+                end = None
+            nextStart[f[1]] = start
+            f[4:] = [start, end]
+
+    def refresh(self):
+        '''
+        Update the index from the mtimes of the roots and folders, return
+        True if something changed
+        '''
+
+        changed = False
+        roots = self.index['roots']
+
+        for path in self.roots:
+            key = os.path.abspath(path)
+            try:
+                mtime = os.stat(path).st_mtime_ns
+            except OSError:
+                if roots.pop(key, None) is not None:
+                    changed = True
+                continue
+
+            root = roots.setdefault(key, {'mtime': None, 'folders': {}})
+
+            if not self.walk:
+                names = ['']
+            elif root['mtime'] != mtime:
+                names = sorted(x.name for x in os.scandir(path) if x.is_dir())
+            else:
+                names = sorted(root['folders'])
+
+            if root['mtime'] != mtime:
+                root['mtime'] = mtime
+                changed = True
+
+            for name in set(root['folders']).difference(names):
+                root['folders'].pop(name)
+                changed = True
+
+            for i, name in enumerate(names):
+                folder = os.path.join(path, name) if name else path
+                try:
+                    mtime = os.stat(folder).st_mtime_ns
+                except OSError:
+                    continue
+                entry = root['folders'].get(name)
+                if entry is not None and entry['mtime'] == mtime and i < len(names)-1:
+                    continue
+                new = self.scanFolder(folder, name, mtime)
+                if new != entry:
+                    root['folders'][name] = new
+                    changed = True
+
+        if changed:
+            self.save()
+
+        return changed
+
+    @staticmethod
+    def inTimeRange(start, end, startTime, endTime):
+        '''
+        True if the file [start, end] overlaps the daily window
+        startTime-endTime
+        '''
+
+        t0 = datetime.datetime.utcfromtimestamp(start)
+        if end is None:
+            return t0.time() <= endTime
+        t1 = datetime.datetime.utcfromtimestamp(end)
+
+        day = t0.date()
+        while day <= t1.date():
+            if datetime.datetime.combine(day, startTime) <= t1 and t0 <= datetime.datetime.combine(day, endTime):
+                return True
+            day += datetime.timedelta(1)
+
+        return False
+
+    def query(self, startDate=None, endDate=None, startTime=None, endTime=None,
+              ext='', expLabel='', filter=None, last=False, refresh=True):
+        '''
+        Files in the date range (and in the daily window startTime-endTime if
+        given), `last` returns only the last file of the last folder
+        '''
+
+        if refresh:
+            self.refresh()
+
+        startDate = startDate or datetime.date.min
+        endDate = endDate or datetime.date.max
+        folders = []
+        for path in self.roots:
+            root = self.index['roots'].get(os.path.abspath(path))
+            if root is None:
+                continue
+            for name in sorted(root['folders']):
+                folders.append((name, os.path.join(path, name) if name else path, root['folders'][name]))
+
+        if self.walk:
+            folders.sort(key=lambda x: x[0])
+        if last:
+            folders = folders[-1:]
+
+        useTime = startTime is not None and endTime is not None and startTime <= endTime
+        files = []
+
+        for name, path, entry in folders:
+            if self.walk:
+                if entry['date'] is None:
+                    continue
+                dt = datetime.date.fromordinal(entry['date'])
+                if dt < startDate or dt > endDate:
+                    continue
+
+            items = [f for f in entry['files'] if f[0].endswith(ext or '')]
+            if filter is not None:
+                items = [f for f in items if os.path.splitext(f[0])[0][-len(filter):] == filter]
+            if last:
+                items = items[-1:]
+
+            for fo, ftype, size, mtime, start, end in items:
+                if start is None:
+                    continue
+                if not last:
+                    dt = datetime.datetime.utcfromtimestamp(start).date()
+                    if dt < startDate or dt > endDate:
+                        continue
+                    if useTime and not self.inTimeRange(start, end, startTime, endTime):
+                        continue
+                files.append(os.path.join(path, expLabel, fo))
+
+        return files
+
+    def summary(self):
+
+        nFolders = nFiles = size = 0
+        starts = []
+        for root in self.index['roots'].values():
+            for entry in root['folders'].values():
+                nFolders += 1
+                nFiles += len(entry['files'])
+                size += sum(f[2] for f in entry['files'])
+                starts.extend(f[4] for f in entry['files'] if f[4] is not None)
+
+        return {
+            'folders': nFolders,
+            'files': nFiles,
+            'size': size,
+            'first': datetime.datetime.utcfromtimestamp(min(starts)) if starts else None,
+            'last': datetime.datetime.utcfromtimestamp(max(starts)) if starts else None,
+            }
+
+
 class Reader(object):
 
     c = 3E8
@@ -482,6 +774,7 @@ class Reader(object):
     open_file = open
     open_mode = 'rb'
     filter =None
+    catalog = False
 
     def run(self):
 
@@ -550,15 +843,29 @@ class Reader(object):
                     log.log('Skiping file {}'.format(fo), self.name)
                     continue
 
+    def getCatalog(self, path, filefmt, folderfmt, walk):
+        '''
+        FileCatalog of the path, `catalog` can be True or the index file
+        '''
+
+        index_file = self.catalog if isinstance(self.catalog, str) else None
+        return FileCatalog.get(path, filefmt, folderfmt, walk, index_file)
+
     def searchFilesOffLine(self, path, startDate, endDate,
                            expLabel, ext, walk,
-                           filefmt, folderfmt,filter):
+                           filefmt, folderfmt,filter=None):
         """Search files in offline mode for the given arguments
 
         Return:
             Generator of files
         """
 
+        if self.catalog:
+            startTime = self.startTime if isinstance(self.startTime, datetime.time) else None
+            endTime = self.endTime if isinstance(self.endTime, datetime.time) else None
+            catalog = self.getCatalog(path, filefmt, folderfmt, walk)
+            return iter(catalog.query(startDate, endDate, startTime, endTime, ext, expLabel, filter))
+
         if walk:
             folders = self.find_folders(
                 path, startDate, endDate, folderfmt)
@@ -570,7 +877,7 @@ class Reader(object):
 
     def searchFilesOnLine(self, path, startDate, endDate,
                           expLabel, ext, walk,
-                          filefmt, folderfmt,filter):
+                          filefmt, folderfmt,filter=None):
         """Search for the last file of the last folder
 
         Arguments:
@@ -583,6 +890,11 @@ class Reader(object):
             generator with the full path of last filename
         """
 
+        if self.catalog:
+            catalog = self.getCatalog(path, filefmt, folderfmt, walk)
+            return iter(catalog.query(startDate, endDate, ext=ext, expLabel=expLabel,
+                                      filter=filter, last=True))
+
         if walk:
             folders = self.find_folders(
                 path, startDate, endDate, folderfmt, last=True)
@@ -792,7 +1104,16 @@ class JRODataReader(Reader):
     __isFirstTimeOnline = 1
     filefmt = "*%Y%j***"
     folderfmt = "*%Y%j"
-    __attrs__ = ['path', 'startDate', 'endDate', 'startTime', 'endTime', 'online', 'delay', 'walk']
+    mmap = False
+    selChannels = None
+    selHeights = None
+    fileMap = None
+    fileMapName = None
+    blockBuffers = None
+    blockLent = None
+    nBuffers = 0
+    __attrs__ = ['path', 'startDate', 'endDate', 'startTime', 'endTime', 'online', 'delay', 'walk', 'catalog',
+                 'mmap', 'selChannels', 'selHeights', 'nBuffers']
 
     def getDtypeWidth(self):
 
@@ -959,6 +1280,151 @@ class JRODataReader(Reader):
                                                        self.dataOut.datatime.ctime()))
         return 1
 
+    def readBlockData(self, dtype, count):
+        """
+        Lee `count` elementos de tipo `dtype` desde la posicion actual de self.fp
+        igual que numpy.fromfile. Con mmap=True el archivo se mapea en memoria
+        (copy-on-write) y se devuelve una vista estructurada del bloque sin
+        copiar los datos, self.fp avanza al final del bloque para seguir
+        leyendo las cabeceras. Si el archivo aun no tiene el bloque completo
+        (online) se usa numpy.fromfile.
+        """
+
+        if not self.mmap:
+            return numpy.fromfile(self.fp, dtype, count)
+
+        offset = self.fp.tell()
+        nbytes = numpy.dtype(dtype).itemsize * count
+
+        if self.fileMap is None or self.fileMapName != self.filename or offset + nbytes > len(self.fileMap):
+            # nuevo archivo o el archivo crecio (online)
+            self.fileMap = None
+            self.fileMapName = None
+            if os.fstat(self.fp.fileno()).st_size >= offset + nbytes:
+                self.fileMap = mmap.mmap(self.fp.fileno(), 0, access=mmap.ACCESS_COPY)
+                self.fileMapName = self.filename
+
+        if self.fileMap is None:
+            return numpy.fromfile(self.fp, dtype, count)
+
+        self.fp.seek(offset + nbytes)
+
+        return numpy.frombuffer(self.fileMap, dtype, count, offset)
+
+    def releaseBlockData(self, data):
+        """
+        Devuelve `data` (arreglo entregado por getBlockBuffer o una vista de
+        el) para que se vuelva a usar en los siguientes bloques si nBuffers >
+        0, en ese caso no se debe usar `data` despues. Si `data` es una vista
+        de readBlockData libera las paginas del archivo mapeado una vez
+        copiado el bloque, para que el RSS no crezca con el tamaño del
+        archivo.
+        """
+
+        array = data
+        while isinstance(array, numpy.ndarray):
+            if self.blockLent is not None and id(array) in self.blockLent:
+                name, buffer = self.blockLent.pop(id(array))
+                self.blockBuffers[name].append(buffer)
+                return
+            array = array.base
+
+        if self.fileMap is None or not hasattr(self.fileMap, 'madvise'):
+            return
+
+        base = numpy.frombuffer(self.fileMap, numpy.uint8)
+        start = data.__array_interface__['data'][0] - base.__array_interface__['data'][0]
+        if start < 0 or start + data.nbytes > len(self.fileMap):
+            # no es una vista del archivo mapeado (fromfile)
+            return
+
+        first = -(-start // mmap.PAGESIZE) * mmap.PAGESIZE
+        last = (start + data.nbytes) // mmap.PAGESIZE * mmap.PAGESIZE
+        if last > first:
+            self.fileMap.madvise(mmap.MADV_DONTNEED, first, last - first)
+
+    def getBlockBuffer(self, name, shape, dtype):
+        """
+        Entrega un arreglo de salida para `name`. Por defecto (nBuffers = 0)
+        es un arreglo nuevo en cada bloque y las unidades pueden guardarlo.
+        Con nBuffers > 0 (opcion del lector) es del lector hasta que se
+        devuelve con releaseBlockData y se vuelve a entregar cuando hay
+        `nBuffers` devueltos: los datos de un bloque siguen validos solo
+        mientras se leen los nBuffers - 1 bloques siguientes, despues se
+        sobreescriben y las unidades que guardan referencias (integradores,
+        buffers de las operaciones, graficos) deben copiarlos.
+        """
+
+        if not self.nBuffers:
+            return numpy.empty(shape, dtype)
+
+        if self.blockBuffers is None:
+            self.blockBuffers = {}
+            self.blockLent = {}
+        pool = self.blockBuffers.setdefault(name, [])
+        pool[:] = [buffer for buffer in pool if buffer.shape == shape and buffer.dtype == dtype]
+
+        if len(pool) >= self.nBuffers:
+            buffer = pool.pop(0)
+        else:
+            buffer = numpy.empty(shape, dtype)
+
+        self.blockLent[id(buffer)] = (name, buffer)
+
+        return buffer
+
+    def getHeightSlice(self):
+        """
+        Rango de indices de alturas selHeights = [minIndex, maxIndex] como slice
+        (minIndex <= index <= maxIndex)
+        """
+
+        if self.selHeights is None:
+            return slice(None)
+
+        minIndex, maxIndex = self.selHeights
+        if (minIndex < 0) or (minIndex > maxIndex):
+            raise ValueError("Height index range (%d,%d) is not valid" % (minIndex, maxIndex))
+
+        return slice(minIndex, maxIndex + 1)
+
+    def copyBlock(self, name, data, rows=None, shift=0):
+        """
+        Copia el bloque `data` [canales o pares, perfiles, alturas] (puede ser
+        una vista del archivo) a un arreglo de salida reutilizable. Sobre la
+        vista se seleccionan primero las filas `rows` y las alturas selHeights,
+        se desplazan `shift` perfiles (como numpy.roll en el eje 1) y si los
+        datos son (real, imag) se convierten a complejo (getComplexDtype), todo
+        en una sola copia sin temporales del tamaño del bloque.
+        """
+
+        if rows is None:
+            rows = range(data.shape[0])
+
+        heights = self.getHeightSlice()
+        nProfiles = data.shape[1]
+        shift %= nProfiles
+
+        if data.dtype.names:
+            dtype = self.getComplexDtype(data.dtype['real'])
+        else:
+            dtype = data.dtype
+
+        shape = (len(rows), nProfiles, len(range(data.shape[2])[heights]))
+        out = self.getBlockBuffer(name, shape, dtype)
+
+        for i, row in enumerate(rows):
+            src = data[row, :, heights]
+            if data.dtype.names:
+                parts = ((out[i].real, src['real']), (out[i].imag, src['imag']))
+            else:
+                parts = ((out[i], src),)
+            for dst, src in parts:
+                dst[shift:] = src[:nProfiles - shift]
+                dst[:shift] = src[nProfiles - shift:]
+
+        return out
+
     def readFirstHeader(self):
 
         self.basicHeaderObj.read(self.fp)
@@ -1275,6 +1741,9 @@ class JRODataReader(Reader):
             oneDDict    :
             twoDDict    :
             independentParam    :
+            mmap        :    lee los bloques desde el archivo mapeado en memoria
+            selChannels :    lista de indices de canales a leer
+            selHeights  :    rango de indices de alturas [minIndex, maxIndex] a leer
         """
 
         if not(self.isConfig):
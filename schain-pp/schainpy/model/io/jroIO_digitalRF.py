@@ -12,9 +12,12 @@ Created on Jul 3, 2014
 
 import os
 import time
+import queue
 import datetime
 import numpy
 import timeit
+from threading import Thread, Event
+from multiprocessing.pool import ThreadPool
 from fractions import Fraction
 from time import time
 from time import sleep
@@ -23,6 +26,7 @@ import schainpy.admin
 from schainpy.model.data.jroheaderIO import RadarControllerHeader, SystemHeader
 from schainpy.model.data.jrodata import Voltage
 from schainpy.model.proc.jroproc_base import ProcessingUnit, Operation, MPDecorator
+from schainpy.utils import log
 
 import pickle
 try:
@@ -56,9 +60,19 @@ class DigitalRFReader(ProcessingUnit):
         self.dtype         = None
         self.oldAverage    = None
         self.path          = None
+        self.__prefetchQueue = None
+        self.__readPool      = None
+        self.__dataBlock     = None
 
     def close(self):
-        print('Average of writing to digital rf format is ', self.oldAverage * 1000)
+        self.__stopPrefetch()
+        if self.__readPool is not None:
+            self.__readPool.close()
+            self.__readPool.join()
+            self.__readPool = None
+        # sin lecturas canal por canal (readThreads) no hay promedio
+        if self.oldAverage is not None:
+            print('Average of writing to digital rf format is ', self.oldAverage * 1000)
         return
 
     def __getCurrentSecond(self):
@@ -246,6 +260,8 @@ class DigitalRFReader(ProcessingUnit):
               code=numpy.ones((1, 1), dtype=int),
               getByBlock=0,
               nProfileBlocks=1,
+              prefetch=0,
+              readThreads=1,
               **kwargs):
         '''
         In this method we should set all initial parameters.
@@ -261,6 +277,8 @@ class DigitalRFReader(ProcessingUnit):
             ext
             online
             delay
+            prefetch        :    number of blocks read in advance by a background thread (0: disabled)
+            readThreads     :    number of threads to read the channels of a block in parallel
         '''
         self.path           = path
         self.nCohInt        = nCohInt
@@ -438,12 +456,27 @@ class DigitalRFReader(ProcessingUnit):
         #self.__data_buffer    = numpy.zeros(
         #    (self.__num_subchannels, self.__samples_to_read), dtype=numpy.complex)
         print("samplestoread",self.__samples_to_read)
-        self.__data_buffer    = numpy.zeros((int(len(channelList)), self.__samples_to_read), dtype=numpy.complex_)
+        self.__data_buffer    = numpy.zeros((int(len(channelList)), self.__samples_to_read), dtype=self.getComplexDtype())
 
 
         self.__setFileHeader()
         self.isConfig = True
 
+        self.__readTime = 0.
+        self.__waitTime = 0.
+        self.__blockUnixSample   = self.__thisUnixSample
+        self.__blockDiscontinuous = False
+
+        if int(readThreads) > 1:
+            self.__readPool = ThreadPool(int(readThreads))
+            # un reader por (canal, subcanal), cada tarea del pool usa el suyo
+            self.__channelReaders = {
+                (name, sub): digital_rf.DigitalRFReader(path)
+                for name in self.__channelNameList for sub in range(self.__num_subchannels)}
+
+        if int(prefetch) > 0:
+            self.__startPrefetch(int(prefetch))
+
         print("[Reading] Digital RF Data was found from %s to %s " % (
             datetime.datetime.utcfromtimestamp(
                 self.__startUTCSecond - self.__timezone),
@@ -471,6 +504,13 @@ class DigitalRFReader(ProcessingUnit):
         except:
             self.digitalReadObj = digital_rf.DigitalRFReader(self.path)
 
+        if self.__readPool is not None:
+            for key in self.__channelReaders:
+                try:
+                    self.__channelReaders[key].reload(complete_update=True)
+                except:
+                    self.__channelReaders[key] = digital_rf.DigitalRFReader(self.path)
+
         start_index, end_index  = self.digitalReadObj.get_bounds(
             self.__channelNameList[self.__channelList[0]])
 
@@ -536,6 +576,13 @@ class DigitalRFReader(ProcessingUnit):
 
         dataOk = False
 
+        if self.__readPool is not None and self.__readChannels(volt_scale):
+            self.__utctime = self.__thisUnixSample / self.__sample_rate
+            print("[Reading] %s: %d samples <> %f sec" % (datetime.datetime.utcfromtimestamp(self.thisSecond - self.__timezone),
+                                                          self.__samples_to_read,
+                                                          self.__timeInterval))
+            return True
+
         for thisChannelName in self.__channelNameList:  # TODO VARIOS CHANNELS?
             for indexSubchannel in range(self.__num_subchannels):
                 try:
@@ -593,10 +640,142 @@ class DigitalRFReader(ProcessingUnit):
                                                       self.__samples_to_read,
                                                       self.__timeInterval))
 
-        self.__bufferIndex   = 0
+        return True
+
+    def __readChannels(self, volt_scale):
+        '''
+        Read all the channels of the block at the same time (one digital_rf
+        reader per channel and subchannel), return False if any of them fails
+        so the block is read again channel by channel with the discontinuity
+        handling.
+        '''
+
+        tasks = [(name, sub) for name in self.__channelNameList for sub in range(self.__num_subchannels)]
+
+        def read(task):
+            name, sub = task
+            return self.__channelReaders[task].read_vector_c81d(self.__thisUnixSample,
+                                                                self.__samples_to_read,
+                                                                name, sub_channel=sub)
+
+        try:
+            results = self.__readPool.map(read, tasks)
+        except IOError:
+            return False
+
+        if any(result.shape[0] != self.__samples_to_read for result in results):
+            return False
+
+        for indexChannel, result in enumerate(results):
+            numpy.multiply(result, volt_scale, out=self.__data_buffer[indexChannel])
 
         return True
 
+    def __startPrefetch(self, depth):
+        '''
+        Start the thread that reads the next `depth` blocks while the
+        current one is processed, depth + 2 buffers are allocated once and
+        reused (being read, waiting in the queue and handed out).
+        '''
+
+        self.__prefetchQueue = queue.Queue(maxsize=depth)
+        self.__freeBuffers = queue.Queue()
+        self.__retry = Event()
+        self.__stop = Event()
+
+        for i in range(depth + 2):
+            self.__freeBuffers.put(numpy.zeros_like(self.__data_buffer))
+
+        # el hilo recibe la cola y los eventos, __stopPrefetch borra __prefetchQueue
+        self.__prefetchThread = Thread(target=self.__prefetchLoop, daemon=True,
+                                       args=(self.__prefetchQueue, self.__freeBuffers, self.__retry, self.__stop))
+        self.__prefetchThread.start()
+
+    def __prefetchLoop(self, blocks, freeBuffers, retry, stop):
+
+        while not stop.is_set():
+            buffer = freeBuffers.get()
+            if buffer is None:
+                break
+            self.__data_buffer = buffer
+
+            t0 = time()
+            err = None
+            try:
+                ok = self.__readNextBlock()
+            except Exception as e:
+                ok = False
+                err = e
+            self.__readTime += time() - t0
+
+            item = (ok, self.__thisUnixSample, self.__flagDiscontinuousBlock, self.__data_buffer, err)
+            while not stop.is_set():
+                try:
+                    blocks.put(item, timeout=0.1)
+                    break
+                except queue.Full:
+                    continue
+
+            if not ok:
+                # wait until getData decides to try again (online mode)
+                retry.wait()
+                retry.clear()
+
+    def __stopPrefetch(self):
+
+        if self.__prefetchQueue is None:
+            return
+
+        self.__stop.set()
+        self.__retry.set()
+        self.__freeBuffers.put(None)
+        self.__prefetchThread.join()
+        self.__printPrefetchInfo()
+        self.__prefetchQueue = None
+
+    def __printPrefetchInfo(self):
+
+        log.success('Prefetch: reading {:.2f}s, waiting {:.2f}s, hidden {:.2f}s'.format(
+            self.__readTime, self.__waitTime, max(self.__readTime - self.__waitTime, 0)), self.name)
+
+    def __getNextBlock(self):
+        '''
+        Read the next block or take it from the prefetch queue, the values of
+        the block handed out are kept in __dataBlock, __blockUnixSample and
+        __blockDiscontinuous.
+        '''
+
+        if self.__prefetchQueue is None:
+            ok = self.__readNextBlock()
+            self.__dataBlock = self.__data_buffer
+            self.__blockUnixSample = self.__thisUnixSample
+            self.__blockDiscontinuous = self.__flagDiscontinuousBlock
+            if ok:
+                self.__bufferIndex = 0
+            return ok
+
+        t0 = time()
+        ok, unixSample, discontinuous, buffer, err = self.__prefetchQueue.get()
+        self.__waitTime += time() - t0
+
+        if err is not None:
+            raise err
+
+        if self.__dataBlock is not None:
+            self.__freeBuffers.put(self.__dataBlock)
+            self.__dataBlock = None
+
+        self.__blockUnixSample = unixSample
+        self.__blockDiscontinuous = discontinuous
+
+        if ok:
+            self.__dataBlock = buffer
+            self.__bufferIndex = 0
+        else:
+            self.__freeBuffers.put(buffer)
+
+        return ok
+
     def __isBufferEmpty(self):
 
         return self.__bufferIndex > self.__samples_to_read - self.__nSamples  # 40960 - 40
@@ -624,39 +803,46 @@ class DigitalRFReader(ProcessingUnit):
 
         if self.__isBufferEmpty():
             #print("hi")
-            self.__flagDiscontinuousBlock = False
+            if self.__prefetchQueue is None:
+                self.__flagDiscontinuousBlock = False
 
             while True:
-                if self.__readNextBlock():
+                if self.__getNextBlock():
                     break
-                if self.__thisUnixSample > self.__endUTCSecond * self.__sample_rate:
+                if self.__blockUnixSample > self.__endUTCSecond * self.__sample_rate:
+                    self.__stopPrefetch()
                     raise schainpy.admin.SchainError('Error')
                     return
 
-                if self.__flagDiscontinuousBlock:
+                if self.__blockDiscontinuous:
+                    self.__stopPrefetch()
                     raise schainpy.admin.SchainError('discontinuous block found')
                     return
 
                 if not self.__online:
+                    self.__stopPrefetch()
                     raise schainpy.admin.SchainError('Online?')
                     return
 
                 err_counter += 1
                 if err_counter > nTries:
+                    self.__stopPrefetch()
                     raise schainpy.admin.SchainError('Max retrys reach')
                     return
 
                 print('[Reading] waiting %d seconds to read a new block' % seconds)
                 sleep(seconds)
+                if self.__prefetchQueue is not None:
+                    self.__retry.set()
 
 
             if not self.getByBlock:
 
                 #print("self.__bufferIndex",self.__bufferIndex)# este valor siempre es cero aparentemente
-                self.dataOut.data = self.__data_buffer[:, self.__bufferIndex:self.__bufferIndex + self.__nSamples]
-                self.dataOut.utctime = ( self.__thisUnixSample + self.__bufferIndex) / self.__sample_rate
+                self.dataOut.data = self.__dataBlock[:, self.__bufferIndex:self.__bufferIndex + self.__nSamples]
+                self.dataOut.utctime = ( self.__blockUnixSample + self.__bufferIndex) / self.__sample_rate
                 self.dataOut.flagNoData = False
-                self.dataOut.flagDiscontinuousBlock = self.__flagDiscontinuousBlock
+                self.dataOut.flagDiscontinuousBlock = self.__blockDiscontinuous
                 self.dataOut.profileIndex = self.profileIndex
 
                 self.__bufferIndex += self.__nSamples
@@ -667,14 +853,14 @@ class DigitalRFReader(ProcessingUnit):
             else:
                 # ojo debo anadir el readNextBLock y el  __isBufferEmpty(
                 self.dataOut.flagNoData             = False
-                buffer = self.__data_buffer[:,self.__bufferIndex:self.__bufferIndex + self.__samples_to_read]
+                buffer = self.__dataBlock[:,self.__bufferIndex:self.__bufferIndex + self.__samples_to_read]
                 buffer = buffer.reshape((self.__nChannels, self.nProfileBlocks, int(self.__samples_to_read/self.nProfileBlocks)))
                 self.dataOut.nProfileBlocks = self.nProfileBlocks
                 self.dataOut.data = buffer
-                self.dataOut.utctime = ( self.__thisUnixSample + self.__bufferIndex) / self.__sample_rate
+                self.dataOut.utctime = ( self.__blockUnixSample + self.__bufferIndex) / self.__sample_rate
                 self.profileIndex  += self.__samples_to_read
                 self.__bufferIndex += self.__samples_to_read
-                self.dataOut.flagDiscontinuousBlock = self.__flagDiscontinuousBlock
+                self.dataOut.flagDiscontinuousBlock = self.__blockDiscontinuous
             return True
 
 
@@ -1,7 +1,11 @@
 from email.utils import localtime
 import os
 import time
+import queue
 import datetime
+import itertools
+import threading
+import traceback
 
 import numpy
 import h5py
@@ -38,6 +42,17 @@ class HDFReader(Reader, ProcessingUnit):
         Dictionary with the description of the HDF5 file
     extras : dict, optional
         Dictionary with extra metadata to be be added to `dataOut`
+    lazy : bool, optional
+        Keep the file open and read only the current block of the data
+        with more than one dimension instead of the whole file
+    prefetch : int, optional
+        Blocks read ahead by a background thread in lazy mode (default 2),
+        0 reads each block when it is requested
+    maxMemory : float, optional
+        Maximum size in MB of the blocks read ahead (default 256)
+    catalog : bool or str, optional
+        Search the files with a persistent FileCatalog of `path` (or the
+        given index file) instead of listing the folders
 
     Examples
     --------
@@ -77,9 +92,21 @@ class HDFReader(Reader, ProcessingUnit):
         # extras=json.dumps(extras),
         )
 
+    # reprocessing of big files, only the current block is in memory
+    reader = project.addReadUnit(
+        name='HDFReader',
+        path='/path/to/files',
+        startDate='2019/01/01',
+        endDate='2019/01/31',
+        lazy=1,
+        prefetch=4,
+        maxMemory=512,
+        )
+
     """
 
-    __attrs__ = ['path', 'startDate', 'endDate', 'startTime', 'endTime', 'description', 'extras']
+    __attrs__ = ['path', 'startDate', 'endDate', 'startTime', 'endTime', 'description', 'extras',
+                 'lazy', 'prefetch', 'maxMemory', 'catalog']
 
     def __init__(self):
         ProcessingUnit.__init__(self)
@@ -97,6 +124,11 @@ class HDFReader(Reader, ProcessingUnit):
         self.utcoffset = 0
         self.filter  = None
         self.dparam  = None
+        self.lazy    = False
+        self.prefetch  = 2
+        self.maxMemory = 256
+        self.sources = {}
+        self.prefetchThread = None
 
     def setup(self, **kwargs):
 
@@ -148,6 +180,7 @@ class HDFReader(Reader, ProcessingUnit):
         self.__readMetadata()
         self.__readData()
         self.__setBlockList()
+        self.startPrefetch()
 
         if 'type' in self.meta:
             self.dataOut = eval(self.meta['type'])()
@@ -220,32 +253,24 @@ class HDFReader(Reader, ProcessingUnit):
     def __readData(self):
 
         data = {}
+        self.sources = {}
 
         if self.description:
             for key, value in self.description['Data'].items():
                 if isinstance(value, str):
                     if isinstance(self.fp[value], h5py.Dataset):
-                        data[key] = self.fp[value][()]
+                        self.__addData(data, key, self.fp[value])
                     elif isinstance(self.fp[value], h5py.Group):
-                        array = []
-                        for ch in self.fp[value]:
-                            array.append(self.fp[value][ch][()])
-                        data[key] = numpy.array(array)
+                        self.__addData(data, key, [self.fp[value][ch] for ch in self.fp[value]])
                 elif isinstance(value, list):
-                    array = []
-                    for ch in value:
-                        array.append(self.fp[ch][()])
-                    data[key] = numpy.array(array)
+                    self.__addData(data, key, [self.fp[ch] for ch in value])
         else:
             grp = self.fp['Data']
             for name in grp:
                 if isinstance(grp[name], h5py.Dataset):
-                    array = grp[name][()]
+                    source = grp[name]
                 elif isinstance(grp[name], h5py.Group):
-                    array = []
-                    for ch in grp[name]:
-                        array.append(grp[name][ch][()])
-                    array = numpy.array(array)
+                    source = [grp[name][ch] for ch in grp[name]]
                 else:
                     log.warning('Unknown type: {}'.format(name))
 
@@ -253,11 +278,153 @@ class HDFReader(Reader, ProcessingUnit):
                     key = self.description[name]
                 else:
                     key = name
-                data[key] = array
+                self.__addData(data, key, source)
 
         self.data = data
         return
 
+    def __addData(self, data, key, source):
+        '''
+        Read a dataset or a list of channel datasets, in lazy mode the ones
+        sliced by block (more than one dimension) are only referenced and
+        read block by block in `readBlock`
+        '''
+
+        if isinstance(source, list):
+            lazy = self.lazy and not self.dparam and all(ds.ndim > 0 for ds in source)
+        else:
+            lazy = self.lazy and not self.dparam and source.ndim > 1
+
+        if lazy:
+            self.sources[key] = source
+        elif isinstance(source, list):
+            data[key] = numpy.array([ds[()] for ds in source])
+        else:
+            data[key] = source[()]
+
+    def readBlock(self, index):
+        '''
+        Block `index` of the lazy datasets, same values than `data[:, index]`
+        of the arrays read in the normal mode
+        '''
+
+        block = {}
+        for key, source in self.sources.items():
+            if isinstance(source, list):
+                block[key] = numpy.array([ds[index] for ds in source])
+            else:
+                block[key] = source[:, index]
+
+        return block
+
+    def getBlockSize(self):
+
+        size = 0
+        for source in self.sources.values():
+            if isinstance(source, list):
+                size += sum(ds.nbytes//max(ds.shape[0], 1) for ds in source)
+            else:
+                size += source.nbytes//max(source.shape[1], 1)
+
+        return size
+
+    def startPrefetch(self, start=0):
+        '''
+        Read the blocks of the file from `start` in a background thread, as
+        many ahead as `prefetch` and `maxMemory` allow
+        '''
+
+        if not self.sources or not self.prefetch or start >= self.blocksPerFile:
+            return
+
+        depth = int(self.maxMemory*1e6//max(self.getBlockSize(), 1))
+        depth = max(1, min(int(self.prefetch), depth))
+        self.prefetchQueue = queue.Queue(maxsize=depth)
+        self.prefetchStop = threading.Event()
+        self.prefetchThread = threading.Thread(
+            target=self.__prefetch,
+            args=(self.prefetchQueue, self.prefetchStop, self.blocksPerFile, start),
+            daemon=True)
+        self.prefetchThread.start()
+
+    def __prefetch(self, blocks, stop, nBlocks, start=0):
+
+        for index in range(start, nBlocks):
+            try:
+                item = (index, self.readBlock(index))
+            except Exception:
+                # se lee de nuevo en getBlock y ahi se reporta el error
+                item = (None, None)
+            if not self.__put(blocks, stop, item) or item[0] is None:
+                return
+
+        self.__put(blocks, stop, (None, None))
+
+    def __put(self, blocks, stop, item):
+        '''
+        Wait while the queue is full unless the prefetch is stopped, return
+        False if it was stopped
+        '''
+
+        while not stop.is_set():
+            try:
+                blocks.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+
+        return False
+
+    def stopPrefetch(self):
+
+        if self.prefetchThread is None:
+            return
+
+        self.prefetchStop.set()
+        self.prefetchThread.join()
+        self.prefetchThread = None
+
+    def getBlock(self):
+
+        if self.prefetchThread is not None:
+            index, block = self.prefetchQueue.get()
+            if index == self.blockIndex:
+                return block
+            # el hilo fallo o va desfasado, se lee este bloque y se reinicia
+            # la lectura anticipada desde el siguiente
+            self.stopPrefetch()
+            block = self.readBlock(self.blockIndex)
+            self.startPrefetch(self.blockIndex + 1)
+            return block
+
+        return self.readBlock(self.blockIndex)
+
+    def close(self):
+
+        self.stopPrefetch()
+        if self.fp is not None:
+            self.fp.close()
+            self.fp = None
+
+    def setNextFile(self):
+
+        self.stopPrefetch()
+        Reader.setNextFile(self)
+
+        if self.lazy and self.prefetch and not self.online:
+            # el sistema lee el siguiente archivo mientras se procesa este
+            try:
+                filename = next(self.filenameList)
+            except StopIteration:
+                return
+            self.filenameList = itertools.chain([filename], self.filenameList)
+            if hasattr(os, 'posix_fadvise'):
+                fd = os.open(filename, os.O_RDONLY)
+                try:
+                    os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+                finally:
+                    os.close(fd)
+
     def getData(self):
 
         for attr in self.data:
@@ -269,6 +436,10 @@ class HDFReader(Reader, ProcessingUnit):
                 else:
                     setattr(self.dataOut, attr, self.data[attr][:, self.blockIndex])
 
+        if self.sources:
+            for attr, value in self.getBlock().items():
+                setattr(self.dataOut, attr, value)
+
         self.dataOut.flagNoData = False
         self.blockIndex += 1
 
@@ -317,6 +488,30 @@ class HDFWriter(Operation):
         If True the name of the files corresponds to the timestamp of the data
     description : dict, optional
         Dictionary with the desired description of the HDF5 file
+    weather_var : str or list, optional
+        With setType='weather', variable of the sweep to save (one file per
+        variable and sweep), a list of variables saves all of them in one
+        file per sweep with the coordinates (Metadata) written once
+    compression : str, optional
+        Filter of the data datasets: 'gzip' (default), 'lzf' or 'none'
+    compression_opts : int, optional
+        Level of the gzip compression (0-9)
+    shuffle : bool, optional
+        Apply the shuffle filter before the compression
+    chunks : True, 'block' or tuple, optional
+        Chunk shape of the data datasets, True lets h5py choose it, 'block'
+        uses one chunk per block and a tuple gives the last dimensions of
+        the chunk e.g. (radials, heights), it is clipped to the dataset shape
+    dtype : str or dict, optional
+        Type of the saved data, e.g. 'float32' downcasts every float
+        variable and {'data_param': 'float32'} only the given ones
+    flushBlocks : int, optional
+        Flush the file every `flushBlocks` blocks (default 1), 0 only when
+        the file is closed
+    queueSize : int, optional
+        If > 0 the blocks are written (compression, disk I/O and the change
+        of file) by a background thread fed by a queue of `queueSize`
+        blocks, `run` only waits when the queue is full
 
     Examples
     --------
@@ -348,6 +543,33 @@ class HDFWriter(Operation):
     writer.addParameter(name='dataList',value='data_output,utctime')
     # writer.addParameter(name='description',value=json.dumps(desc))
 
+    # weather sweeps written in background, lzf and float32, chunks of 90 radials
+    writer.addParameter(name='compression', value='lzf')
+    writer.addParameter(name='chunks', value='(90, 1000)')
+    writer.addParameter(name='dtype', value='float32')
+    writer.addParameter(name='queueSize', value='4')
+
+    # one file per sweep with Z, V and W (Data/reflectivity/H, Data/velocity/H...)
+    desc = {
+        'Data': {
+            'data_param': {
+                'Z': {'reflectivity': ['H', 'V']},
+                'V': {'velocity': ['H', 'V']},
+                'W': {'spectral_width': ['H', 'V']},
+                },
+            'utctime': 'time'
+        },
+        'Metadata': {
+            'heightList': 'range',
+            'data_azi': 'azimuth',
+            'data_ele': 'elevation'
+        }
+    }
+    writer.addParameter(name='setType', value='weather')
+    writer.addParameter(name='blocksPerFile', value='1')
+    writer.addParameter(name='weather_var', value='Z,V,W')
+    writer.addParameter(name='description', value=json.dumps(desc))
+
     """
 
     ext           = ".hdf5"
@@ -373,6 +595,18 @@ class HDFWriter(Operation):
     Typename   = None
     mask       = False
     setChannel = None
+    multiVar   = False
+    weatherVars = None
+    #Codec and background writer
+    compression      = 'gzip'
+    compression_opts = None
+    shuffle          = False
+    chunks           = True
+    dtype            = None
+    flushBlocks      = 1
+    writeQueue       = None
+    writeThread      = None
+    writeError       = None
 
     def __init__(self):
 
@@ -389,7 +623,20 @@ class HDFWriter(Operation):
         for key, value in kwargs.items():
             setattr(obj, key, value)
 
-    def setup(self, path=None, blocksPerFile=10, metadataList=None, dataList=None, setType=None, description=None,type_data=None, localtime=True,setChannel=None, **kwargs):
+    def setup(self, path=None, blocksPerFile=10, metadataList=None, dataList=None, setType=None, description=None,type_data=None, localtime=True,setChannel=None,
+              compression='gzip', compression_opts=None, shuffle=False, chunks=True, dtype=None, flushBlocks=1, **kwargs):
+
+        if compression in (None, False, 'none', 'None', ''):
+            compression = None
+        elif compression not in ('gzip', 'lzf'):
+            raise ValueError('compression should be gzip, lzf or none not {}'.format(compression))
+
+        self.compression      = compression
+        self.compression_opts = compression_opts if compression == 'gzip' else None
+        self.shuffle          = bool(shuffle)
+        self.chunks           = chunks
+        self.dtype            = dtype
+        self.flushBlocks      = int(flushBlocks)
         self.path = path
         self.blocksPerFile = blocksPerFile
         self.metadataList  = metadataList
@@ -399,16 +646,12 @@ class HDFWriter(Operation):
         if self.setType == "weather":
             self.set_kwargs(**kwargs)
             self.set_kwargs_obj(self.dataOut,**kwargs)
-            self.weather_vars = {
-                'S' : 0,
-                'V' : 1,
-                'W' : 2,
-                'SNR' : 3,
-                'Z' : 4,
-                'D' : 5,
-                'P' : 6,
-                'R' : 7,
-            }
+            # una lista de variables escribe un solo archivo por barrido
+            self.multiVar = not isinstance(self.weather_var, str)
+            if self.multiVar:
+                self.weatherVars = list(self.weather_var)
+            else:
+                self.weatherVars = [self.weather_var]
 
         if localtime:
             self.getDateTime = datetime.datetime.fromtimestamp
@@ -424,34 +667,46 @@ class HDFWriter(Operation):
         dsList = []
 
         for i in range(len(self.dataList)):
-            dsDict = {}
             if hasattr(self.dataOut, self.dataList[i]):
                 dataAux = getattr(self.dataOut, self.dataList[i])
-                if self.setType == 'weather' and self.dataList[i] == 'data_param':
-                    if self.setChannel is None: 
-                        dataAux = dataAux[:,self.weather_vars[self.weather_var],:]
-                    else:
-                        dataAux = dataAux[self.setChannel,self.weather_vars[self.weather_var],:]
-                        dataAux = numpy.reshape(dataAux,(1,dataAux.shape[0],dataAux.shape[1]))
-                dsDict['variable'] = self.dataList[i]
             else:
                 log.warning('Attribute {} not found in dataOut'.format(self.dataList[i]), self.name)
                 continue
 
-            if dataAux is None:
-                continue
-            elif isinstance(dataAux, (int, float, numpy.integer, numpy.float_)):
-                dsDict['nDim'] = 0
+            if self.setType == 'weather' and self.dataList[i] == 'data_param' and dataAux is not None:
+                # un grupo de datasets por cada variable del archivo
+                items = [(var, self.getWeatherData(dataAux, var)) for var in self.weatherVars]
             else:
-                dsDict['nDim'] = len(dataAux.shape)
-                dsDict['shape'] = dataAux.shape
-                dsDict['dsNumber'] = dataAux.shape[0]
-                dsDict['dtype'] = dataAux.dtype
-            dsList.append(dsDict)
+                items = [(None, dataAux)]
+
+            for var, dataAux in items:
+                dsDict = {'variable': self.dataList[i], 'weather_var': var}
+                if dataAux is None:
+                    continue
+                elif isinstance(dataAux, (int, float, numpy.integer, numpy.float_)):
+                    dsDict['nDim'] = 0
+                else:
+                    dsDict['nDim'] = len(dataAux.shape)
+                    dsDict['shape'] = dataAux.shape
+                    dsDict['dsNumber'] = dataAux.shape[0]
+                    dsDict['dtype'] = dataAux.dtype
+                dsList.append(dsDict)
 
         self.dsList = dsList
         self.currentDay = self.dataOut.datatime.date()
 
+    def getWeatherData(self, data, var):
+        '''
+        Slice of the sweep `data` (nch, nVars, nRadials, nHeights) for the
+        weather variable `var` and the selected channels
+        '''
+
+        if self.setChannel is None:
+            return data[:,self.dataOut.getWeatherIndex(var),:]
+
+        data = data[self.setChannel,self.dataOut.getWeatherIndex(var),:]
+        return numpy.reshape(data,(1,data.shape[0],data.shape[1]))
+
     def timeFlag(self):
         currentTime = self.dataOut.utctime
         dt = self.getDateTime(currentTime)
@@ -477,8 +732,62 @@ class HDFWriter(Operation):
             return False
 
     def run(self, dataOut, path, blocksPerFile=10, metadataList=None,
-            dataList=[], setType=None, description={}, mode= None, 
-            type_data=None, Reset = False, localtime=True, **kwargs):
+            dataList=[], setType=None, description={}, mode= None,
+            type_data=None, Reset = False, localtime=True, compression='gzip',
+            compression_opts=None, shuffle=False, chunks=True, dtype=None,
+            flushBlocks=1, queueSize=0, **kwargs):
+
+        kwargs.update(path=path, blocksPerFile=blocksPerFile,
+                      metadataList=metadataList, dataList=dataList,
+                      setType=setType, description=description, type_data=type_data,
+                      localtime=localtime, compression=compression,
+                      compression_opts=compression_opts, shuffle=shuffle,
+                      chunks=chunks, dtype=dtype, flushBlocks=flushBlocks)
+
+        self.checkWriteError()
+
+        if queueSize:
+            if self.writeThread is None:
+                self.writeQueue = queue.Queue(maxsize=queueSize)
+                self.writeThread = threading.Thread(target=self.writeLoop, daemon=True)
+                self.writeThread.start()
+            # dataOut es un objeto nuevo en cada bloque (operacion externa),
+            # solo se espera si el hilo de escritura va atrasado
+            self.writeQueue.put((dataOut, mode, Reset, kwargs))
+        else:
+            self.write(dataOut, mode, Reset, **kwargs)
+
+        return
+
+    def writeLoop(self):
+        '''
+        Background writer, compression, disk I/O and the change of file are
+        done here with the blocks received through `writeQueue`, the first
+        error is raised in the next `run` or in `close`
+        '''
+
+        while True:
+            item = self.writeQueue.get()
+            if item is None:
+                break
+            dataOut, mode, Reset, kwargs = item
+            try:
+                self.write(dataOut, mode, Reset, **kwargs)
+            except Exception as e:
+                log.error(traceback.format_exc(), self.name)
+                if self.writeError is None:
+                    self.writeError = e
+
+    def checkWriteError(self):
+        '''
+        Raise the error of the background writer if any
+        '''
+
+        if self.writeError is not None:
+            error, self.writeError = self.writeError, None
+            raise error
+
+    def write(self, dataOut, mode=None, Reset=False, **kwargs):
 
         if Reset:
             self.isConfig = False
@@ -490,10 +799,7 @@ class HDFWriter(Operation):
         self.mode    = mode
 
         if not(self.isConfig):
-            self.setup(path=path, blocksPerFile=blocksPerFile,
-                       metadataList=metadataList, dataList=dataList,
-                       setType=setType, description=description,type_data=type_data,
-                       localtime=localtime, **kwargs)
+            self.setup(**kwargs)
 
             self.isConfig = True
             self.setNextFile()
@@ -560,7 +866,9 @@ class HDFWriter(Operation):
                 mean = numpy.mean(self.dataOut.data_azi[len_aux:-len_aux])
                 ang_    = round(mean,1)
 
-            file = '%s_%2.2d%2.2d%2.2d_%2.2d%2.2d%2.2d_%s%2.1f_%s%s' % (
+            #SOPHY_20200505_140215_E10.0.h5 (todas las variables)
+            var = '' if self.multiVar else '_' + self.weather_var
+            file = '%s_%2.2d%2.2d%2.2d_%2.2d%2.2d%2.2d_%s%2.1f%s%s' % (
                 'SOPHY',
                                            dt.year,
                                            dt.month,
@@ -570,9 +878,11 @@ class HDFWriter(Operation):
                                            dt.second,
                                            ang_type[0],
                                            ang_,
-                                           self.weather_var,
+                                           var,
                                            ext )
-            subfolder = '{}_{}_{}_{:2.1f}'.format(self.weather_var, mode_type, ang_type, ang_)
+            subfolder = '{}_{}_{:2.1f}'.format(mode_type, ang_type, ang_)
+            if not self.multiVar:
+                subfolder = '{}_{}'.format(self.weather_var, subfolder)
             fullpath = os.path.join(path, subfolder)
             if not os.path.exists(fullpath):
                 os.makedirs(fullpath)
@@ -628,6 +938,32 @@ class HDFWriter(Operation):
             else:
                 return 'channel{:02d}'.format(x)
 
+    def getWeatherLabel(self, var, x=None):
+        '''
+        Name of the group (x=None) or channel dataset of the weather variable
+        `var` in a multi-variable file, given in the description as
+        {'data_param': {'Z': {'reflectivity': ['H', 'V']}, ...}}
+        '''
+
+        data = self.description.get('Data', self.description) if self.description else {}
+        value = data.get('data_param', {})
+        value = value.get(var) if isinstance(value, dict) else None
+
+        name, channels = var, None
+        if isinstance(value, str):
+            name = value
+        elif isinstance(value, list):
+            channels = value
+        elif isinstance(value, dict):
+            for name, channels in value.items():
+                break
+
+        if x is None:
+            return name
+        if channels is not None:
+            return channels[x]
+        return 'channel{:02d}'.format(x)
+
     def writeMetadata(self, fp):
 
         if self.description:
@@ -648,9 +984,46 @@ class HDFWriter(Operation):
                     value = 1
                 else:
                     value = 0
+            elif isinstance(value, (list, tuple)) and value and all(isinstance(x, str) for x in value):
+                # e.g. variable/variable_unit de cada variable en modo multi-variable
+                value = numpy.array(value, dtype=h5py.string_dtype())
             grp.create_dataset(self.getLabel(self.metadataList[i]), data=value)
         return
 
+    def getChunks(self, shape):
+        '''
+        Chunk shape for a dataset of the given shape, the leading dimensions
+        not given in `chunks` (blocks, channels) are chunked one by one
+        '''
+
+        if self.chunks is True or not shape:
+            return True
+
+        if self.chunks == 'block':
+            chunks = shape if self.blocksPerFile == 1 else shape[1:]
+        else:
+            chunks = tuple(self.chunks)[-len(shape):]
+
+        chunks = (1, )*(len(shape)-len(chunks)) + tuple(chunks)
+
+        return tuple(max(1, min(int(c), s)) for c, s in zip(chunks, shape))
+
+    def getDtype(self, name, dtype):
+        '''
+        Type of the dataset for the variable `name`, a single `dtype` only
+        changes float variables, a dict sets the type of each variable
+        '''
+
+        if isinstance(self.dtype, dict):
+            if name not in self.dtype:
+                return dtype
+            return numpy.dtype(self.dtype[name])
+
+        if self.dtype is None or not numpy.issubdtype(dtype, numpy.floating):
+            return dtype
+
+        return numpy.dtype(self.dtype)
+
     def writeData(self, fp):
 
         if self.description:
@@ -673,11 +1046,17 @@ class HDFWriter(Operation):
                     chunks=True,
                     dtype=numpy.float64)
                 dtsets.append(ds)
-                data.append((dsInfo['variable'], -1))
+                data.append((dsInfo['variable'], -1, None))
             else:
-                label = self.getLabel(dsInfo['variable'])
+                var = dsInfo['weather_var']
+                if self.multiVar and var is not None:
+                    label = self.getWeatherLabel(var)
+                else:
+                    label = self.getLabel(dsInfo['variable'])
                 if label is not None:
                     sgrp = grp.create_group(label)
+                    if self.multiVar and var is not None:
+                        sgrp.attrs['weather_var'] = var
                 else:
                     sgrp = grp
                 if self.blocksPerFile == 1:
@@ -688,15 +1067,21 @@ class HDFWriter(Operation):
                     if dsInfo['dsNumber']==1:
                         if self.setChannel==1:
                             i=1
+                    if self.multiVar and var is not None:
+                        name = self.getWeatherLabel(var, i)
+                    else:
+                        name = self.getLabel(dsInfo['variable'], i)
                     ds = sgrp.create_dataset(
-                        self.getLabel(dsInfo['variable'], i),
+                        name,
                         shape,
-                        chunks=True,
-                        dtype=dsInfo['dtype'],
-                        compression='gzip',
+                        chunks=self.getChunks(shape),
+                        dtype=self.getDtype(dsInfo['variable'], dsInfo['dtype']),
+                        compression=self.compression,
+                        compression_opts=self.compression_opts,
+                        shuffle=self.shuffle,
                         )
                     dtsets.append(ds)
-                    data.append((dsInfo['variable'], i))
+                    data.append((dsInfo['variable'], i, var))
         fp.flush()
 
         log.log('Creating file: {}'.format(fp.filename), self.name)
@@ -714,21 +1099,25 @@ class HDFWriter(Operation):
             self.setNextFile()
 
         for i, ds in enumerate(self.ds):
-            attr, ch = self.data[i]
+            attr, ch, var = self.data[i]
             if ch == -1:
                 ds[self.blockIndex] = getattr(self.dataOut, attr)
             else:
                 if self.blocksPerFile == 1:
-                    mask = self.dataOut.data_param[:,3,:][ch] < self.mask
-                    tmp = getattr(self.dataOut, attr)[:,self.weather_vars[self.weather_var],:][ch]
+                    tmp = getattr(self.dataOut, attr)[:,self.dataOut.getWeatherIndex(var),:][ch]
                     if self.mask:
-                        tmp[mask] = numpy.nan
+                        # sin modificar data_param, el barrido puede ser compartido
+                        mask = self.dataOut.data_param[:,self.dataOut.getWeatherIndex('SNR'),:][ch] < self.mask
+                        tmp = numpy.where(mask, numpy.nan, tmp)
                     ds[:] = tmp
                 else:
                     ds[self.blockIndex] = getattr(self.dataOut, attr)[ch]
 
-        self.fp.flush()
         self.blockIndex += 1
+        # el ultimo bloque del archivo siempre se escribe en disco
+        if self.blockIndex == self.blocksPerFile or \
+            (self.flushBlocks and self.blockIndex % self.flushBlocks == 0):
+            self.fp.flush()
         log.log('Block No. {}/{}'.format(self.blockIndex, self.blocksPerFile), self.name)
 
         return
@@ -745,4 +1134,12 @@ class HDFWriter(Operation):
 
     def close(self):
 
-        self.closeFile()
+        if self.writeThread is not None:
+            self.writeQueue.put(None)
+            self.writeThread.join()
+            self.writeThread = None
+
+        try:
+            self.closeFile()
+        finally:
+            self.checkWriteError()
@@ -332,7 +332,7 @@ class SimulatorReader(JRODataReader, ProcessingUnit):
         Hdoppler   = self.Hdoppler
         Adoppler   = self.Adoppler
 
-        self.datablock = numpy.zeros([channels,prof_gen,Samples],dtype= numpy.complex64)
+        self.datablock = numpy.zeros([channels,prof_gen,Samples],dtype= self.getComplexDtype(numpy.complex64))
         for i in range(channels):
             for k in range(prof_gen):
                 #-----------------------NOISE---------------
@@ -89,6 +89,9 @@ class SpectraReader(JRODataReader, ProcessingUnit):
         self.nRdChannels = None
         self.nRdPairs = None
         self.rdPairList = []
+        self.data_spc = None
+        self.data_cspc = None
+        self.data_dc = None
 
     def createObjByDefault(self):
 
@@ -128,6 +131,13 @@ class SpectraReader(JRODataReader, ProcessingUnit):
                 self.nRdPairs = self.nRdPairs + 1 #par de canales diferentes
                 self.rdPairList.append((self.processingHeaderObj.spectraComb[i], self.processingHeaderObj.spectraComb[i+1]))
 
+        if self.selChannels is None:
+            self.rdPairIndex = None
+        else:
+            #pares con ambos canales seleccionados
+            self.rdPairIndex = [n for n, pair in enumerate(self.rdPairList)
+                                if pair[0] in self.selChannels and pair[1] in self.selChannels]
+
         pts2read = self.processingHeaderObj.nHeights * self.processingHeaderObj.profilesPerBlock
 
         self.pts2read_SelfSpectra = int(self.nRdChannels * pts2read)
@@ -165,38 +175,45 @@ class SpectraReader(JRODataReader, ProcessingUnit):
         
         fpointer = self.fp.tell()
 
-        spc = numpy.fromfile( self.fp, self.dtype[0], self.pts2read_SelfSpectra )
+        spc = self.readBlockData( self.dtype[0], self.pts2read_SelfSpectra )
         spc = spc.reshape( (self.nRdChannels, self.processingHeaderObj.nHeights, self.processingHeaderObj.profilesPerBlock) ) #transforma a un arreglo 3D
 
         if self.processingHeaderObj.flag_cspc:
-            cspc = numpy.fromfile( self.fp, self.dtype, self.pts2read_CrossSpectra )
+            cspc = self.readBlockData( self.dtype, self.pts2read_CrossSpectra )
             cspc = cspc.reshape( (self.nRdPairs, self.processingHeaderObj.nHeights, self.processingHeaderObj.profilesPerBlock) ) #transforma a un arreglo 3D
 
         if self.processingHeaderObj.flag_dc:
-            dc = numpy.fromfile( self.fp, self.dtype, self.pts2read_DCchannels ) #int(self.processingHeaderObj.nHeights*self.systemHeaderObj.nChannels) )
+            dc = self.readBlockData( self.dtype, self.pts2read_DCchannels ) #int(self.processingHeaderObj.nHeights*self.systemHeaderObj.nChannels) )
             dc = dc.reshape( (self.systemHeaderObj.nChannels, self.processingHeaderObj.nHeights) ) #transforma a un arreglo 2D
 
+        shift = 0
         if not self.processingHeaderObj.shif_fft:
-            #desplaza a la derecha en el eje 2 determinadas posiciones
+            #desplaza a la derecha en el eje de perfiles determinadas posiciones (al copiar el bloque)
             shift = int(self.processingHeaderObj.profilesPerBlock/2)
-            spc = numpy.roll( spc, shift , axis=2 )
 
-            if self.processingHeaderObj.flag_cspc:
-                #desplaza a la derecha en el eje 2 determinadas posiciones
-                cspc = numpy.roll( cspc, shift, axis=2 )
+        # el bloque anterior vuelve al pool si nBuffers > 0 (ver getBlockBuffer)
+        for data in (self.data_spc, self.data_cspc, self.data_dc):
+            if data is not None:
+                self.releaseBlockData(data)
 
         #Dimensions : nChannels, nProfiles, nSamples
         spc = numpy.transpose( spc, (0,2,1) )
-        self.data_spc = spc
+        if self.mmap or shift or self.selChannels is not None or self.selHeights is not None:
+            # con mmap spc es una vista del archivo, se copia
+            self.data_spc = self.copyBlock('spc', spc, self.selChannels, shift)
+            self.releaseBlockData(spc)
+        else:
+            self.data_spc = spc
 
-        if self.processingHeaderObj.flag_cspc:
+        if self.processingHeaderObj.flag_cspc and self.rdPairIndex != []:
             cspc = numpy.transpose( cspc, (0,2,1) )
-            self.data_cspc = cspc['real'] + cspc['imag']*1j
+            self.data_cspc = self.copyBlock('cspc', cspc, self.rdPairIndex, shift)
+            self.releaseBlockData(cspc)
         else:
             self.data_cspc = None
 
         if self.processingHeaderObj.flag_dc:
-            self.data_dc = dc['real'] + dc['imag']*1j
+            self.data_dc = self.copyBlock('dc', dc[:, None, :], self.selChannels)[:, 0, :]
         else:
             self.data_dc = None
 
@@ -214,14 +231,20 @@ class SpectraReader(JRODataReader, ProcessingUnit):
         self.dataOut.systemHeaderObj = self.systemHeaderObj.copy()
         self.dataOut.radarControllerHeaderObj = self.radarControllerHeaderObj.copy()
         self.dataOut.dtype = self.dtype
-        self.dataOut.pairsList = self.rdPairList
+        if self.rdPairIndex is None:
+            self.dataOut.pairsList = self.rdPairList
+        else:
+            self.dataOut.pairsList = [self.rdPairList[n] for n in self.rdPairIndex]
         self.dataOut.nProfiles = self.processingHeaderObj.profilesPerBlock
         self.dataOut.nFFTPoints = self.processingHeaderObj.profilesPerBlock
         self.dataOut.nCohInt = self.processingHeaderObj.nCohInt
         self.dataOut.nIncohInt = self.processingHeaderObj.nIncohInt
         xf = self.processingHeaderObj.firstHeight + self.processingHeaderObj.nHeights*self.processingHeaderObj.deltaHeight
-        self.dataOut.heightList = numpy.arange(self.processingHeaderObj.firstHeight, xf, self.processingHeaderObj.deltaHeight)
-        self.dataOut.channelList = list(range(self.systemHeaderObj.nChannels))
+        self.dataOut.heightList = numpy.arange(self.processingHeaderObj.firstHeight, xf, self.processingHeaderObj.deltaHeight)[self.getHeightSlice()]
+        if self.selChannels is None:
+            self.dataOut.channelList = list(range(self.systemHeaderObj.nChannels))
+        else:
+            self.dataOut.channelList = list(self.selChannels)
         self.dataOut.flagShiftFFT = True    #Data is always shifted
         self.dataOut.flagDecodeData = self.processingHeaderObj.flag_decode #asumo q la data no esta decodificada
         self.dataOut.flagDeflipData = self.processingHeaderObj.flag_deflip #asumo q la data esta sin flip
@@ -147,7 +147,7 @@ class VoltageReader(JRODataReader, ProcessingUnit):
         #     self.systemHeaderObj.nChannels
         # else:
         current_pointer_location = self.fp.tell()
-        junk = numpy.fromfile(self.fp, self.dtype, self.blocksize)
+        junk = self.readBlockData(self.dtype, self.blocksize)
 
         try:
             junk = junk.reshape((self.processingHeaderObj.profilesPerBlock,
@@ -156,7 +156,7 @@ class VoltageReader(JRODataReader, ProcessingUnit):
             # print "The read block (%3d) has not enough data" %self.nReadBlocks
 
             if self.waitDataBlock(pointer_location=current_pointer_location):
-                junk = numpy.fromfile(self.fp, self.dtype, self.blocksize)
+                junk = self.readBlockData(self.dtype, self.blocksize)
                 junk = junk.reshape((self.processingHeaderObj.profilesPerBlock,
                                      self.processingHeaderObj.nHeights, self.systemHeaderObj.nChannels))
         #             return 0
@@ -164,7 +164,12 @@ class VoltageReader(JRODataReader, ProcessingUnit):
         # Dimensions : nChannels, nProfiles, nSamples
 
         junk = numpy.transpose(junk, (2, 0, 1))
-        self.datablock = junk['real'] + junk['imag'] * 1j
+        # el bloque anterior vuelve al pool si nBuffers > 0 (ver getBlockBuffer)
+        if self.datablock is not None:
+            self.releaseBlockData(self.datablock)
+        # seleccion de canales/alturas y conversion a complejo en un solo paso
+        self.datablock = self.copyBlock('datablock', junk, self.selChannels)
+        self.releaseBlockData(junk)
 
         self.profileIndex = 0
 
@@ -206,8 +211,12 @@ class VoltageReader(JRODataReader, ProcessingUnit):
 
         self.dataOut.heightList = numpy.arange(
             self.processingHeaderObj.nHeights) * self.processingHeaderObj.deltaHeight + self.processingHeaderObj.firstHeight
+        self.dataOut.heightList = self.dataOut.heightList[self.getHeightSlice()]
 
-        self.dataOut.channelList = list(range(self.systemHeaderObj.nChannels))
+        if self.selChannels is None:
+            self.dataOut.channelList = list(range(self.systemHeaderObj.nChannels))
+        else:
+            self.dataOut.channelList = list(self.selChannels)
 
         self.dataOut.nCohInt = self.processingHeaderObj.nCohInt
 
@@ -235,8 +244,11 @@ class VoltageReader(JRODataReader, ProcessingUnit):
             raise ValueError("nTxs (=%d), should be a multiple of nHeights (=%d)" % (
                 self.nTxs, self.processingHeaderObj.nHeights))
 
+        if self.selHeights is not None:
+            raise ValueError("selHeights can not be used with nTxs (=%s)" % self.nTxs)
+
         self.datablock = self.datablock.reshape(
-            (self.systemHeaderObj.nChannels, self.processingHeaderObj.profilesPerBlock * self.nTxs, int(self.processingHeaderObj.nHeights / self.nTxs)))
+            (self.datablock.shape[0], self.processingHeaderObj.profilesPerBlock * self.nTxs, int(self.processingHeaderObj.nHeights / self.nTxs)))
 
         self.dataOut.nProfiles = self.processingHeaderObj.profilesPerBlock * self.nTxs
         self.dataOut.heightList = numpy.arange(self.processingHeaderObj.nHeights / self.nTxs) * \
@@ -319,7 +331,9 @@ class VoltageReader(JRODataReader, ProcessingUnit):
         # Dimensions : nChannels, nProfiles, nSamples
 
         junk = numpy.transpose(junk, (2, 0, 1))
-        self.datablock = junk['real'] + junk['imag'] * 1j
+        self.datablock = numpy.empty(junk.shape, dtype=self.getComplexDtype(junk.dtype['real']))
+        self.datablock.real = junk['real']
+        self.datablock.imag = junk['imag']
         self.profileIndex = 0
         if self.selBlocksize == None:
             self.selBlocksize = self.dataOut.nProfiles
@@ -335,7 +349,7 @@ class VoltageReader(JRODataReader, ProcessingUnit):
         datasize = self.dataOut.data.shape[1]
         if datasize < self.selBlocksize:
             buffer = numpy.zeros(
-                (self.dataOut.data.shape[0], self.selBlocksize, self.dataOut.data.shape[2]), dtype='complex')
+                (self.dataOut.data.shape[0], self.selBlocksize, self.dataOut.data.shape[2]), dtype=self.datablock.dtype)
             buffer[:, :datasize, :] = self.dataOut.data
             self.dataOut.data = buffer
             self.profileIndex = blockIndex
@@ -433,7 +447,7 @@ class VoltageReader(JRODataReader, ProcessingUnit):
 
             if datasize < self.selBlocksize:
                 buffer = numpy.zeros(
-                    (self.dataOut.data.shape[0], self.selBlocksize, self.dataOut.data.shape[2]), dtype='complex')
+                    (self.dataOut.data.shape[0], self.selBlocksize, self.dataOut.data.shape[2]), dtype=self.datablock.dtype)
                 buffer[:, :datasize, :] = self.dataOut.data
 
                 while datasize < self.selBlocksize:  # Not enough profiles to fill the block
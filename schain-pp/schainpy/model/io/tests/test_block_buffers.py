@@ -0,0 +1,196 @@
+import io
+import mmap
+import datetime
+import contextlib
+
+import numpy
+import pytest
+
+from schainpy.model.io.jroIO_simulator import SimulatorReader
+from schainpy.model.io.jroIO_voltage import VoltageReader, VoltageWriter
+from schainpy.model.io.jroIO_spectra import SpectraReader, SpectraWriter
+from schainpy.model.proc.jroproc_spectra import SpectraProc
+
+nChannels = 2
+nProfiles = 16
+nHeights = 1000
+nBlocks = 6
+
+
+@pytest.fixture(scope='module')
+def rawpath(tmp_path_factory):
+    '''
+    Archivos .r con ruido, las cabeceras se toman del simulador
+    '''
+
+    path = str(tmp_path_factory.mktemp('raw'))
+    sim = SimulatorReader()
+    writer = VoltageWriter.__bases__[0]()
+    rng = numpy.random.default_rng(0)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        sim.run(samples=nHeights, channels=nChannels, profilesPerBlock=nProfiles,
+                dataBlocksPerFile=2, FixRCP_IPP=60)
+        dataOut = sim.dataOut
+        for n in range(nBlocks*nProfiles):
+            dataOut.data = rng.normal(0, 500, (nChannels, nHeights)) + 1j*rng.normal(0, 500, (nChannels, nHeights))
+            dataOut.flagDiscontinuousBlock = False
+            writer.run(dataOut, path, blocksPerFile=2, profilesPerBlock=nProfiles, datatype=1)
+            dataOut.utctime += dataOut.ippSeconds
+
+    return path
+
+
+def read(path, snapshot, **kwargs):
+
+    reader = VoltageReader()
+    profiles = []
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        while True:
+            try:
+                reader.run(path=path, startDate=datetime.date(2000, 1, 1), endDate=datetime.date(2100, 1, 1),
+                           startTime=datetime.time(0, 0), endTime=datetime.time(23, 59, 59), **kwargs)
+            except Exception:
+                break
+            if reader.dataOut.flagNoData:
+                continue
+            profiles.append(reader.dataOut.data.copy())
+            if snapshot:
+                # como copy_mode='cow' con una operacion externa
+                reader.dataOut.snapshot()
+
+    return profiles
+
+
+@pytest.mark.parametrize('kwargs', [{}, {'mmap': True}], ids=['fromfile', 'mmap'])
+def test_cow_snapshot_with_reused_blocks(rawpath, kwargs):
+
+    ref = read(rawpath, False, **kwargs)
+    profiles = read(rawpath, True, **kwargs)
+
+    assert len(ref) == nBlocks*nProfiles
+    assert len(profiles) == len(ref)
+    for a, b in zip(ref, profiles):
+        numpy.testing.assert_array_equal(a, b)
+
+
+def test_held_blocks_stay_valid(rawpath):
+    '''
+    Sin nBuffers los perfiles entregados no se sobreescriben con los bloques
+    siguientes, con nBuffers se reutilizan despues de nBuffers bloques
+    '''
+
+    ref = read(rawpath, False)
+
+    for nBuffers in (0, 2):
+        reader = VoltageReader()
+        held = []
+        with contextlib.redirect_stdout(io.StringIO()):
+            while True:
+                try:
+                    reader.run(path=rawpath, startDate=datetime.date(2000, 1, 1), endDate=datetime.date(2100, 1, 1),
+                               startTime=datetime.time(0, 0), endTime=datetime.time(23, 59, 59), nBuffers=nBuffers)
+                except Exception:
+                    break
+                if not reader.dataOut.flagNoData:
+                    held.append(reader.dataOut.data)
+
+        assert len(held) == len(ref)
+        same = [numpy.array_equal(a, b) for a, b in zip(ref, held)]
+        if nBuffers:
+            assert not all(same)
+            assert all(same[-nBuffers*nProfiles:])
+        else:
+            assert all(same)
+
+
+@pytest.fixture(scope='module')
+def spcpath(tmp_path_factory):
+    '''
+    Archivos .pdata con espectros y espectros cruzados de ruido
+    '''
+
+    path = str(tmp_path_factory.mktemp('pdata'))
+    sim = SimulatorReader()
+    proc = SpectraProc()
+    writer = SpectraWriter.__bases__[0]()
+    rng = numpy.random.default_rng(0)
+    n = 0
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        sim.run(samples=nHeights, channels=nChannels, profilesPerBlock=nProfiles,
+                dataBlocksPerFile=2, FixRCP_IPP=60)
+        while n < nBlocks:
+            sim.dataOut.data = rng.normal(0, 500, (nChannels, nHeights)) + 1j*rng.normal(0, 500, (nChannels, nHeights))
+            sim.dataOut.flagNoData = False
+            proc.dataIn = sim.dataOut
+            proc.run(nFFTPoints=nProfiles, pairsList=[(0, 1)])
+            sim.dataOut.utctime += sim.dataOut.ippSeconds
+            if proc.dataOut.flagNoData:
+                continue
+            # sin desplazamiento de la FFT al leer
+            proc.dataOut.flagShiftFFT = True
+            writer.run(proc.dataOut, path, blocksPerFile=2)
+            n += 1
+
+    return path
+
+
+def isFileView(array):
+
+    while isinstance(array, numpy.ndarray):
+        array = array.base
+    return isinstance(array, memoryview) and isinstance(array.obj, mmap.mmap)
+
+
+def test_spectra_mmap_blocks_are_copied(spcpath):
+
+    blocks = {}
+    for kwargs in ({}, {'mmap': True}):
+        reader = SpectraReader()
+        blocks[len(kwargs)] = []
+        with contextlib.redirect_stdout(io.StringIO()):
+            while True:
+                try:
+                    reader.run(path=spcpath, startDate=datetime.date(2000, 1, 1), endDate=datetime.date(2100, 1, 1),
+                               startTime=datetime.time(0, 0), endTime=datetime.time(23, 59, 59), **kwargs)
+                except Exception:
+                    break
+                if reader.dataOut.flagNoData:
+                    continue
+                # el bloque no debe ser una vista del archivo mapeado
+                for data in (reader.dataOut.data_spc, reader.dataOut.data_cspc):
+                    assert not isFileView(data)
+                blocks[len(kwargs)].append((reader.dataOut.data_spc.copy(), reader.dataOut.data_cspc.copy()))
+
+    assert len(blocks[0]) == nBlocks
+    assert len(blocks[1]) == nBlocks
+    for (spc, cspc), (spc1, cspc1) in zip(blocks[0], blocks[1]):
+        numpy.testing.assert_array_equal(spc, spc1)
+        numpy.testing.assert_array_equal(cspc, cspc1)
+
+
+def test_block_buffer_lent_and_released():
+
+    reader = VoltageReader()
+    reader.nBuffers = 2
+    shape = (2, 4, 8)
+
+    a = reader.getBlockBuffer('datablock', shape, numpy.complex128)
+    b = reader.getBlockBuffer('datablock', shape, numpy.complex128)
+    assert a is not b
+
+    # un arreglo devuelto se usa otra vez cuando hay nBuffers devueltos
+    reader.releaseBlockData(a)
+    c = reader.getBlockBuffer('datablock', shape, numpy.complex128)
+    assert c is not a and c is not b
+    # se puede devolver con una vista (ej. reshape, un canal)
+    reader.releaseBlockData(b[:, 0, :])
+    assert reader.getBlockBuffer('datablock', shape, numpy.complex128) is a
+
+    # otra forma o tipo no usa los arreglos devueltos
+    reader.releaseBlockData(c)
+    d = reader.getBlockBuffer('datablock', (2, 4, 4), numpy.complex128)
+    assert d is not b and d is not c
+
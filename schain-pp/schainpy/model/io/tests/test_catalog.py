@@ -0,0 +1,62 @@
+import io
+import os
+import datetime
+import contextlib
+
+from schainpy.model.io.jroIO_base import FileCatalog
+from schainpy.model.io.jroIO_param import HDFReader
+
+filefmt = '*%Y%j***'
+folderfmt = '*%Y%j'
+
+
+def touch(path, *names):
+
+    os.makedirs(path, exist_ok=True)
+    for name in names:
+        with open(os.path.join(path, name), 'w') as fp:
+            fp.write(name)
+
+
+def scan(path, startDate, endDate, ext='.hdf5', last=False):
+    '''
+    Archivos como los lista el reader sin catalogo
+    '''
+
+    reader = HDFReader()
+    with contextlib.redirect_stdout(io.StringIO()):
+        folders = reader.find_folders(path, startDate, endDate, folderfmt, last=last)
+        return list(reader.find_files(folders, ext, filefmt, startDate, endDate, last=last))
+
+
+def test_catalog_as_directory_scan(tmp_path):
+
+    path = str(tmp_path / 'data')
+    touch(os.path.join(path, 'd2024288'), 'D2024288000.hdf5', 'D2024288001.hdf5')
+    touch(os.path.join(path, 'd2024289'), 'D2024289000.hdf5', 'D2024289001.hdf5', 'D2024289000.txt', '.index')
+    touch(os.path.join(path, 'd2024290'), 'D2024290000.hdf5')
+    touch(os.path.join(path, 'calib'), 'D2024289005.hdf5')
+    index_file = str(tmp_path / 'catalog.json')
+
+    catalog = FileCatalog(path, filefmt, folderfmt, index_file=index_file)
+    ranges = [(datetime.date(2000, 1, 1), datetime.date(2100, 1, 1)),
+              (datetime.date(2024, 10, 15), datetime.date(2024, 10, 16)),
+              (datetime.date(2024, 10, 16), datetime.date(2024, 10, 16))]
+    for startDate, endDate in ranges:
+        assert catalog.query(startDate, endDate, ext='.hdf5') == scan(path, startDate, endDate)
+    assert catalog.query(ext='.txt') == scan(path, datetime.date.min, datetime.date.max, '.txt')
+
+    # archivos nuevos en la ultima carpeta y en una anterior
+    touch(os.path.join(path, 'd2024290'), 'D2024290001.hdf5')
+    touch(os.path.join(path, 'd2024288'), 'D2024288002.hdf5')
+    touch(os.path.join(path, 'd2024291'), 'D2024291000.hdf5')
+    for startDate, endDate in ranges:
+        assert catalog.query(startDate, endDate, ext='.hdf5') == scan(path, startDate, endDate)
+
+    # el indice guardado da los mismos archivos
+    catalog = FileCatalog(path, filefmt, folderfmt, index_file=index_file)
+    files = catalog.query(ext='.hdf5', refresh=False)
+    assert files == scan(path, datetime.date.min, datetime.date.max)
+    assert len(files) == 8
+    assert catalog.query(ext='.hdf5', last=True) == scan(path, datetime.date.min, datetime.date.max, last=True)
+    assert catalog.query(ext='.hdf5', last=True) == [os.path.join(path, 'd2024291', 'D2024291000.hdf5')]
@@ -0,0 +1,102 @@
+import io
+import os
+import datetime
+import threading
+import contextlib
+
+import numpy
+import pytest
+
+digital_rf = pytest.importorskip('digital_rf')
+
+import schainpy.admin
+from schainpy.model.io.jroIO_digitalRF import DigitalRFReader
+
+sample_rate = 1000000
+start = 1700000000*sample_rate
+
+
+def writeDrf(path, nSubchannels):
+    '''
+    Canales ch0 y ch1 (los que lee DigitalRFReader) con ruido
+    '''
+
+    rng = numpy.random.default_rng(0)
+
+    for ch in ('ch0', 'ch1'):
+        os.makedirs(os.path.join(path, ch, 'metadata'))
+        writer = digital_rf.DigitalRFWriter(os.path.join(path, ch), numpy.int16, 3600, 1000, start, sample_rate,
+                                            1, 'uuid', compression_level=0, checksum=False, is_complex=True,
+                                            num_subchannels=nSubchannels, is_continuous=True, marching_periods=False)
+        for k in range(10):
+            writer.rf_write(rng.integers(-3000, 3000, (100000, 2*nSubchannels)).astype(numpy.int16))
+        writer.close()
+        metadata = digital_rf.DigitalMetadataWriter(os.path.join(path, ch, 'metadata'), 3600, 60, sample_rate, 1, 'metadata')
+        metadata.write(start, {'frequency': 9.345e9, 'nSamples': 1000})
+
+    return path
+
+
+@pytest.fixture(scope='module')
+def drfpath(tmp_path_factory):
+
+    return writeDrf(str(tmp_path_factory.mktemp('drf')), 1)
+
+
+def read(path, nBlocks=None, **kwargs):
+
+    reader = DigitalRFReader()
+    blocks = []
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        try:
+            while nBlocks is None or len(blocks) < nBlocks:
+                reader.run(path=path, startDate=datetime.date(2023, 11, 14), endDate=datetime.date(2023, 11, 15),
+                           delay=0, getByBlock=1, nProfileBlocks=50, **kwargs)
+                if not reader.dataOut.flagNoData:
+                    blocks.append(reader.dataOut.data.copy())
+        except schainpy.admin.SchainError:
+            pass
+        reader.close()
+
+    return blocks
+
+
+@pytest.mark.parametrize('kwargs', [{'readThreads': 4}, {'prefetch': 2, 'readThreads': 4}],
+                         ids=['threads', 'prefetch+threads'])
+def test_parallel_reads(drfpath, kwargs):
+
+    ref = read(drfpath)
+    count = threading.active_count()
+    blocks = read(drfpath, **kwargs)
+
+    assert len(ref) > 0 and len(blocks) == len(ref)
+    for a, b in zip(ref, blocks):
+        numpy.testing.assert_array_equal(a, b)
+    # el pool y el hilo de prefetch se cierran en close
+    assert threading.active_count() == count
+
+
+def test_close_while_prefetching(drfpath):
+
+    count = threading.active_count()
+    # la cola queda llena y el hilo sigue leyendo cuando se cierra el lector
+    blocks = read(drfpath, nBlocks=1, prefetch=1, readThreads=2)
+
+    assert len(blocks) == 1
+    assert threading.active_count() == count
+
+
+def test_reader_per_subchannel(tmp_path):
+
+    path = writeDrf(str(tmp_path), 2)
+    reader = DigitalRFReader()
+    with contextlib.redirect_stdout(io.StringIO()):
+        reader.setup(path=path, startDate=datetime.date(2023, 11, 14), endDate=datetime.date(2023, 11, 15),
+                     delay=0, nSamples=1000, readThreads=4)
+        readers = reader._DigitalRFReader__channelReaders
+        reader.close()
+
+    # un digital_rf.DigitalRFReader por tarea del pool
+    assert sorted(readers) == [('ch0', 0), ('ch0', 1), ('ch1', 0), ('ch1', 1)]
+    assert len(set(map(id, readers.values()))) == 4
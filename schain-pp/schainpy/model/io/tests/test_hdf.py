@@ -0,0 +1,249 @@
+import io
+import os
+import glob
+import time
+import datetime
+import threading
+import contextlib
+
+import h5py
+import numpy
+import pytest
+
+from schainpy.model.data.jrodata import Parameters
+from schainpy.model.io.jroIO_param import HDFReader, HDFWriter
+
+nChannels = 2
+nParams = 3
+nHeights = 50
+nBlocks = 6
+blocksPerFile = 4
+t0 = datetime.datetime(2024, 10, 15, 12).timestamp()
+
+
+def getBlocks():
+
+    rng = numpy.random.default_rng(0)
+    for i in range(nBlocks):
+        dataOut = Parameters()
+        dataOut.data_param = rng.normal(0, 10, (nChannels, nParams, nHeights))
+        dataOut.data_SNR = rng.normal(0, 10, (nChannels, nHeights))
+        dataOut.heightList = numpy.arange(nHeights)*0.15
+        dataOut.utctime = t0 + 60*i
+        yield dataOut
+
+
+def write(path, **kwargs):
+
+    # clase sin MPDecorator, se ejecuta en este proceso
+    writer = HDFWriter.__bases__[0]()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for dataOut in getBlocks():
+            writer.run(dataOut, path, blocksPerFile=blocksPerFile, metadataList=['heightList'],
+                       dataList=['data_param', 'data_SNR', 'utctime'], localtime=False, **kwargs)
+        writer.close()
+
+    return sorted(glob.glob(os.path.join(path, '*', '*.hdf5')))
+
+
+def readFile(filename):
+
+    with h5py.File(filename, 'r') as fp:
+        return {
+            'data_param': numpy.array([fp['Data']['data_param'][ch][:] for ch in sorted(fp['Data']['data_param'])]),
+            'data_SNR': numpy.array([fp['Data']['data_SNR'][ch][:] for ch in sorted(fp['Data']['data_SNR'])]),
+            'utctime': fp['Data']['utctime'][:],
+            }
+
+
+def test_writer_thread_with_codecs(tmp_path):
+
+    ref = write(str(tmp_path / 'sync'))
+    files = write(str(tmp_path / 'thread'), compression='lzf', shuffle=True, chunks='block',
+                  dtype={'data_SNR': 'float32'}, queueSize=2)
+
+    assert [os.path.basename(f) for f in files] == [os.path.basename(f) for f in ref]
+    assert len(files) == 2
+
+    blocks = list(getBlocks())
+    for n, (a, b) in enumerate(zip(ref, files)):
+        expected, data = readFile(a), readFile(b)
+        # el ultimo archivo se recorta a los bloques escritos
+        assert data['utctime'].shape == (min(blocksPerFile, nBlocks - n*blocksPerFile), )
+        numpy.testing.assert_array_equal(data['data_param'], expected['data_param'])
+        numpy.testing.assert_array_equal(data['data_SNR'], expected['data_SNR'].astype('float32'))
+        numpy.testing.assert_array_equal(data['utctime'], expected['utctime'])
+        for i, t in enumerate(data['utctime']):
+            dataOut = blocks[n*blocksPerFile + i]
+            assert t == dataOut.utctime
+            numpy.testing.assert_array_equal(data['data_param'][:, i], dataOut.data_param)
+
+    with h5py.File(files[0], 'r') as fp:
+        ds = fp['Data']['data_param']['channel00']
+        assert ds.compression == 'lzf'
+        assert ds.shuffle
+        assert ds.chunks == (1, nParams, nHeights)
+        assert fp['Data']['data_SNR']['channel00'].dtype == numpy.float32
+    with h5py.File(ref[0], 'r') as fp:
+        assert fp['Data']['data_param']['channel00'].compression == 'gzip'
+
+
+def getSweeps(nRadials=36):
+
+    rng = numpy.random.default_rng(1)
+    for i in range(2):
+        dataOut = Parameters()
+        dataOut.data_param = rng.normal(0, 10, (nChannels, 8, nRadials, nHeights))
+        dataOut.weather_vars = None
+        dataOut.channelList = list(range(nChannels))
+        dataOut.heightList = numpy.arange(nHeights)*0.15
+        dataOut.data_azi = numpy.linspace(0, 360, nRadials, endpoint=False)
+        dataOut.data_ele = numpy.full(nRadials, 4.0)
+        dataOut.flagMode = 1
+        dataOut.utctime = t0 + 60*i
+        yield dataOut
+
+
+def writeSweeps(path, weather_var, description, **kwargs):
+
+    writer = HDFWriter.__bases__[0]()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for dataOut in getSweeps():
+            writer.run(dataOut, path, blocksPerFile=1, metadataList=['heightList', 'data_azi', 'data_ele'],
+                       dataList=['data_param', 'utctime'], setType='weather', Reset=True,
+                       description=description, weather_var=weather_var, mask=0, localtime=False, **kwargs)
+        writer.close()
+
+    return sorted(glob.glob(os.path.join(path, '*', '*.hdf5')))
+
+
+def test_weather_variables_in_one_file(tmp_path):
+
+    meta = {'heightList': 'range', 'data_azi': 'azimuth', 'data_ele': 'elevation'}
+    single = {}
+    for var in ('Z', 'V'):
+        single[var] = writeSweeps(str(tmp_path / var), var,
+                                  {'Data': {'data_param': {var: ['H', 'V']}, 'utctime': 'time'}, 'Metadata': dict(meta)})
+    desc = {'Data': {'data_param': {'Z': {'reflectivity': ['H', 'V']}, 'V': {'velocity': ['H', 'V']}},
+                     'utctime': 'time'},
+            'Metadata': dict(meta)}
+    files = writeSweeps(str(tmp_path / 'all'), ['Z', 'V'], desc, compression='lzf', queueSize=2)
+
+    assert [os.path.relpath(f, str(tmp_path / 'all')) for f in files] == [
+        os.path.join('PPI_EL_4.0', 'SOPHY_20241015_120000_E4.0.hdf5'),
+        os.path.join('PPI_EL_4.0', 'SOPHY_20241015_120100_E4.0.hdf5')]
+
+    sweeps = list(getSweeps())
+    for n, filename in enumerate(files):
+        with h5py.File(filename, 'r') as fp:
+            assert sorted(fp['Data']) == ['reflectivity', 'time', 'velocity']
+            assert sorted(fp['Metadata']) == ['azimuth', 'elevation', 'range']
+            for var, group in (('Z', 'reflectivity'), ('V', 'velocity')):
+                assert fp['Data'][group].attrs['weather_var'] == var
+                data = numpy.array([fp['Data'][group][ch][:] for ch in ('H', 'V')])
+                assert fp['Data'][group]['H'].compression == 'lzf'
+                numpy.testing.assert_array_equal(data, sweeps[n].data_param[:, sweeps[n].getWeatherIndex(var)])
+                # mismo contenido que el archivo de una sola variable
+                with h5py.File(single[var][n], 'r') as fs:
+                    numpy.testing.assert_array_equal(data, numpy.array([fs['Data'][var][ch][:] for ch in ('H', 'V')]))
+                    numpy.testing.assert_array_equal(fp['Metadata']['azimuth'][:], fs['Metadata']['azimuth'][:])
+
+
+def read(path, reader=None, **kwargs):
+
+    reader = reader or HDFReader()
+    blocks = []
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        while True:
+            try:
+                reader.run(path=path, startDate=datetime.date(2000, 1, 1), endDate=datetime.date(2100, 1, 1),
+                           startTime=datetime.time(0, 0), endTime=datetime.time(23, 59, 59), **kwargs)
+            except Exception:
+                break
+            blocks.append((reader.dataOut.utctime, reader.dataOut.data_param.copy(), reader.dataOut.data_SNR.copy()))
+        reader.close()
+
+    return blocks
+
+
+@pytest.mark.parametrize('kwargs', [{}, {'lazy': 1, 'prefetch': 0}, {'lazy': 1, 'prefetch': 2}],
+                         ids=['eager', 'lazy', 'prefetch'])
+def test_lazy_reader_round_trip(tmp_path, kwargs):
+
+    path = str(tmp_path)
+    write(path, compression='gzip', shuffle=True, dtype={'data_SNR': 'float32'}, queueSize=2)
+
+    blocks = read(path, **kwargs)
+
+    assert len(blocks) == nBlocks
+    for (utctime, data_param, data_SNR), dataOut in zip(blocks, getBlocks()):
+        assert utctime == dataOut.utctime
+        numpy.testing.assert_array_equal(data_param, dataOut.data_param)
+        numpy.testing.assert_array_equal(data_SNR, dataOut.data_SNR.astype('float32'))
+
+
+
+class FailingReader(HDFReader):
+    '''
+    El hilo de lectura anticipada falla una vez en el bloque 1 de cada archivo
+    '''
+
+    def __init__(self):
+        HDFReader.__init__(self)
+        self.failed = set()
+        self.restarts = 0
+
+    def readBlock(self, index):
+        if index == 1 and self.filename not in self.failed and threading.current_thread() is self.prefetchThread:
+            self.failed.add(self.filename)
+            raise IOError('read failed')
+        return HDFReader.readBlock(self, index)
+
+    def startPrefetch(self, start=0):
+        self.restarts += start > 0
+        HDFReader.startPrefetch(self, start)
+
+
+def test_prefetch_restarts_after_mismatch(tmp_path):
+
+    path = str(tmp_path)
+    write(path)
+    reader = FailingReader()
+    blocks = read(path, reader, lazy=1, prefetch=2)
+
+    assert len(blocks) == nBlocks
+    for (utctime, data_param, data_SNR), dataOut in zip(blocks, getBlocks()):
+        assert utctime == dataOut.utctime
+        numpy.testing.assert_array_equal(data_param, dataOut.data_param)
+    # se lee el bloque 1 y la lectura anticipada sigue desde el bloque 2
+    assert len(reader.failed) == 2
+    assert reader.restarts == 2
+    assert reader.prefetchThread is None and reader.fp is None
+
+
+def test_writer_thread_errors(tmp_path):
+
+    # la ruta es un archivo, no se pueden crear las carpetas
+    path = tmp_path / 'file'
+    path.write_text('')
+    kwargs = dict(blocksPerFile=blocksPerFile, metadataList=['heightList'],
+                  dataList=['data_param', 'data_SNR', 'utctime'], localtime=False, queueSize=2)
+
+    writer = HDFWriter.__bases__[0]()
+    blocks = getBlocks()
+    with contextlib.redirect_stdout(io.StringIO()):
+        writer.run(next(blocks), str(path), **kwargs)
+        for n in range(500):
+            if writer.writeError is not None:
+                break
+            time.sleep(0.01)
+        # el error del hilo se lanza en el siguiente run
+        with pytest.raises(OSError):
+            writer.run(next(blocks), str(path), **kwargs)
+
+        writer = HDFWriter.__bases__[0]()
+        writer.run(next(blocks), str(path), **kwargs)
+        # o al cerrar
+        with pytest.raises(OSError):
+            writer.close()
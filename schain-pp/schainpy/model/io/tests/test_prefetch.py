@@ -0,0 +1,33 @@
+import queue
+import threading
+
+from schainpy.model.io.jroIO_param import HDFReader
+
+
+def test_prefetch_stops_with_full_queue():
+
+    reader = HDFReader()
+    reader.readBlock = lambda index: index
+    blocks = queue.Queue(maxsize=1)
+    stop = threading.Event()
+    thread = threading.Thread(target=reader._HDFReader__prefetch, args=(blocks, stop, 1), daemon=True)
+    thread.start()
+
+    # cola llena con el unico bloque, el consumidor se detiene sin leerlo
+    while not blocks.full():
+        thread.join(timeout=0.01)
+    stop.set()
+    thread.join(timeout=5)
+    assert not thread.is_alive()
+    assert blocks.get_nowait() == (0, 0)
+    assert blocks.empty()
+
+
+def test_prefetch_end_of_file():
+
+    reader = HDFReader()
+    reader.readBlock = lambda index: index
+    blocks = queue.Queue(maxsize=4)
+    reader._HDFReader__prefetch(blocks, threading.Event(), 2)
+
+    assert [blocks.get_nowait() for n in range(3)] == [(0, 0), (1, 1), (None, None)]
@@ -5,16 +5,410 @@ external process.
 '''
 
 import os
+import sys
+import copy
+import mmap
 import inspect
 import zmq
 import time
+import queue
 import pickle
 import traceback
+import resource
+import numpy
 from threading import Thread
-from multiprocessing import Process, Queue
+from multiprocessing import Process, Queue, shared_memory
 from schainpy.utils import log
 
 QUEUE_SIZE = int(os.environ.get('QUEUE_MAX_SIZE', '10'))
+TRANSPORTS = ('pickle', 'shared')
+TRANSPORT = os.environ.get('SCHAIN_TRANSPORT', 'pickle')
+SHM_MIN_BYTES = int(os.environ.get('SHM_MIN_BYTES', '65536'))
+SHM_PATH = '/dev/shm'
+COPY_MODES = ('deep', 'cow')
+COPY_MODE = os.environ.get('SCHAIN_COPY_MODE', 'deep')
+PROFILE = os.environ.get('SCHAIN_PROFILE', '').lower() in ('1', 'true', 'yes')
+PROFILE_FILE = os.environ.get('SCHAIN_PROFILE_FILE', '')
+PRECISIONS = {'double': numpy.complex128, 'single': numpy.complex64}
+PRECISION = os.environ.get('SCHAIN_PRECISION', '')
+POLICIES = ('block', 'drop-oldest', 'keep-latest', 'coalesce')
+POLICY = os.environ.get('SCHAIN_POLICY', '')
+
+
+def getMaxRSS():
+    '''
+    Peak resident memory of the current process in MB
+    '''
+
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    if sys.platform == 'darwin':
+        return rss / 1024. / 1024.
+
+    return rss / 1024.
+
+
+class OperationStats(object):
+    '''
+    Timing and throughput counters of one operation (or of the run method
+    of a processing unit), wall and cpu time are accumulated between
+    `start` and `stop`, `wait` is the time waiting for data in the queue of
+    an external operation and `send` the time spent copying and putting the
+    data in that queue by the producer, `dropped` and `coalesced` are the
+    frames not delivered or only added by the delivery policy of the queue.
+    '''
+
+    fields = ['id', 'unit', 'name', 'type', 'calls', 'blocks', 'wall', 'cpu',
+              'wait', 'send', 'bytes_in', 'bytes_out', 'blocks_s', 'dropped',
+              'coalesced', 'maxrss']
+
+    def __init__(self, id, name, optype):
+
+        self.id = id
+        self.unit = None
+        self.name = name
+        self.type = optype
+        self.calls = 0
+        self.blocks = 0
+        self.wall = 0.
+        self.cpu = 0.
+        self.wait = 0.
+        self.send = 0.
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.t0 = 0.
+        self.c0 = 0.
+
+    @staticmethod
+    def getNBytes(dataOut):
+        '''
+        Size of the main array of dataOut (data, data_spc or data_param)
+        '''
+
+        for attr in ('data', 'data_spc', 'data_param'):
+            data = getattr(dataOut, attr, None)
+            if isinstance(data, numpy.ndarray):
+                return data.nbytes
+
+        return 0
+
+    def start(self, dataOut):
+
+        self.bytes_in += self.getNBytes(dataOut)
+        self.c0 = time.process_time()
+        self.t0 = time.perf_counter()
+
+    def stop(self, dataOut):
+
+        self.wall += time.perf_counter() - self.t0
+        self.cpu += time.process_time() - self.c0
+        self.calls += 1
+
+        if not dataOut.flagNoData:
+            self.blocks += 1
+            self.bytes_out += self.getNBytes(dataOut)
+
+    def as_dict(self):
+
+        return {
+            'id': self.id,
+            'unit': self.unit,
+            'name': self.name,
+            'type': self.type,
+            'calls': self.calls,
+            'blocks': self.blocks,
+            'wall': self.wall,
+            'cpu': self.cpu,
+            'wait': self.wait,
+            'send': self.send,
+            'bytes_in': self.bytes_in,
+            'bytes_out': self.bytes_out,
+            'blocks_s': self.blocks / self.wall if self.wall else 0.,
+            'dropped': self.dropped,
+            'coalesced': self.coalesced,
+            'maxrss': getMaxRSS(),
+            }
+
+
+class SharedBlock(object):
+    '''
+    Descriptor of a dataOut whose big numpy arrays live in a shared memory
+    segment, only this object (header + layout) is sent through the queues.
+    '''
+
+    def __init__(self, name, size, layout, header):
+
+        self.name = name
+        self.size = size
+        self.layout = layout
+        self.header = header
+
+    @classmethod
+    def pack(cls, dataOut):
+        '''
+        Block with the whole dataOut pickled now (no shared segment), so the
+        producer can modify its arrays in place as soon as it is sent (the
+        queues pickle their items later in a feeder thread)
+        '''
+
+        return cls(None, 0, {}, pickle.dumps(dataOut, pickle.HIGHEST_PROTOCOL))
+
+    def attach(self, release_queue=None):
+        '''
+        Rebuild the dataOut in the consumer process, arrays are mapped
+        copy-on-write so each consumer can modify them without affecting
+        the others, the segment is released as soon as it is mapped.
+        '''
+
+        dataOut = pickle.loads(self.header)
+
+        if self.name is None:
+            return dataOut
+
+        if os.path.isdir(SHM_PATH):
+            fd = os.open(os.path.join(SHM_PATH, self.name), os.O_RDONLY)
+            try:
+                buf = mmap.mmap(fd, self.size, flags=mmap.MAP_PRIVATE,
+                                prot=mmap.PROT_READ | mmap.PROT_WRITE)
+            finally:
+                os.close(fd)
+            for key, (offset, shape, dtype) in self.layout.items():
+                dataOut.__dict__[key] = numpy.ndarray(shape, dtype=dtype, buffer=buf, offset=offset)
+        else:
+            shm = shared_memory.SharedMemory(name=self.name)
+            for key, (offset, shape, dtype) in self.layout.items():
+                dataOut.__dict__[key] = numpy.ndarray(
+                    shape, dtype=dtype, buffer=shm.buf, offset=offset).copy()
+            shm.close()
+
+        if release_queue is not None:
+            release_queue.put(self.name)
+
+        return dataOut
+
+
+class SharedMemoryPool(object):
+    '''
+    Producer side of the shared transport, the arrays of dataOut are written
+    once in a shared memory segment for all the external operations and the
+    segment is unlinked when every consumer has released it.
+    '''
+
+    def __init__(self):
+
+        self.segments = {}
+        self.refs = {}
+        self.queues = []
+
+    def register(self, release_queue):
+
+        self.queues.append(release_queue)
+
+    def share(self, dataOut):
+        '''
+        Copy the big arrays of dataOut to a new segment, the producer keeps
+        one reference until `release` is called.
+        '''
+
+        self.collect()
+
+        layout = {}
+        arrays = {}
+        size = 0
+
+        for key, value in dataOut.__dict__.items():
+            if isinstance(value, numpy.ndarray) and value.nbytes >= SHM_MIN_BYTES and not value.dtype.hasobject:
+                layout[key] = (size, value.shape, value.dtype.str)
+                arrays[key] = value
+                size += (value.nbytes + 63) // 64 * 64
+
+        skeleton = copy.copy(dataOut)
+        for key in arrays:
+            skeleton.__dict__[key] = None
+        header = pickle.dumps(skeleton, pickle.HIGHEST_PROTOCOL)
+
+        if not arrays:
+            return SharedBlock(None, 0, layout, header)
+
+        shm = shared_memory.SharedMemory(create=True, size=size)
+        for key, value in arrays.items():
+            offset, shape, dtype = layout[key]
+            numpy.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset)[...] = value
+        shm.close()
+
+        self.segments[shm.name] = shm
+        self.refs[shm.name] = 1
+
+        return SharedBlock(shm.name, size, layout, header)
+
+    def send(self, op, block):
+
+        if block.name is not None:
+            self.refs[block.name] += 1
+        op.queue.put(block)
+
+    def release(self, name):
+
+        if name not in self.refs:
+            return
+
+        self.refs[name] -= 1
+        if self.refs[name] == 0:
+            self.refs.pop(name)
+            self.segments.pop(name).unlink()
+
+    def collect(self):
+        '''
+        Process the segments released by the consumers
+        '''
+
+        for release_queue in self.queues:
+            while True:
+                try:
+                    name = release_queue.get_nowait()
+                except queue.Empty:
+                    break
+                self.release(name)
+
+    def close(self):
+
+        for shm in self.segments.values():
+            shm.unlink()
+        self.segments = {}
+        self.refs = {}
+
+
+def parsePolicy(policy):
+    '''
+    Delivery policy of an external operation and its time window in
+    seconds, given as 'block', 'drop-oldest', 'keep-latest', 'coalesce' or
+    'coalesce:<seconds>'
+    '''
+
+    name, _, window = policy.partition(':')
+
+    if name not in POLICIES:
+        raise ValueError('policy should be one of {}'.format(POLICIES))
+
+    return name, float(window) if window else 0.
+
+
+def coalesceFrames(frames, policy, window=0):
+    '''
+    Select the frames waiting for a busy external operation, return a list
+    of (dataOut, coalesced) and the number of frames dropped: keep-latest
+    delivers only the last one, coalesce delivers the last one of each time
+    window (of all the frames if window is 0) and flags the others to be
+    only added to the buffers of the operation. The last block (error) is
+    always delivered.
+    '''
+
+    end = []
+    if frames and frames[-1].error:
+        frames, end = frames[:-1], [(frames[-1], False)]
+
+    if policy == 'keep-latest':
+        return [(dataOut, False) for dataOut in frames[-1:]] + end, max(len(frames) - 1, 0)
+
+    if policy != 'coalesce':
+        return [(dataOut, False) for dataOut in frames] + end, 0
+
+    ret = []
+    for dataOut, following in zip(frames, frames[1:] + [None]):
+        tm = getattr(dataOut, 'utctime', None)
+        if following is None:
+            coalesced = False
+        elif window and tm is not None and getattr(following, 'utctime', None) is not None:
+            coalesced = tm // window == following.utctime // window
+        else:
+            coalesced = True
+        ret.append((dataOut, coalesced))
+
+    return ret + end, 0
+
+
+class FrameQueue(object):
+    '''
+    Bounded queue of an external operation with the policy used when the
+    operation falls behind: 'block' waits for space (every frame is
+    delivered), 'drop-oldest' discards the oldest frame waiting,
+    'keep-latest' also delivers only the last of the frames waiting and
+    'coalesce' delivers the last frame of each time window (the others are
+    only added to the buffers of the plots). The last block is never
+    dropped, `dropped` and `coalesced` are counted in each side.
+    '''
+
+    def __init__(self, maxsize=QUEUE_SIZE):
+
+        self.queue = Queue(maxsize=maxsize)
+        self.policy = 'block'
+        self.window = 0.
+        self.release_queue = None
+        self.dropped = 0
+        self.coalesced = 0
+        self.name = ''
+
+    def setPolicy(self, policy):
+
+        self.policy, self.window = parsePolicy(policy)
+
+    def put(self, item):
+        '''
+        Producer side, never waits unless the policy is block or item is
+        the last block
+        '''
+
+        if not isinstance(item, SharedBlock):
+            error = item.error
+            item = SharedBlock.pack(item)
+            if error:
+                if self.dropped:
+                    log.warning('{} frames dropped, operation busy'.format(self.dropped), self.name)
+                self.queue.put(item)
+                return
+
+        if self.policy == 'block':
+            self.queue.put(item)
+            return
+
+        while True:
+            try:
+                self.queue.put_nowait(item)
+                return
+            except queue.Full:
+                pass
+            try:
+                old = self.queue.get_nowait()
+            except queue.Empty:
+                continue
+            self.dropped += 1
+            if isinstance(old, SharedBlock) and old.name is not None and self.release_queue is not None:
+                self.release_queue.put(old.name)
+
+    def get(self):
+        '''
+        Consumer side, wait for the next frame and return it with the rest
+        of frames waiting as selected by coalesceFrames
+        '''
+
+        items = [self.queue.get()]
+
+        if self.policy in ('keep-latest', 'coalesce'):
+            while True:
+                try:
+                    items.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+        frames = [item.attach(self.release_queue) if isinstance(item, SharedBlock) else item for item in items]
+        frames, dropped = coalesceFrames(frames, self.policy, self.window)
+        self.dropped += dropped
+        self.coalesced += sum(coalesced for dataOut, coalesced in frames)
+
+        return frames
+
 
 class ProcessingUnit(object):
     '''
@@ -22,6 +416,10 @@ class ProcessingUnit(object):
     '''
 
     proc_type = 'processing'
+    sharedPool = None
+    copy_mode = COPY_MODE
+    stats = None
+    precision = PRECISION
 
     def __init__(self):
 
@@ -55,6 +453,15 @@ class ProcessingUnit(object):
 
         self.operations.append((operation, conf.type, conf.getKwargs()))
 
+        if self.stats is not None:
+            self.stats[operation] = OperationStats(conf.id, conf.name, conf.type)
+            self.stats[operation].unit = self.name
+
+        if conf.type == 'external' and operation.transport == 'shared':
+            if self.sharedPool is None:
+                self.sharedPool = SharedMemoryPool()
+            self.sharedPool.register(operation.release_queue)
+
     def getOperationObj(self, objId):
 
         if objId not in list(self.operations.keys()):
@@ -62,15 +469,127 @@ class ProcessingUnit(object):
 
         return self.operations[objId]
 
+    def setCopyMode(self, copy_mode):
+        '''
+        Select how dataOut is copied for the external operations: 'deep'
+        (the frames are pickled when they are put in the queue, that is the
+        copy received by the operation) or 'cow' (a read-only snapshot,
+        also pickled when it is put in the queue, so the unit can keep
+        writing its arrays in place)
+        '''
+
+        if copy_mode not in COPY_MODES:
+            raise ValueError('copy_mode should be one of {}'.format(COPY_MODES))
+
+        self.copy_mode = copy_mode
+
+    def setPrecision(self, precision):
+        '''
+        Select the precision of the voltage and spectra arrays: 'double'
+        (complex128/float64) or 'single' (complex64/float32), readers
+        allocate their buffers with it (the data of the readers that do not
+        is cast once in `call`) and operations keep the dtype of their
+        input, it is saved as metadata in dataOut.precision. Without it
+        (or SCHAIN_PRECISION) the readers keep the dtype of their data.
+        '''
+
+        if precision not in PRECISIONS:
+            raise ValueError('precision should be one of {}'.format(tuple(PRECISIONS)))
+
+        self.precision = precision
+        if self.dataOut is not None:
+            self.dataOut.precision = precision
+
+    def getComplexDtype(self, dtype=None):
+        '''
+        Complex dtype of the selected precision, if none was selected the
+        one numpy gives to the samples of `dtype` (complex128 by default)
+        '''
+
+        if self.precision:
+            return PRECISIONS[self.precision]
+
+        if dtype is not None and numpy.dtype(dtype).kind in 'fc':
+            return numpy.result_type(dtype, numpy.complex64)
+
+        return numpy.complex128
+
+    @staticmethod
+    def getPrecision(dtype):
+        '''
+        Name of the precision of `dtype`
+        '''
+
+        return 'single' if numpy.dtype(dtype) in (numpy.complex64, numpy.float32) else 'double'
+
+    def castPrecision(self):
+        '''
+        Cast the complex data of a reader to the selected precision (only if
+        it was selected) and save it in dataOut.precision
+        '''
+
+        data = getattr(self.dataOut, 'data', None)
+        if not isinstance(data, numpy.ndarray) or not numpy.iscomplexobj(data):
+            return
+        if self.precision and data.dtype != self.getComplexDtype():
+            self.dataOut.data = data.astype(self.getComplexDtype())
+        self.dataOut.precision = self.getPrecision(self.dataOut.data.dtype)
+
+    def enableStats(self, id):
+        '''
+        Record timing and throughput of the unit (`id` is the id of its
+        configuration) and of every operation added after this call
+        '''
+
+        self.stats = {self: OperationStats(id, self.name, 'unit')}
+        self.stats[self].unit = self.name
+
+    def getStats(self, timeout=30):
+        '''
+        Return the counters of the unit and its operations as a list of
+        dicts, the external operations send theirs when they finish.
+        '''
+
+        if self.stats is None:
+            return []
+
+        ret = []
+
+        for op, stats in self.stats.items():
+            row = stats.as_dict()
+            if getattr(op, 'stats_queue', None) is not None:
+                try:
+                    ext = op.stats_queue.get(timeout=timeout)
+                    ext['unit'] = row['unit']
+                    ext['send'] = row['send']
+                    ext['dropped'] += getattr(op.queue, 'dropped', 0)
+                    row = ext
+                except queue.Empty:
+                    log.warning('No stats received from {}'.format(stats.name), self.name)
+            ret.append(row)
+
+        return ret
+
     def call(self, **kwargs):
         '''
         '''
 
+        stats = self.stats
+
         try:
             if self.dataIn is not None and self.dataIn.flagNoData and not self.dataIn.error:
                 return self.dataIn.isReady()
             elif self.dataIn is None or not self.dataIn.error:
-                self.run(**kwargs)
+                if stats:
+                    stats[self].start(self.dataIn)
+                    try:
+                        self.run(**kwargs)
+                    finally:
+                        stats[self].stop(self.dataOut)
+                else:
+                    self.run(**kwargs)
+                if self.dataIn is None and not self.dataOut.flagNoData:
+                    self.castPrecision()
             elif self.dataIn.error:
                 self.dataOut.error = self.dataIn.error
                 self.dataOut.flagNoData = True
@@ -84,8 +603,20 @@ class ProcessingUnit(object):
                 log.error(err, self.name)
             self.dataOut.error = True
         ##### correcion de la declaracion Out
+        blocks = {}
+        aux = None
         for op, optype, opkwargs in self.operations:
-            aux = self.dataOut.copy()
+            if optype == 'external' and op.transport == 'shared' and not self.dataOut.flagNoData and not self.dataOut.error:
+                t0 = time.perf_counter()
+                # one segment for each selection of the data (e.g. weather variable)
+                data = self.dataOut.select(**opkwargs)
+                key = None if data is self.dataOut else tuple(data.weather_vars)
+                if key not in blocks:
+                    blocks[key] = self.sharedPool.share(data)
+                self.sharedPool.send(op, blocks[key])
+                if stats:
+                    stats[op].send += time.perf_counter() - t0
+                continue
             '''
             print("op",op)
             try:
@@ -97,13 +628,32 @@ class ProcessingUnit(object):
                 self.dataOut.runNextOp = False
             if optype == 'other' and (not self.dataOut.flagNoData or self.dataOut.runNextOp):
             #if optype == 'other' and not self.dataOut.flagNoData:
-                self.dataOut = op.run(self.dataOut, **opkwargs)
-            elif optype == 'external' and not self.dataOut.flagNoData:
-                #op.queue.put(self.dataOut)
-                op.queue.put(aux)
-            elif optype == 'external' and self.dataOut.error:
+                if stats:
+                    stats[op].start(self.dataOut)
+                    try:
+                        self.dataOut = op.run(self.dataOut, **opkwargs)
+                    finally:
+                        stats[op].stop(self.dataOut)
+                else:
+                    self.dataOut = op.run(self.dataOut, **opkwargs)
+                aux = None
+                for block in blocks.values():
+                    self.sharedPool.release(block.name)
+                blocks = {}
+            elif optype == 'external' and (not self.dataOut.flagNoData or self.dataOut.error):
                 #op.queue.put(self.dataOut)
-                op.queue.put(aux)
+                t0 = time.perf_counter()
+                if aux is None:
+                    # the frame is pickled when it is put in the queue, with
+                    # 'deep' that is already the copy of the operation
+                    aux = self.dataOut.snapshot() if self.copy_mode == 'cow' else self.dataOut
+                # only the part of the data used by the operation (e.g. one weather variable)
+                op.queue.put(aux.select(**opkwargs))
+                if stats:
+                    stats[op].send += time.perf_counter() - t0
+
+        for block in blocks.values():
+            self.sharedPool.release(block.name)
 
         try:
             if self.dataOut.runNextUnit:
@@ -128,6 +678,21 @@ class ProcessingUnit(object):
 
         return
 
+    def closeShared(self):
+        '''
+        Wait for the external operations using the shared transport and free
+        the remaining shared memory segments
+        '''
+
+        if self.sharedPool is None:
+            return
+
+        for op, optype, opkwargs in self.operations:
+            if optype == 'external' and op.transport == 'shared':
+                op.join()
+
+        self.sharedPool.close()
+
 
 class Operation(object):
 
@@ -187,7 +752,8 @@ def MPDecorator(BaseClass):
     """
     Multiprocessing class decorator
 
-    This function add multiprocessing features to a BaseClass.
+    This function add multiprocessing features to a BaseClass, the class
+    without them is kept in the `BaseClass` attribute (see undecorated).
     """
 
     class MPClass(BaseClass, Process):
@@ -208,29 +774,109 @@ def MPDecorator(BaseClass):
 
             self.start_time = time.time()
             self.err_queue = args[3]
-            self.queue = Queue(maxsize=QUEUE_SIZE)
+            self.queue = FrameQueue(QUEUE_SIZE)
+            self.queue.name = self.name
             self.myrun = BaseClass.run
+            self.transport = 'pickle'
+            self.release_queue = None
+            self.stats = None
+            self.stats_queue = None
+
+        def setTransport(self, transport):
+            '''
+            Select how dataOut is sent to this process: 'pickle' (whole object
+            through the queue) or 'shared' (arrays in shared memory)
+            '''
+
+            if transport not in TRANSPORTS:
+                raise ValueError('transport should be one of {}'.format(TRANSPORTS))
+
+            self.transport = transport
+            if transport == 'shared' and self.release_queue is None:
+                self.release_queue = Queue()
+                self.queue.release_queue = self.release_queue
+
+        def setPolicy(self, policy):
+            '''
+            Delivery policy of the queue when this process falls behind, one
+            of POLICIES ('coalesce:<seconds>' for a time window)
+            '''
+
+            self.queue.setPolicy(policy)
+
+        def enableStats(self):
+            '''
+            Record timing and queue wait of this process, the counters are
+            sent back through `stats_queue` when it finishes
+            '''
+
+            self.stats = OperationStats(self.args[0], BaseClass.__name__, 'external')
+            self.stats_queue = Queue()
 
         def run(self):
 
-            while True:
+            error = False
 
-                dataOut = self.queue.get()
+            while not error:
 
-                if not dataOut.error:
+                t0 = time.perf_counter()
+                frames = self.queue.get()
+                if self.stats:
+                    self.stats.wait += time.perf_counter() - t0
+
+                for dataOut, coalesced in frames:
+                    if dataOut.error:
+                        error = True
+                        break
+                    if self.stats:
+                        self.stats.start(dataOut)
                     try:
-                        BaseClass.run(self, dataOut, **self.kwargs)
+                        if not coalesced:
+                            BaseClass.run(self, dataOut, **self.kwargs)
+                        elif hasattr(BaseClass, 'add_frame'):
+                            BaseClass.add_frame(self, dataOut, **self.kwargs)
                     except:
                         err = traceback.format_exc()
                         log.error(err, self.name)
-                else:
-                    break
+                    if self.stats:
+                        self.stats.stop(dataOut)
 
             self.close()
 
         def close(self):
 
             BaseClass.close(self)
+            # los cuadros descartados se cuentan tambien en el productor
+            # (FrameQueue.put los reporta), el total esta en getStats
+            if self.queue.coalesced:
+                log.warning('{} frames coalesced ({})'.format(
+                    self.queue.coalesced, self.queue.policy), self.name)
+            if self.stats_queue is not None:
+                self.stats.dropped = self.queue.dropped
+                self.stats.coalesced = self.queue.coalesced
+                self.stats_queue.put(self.stats.as_dict())
             log.success('Done...(Time:{:4.2f} secs)'.format(time.time()-self.start_time), self.name)
 
+    MPClass.BaseClass = BaseClass
+
     return MPClass
+
+
+def undecorated(cls):
+    '''
+    Class `cls` without the process added by MPDecorator, to run the
+    operation inside another process (e.g. a plot worker): the decorated
+    classes in its bases are replaced by their BaseClass, so the __init__ of
+    `cls` and of its bases is run as usual.
+    '''
+
+    if 'BaseClass' in vars(cls):
+        return cls.BaseClass
+
+    bases = tuple(undecorated(base) for base in cls.__bases__)
+    if bases == cls.__bases__:
+        return cls
+
+    attrs = {key: value for key, value in vars(cls).items() if key not in ('__dict__', '__weakref__')}
+
+    return type(cls.__name__, bases, attrs)
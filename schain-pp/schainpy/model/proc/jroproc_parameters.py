@@ -9,16 +9,18 @@ import copy
 import sys
 import importlib
 import itertools
+import json
+import threading
+from collections import OrderedDict
 
 from multiprocessing import Pool, TimeoutError
 from multiprocessing.pool import ThreadPool
 import numpy
-import glob
 import scipy
 import h5py
 from scipy.optimize import fmin_l_bfgs_b #optimize with bounds on state papameters
 from .jroproc_base import ProcessingUnit, Operation, MPDecorator
-from schainpy.model.data.jrodata import Parameters, hildebrand_sekhon
+from schainpy.model.data.jrodata import Parameters, hildebrand_sekhon_batch, WEATHER_VARS
 from scipy import asarray as ar,exp
 from scipy.optimize import curve_fit
 from schainpy.utils import log
@@ -268,11 +270,13 @@ class RemoveWideGC(Operation):
         # Find the velocities that corresponds to zero
         gc_values = numpy.squeeze(numpy.where(numpy.abs(VelRange) <= ClutterWidth))
 
+        # Estimate the noise at each range
+        noise = hildebrand_sekhon_batch(self.spc, dataOut.nIncohInt, axis=1)
+
         # Removing novalid data from the spectra
         for ich in range(self.Num_Chn) :
             for ir in range(self.Num_Hei) :
-                # Estimate the noise at each range
-                HSn = hildebrand_sekhon(self.spc[ich,:,ir],dataOut.nIncohInt)
+                HSn = noise[ich,ir]
 
                 # Removing the noise floor at each range
                 novalid = numpy.where(self.spc[ich,:,ir] < HSn)
@@ -2443,10 +2447,9 @@ class NonSpecularMeteorDetection(Operation):
 
         #------------------------    SNR    --------------------------------------
         power = data_acf[:,0,:,:].real
-        noise = numpy.zeros(nChannels)
+        noise = hildebrand_sekhon_batch(power, nCohInt, axis=tuple(range(1, power.ndim)))
         SNR = numpy.zeros(power.shape)
         for i in range(nChannels):
-            noise[i] = hildebrand_sekhon(power[i,:], nCohInt)
             SNR[i] = (power[i]-noise[i])/noise[i]
         SNRm = numpy.nanmean(SNR, axis = 0)
         SNRdB = 10*numpy.log10(SNR)
@@ -4096,137 +4099,306 @@ class WeatherRadar(Operation):
 
         return dataOut
 
-class PedestalInformation(Operation):
+class PedestalIndex(object):
+    '''
+    Indice en memoria de los archivos de posicion del pedestal
+    (<path>/<YYYY-mm-ddTHH-00-00>/pos@<utc>.000.h5).
+
+    Solo se vuelven a listar las carpetas que cambiaron (mtime), el indice se
+    puede guardar en `index_file` para no listar todo de nuevo, los ultimos
+    `cache` archivos leidos se mantienen en memoria y `query` devuelve la
+    posicion para un arreglo de tiempos en una sola llamada. Las unidades que
+    usan la misma carpeta y opciones comparten una instancia (ver `get`).
+    '''
 
-    def __init__(self):
-        Operation.__init__(self)
-        self.filename = False
-        self.delay = 32
-        self.nTries = 3
-        self.nFiles = 5
-        self.flagAskMode = False
+    FOLDER = re.compile(r'^\d{4}-\d{2}-\d{2}T\d{2}-00-00$')
+    FILE = re.compile(r'^pos@(\d+(?:\.\d+)?)\.h5$')
+    AZI_OFFSET = 26.27
+    __instances = {}
 
-    def find_file(self, timestamp):
+    def __init__(self, path, interval=0.04, cache=8, index_file=None, azi_offset=AZI_OFFSET):
 
-        dt = datetime.datetime.utcfromtimestamp(timestamp)
-        path = os.path.join(self.path, dt.strftime('%Y-%m-%dT%H-00-00'))
+        self.path = path
+        self.interval = interval
+        self.cache = cache
+        self.index_file = index_file
+        self.azi_offset = azi_offset
+        self.lock = threading.RLock()
+        self.folders = {}
+        self.files = []
+        self.starts = numpy.zeros(0)
+        self.__data = OrderedDict()
+        self.__stats = {}
+
+        if index_file and os.path.exists(index_file):
+            try:
+                with open(index_file) as fp:
+                    index = json.load(fp)
+                self.folders = index['folders']
+                self.files = [tuple(x) for x in index['files']]
+                self.starts = numpy.array([x[0] for x in self.files])
+            except Exception:
+                log.warning('Invalid pedestal index {}, scanning {}'.format(index_file, path), 'PedestalIndex')
+
+    @classmethod
+    def get(cls, path, interval=0.04, cache=8, index_file=None, azi_offset=AZI_OFFSET):
+        '''
+        Shared instance for the given folder and options
+        '''
 
-        if not os.path.exists(path):
-            return False
-        fileList = glob.glob(os.path.join(path, '*.h5'))
-        fileList.sort()
-        return fileList
+        key = (os.path.abspath(path), interval, cache,
+               os.path.abspath(index_file) if index_file else None, azi_offset)
+        if key not in cls.__instances:
+            cls.__instances[key] = cls(path, interval, cache, index_file, azi_offset)
 
-    def find_next_file(self):
+        return cls.__instances[key]
 
-        while True:
-            if self.utctime < self.utcfile:
-                self.flagNoData = True
-                break
-            self.flagNoData = False
-            file_size = len(self.fp['Data']['utc'])
-            if self.utctime < self.utcfile+file_size*self.interval:
-                break
-            dt = datetime.datetime.utcfromtimestamp(self.utcfile)
-            if dt.second > 0:
-                self.utcfile -= dt.second
-            self.utcfile += self.samples*self.interval
-            dt = datetime.datetime.utcfromtimestamp(self.utcfile)
-            path = os.path.join(self.path, dt.strftime('%Y-%m-%dT%H-00-00'))
-            self.filename = os.path.join(path, 'pos@{}.000.h5'.format(int(self.utcfile)))
-
-            for i in range(self.nFiles):
-                ok = False
-                for j in range(self.nTries):
-                    ok = False
-                    try:
-                        if not os.path.exists(self.filename):
-                            log.warning('Waiting {}s for position files...'.format(self.delay), self.name)
-                            time.sleep(1)
-                            continue
-                        self.fp.close()
-                        self.fp = h5py.File(self.filename, 'r')
-                        self.ele = self.fp['Data']['ele_pos'][:]
-                        self.azi = self.fp['Data']['azi_pos'][:] + 26.27 #+ self.heading
-                        self.azi[self.azi>360] = self.azi[self.azi>360] - 360
-                        self.time_pedestal = self.fp['Data']['utc'][:] # N 1.5
-                        log.log('Opening file: {}'.format(self.filename), self.name)
-                        ok = True
-                        break
-                    except Exception as e:
-                        log.warning('Waiting {}s for position file to be ready...'.format(self.delay), self.name)
-                        time.sleep(self.delay)
-                        continue
-                if ok:
-                    break
-                log.warning('Trying next file...', self.name)
-                self.utcfile += self.samples*self.interval
-                dt = datetime.datetime.utcfromtimestamp(self.utcfile)
-                path = os.path.join(self.path, dt.strftime('%Y-%m-%dT%H-00-00'))
-                self.filename = os.path.join(path, 'pos@{}.000.h5'.format(int(self.utcfile)))
-            if not ok:
-                log.error('No new position files found in {}'.format(path))
-                raise IOError('No new position files found in {}'.format(path))
-
-    def get_values(self):
-
-        if self.flagNoData:
-            return numpy.nan, numpy.nan, numpy.nan, numpy.nan #,numpy.nan #Should be self.mode? N 2
-        else:
-            index = int((self.utctime-self.utcfile)/self.interval)
+    def refresh(self):
+        '''
+        Add the new files to the index, only the new or modified hourly folders
+        are listed, return True if there are new files
+        '''
+
+        with self.lock:
+            if not os.path.isdir(self.path):
+                return False
+
+            new = []
+            folders = [entry for entry in os.scandir(self.path) if entry.is_dir() and self.FOLDER.match(entry.name)]
+            for entry in folders:
+                mtime = entry.stat().st_mtime
+                if self.folders.get(entry.name) == mtime:
+                    continue
+                self.folders[entry.name] = mtime
+                for f in os.scandir(entry.path):
+                    match = self.FILE.match(f.name)
+                    if match:
+                        new.append((float(match.group(1)), os.path.join(entry.name, f.name)))
+
+            new = set(new).difference(self.files)
+            if not new:
+                return False
+
+            self.files = sorted(set(self.files).union(new))
+            self.starts = numpy.array([x[0] for x in self.files])
+
+            if self.index_file:
+                with open(self.index_file, 'w') as fp:
+                    json.dump({'folders': self.folders, 'files': self.files}, fp)
+
+            return True
+
+    def load(self, i, reload=False):
+        '''
+        Arrays (utc, azi, ele) of the i-th file, None if it can not be read yet,
+        with reload=True the file is read again only if its size or mtime changed
+        '''
+
+        with self.lock:
+            name = self.files[i][1]
+            filename = os.path.join(self.path, name)
+            try:
+                stat = os.stat(filename)
+                stat = (stat.st_size, stat.st_mtime)
+            except OSError:
+                stat = None
+            if name in self.__data and (not reload or stat is None or stat == self.__stats.get(name)):
+                self.__data.move_to_end(name)
+                return self.__data[name]
             try:
-                return self.azi[index], self.ele[index], None, self.time_pedestal[index] #,self.time_pedesal[index]    N 3
-            except:
-                return numpy.nan, numpy.nan, numpy.nan, numpy.nan #,numpy.nan N 4
+                with h5py.File(filename, 'r') as fp:
+                    utc = fp['Data']['utc'][:]
+                    azi = fp['Data']['azi_pos'][:] + self.azi_offset
+                    ele = fp['Data']['ele_pos'][:]
+            except Exception:
+                return None
+            azi[azi>360] = azi[azi>360] - 360
+            azi[azi<0] = azi[azi<0] + 360
+            if name not in self.__data:
+                log.log('Opening file: {}'.format(name), 'PedestalIndex')
+
+            self.__data[name] = (utc, azi, ele)
+            self.__stats[name] = stat
+            while len(self.__data) > self.cache:
+                self.__stats.pop(self.__data.popitem(last=False)[0], None)
+
+            return self.__data[name]
+
+    def end(self, i):
+        '''
+        Time after the last sample of the i-th file
+        '''
+
+        data = self.load(i)
+        if data is None:
+            return self.starts[i]
+
+        return self.starts[i] + len(data[0])*self.interval
+
+    def isAvailable(self, utctime):
+        '''
+        True if the position at utctime is in the index (or in a gap between files)
+        '''
+
+        with self.lock:
+            if len(self.files) == 0:
+                return False
+            if utctime < self.starts[-1]:
+                return True
+            if utctime < self.end(-1):
+                return True
+            # el ultimo archivo pudo estar incompleto
+            self.load(-1, reload=True)
+            return utctime < self.end(-1)
+
+    def wait(self, utctime, timeout=15):
+        '''
+        Wait until the position at utctime is available, the index is
+        refreshed with an increasing delay (50 ms up to 2 s), return False
+        after `timeout` seconds.
+        '''
+
+        t0 = time.time()
+        delay = 0.05
+
+        while True:
+            if self.isAvailable(utctime):
+                return True
+            if self.refresh() and self.isAvailable(utctime):
+                return True
+            remaining = timeout - (time.time() - t0)
+            if remaining <= 0:
+                return False
+            time.sleep(min(delay, remaining))
+            delay = min(2*delay, 2.)
+
+    def query(self, times, method='previous'):
+        '''
+        Azimuth, elevation and pedestal time for an array of utc times.
+
+        method='previous' gives the last sample before each time (as the index
+        int((t - t_file)/interval)), 'linear' interpolates between samples (the
+        azimuth across 0/360 too), NaN where there is no position.
+        '''
+
+        times = numpy.asarray(times, dtype=float)
+        azi = numpy.full(times.shape, numpy.nan)
+        ele = numpy.full(times.shape, numpy.nan)
+        utc = numpy.full(times.shape, numpy.nan)
+
+        with self.lock:
+            nfile = numpy.searchsorted(self.starts, times, side='right') - 1
+
+            for i in numpy.unique(nfile[nfile >= 0]):
+                data = self.load(i)
+                if data is None:
+                    continue
+                u, a, e = data
+                n = len(u)
+                sel = nfile == i
+                x = (times[sel] - self.starts[i])/self.interval
+                k = numpy.floor(x).astype(int)
+
+                if method == 'linear':
+                    # primer dato del siguiente archivo para interpolar en el borde
+                    if i + 1 < len(self.files) and abs(self.starts[i+1] - self.starts[i] - n*self.interval) < self.interval/2:
+                        following = self.load(i + 1)
+                        if following is not None:
+                            u, a, e = [numpy.append(y, z[:1]) for y, z in zip((u, a, e), following)]
+                    k1 = numpy.minimum(k + 1, len(u) - 1)
+                    valid = k < n
+                    k, k1, f = k[valid], k1[valid], (x - numpy.floor(x))[valid]
+                    da = (a[k1] - a[k] + 180) % 360 - 180
+                    tmp = a[k] + f*da
+                    tmp[tmp>360] -= 360
+                    tmp[tmp<0] += 360
+                    idx = numpy.flatnonzero(sel)[valid]
+                    azi[idx] = tmp
+                    ele[idx] = e[k] + f*(e[k1] - e[k])
+                    utc[idx] = u[k] + f*(u[k1] - u[k])
+                else:
+                    valid = k < n
+                    idx = numpy.flatnonzero(sel)[valid]
+                    azi[idx] = a[k[valid]]
+                    ele[idx] = e[k[valid]]
+                    utc[idx] = u[k[valid]]
+
+        return azi, ele, utc
+
+
+class PedestalInformation(Operation):
+    '''
+    Posicion del pedestal (azimuth, elevation, time_pedestal) para cada bloque
+    a partir de los archivos pos@<utc>.000.h5 (ver PedestalIndex).
+
+    interpolate=True interpola la posicion en utctime (por defecto el ultimo
+    dato antes de utctime), profiles=True agrega azimuth_profiles y
+    elevation_profiles con la posicion de cada perfil del bloque (NaN si no
+    llega a tiempo), heading (grados) se suma al azimuth de todos los
+    archivos, timeout son los segundos que se espera por nuevos archivos y
+    index_file guarda el indice de archivos en disco.
+
+    samples esta obsoleto (el numero de datos se toma de cada archivo), se
+    acepta para no romper las configuraciones anteriores y se ignora.
+    '''
+
+    def __init__(self):
+        Operation.__init__(self)
+        self.index = None
+        self.flagAskMode = False
+        self.flagIncomplete = False
 
-    def setup(self, dataOut, path, conf, samples, interval, mode, heading):
+    def setup(self, dataOut, path, conf, interval, mode, heading, timeout, index_file, cache, shared, samples):
 
+        if samples is not None:
+            log.warning('samples is deprecated and ignored, the samples are read from each position file', self.name)
         self.path = path
         self.conf = conf
-        self.samples = samples
         self.interval = interval
         self.mode = mode
         self.heading = heading
         if mode is None:
             self.flagAskMode = True
-        N = 0
-        while True:
-            if N == self.nTries+1:
-                log.error('No position files found in {}'.format(path), self.name)
-                raise IOError('No position files found in {}'.format(path))
-            filelist = self.find_file(dataOut.utctime)
-
-            if filelist == 0:
-                N += 1
-                log.warning('Waiting {}s for position files...'.format(self.delay), self.name)
-                time.sleep(self.delay)
-                continue
-            self.filename = filelist[0]
-            try:
-                self.fp = h5py.File(self.filename, 'r')
-                self.utcfile = int(self.filename.split('/')[-1][4:14])
 
-                self.ele = self.fp['Data']['ele_pos'][:]
-                self.azi = self.fp['Data']['azi_pos'][:] + 26.27 + self.heading
-                self.azi[self.azi>360] = self.azi[self.azi>360] - 360
-                self.time_pedestal = self.fp['Data']['utc'][:] # N 1
-                break
-            except:
-                log.warning('Waiting {}s for position file to be ready...'.format(self.delay), self.name)
-                time.sleep(self.delay)
+        azi_offset = PedestalIndex.AZI_OFFSET + heading
+        if shared:
+            self.index = PedestalIndex.get(path, interval, cache, index_file, azi_offset)
+        else:
+            self.index = PedestalIndex(path, interval, cache, index_file, azi_offset)
+        self.index.refresh()
+
+        if len(self.index.files) == 0 and not self.index.wait(dataOut.utctime, timeout):
+            log.error('No position files found in {}'.format(path), self.name)
+            raise IOError('No position files found in {}'.format(path))
 
-    def run(self, dataOut, path, conf=None, samples=1500, interval=0.04, time_offset=0, mode=None, heading=0):
+    def run(self, dataOut, path, conf=None, samples=None, interval=0.04, time_offset=0, mode=None, heading=0,
+            interpolate=False, profiles=False, timeout=15, index_file=None, cache=8, shared=True):
 
         if not self.isConfig:
-            self.setup(dataOut, path, conf, samples, interval, mode, heading)
+            self.setup(dataOut, path, conf, interval, mode, heading, timeout, index_file, cache, shared, samples)
             self.isConfig   = True
 
         self.utctime = dataOut.utctime + time_offset
-
-        self.find_next_file()
-
-        #az, el, scan = self.get_values()
-        az, el, scan,time_pedestal = self.get_values() # N 5
+        method = 'linear' if interpolate else 'previous'
+
+        if not self.index.wait(self.utctime, timeout):
+            log.error('No new position files found in {}'.format(path), self.name)
+            raise IOError('No new position files found in {}'.format(path))
+
+        if profiles and getattr(dataOut, 'nProfiles', None):
+            ipp = dataOut.ippSeconds*getattr(dataOut, 'nCohInt', 1)
+            times = self.utctime + numpy.arange(dataOut.nProfiles)*ipp
+            # los perfiles sin posicion quedan en NaN
+            if not self.index.wait(times[-1], timeout) and not self.flagIncomplete:
+                log.warning('No positions for the last profiles of the block, they are set to NaN', self.name)
+                self.flagIncomplete = True
+            azi, ele, utc = self.index.query(times, method)
+            dataOut.azimuth_profiles = azi
+            dataOut.elevation_profiles = ele
+            az, el, time_pedestal = azi[0], ele[0], utc[0]
+        else:
+            azi, ele, utc = self.index.query([self.utctime], method)
+            az, el, time_pedestal = azi[0], ele[0], utc[0]
 
         dataOut.flagNoData = False
         if numpy.isnan(az) or numpy.isnan(el) :
@@ -4235,13 +4407,129 @@ class PedestalInformation(Operation):
 
         dataOut.azimuth =  round(az, 2)
         dataOut.elevation = round(el, 2)
-        dataOut.mode_op = scan
+        dataOut.mode_op = None
         dataOut.time_pedestal = round(time_pedestal,2)   # N 6
-        #log.log("TIME-----------------{}".format(self.delay),dataOut.time_pedestal)
         return dataOut
 
+class SweepBuffer(object):
+    '''
+    Buffer de los radiales de un barrido (PPI/RHI) reservado una sola vez.
+
+    Cada variable se guarda con el eje de los radiales antes del eje de
+    alturas, (..., nRadials, nHeights), los escalares como (nRadials,) y los
+    vectores (ej. ruido por canal) como (nRadials, nch), de esta forma el
+    barrido se entrega como vistas sin copiar ni transponer. Se usan
+    `nBuffers` juegos de arreglos por turnos, las vistas que devuelve flush
+    son validas hasta que se complete el siguiente barrido. La capacidad se
+    duplica si un barrido tiene mas radiales.
+    '''
+
+    def __init__(self, nRadials=512, nBuffers=2):
+
+        self.nRadials = nRadials
+        self.nBuffers = nBuffers
+        self.buffers = [{} for i in range(nBuffers)]
+        self.index = 0
+        self.n = 0
+
+    def __len__(self):
+
+        return self.n
+
+    @staticmethod
+    def getIndex(array, start, stop=None):
+        '''
+        Index of the radials start:stop (or only start if stop is None)
+        '''
+
+        axis = max(array.ndim - 2, 0)
+        if stop is None:
+            return (slice(None), )*axis + (start, )
+        return (slice(None), )*axis + (slice(start, stop), )
+
+    def allocate(self, value, nRadials):
+
+        value = numpy.asarray(value)
+        axis = max(value.ndim - 1, 0)
+        shape = value.shape[:axis] + (nRadials, ) + value.shape[axis:]
+
+        return numpy.empty(shape, dtype=value.dtype)
+
+    def append(self, **values):
+        '''
+        Add one radial, the values are given by name (data=..., azi=...)
+        '''
+
+        arrays = self.buffers[self.index]
+
+        for name, value in values.items():
+            array = arrays.get(name)
+            if array is None or (self.n == 0 and array.shape[max(array.ndim - 2, 0)] < self.nRadials):
+                array = arrays[name] = self.allocate(value, self.nRadials)
+            elif array.shape[max(array.ndim - 2, 0)] == self.n:
+                # los siguientes barridos se reservan con la nueva capacidad
+                self.nRadials = max(2*self.n, self.nRadials)
+                new = self.allocate(value, self.nRadials)
+                new[self.getIndex(new, 0, self.n)] = array[self.getIndex(array, 0, self.n)]
+                array = arrays[name] = new
+            array[self.getIndex(array, self.n)] = value
+
+        self.n += 1
+
+    def last(self, name, k=1):
+        '''
+        View of the last k radials of a variable
+        '''
+
+        array = self.buffers[self.index][name]
+
+        return array[self.getIndex(array, max(self.n - k, 0), self.n)]
+
+    def pop(self):
+        '''
+        Erase the last radial
+        '''
+
+        self.n = max(self.n - 1, 0)
+
+    def popFirst(self):
+        '''
+        Erase the first radial
+        '''
+
+        for array in self.buffers[self.index].values():
+            array[self.getIndex(array, 0, self.n - 1)] = array[self.getIndex(array, 1, self.n)]
+
+        self.n = max(self.n - 1, 0)
+
+    def flush(self, carry=0):
+        '''
+        Return the sweep as a dict of views (without the last `carry` radials)
+        and the number of radials, the next sweep starts with the last `carry`
+        radials in the other buffer.
+        '''
+
+        n = self.n - carry
+        arrays = self.buffers[self.index]
+        sweep = {name: array[self.getIndex(array, 0, n)] for name, array in arrays.items()}
+
+        self.index = (self.index + 1) % self.nBuffers
+        self.n = 0
+
+        for i in range(n, n + carry):
+            self.append(**{name: array[self.getIndex(array, i)] for name, array in arrays.items()})
+
+        return sweep, n
+
 class Block360(Operation):
     '''
+    Arma el barrido (PPI/RHI) de `attr_data` radial por radial.
+
+    Con attr_data='data_param' y parameters='S,V,Z,...' solo se guardan esas
+    variables meteorologicas una vez, el barrido queda en data_param con la
+    forma (nch, nVars, nRadials, nHeights) y su orden en dataOut.weather_vars,
+    de esta forma un solo Block360 alimenta a varios WeatherParamsPlot y
+    HDFWriter (cada operacion externa recibe solo su variable).
     '''
     isConfig       = False
     __profIndex    = 0
@@ -4256,21 +4544,33 @@ class Block360(Operation):
     def __init__(self,**kwargs):
         Operation.__init__(self,**kwargs)
 
-    def setup(self, dataOut, attr, angles,horario,heading,bottom):
+    def setup(self, dataOut, attr, angles,horario,heading,bottom,nRadials=512,parameters=None):
         '''
-        n= Numero de PRF's de entrada
+        nRadials= Numero de radiales reservados por barrido (crece si hay mas)
+        parameters= Variables meteorologicas de data_param que se guardan (ej. 'S,V,Z')
         '''
         self.__initime        = None
         self.__lastdatatime   = 0
         self.__dataReady      = False
-        self.__buffer         = 0
         self.index            = 0
         self.attr = attr
-        self.__buffer  = []
-        self.azi       = []
-        self.ele       = []
-        self.__noise   = []
-        self.__time_pedestal = [] # c1
+        self.__sweep   = SweepBuffer(nRadials)
+        self.__index   = None
+        self.weather_vars = None
+
+        if parameters is not None:
+            if attr != 'data_param':
+                raise ValueError('parameters can only be used with attr_data=data_param')
+            if isinstance(parameters, str):
+                parameters = parameters.split(',')
+            parameters = [param.strip() for param in parameters]
+            for param in parameters:
+                if param not in WEATHER_VARS:
+                    raise ValueError('Unknown weather variable {}, use: {}'.format(param, ','.join(WEATHER_VARS)))
+            self.weather_vars = {param: i for i, param in enumerate(parameters)}
+            if parameters != list(WEATHER_VARS):
+                self.__index = [WEATHER_VARS[param] for param in parameters]
+
         self.angles = angles
         self.horario= horario
         self.heading = heading
@@ -4280,39 +4580,31 @@ class Block360(Operation):
         '''
         Add a profile to he __buffer and increase in one the __profiel Index
         '''
-        tmp= getattr(data, attr)
-        self.__buffer.append(tmp)
-        self.azi.append(data.azimuth)
-        self.ele.append(data.elevation)
-        self.__time_pedestal.append(data.time_pedestal) # c2        
         try:
-            #print("SHOW ------", type(data.dataPP_NOISE),data.dataPP_NOISE.shape,"value:",data.dataPP_NOISE)
-            self.__noise.append(data.dataPP_NOISE)
+            noise = data.dataPP_NOISE
         except:
-            #print("SHOW ------", type(data.noise),data.noise.shape,"value:",data.noise)
-            self.__noise.append(data.noise)
-        self.__profIndex  += 1
+            noise = data.noise
+
+        tmp = getattr(data, attr)
+        if self.__index is not None:
+            tmp = tmp[:, self.__index]
+
+        self.__sweep.append(data=tmp, azi=data.azimuth, ele=data.elevation,
+                            time=data.time_pedestal, noise=noise)
 
     def pushData(self, data, case_flag):
         '''
+        Return the sweep without the last radial (views of the buffer, valid
+        until the next sweep is completed), the last radial starts the next one
         '''
 
-        data_360 = numpy.array(self.__buffer).transpose(1, 2, 0, 3)
-        data_p   = numpy.array(self.azi)
-        data_e   = numpy.array(self.ele)
-        data_n   = numpy.array(self.__noise)
-        time_pedestal  = numpy.array(self.__time_pedestal) #c3
-        n   = self.__profIndex
-
-        self.__buffer = []
-        self.azi      = []
-        self.ele      = []
-        self.__noise  = []
-        self.__time_pedestal = [] # c4
-        self.__profIndex = 0
+        sweep, n = self.__sweep.flush(carry=1 if case_flag in (0, 1, -1) else 0)
 
-        if case_flag in (0, 1, -1):
-            self.putData(data=data, attr = self.attr)
+        data_360 = sweep['data']
+        data_p   = sweep['azi']
+        data_e   = sweep['ele']
+        data_n   = sweep['noise']
+        time_pedestal  = sweep['time']
 
         return data_360, n, data_p, data_e, data_n ,time_pedestal #time_pedestal c5
 
@@ -4327,31 +4619,19 @@ class Block360(Operation):
 
         self.putData(data=dataOut, attr = self.attr)
 
-        if self.__profIndex > 5:
+        if len(self.__sweep) > 5:
             case_flag = self.checkcase()
 
             if self.flagMode == 1: #'AZI':
-                if case_flag == 0: #Ya giró
-                    self.__buffer.pop() #Erase last data
-                    self.azi.pop()
-                    self.ele.pop()
-                    self.__time_pedestal.pop() # c7
+                if case_flag == 0: #Ya giró, el ultimo dato es del siguiente barrido
                     data_360 ,n,data_p,data_e,data_n,time_pedestal = self.pushData(dataOut, case_flag) # time_pedestal c8
                     if len(data_p)>350:
                         self.__dataReady = True
             elif self.flagMode == 0: #'ELE'
                 if case_flag == 1: #Bajada
-                    self.__buffer.pop() #Erase last data
-                    self.azi.pop()
-                    self.ele.pop()
-                    self.__time_pedestal.pop() #c9
                     data_360, n, data_p, data_e, data_n,time_pedestal  = self.pushData(dataOut, case_flag) # time_pedestal c10
                     self.__dataReady = True
                 if case_flag == -1: #Subida
-                    self.__buffer.pop() #Erase last data
-                    self.azi.pop()
-                    self.ele.pop()
-                    self.__time_pedestal.pop() # time_pedestal c11
                     data_360, n, data_p, data_e, data_n, time_pedestal  = self.pushData(dataOut, case_flag) # time_pedestal c12
                     #self.__dataReady = True
 
@@ -4371,10 +4651,27 @@ class Block360(Operation):
         self.__initime = datatime
         return data_360, avgdatatime, data_p, data_e, data_n ,time_pedestal # time_pedestal c15
 
+    @staticmethod
+    def nanstd(values):
+        '''
+        numpy.nanstd of a few values without the overhead of numpy
+        '''
+
+        values = [value for value in values if value == value]
+        if not values:
+            return numpy.nan
+        mean = sum(values)/len(values)
+
+        return math.sqrt(sum([(value - mean)**2 for value in values])/len(values))
+
     def checkcase(self):
 
-        sigma_ele = numpy.nanstd(self.ele[-5:])
-        sigma_azi = numpy.nanstd(self.azi[-5:])
+        # solo se revisan los ultimos 5 angulos
+        ele = self.__sweep.last('ele', 5).tolist()
+        azi = self.__sweep.last('azi', 5).tolist()
+
+        sigma_ele = self.nanstd(ele)
+        sigma_azi = self.nanstd(azi)
 
         if sigma_ele<.5 and sigma_azi<.5:
             if sigma_ele<sigma_azi:
@@ -4394,8 +4691,8 @@ class Block360(Operation):
             self.mode_op = 'None'
 
         if self.flagMode == 1: #'AZI'
-            start  = self.azi[-2]
-            end    = self.azi[-1]
+            start  = azi[-2]
+            end    = azi[-1]
             diff_angle = (end-start)
             if self.horario== True:
                if diff_angle < 0: #Ya giró
@@ -4405,9 +4702,9 @@ class Block360(Operation):
                    return 0
         elif self.flagMode == 0: #'ELE'
 
-            start  = self.ele[-3]
-            middle = self.ele[-2]
-            end    = self.ele[-1]
+            start  = ele[-3]
+            middle = ele[-2]
+            end    = ele[-1]
 
             if end < self.bottom:
                 return 1
@@ -4423,6 +4720,9 @@ class Block360(Operation):
             self.setup(dataOut=dataOut, attr=attr_data, angles=angles,horario=horario, heading=heading,bottom=bottom,**kwargs)
             self.isConfig   = True
 
+        if self.weather_vars is not None:
+            dataOut.weather_vars = None # data_param del radial tiene todas las variables
+
         data_360, avgdatatime, data_p, data_e, data_n,time_pedestal = self.blockOp(dataOut, dataOut.utctime) # time_pedestal c16
 
         dataOut.flagNoData = True
@@ -4433,13 +4733,16 @@ class Block360(Operation):
                 setattr(dataOut, attr_data, data_360 )
                 dataOut.data_azi   = data_p+self.heading
                 dataOut.data_azi[dataOut.data_azi>360]=dataOut.data_azi[dataOut.data_azi>360]-360
-                dataOut.data_ele   = data_e
-                dataOut.radar_sweep_time  = time_pedestal # time_pedestal c17
+                # los angulos, tiempos y ruido son pequeños, se copian
+                dataOut.data_ele   = data_e.copy()
+                dataOut.radar_sweep_time  = time_pedestal.copy() # time_pedestal c17
                 dataOut.utctime    = avgdatatime
-                dataOut.data_noise = data_n
+                dataOut.data_noise = data_n.copy()
                 dataOut.flagNoData = False
                 dataOut.flagMode   = self.flagMode
                 dataOut.mode_op    = self.mode_op
+                if self.weather_vars is not None:
+                    dataOut.weather_vars = self.weather_vars
             else:
                 log.warning('Skipping angle {} / {}'.format(round(mean_az,1), round(mean_el,1)))
 
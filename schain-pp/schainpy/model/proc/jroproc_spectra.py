@@ -12,10 +12,11 @@ import time
 import itertools
 
 import numpy
+from scipy import fft as sp_fft
 
 from schainpy.model.proc.jroproc_base import ProcessingUnit, MPDecorator, Operation
 from schainpy.model.data.jrodata import Spectra
-from schainpy.model.data.jrodata import hildebrand_sekhon
+from schainpy.model.data.jrodata import hildebrand_sekhon_batch
 from schainpy.utils import log
 
 
@@ -80,9 +81,9 @@ class SpectraProc(ProcessingUnit):
             self.buffer
             self.dataOut.flagNoData
         """
-        fft_volt = numpy.fft.fft(
+        # scipy.fft keeps complex64 (single precision) as complex64
+        fft_volt = sp_fft.fft(
             self.buffer, n=self.dataOut.nFFTPoints, axis=1)
-        fft_volt = fft_volt.astype(numpy.dtype('complex'))
         dc = fft_volt[:, 0, :]
 
         # calculo de self-spectra
@@ -99,7 +100,7 @@ class SpectraProc(ProcessingUnit):
         if self.dataOut.pairsList != None:
             # calculo de cross-spectra
             cspc = numpy.zeros(
-                (self.dataOut.nPairs, self.dataOut.nFFTPoints, self.dataOut.nHeights), dtype='complex')
+                (self.dataOut.nPairs, self.dataOut.nFFTPoints, self.dataOut.nHeights), dtype=fft_volt.dtype)
             for pair in self.dataOut.pairsList:
                 if pair[0] not in self.dataOut.channelList:
                     raise ValueError("Error getting CrossSpectra: pair 0 of %s is not in channelList = %s" % (
@@ -116,6 +117,7 @@ class SpectraProc(ProcessingUnit):
         self.dataOut.data_spc = spc
         self.dataOut.data_cspc = cspc
         self.dataOut.data_dc = dc
+        self.dataOut.precision = self.getPrecision(self.buffer.dtype)
         self.dataOut.blockSize = blocksize
         self.dataOut.flagShiftFFT = False
 
@@ -153,13 +155,13 @@ class SpectraProc(ProcessingUnit):
                 self.buffer = numpy.zeros((self.dataIn.nChannels,
                                            nProfiles,
                                            self.dataIn.nHeights),
-                                          dtype='complex')
+                                          dtype=self.getComplexDtype(self.dataIn.data.dtype))
 
             if self.dataIn.flagDataAsBlock:
                 nVoltProfiles = self.dataIn.data.shape[1]
 
                 if nVoltProfiles == nProfiles:
-                    self.buffer = self.dataIn.data.copy()
+                    self.buffer = self.dataIn.data.astype(self.getComplexDtype(self.dataIn.data.dtype))
                     self.profIndex = nVoltProfiles
 
                 elif nVoltProfiles < nProfiles:
@@ -406,12 +408,7 @@ class SpectraProc(ProcessingUnit):
         data_spc = self.dataOut.data_spc[:,
                                          minIndexVel:maxIndexVel + 1, minIndex:maxIndex + 1]
         # estimacion de ruido
-        noise = numpy.zeros(self.dataOut.nChannels)
-
-        for channel in range(self.dataOut.nChannels):
-            daux = data_spc[channel, :, :]
-            sortdata = numpy.sort(daux, axis=None)
-            noise[channel] = hildebrand_sekhon(sortdata, self.dataOut.nIncohInt)
+        noise = hildebrand_sekhon_batch(data_spc, self.dataOut.nIncohInt, axis=(1, 2))
 
         self.dataOut.noise_estimation = noise.copy()
 
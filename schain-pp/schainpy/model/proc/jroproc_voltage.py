@@ -2,10 +2,11 @@ import sys
 import numpy,math
 from scipy import interpolate
 from schainpy.model.proc.jroproc_base import ProcessingUnit, Operation, MPDecorator
-from schainpy.model.data.jrodata import Voltage,hildebrand_sekhon
+from schainpy.model.data.jrodata import Voltage,hildebrand_sekhon_batch
 from schainpy.utils import log
 from time import time
 from scipy import signal
+from scipy import fft as sp_fft
 
 import matplotlib.pyplot as plt
 
@@ -629,7 +630,7 @@ class CohInt(Operation):
     def integrateByBlock(self, dataOut):
 
         times = int(dataOut.data.shape[1]/self.n)
-        avgdata = numpy.zeros((dataOut.nChannels, times, dataOut.nHeights), dtype=numpy.complex_)
+        avgdata = numpy.zeros((dataOut.nChannels, times, dataOut.nHeights), dtype=numpy.result_type(dataOut.data, numpy.complex64))
 
         id_min = 0
         id_max = self.n
@@ -698,6 +699,8 @@ class Decoder(Operation):
     #         self.__setValues = False
         self.isConfig = False
         self.setupReq = False
+        self.__fftCodeBlock = None
+        self.__fftCodeKey = None
     def setup(self, code, osamp, dataOut):
 
         self.__profIndex = 0
@@ -726,18 +729,21 @@ class Decoder(Operation):
 
         self.fft_code = numpy.conj(numpy.fft.fft(__codeBuffer, axis=1))
 
+        # complex64 input (single precision) is decoded as complex64
+        dtype = numpy.result_type(dataOut.data, numpy.complex64)
+
         if dataOut.flagDataAsBlock:
 
             self.ndatadec = self.__nHeis #- self.nBaud + 1
 
-            self.datadecTime = numpy.zeros((self.__nChannels, self.__nProfiles, self.ndatadec), dtype=numpy.complex_)
+            self.datadecTime = numpy.zeros((self.__nChannels, self.__nProfiles, self.ndatadec), dtype=dtype)
 
         else:
 
             #Time
             self.ndatadec = self.__nHeis #- self.nBaud + 1
 
-            self.datadecTime = numpy.zeros((self.__nChannels, self.ndatadec), dtype=numpy.complex_)
+            self.datadecTime = numpy.zeros((self.__nChannels, self.ndatadec), dtype=dtype)
 
     def __convolutionInFreq(self, data):
 
@@ -882,23 +888,47 @@ class Decoder(Operation):
 
         return self.datadecTime
 
-    def __convolutionByBlockInFreq(self, data):
+    def __convolutionByBlockInFreq(self, data, code_2=None, DC_1=None, workers=None):
+        '''
+        Decode all channels and profiles of the block with one FFT along range,
+        the FFT length is the next fast size >= nHeis + nBaud - 1 so the
+        circular correlation is equal to the linear one of the time path.
+        '''
 
-        raise NotImplementedError("Decoder by frequency fro Blocks not implemented")
+        nHeis = data.shape[-1]
 
+        if code_2 is not None:
+            code = numpy.array(code_2).reshape(1, -1)
+        else:
+            code = self.code[numpy.arange(self.__nProfiles) % self.nCode]
 
-        fft_code = self.fft_code[self.__profIndex].reshape(1,-1)
+        nfft = sp_fft.next_fast_len(nHeis + code.shape[-1] - 1)
 
-        fft_data = numpy.fft.fft(data, axis=2)
+        # the FFT of the code is kept while the code (code_2 or the code of
+        # each profile), the FFT length and the dtype do not change
+        code = code.astype(self.datadecTime.dtype)
+        key = (nfft, code.shape, code.dtype.str, code.tobytes())
+        if self.__fftCodeKey != key:
+            self.__fftCodeBlock = numpy.conj(sp_fft.fft(code, nfft, axis=-1, workers=workers))
+            self.__fftCodeKey = key
 
-        conv = fft_data*fft_code
+        fft_data = sp_fft.fft(data, nfft, axis=-1, workers=workers)
+        fft_data *= self.__fftCodeBlock
+        dec = sp_fft.ifft(fft_data, axis=-1, overwrite_x=True, workers=workers)
 
-        data = numpy.fft.ifft(conv,axis=2)
+        # same shift as numpy.roll(corr, -int(DC_1*nHeis/100)) of the time path
+        d = int(DC_1*nHeis/100) % nHeis if DC_1 is not None else 0
+        self.datadecTime[..., :nHeis-d] = dec[..., d:nHeis]
+        self.datadecTime[..., nHeis-d:] = dec[..., :d]
 
-        return data
+        return self.datadecTime
 
 
-    def run(self, dataOut, code=None, nCode=None, nBaud=None, mode = 0, osamp=None, times=None, code_1=None, code_2=None, DC_1=None, H0=None, RMIX=None):
+    def run(self, dataOut, code=None, nCode=None, nBaud=None, mode = 0, osamp=None, times=None, code_1=None, code_2=None, DC_1=None, H0=None, RMIX=None, workers=None):
+        '''
+        mode 0: time domain, mode 1: frequency domain (FFT along range), for
+        blocks `workers` is the number of threads used by scipy.fft
+        '''
 
         if dataOut.flagDecodeData:
             print("This data is already decoded, recoding again ...")
@@ -941,7 +971,7 @@ class Decoder(Operation):
                 datadec = self.__convolutionByBlockInTime(dataOut.data, code_1, code_2, DC_1, H0, RMIX)
                 print(dataOut.code.shape)
             if mode == 1:
-                datadec = self.__convolutionByBlockInFreq(dataOut.data)
+                datadec = self.__convolutionByBlockInFreq(dataOut.data, code_2, DC_1, workers)
         else:
             """
             Decoding when data have been read profile by profile
@@ -1462,7 +1492,7 @@ class PulsePair(Operation):
         self.__buffer = numpy.zeros((dataOut.nChannels,
                                            n,
                                            dataOut.nHeights),
-                                          dtype='complex')
+                                          dtype=numpy.result_type(dataOut.data, numpy.complex64))
 
     def putData(self,data):
         '''
@@ -1490,10 +1520,7 @@ class PulsePair(Operation):
         #-----------------Calculo de Cscp------------------------------ New
         cspc_pair01 = self.__buffer[0]*self.__buffer[1]
         #------------------Calculo de Ruido x canal--------------------
-        self.noise  = numpy.zeros(self.__nch)
-        for i in range(self.__nch):
-            daux         = numpy.sort(pair0[i,:,:],axis= None)
-            self.noise[i]=hildebrand_sekhon( daux ,self.nCohInt)
+        self.noise  = hildebrand_sekhon_batch(pair0, self.nCohInt, axis=(1,2))
 
         self.noise       = self.noise.reshape(self.__nch,1)
         self.noise       = numpy.tile(self.noise,[1,self.__nHeis])
@@ -1543,7 +1570,7 @@ class PulsePair(Operation):
         data_specwidth   = (self.lambda_/(2*math.sqrt(2)*math.pi*self.ippSec*self.nCohInt))*tmp*numpy.sign(L)
         n                = self.__profIndex
 
-        self.__buffer    = numpy.zeros((self.__nch, self.__nProf,self.__nHeis),  dtype='complex')
+        self.__buffer    = numpy.zeros((self.__nch, self.__nProf,self.__nHeis),  dtype=self.__buffer.dtype)
         self.__profIndex = 0
         return data_power,data_intensity,data_velocity,data_snrPP,data_specwidth,data_ccf,n
 
@@ -1671,10 +1698,14 @@ class PulsePair_vRF(Operation):
         self.n       = n
         self.__nProf = n
 
-        self.__buffer = numpy.zeros((dataOut.nChannels,
-                                           n,
-                                           dataOut.nHeights),
-                                          dtype='complex')
+        dtype = numpy.result_type(dataOut.data, numpy.complex64)
+        shape = (dataOut.nChannels, n, dataOut.nHeights)
+
+        # arreglos de trabajo, se reservan una sola vez
+        if removeDC or not dataOut.flagDataAsBlock:
+            self.__buffer = numpy.zeros(shape, dtype=dtype)
+        self.__pair0  = numpy.empty(shape, dtype=numpy.finfo(dtype).dtype)
+        self.__pair   = numpy.empty(shape, dtype=dtype)
 
     def putData(self,data):
         '''
@@ -1686,12 +1717,30 @@ class PulsePair_vRF(Operation):
 
     def putDataByBlock(self,data,n):
         '''
-        Add a profile to he __buffer and increase in one the __profiel Index
+        Add a profile to he __buffer and increase in one the __profiel Index,
+        the block is used without copy if DC is not removed.
         '''
-        self.__buffer[:]= data
+        if self.removeDC:
+            self.__buffer[:]= data
+        else:
+            self.__buffer = data
         self.__profIndex      = n
         return
 
+    @staticmethod
+    def __mean(data, axis):
+        '''
+        Same result as numpy.nanmean without the copy of the data that it
+        does to replace NaNs (only used if the sum has NaN values)
+        '''
+        total = numpy.sum(data, axis=axis)
+
+        if numpy.isnan(total).any():
+            return numpy.nanmean(data, axis=axis)
+
+        return numpy.true_divide(total, data.shape[axis], out=total,
+                                 dtype=numpy.result_type(total, numpy.intp), casting='unsafe')
+
     def pushData(self,dataOut):
         '''
         Return the PULSEPAIR and the profiles used in the operation
@@ -1716,102 +1765,68 @@ class PulsePair_vRF(Operation):
         Este parametro esta dividido por los factores: nro. perfiles, nro intCoh y pwcode
         Igual a data_power
 
+        Los productos se calculan sobre __pair0 y __pair (reservados en setup)
+        y los factores por canal o altura se aplican con broadcasting.
         '''
+        buffer = self.__buffer
+        pair0  = self.__pair0
+        pair   = self.__pair
         #----------------- Remove DC-----------------------------------
         if self.removeDC==True:
-            mean    = numpy.nanmean(self.__buffer,1)
-            tmp     = mean.reshape(self.__nch,1,self.__nHeis)
-            dc= numpy.tile(tmp,[1,self.__nProf,1])
-            self.__buffer = self.__buffer -  dc
+            mean    = self.__mean(buffer,1)
+            buffer -= mean[:,numpy.newaxis,:]
         #------------------Calculo de Potencia ------------------------
-        pair0       = self.__buffer*numpy.conj(self.__buffer)#* 10.0
-        pair0       = pair0.real
+        numpy.multiply(buffer, numpy.conjugate(buffer, out=pair), out=pair)
+        pair0[:]    = pair.real
         #-----------------Calculo de Cscp------------------------------ New
-        if len(self.__buffer)>1:
-            cspc_pair01 = self.__buffer[0]*numpy.conjugate(self.__buffer[1])
+        if len(buffer)>1:
+            cspc_pair01 = numpy.multiply(buffer[0], numpy.conjugate(buffer[1], out=pair[0]), out=pair[0])
+            data_ccf    = self.__mean(cspc_pair01,0)/(numpy.sqrt(self.__mean(pair0[0],0)*self.__mean(pair0[1],0)))
+        else:
+            data_ccf = 0
         #------------------  Data Decodificada------------------------
         pwcode =  1
         if dataOut.flagDecodeData == True:
             # Cambio CHIRP
             pwcode = numpy.sum(numpy.abs(dataOut.code[0])**2)
             # pwcode = numpy.sum(dataOut.code[0]**2)
-            
-            
-        
-        pwcode_bins = numpy.zeros(len(self.__buffer[0,0,:]))
-        pwcode_bins[:] = pwcode
-        
-        pwcode_buffer = pwcode_bins.reshape(1, 1, len(self.__buffer[0,0,:]))
-        pwcode_buffer = numpy.tile(pwcode_buffer,[self.__nch, self.__nProf, 1])
-        # print(pwcode_buffer.shape)
-        
-        pair0_norm = pair0/pwcode_buffer
-        
-        
-        #------------------Calculo de Ruido x canal--------------------
-        self.noise  = numpy.zeros(self.__nch)
 
-        for i in range(self.__nch):
-            daux         = numpy.sort(pair0_norm[i,:,:],axis= None)
-            self.noise[i]=hildebrand_sekhon(daux,self.nCohInt)
+        pair0 /= pair0.dtype.type(pwcode)
 
-        
-        data_noise       = self.noise
-        self.noise       = self.noise.reshape(self.__nch,1)
-        self.noise       = numpy.tile(self.noise,[1,self.__nHeis])
-        noise_buffer     = self.noise.reshape(self.__nch,1,self.__nHeis)
-        noise_buffer     = numpy.tile(noise_buffer,[1,self.__nProf,1])
-        
-        noise_buffer_norm = noise_buffer/pwcode_buffer 
-        # print(noise_buffer_norm.shape)
-        
-        # print(noise_buffer.shape) # (2,500,2000)
+        #------------------Calculo de Ruido x canal--------------------
+        self.noise  = hildebrand_sekhon_batch(pair0, self.nCohInt, axis=(1,2)).astype(pair0.dtype)
 
+        data_noise       = self.noise
+        noise_norm       = self.noise/pair0.dtype.type(pwcode)
 
         #------------------ Potencia recibida= P , Potencia senal = S , Ruido= N--
         #------------------   P= S+N  ,P=lag_0/N ---------------------------------
         #-------------------- Power --------------------------------------------------
-        data_power         = numpy.nanmean(pair0_norm,axis=1)/(self.nCohInt)
-        #--------------------CCF------------------------------------------------------
-        if len(self.__buffer)>1:
-            data_ccf          =numpy.nanmean(cspc_pair01,axis=0)/(numpy.sqrt(numpy.nanmean(pair0[0],axis=0)*numpy.nanmean(pair0[1],axis=0)))
-        else:
-            data_ccf = 0
+        data_power         = self.__mean(pair0,1)/(self.nCohInt)
         #------------------  Senal  --------------------------------------------------
-        data_intensity  = (pair0_norm-noise_buffer_norm*self.nCohInt)/(self.nCohInt)
-        data_intensity   = numpy.nanmean(data_intensity,axis=1)
+        pair0 -= (noise_norm*self.nCohInt)[:,numpy.newaxis,numpy.newaxis]
+        pair0 /= self.nCohInt
+        data_intensity   = self.__mean(pair0,1)
 
         #----------------- Calculo de Frecuencia y Velocidad doppler--------
-           
-        
-        # print(pair1.shape)
-        pwcode_buffer_pair1 = pwcode_buffer[:, :-1, :]
-        # print(pwcode_buffer_pair1.shape) # (2,500,2000)
-        
-        
-        pair1            = self.__buffer[:,:-1,:]*numpy.conjugate(self.__buffer[:,1:,:])
-        
-        pair1_norm = pair1/pwcode_buffer_pair1
-        
-        lag_1            = numpy.sum(pair1_norm,1)
+        pair1            = pair[:,:-1,:]
+        numpy.conjugate(buffer[:,1:,:], out=pair1)
+        numpy.multiply(buffer[:,:-1,:], pair1, out=pair1)
+        pair1 /= pair.dtype.type(pwcode)
+
+        lag_1            = numpy.sum(pair1,1)
         data_freq        = (-1/(2.0*math.pi*self.ippSec*self.nCohInt))*numpy.angle(lag_1)
         data_velocity    = (self.lambda_/2.0)*data_freq
 
         #---------------- Potencia promedio estimada de la Senal-----------
         lag_0            = data_power
-        S                = lag_0-self.noise
+        S                = lag_0-self.noise[:,numpy.newaxis]
         #---------------- Frecuencia Doppler promedio ---------------------
         lag_1            = lag_1/((self.n-1)*self.nCohInt)
         R1               = numpy.abs(lag_1)
 
         #---------------- Calculo del SNR----------------------------------
-        data_snrPP       = S/self.noise
-        '''
-        for i in range(self.__nch):
-            for j in range(self.__nHeis):
-                if data_snrPP[i][j]  < 1.e-20:
-                    data_snrPP[i][j] = 1.e-20
-        '''
+        data_snrPP       = S/self.noise[:,numpy.newaxis]
         data_snrPP[data_snrPP<1.e-20] = 1.e-20
         #----------------- Calculo del ancho espectral ----------------------
         L                = S/R1
@@ -1821,13 +1836,7 @@ class PulsePair_vRF(Operation):
         data_specwidth   = (self.lambda_/(2*math.sqrt(2)*math.pi*self.ippSec*self.nCohInt))*tmp
         n                = self.__profIndex
 
-        self.__buffer    = numpy.zeros((self.__nch, self.__nProf,self.__nHeis),  dtype='complex')
         self.__profIndex = 0
-        #print(data_snrPP)
-        #import matplotlib.pyplot as plt
-        #plt.plot(data_snrPP)
-        #plt.show()
-        #plt.savefig(f"snrPP-{pwcode}-{dataOut.utctime}.png")
         return data_power,data_intensity,data_velocity,data_snrPP,data_specwidth,data_ccf,data_noise,n
 
 
@@ -0,0 +1,116 @@
+from multiprocessing import Queue
+
+import numpy
+import pytest
+
+from schainpy.controller import OperationConf
+from schainpy.model.data.jrodata import Parameters, WEATHER_VARS
+from schainpy.model.proc.jroproc_base import ProcessingUnit, Operation, MPDecorator
+from schainpy.model.proc.jroproc_parameters import Block360
+
+nch = 2
+nHeights = 100
+
+
+@MPDecorator
+class Consumer(Operation):
+
+    def run(self, dataOut, **kwargs):
+        pass
+
+
+class Radials(ProcessingUnit):
+    '''
+    Radiales de un PPI con elevacion 4, el azimuth da una vuelta y empieza
+    la siguiente
+    '''
+
+    def __init__(self):
+
+        ProcessingUnit.__init__(self)
+        self.n = 0
+
+    def run(self):
+
+        self.dataOut = Parameters()
+        self.dataOut.data_param = numpy.empty((nch, len(WEATHER_VARS), nHeights))
+        for name, i in WEATHER_VARS.items():
+            self.dataOut.data_param[:, i] = i*1000 + self.n % 360
+        self.dataOut.azimuth = float(self.n % 360)
+        self.dataOut.elevation = 4.0
+        self.dataOut.time_pedestal = 1729000800 + self.n*0.1
+        self.dataOut.utctime = self.dataOut.time_pedestal
+        self.dataOut.dataPP_NOISE = numpy.ones(nch)
+        self.dataOut.flagNoData = False
+        self.n += 1
+
+
+def getConf(id, name, optype, **kwargs):
+
+    conf = OperationConf()
+    conf.setup(id, name, '0', '1', None)
+    conf.type = optype
+    for key, value in kwargs.items():
+        conf.addParameter(key, value)
+    return conf
+
+
+@pytest.mark.parametrize('transport', ['pickle', 'shared'])
+def test_block360_select(transport):
+
+    unit = Radials()
+    unit.addOperation(
+        getConf(11, 'Block360', 'other', attr_data='data_param', angles='[4.0]', parameters='S,V,SNR'),
+        Block360())
+    ops = {}
+    for n, kwargs in enumerate(({'weather_var': 'S'}, {'attr_data': 'V', 'mask': '0.5'}, {})):
+        op = Consumer(12 + n, 12 + n, '1', Queue())
+        op.setTransport(transport)
+        unit.addOperation(getConf(12 + n, 'Consumer', 'external', **kwargs), op)
+        ops[n] = op
+
+    for n in range(362):
+        unit.call()
+
+    frames = {n: op.queue.get() for n, op in ops.items()}
+    for n, op in ops.items():
+        assert op.queue.queue.empty()
+
+    # HDFWriter(weather_var='S') recibe solo S
+    dataOut = frames[0][0][0]
+    assert dataOut.weather_vars == {'S': 0}
+    assert dataOut.data_param.shape == (nch, 1, 360, nHeights)
+    numpy.testing.assert_array_equal(dataOut.data_param[0, 0, :, 0], numpy.arange(360))
+
+    # WeatherParamsPlot(attr_data='V', mask=...) recibe V y SNR
+    dataOut = frames[1][0][0]
+    assert dataOut.weather_vars == {'V': 0, 'SNR': 1}
+    numpy.testing.assert_array_equal(dataOut.data_param[1, 0, :, 0], 1000 + numpy.arange(360))
+    numpy.testing.assert_array_equal(dataOut.data_param[1, 1, :, 0], 3000 + numpy.arange(360))
+
+    # sin variable se recibe todo el barrido de Block360
+    dataOut = frames[2][0][0]
+    assert dataOut.weather_vars == {'S': 0, 'V': 1, 'SNR': 2}
+    assert dataOut.data_param.shape == (nch, 3, 360, nHeights)
+
+    unit.sharedPool and unit.sharedPool.close()
+
+
+def test_parameters_select():
+
+    dataOut = Parameters()
+    dataOut.data_param = numpy.arange(2*3*4).reshape(2, 3, 4)
+    dataOut.weather_vars = {'S': 0, 'V': 1, 'SNR': 2}
+
+    assert dataOut.select() is dataOut
+    assert dataOut.select(weather_var='W') is dataOut
+    assert dataOut.select(attr_data=['S', 'V', 'SNR']) is dataOut
+
+    obj = dataOut.select(weather_var='V')
+    assert obj.weather_vars == {'V': 0}
+    numpy.testing.assert_array_equal(obj.data_param, dataOut.data_param[:, [1]])
+
+    obj = dataOut.select(attr_data='S', mask=0.5)
+    assert obj.weather_vars == {'S': 0, 'SNR': 1}
+    numpy.testing.assert_array_equal(obj.data_param, dataOut.data_param[:, [0, 2]])
+    assert dataOut.weather_vars == {'S': 0, 'V': 1, 'SNR': 2}
@@ -0,0 +1,121 @@
+import numpy
+import pytest
+
+from schainpy.controller import OperationConf
+from schainpy.model.data.jrodata import Voltage, Spectra
+from schainpy.model.proc.jroproc_base import FrameQueue, ProcessingUnit
+from schainpy.model.proc.jroproc_voltage import interpolateHeights
+from schainpy.model.proc.jroproc_spectra import removeDC
+
+
+def getVoltage():
+
+    rng = numpy.random.default_rng(0)
+    dataOut = Voltage()
+    dataOut.data = rng.normal(0, 1, (2, 100)) + 1j*rng.normal(0, 1, (2, 100))
+    return dataOut
+
+
+def getSpectra():
+
+    rng = numpy.random.default_rng(0)
+    dataOut = Spectra()
+    dataOut.data_spc = rng.uniform(1, 2, (2, 16, 50))
+    dataOut.data_cspc = rng.normal(0, 1, (1, 16, 50)) + 1j*rng.normal(0, 1, (1, 16, 50))
+    return dataOut
+
+
+def send(aux):
+    '''
+    Envia el snapshot como a una operacion externa, devuelve la cola
+    '''
+
+    queue = FrameQueue()
+    queue.put(aux)
+    return queue
+
+
+def receive(queue):
+
+    (dataOut, coalesced), = queue.get()
+    return dataOut
+
+
+def test_snapshot_freezes_only_the_copy():
+
+    dataOut = getVoltage()
+    data = dataOut.data
+    aux = dataOut.snapshot()
+
+    assert dataOut.data is data
+    assert dataOut.data.flags.writeable
+    assert not aux.data.flags.writeable
+    assert numpy.shares_memory(aux.data, data)
+    numpy.testing.assert_array_equal(aux.data, data)
+
+
+def test_interpolate_heights_cow():
+
+    ref = interpolateHeights().run(getVoltage(), topLim=60, botLim=50).data
+
+    dataOut = getVoltage()
+    before = dataOut.data.copy()
+    queue = send(dataOut.snapshot())
+    out = interpolateHeights().run(dataOut, topLim=60, botLim=50).data
+
+    numpy.testing.assert_array_equal(out, ref)
+    # la operacion externa recibe los datos de antes de la escritura
+    numpy.testing.assert_array_equal(receive(queue).data, before)
+
+
+def test_remove_dc_cow():
+
+    ref = removeDC().run(getSpectra())
+
+    dataOut = getSpectra()
+    before = dataOut.data_spc.copy()
+    queue = send(dataOut.snapshot())
+    out = removeDC().run(dataOut)
+
+    numpy.testing.assert_array_equal(out.data_spc, ref.data_spc)
+    numpy.testing.assert_array_equal(out.data_cspc, ref.data_cspc)
+    numpy.testing.assert_array_equal(receive(queue).data_spc, before)
+
+
+class External(object):
+
+    transport = None
+
+    def __init__(self):
+        self.queue = FrameQueue()
+
+
+class Unit(ProcessingUnit):
+
+    def run(self):
+
+        self.dataOut = getVoltage()
+        self.dataOut.flagNoData = False
+
+
+@pytest.mark.parametrize('copy_mode', ['deep', 'cow'])
+def test_external_frame_copied_once(monkeypatch, copy_mode):
+
+    unit = Unit()
+    unit.setCopyMode(copy_mode)
+    conf = OperationConf()
+    conf.setup('11', 'External', '0', '1', None)
+    conf.type = 'external'
+    op = External()
+    unit.addOperation(conf, op)
+
+    # el cuadro se serializa en la cola, no se hace otra copia profunda
+    def copy(self, inputObj=None):
+        raise AssertionError('dataOut.copy called')
+    monkeypatch.setattr(Voltage, 'copy', copy)
+
+    unit.call()
+    before = unit.dataOut.data.copy()
+    unit.dataOut.data *= 2
+
+    numpy.testing.assert_array_equal(receive(op.queue).data, before)
@@ -0,0 +1,79 @@
+import numpy
+import pytest
+
+from schainpy.model.data.jrodata import Voltage
+from schainpy.model.proc.jroproc_voltage import Decoder
+
+nChannels = 2
+nProfiles = 8
+nHeights = 64
+
+# codigo complementario de 4 baudios, un codigo por perfil
+CODE = [[1, 1, 1, -1], [1, 1, -1, 1]]
+
+
+def getBlock(dtype=numpy.complex128):
+
+    rng = numpy.random.default_rng(0)
+    dataOut = Voltage()
+    dataOut.data = (rng.normal(0, 1, (nChannels, nProfiles, nHeights)) +
+                    1j*rng.normal(0, 1, (nChannels, nProfiles, nHeights))).astype(dtype)
+    dataOut.heightList = numpy.arange(nHeights, dtype=float)
+    dataOut.channelList = list(range(nChannels))
+    dataOut.nProfiles = nProfiles
+    dataOut.flagDataAsBlock = True
+    dataOut.flagDecodeData = False
+    dataOut.code = None
+    return dataOut
+
+
+def correlate(data, codes, DC_1=0):
+    '''
+    Correlacion de cada perfil con su codigo como el decodificador en tiempo
+    '''
+
+    out = numpy.zeros(data.shape, dtype=complex)
+    for i in range(data.shape[0]):
+        for j in range(data.shape[1]):
+            code = numpy.asarray(codes[j % len(codes)])
+            out[i, j] = numpy.correlate(data[i, j], code, mode='full')[len(code) - 1:]
+    return numpy.roll(out, -int(DC_1*data.shape[-1]/100), axis=-1)
+
+
+def test_block_decoding_in_freq():
+
+    dataOut = getBlock()
+    data = dataOut.data.copy()
+    Decoder().run(dataOut, code=CODE, nCode=2, nBaud=4, mode=1)
+
+    assert dataOut.flagDecodeData
+    assert dataOut.data.shape == (nChannels, nProfiles, nHeights)
+    numpy.testing.assert_allclose(dataOut.data, correlate(data, CODE), atol=1e-12)
+
+
+@pytest.mark.parametrize('dtype', [numpy.complex64, numpy.complex128])
+def test_block_decoding_chirp(dtype):
+
+    t = numpy.arange(16)/16.
+    code_2 = numpy.exp(1j*numpy.pi*8*t**2)
+    dataOut = getBlock(dtype)
+    data = dataOut.data.copy()
+    Decoder().run(dataOut, code=[[1]], nCode=1, nBaud=1, mode=1, code_2=list(code_2), DC_1=10.)
+
+    assert dataOut.data.dtype == dtype
+    atol = 1e-4 if dtype == numpy.complex64 else 1e-12
+    numpy.testing.assert_allclose(dataOut.data, correlate(data, [code_2], DC_1=10.), atol=atol)
+
+
+def test_block_decoding_code_change():
+
+    t = numpy.arange(16)/16.
+    codes = [numpy.exp(1j*numpy.pi*8*t**2), numpy.exp(-1j*numpy.pi*4*t**2)]
+    decoder = Decoder()
+    # el mismo decodificador con otro codigo de igual tamaño no reutiliza la
+    # FFT del codigo anterior
+    for code_2 in codes + codes[:1]:
+        dataOut = getBlock()
+        data = dataOut.data.copy()
+        decoder.run(dataOut, code=[[1]], nCode=1, nBaud=1, mode=1, code_2=list(code_2))
+        numpy.testing.assert_allclose(dataOut.data, correlate(data, [code_2]), atol=1e-12)
@@ -0,0 +1,88 @@
+import os
+
+import h5py
+import numpy
+
+from schainpy.model.data.jrodata import Voltage
+from schainpy.model.proc.jroproc_parameters import PedestalIndex, PedestalInformation
+
+start = 1729000800
+interval = 0.04
+
+
+def writePos(path, n):
+
+    folder = os.path.join(path, '2024-10-15T14-00-00')
+    os.makedirs(folder, exist_ok=True)
+    with h5py.File(os.path.join(folder, 'pos@{}.000.h5'.format(start)), 'w') as fp:
+        data = fp.create_group('Data')
+        data['utc'] = start + numpy.arange(n)*interval
+        data['azi_pos'] = numpy.arange(n)*0.1
+        data['ele_pos'] = numpy.full(n, 4.0)
+
+
+def test_wait_reloads_only_changed_file(tmp_path, capsys):
+
+    path = str(tmp_path)
+    writePos(path, 100)
+    index = PedestalIndex(path, interval, azi_offset=0)
+    index.refresh()
+    capsys.readouterr()
+
+    # el ultimo archivo aun no tiene datos para este tiempo
+    utctime = start + 150*interval
+    for n in range(5):
+        assert not index.isAvailable(utctime)
+    assert capsys.readouterr().out.count('Opening file') == 1
+
+    # el archivo se completa
+    writePos(path, 200)
+    assert index.isAvailable(utctime)
+    assert 'Opening file' not in capsys.readouterr().out
+
+    azi, ele, utc = index.query([utctime])
+    numpy.testing.assert_allclose(azi, [15.0])
+
+
+def test_profiles_without_positions(tmp_path, capsys):
+
+    path = str(tmp_path)
+    writePos(path, 100)
+    op = PedestalInformation()
+    dataOut = Voltage()
+    dataOut.nProfiles = 200
+    dataOut.ippSeconds = interval
+    dataOut.nCohInt = 1
+
+    # los ultimos 100 perfiles del bloque aun no tienen posicion
+    for n in range(2):
+        dataOut.utctime = start + n*interval
+        op.run(dataOut, path, profiles=True, timeout=0, shared=False)
+        assert not dataOut.flagNoData
+        assert numpy.isfinite(dataOut.azimuth_profiles[:100 - n]).all()
+        assert numpy.isnan(dataOut.azimuth_profiles[100 - n:]).all()
+    assert capsys.readouterr().out.count('No positions for the last profiles') == 1
+
+
+def test_heading_and_shared_index(tmp_path):
+
+    path = str(tmp_path)
+    writePos(path, 100)
+    dataOut = Voltage()
+    dataOut.utctime = start + 10*interval
+
+    azimuth = {}
+    for heading in (0, 90, -30):
+        op = PedestalInformation()
+        op.run(dataOut, path, heading=heading, timeout=0)
+        azimuth[heading] = dataOut.azimuth
+    numpy.testing.assert_allclose(azimuth[0], 1.0 + PedestalIndex.AZI_OFFSET)
+    numpy.testing.assert_allclose(azimuth[90], 91.0 + PedestalIndex.AZI_OFFSET)
+    numpy.testing.assert_allclose(azimuth[-30], 1.0 + PedestalIndex.AZI_OFFSET - 30 + 360)
+
+    # solo se comparte la instancia con las mismas opciones
+    index = PedestalIndex.get(path, interval)
+    assert PedestalIndex.get(path, interval) is index
+    assert PedestalIndex.get(path, interval, cache=2) is not index
+    other = PedestalIndex.get(path, interval, index_file=str(tmp_path / 'index.json'))
+    assert other is not index and other.index_file == str(tmp_path / 'index.json')
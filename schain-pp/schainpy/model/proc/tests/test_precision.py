@@ -0,0 +1,87 @@
+import io
+import contextlib
+
+import numpy
+import pytest
+
+from schainpy.model.data.jrodata import Voltage
+from schainpy.model.io.jroIO_simulator import SimulatorReader
+from schainpy.model.proc.jroproc_base import ProcessingUnit
+from schainpy.model.proc.jroproc_spectra import SpectraProc
+
+nChannels = 2
+nProfiles = 16
+nHeights = 1000
+
+DTYPES = {'double': (numpy.complex128, numpy.float64), 'single': (numpy.complex64, numpy.float32)}
+
+
+class Reader(ProcessingUnit):
+    '''
+    Lector que entrega `dtype` sin importar la precision
+    '''
+
+    dtype = numpy.complex128
+
+    def run(self):
+
+        self.dataOut = Voltage()
+        self.dataOut.data = numpy.ones((nChannels, nHeights), dtype=self.dtype)
+        self.dataOut.flagNoData = False
+
+
+@pytest.mark.parametrize('precision', ['double', 'single'])
+def test_simulator_spectra_precision(precision):
+
+    complex_, float_ = DTYPES[precision]
+    sim = SimulatorReader()
+    proc = SpectraProc()
+    for unit in (sim, proc):
+        unit.setPrecision(precision)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        for n in range(nProfiles):
+            sim.call(samples=nHeights, channels=nChannels, profilesPerBlock=nProfiles,
+                     dataBlocksPerFile=2, FixRCP_IPP=60)
+            assert sim.dataOut.data.dtype == complex_
+            proc.dataIn = sim.dataOut
+            proc.call(nFFTPoints=nProfiles, pairsList=[(0, 1)])
+
+    assert not proc.dataOut.flagNoData
+    assert proc.dataOut.data_spc.dtype == float_
+    assert proc.dataOut.data_cspc.dtype == complex_
+    assert proc.dataOut.precision == precision
+
+
+@pytest.mark.parametrize('precision', ['double', 'single'])
+def test_reader_cast_to_precision(precision):
+
+    reader = Reader()
+    reader.setPrecision(precision)
+    reader.call()
+
+    assert reader.dataOut.data.dtype == DTYPES[precision][0]
+    assert reader.dataOut.precision == precision
+
+
+@pytest.mark.parametrize('dtype', [numpy.complex64, numpy.complex128])
+def test_reader_keeps_dtype_without_precision(dtype):
+
+    reader = Reader()
+    reader.dtype = dtype
+    reader.call()
+
+    assert reader.dataOut.data.dtype == dtype
+    assert reader.dataOut.precision == ProcessingUnit.getPrecision(dtype)
+
+
+def test_simulator_default_dtype():
+
+    sim = SimulatorReader()
+    with contextlib.redirect_stdout(io.StringIO()):
+        sim.call(samples=nHeights, channels=nChannels, profilesPerBlock=nProfiles,
+                 dataBlocksPerFile=2, FixRCP_IPP=60)
+
+    # como antes de seleccionar la precision
+    assert sim.dataOut.data.dtype == numpy.complex64
+    assert sim.dataOut.precision == 'single'
@@ -0,0 +1,49 @@
+import io
+import contextlib
+
+import numpy
+import pytest
+
+from schainpy.controller import OperationConf
+from schainpy.model.data.jrodata import Voltage
+from schainpy.model.proc.jroproc_base import ProcessingUnit, Operation
+
+
+class Failing(Operation):
+
+    def run(self, dataOut):
+        raise ValueError('operation failed')
+
+
+class Unit(ProcessingUnit):
+
+    def run(self, fail=False):
+
+        if fail:
+            raise ValueError('unit failed')
+        self.dataOut = Voltage()
+        self.dataOut.data = numpy.zeros((2, 10))
+        self.dataOut.flagNoData = False
+
+
+def test_stats_when_run_raises():
+
+    unit = Unit()
+    unit.enableStats('1')
+    conf = OperationConf()
+    conf.setup('11', 'Failing', '0', '1', None)
+    conf.type = 'other'
+    unit.addOperation(conf, Failing())
+
+    with pytest.raises(ValueError):
+        unit.call()
+
+    # la unidad falla y no se llega a la operacion
+    unit.dataOut.flagNoData = True
+    with contextlib.redirect_stdout(io.StringIO()):
+        unit.call(fail=True)
+
+    rows = unit.getStats()
+    assert rows[0]['calls'] == 2
+    assert rows[1]['calls'] == 1
+    assert rows[0]['wall'] > 0 and rows[1]['wall'] > 0
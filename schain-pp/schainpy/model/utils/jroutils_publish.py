@@ -9,6 +9,8 @@ import os
 import glob
 import time
 import json
+import zlib
+import pickle
 import numpy
 import zmq
 import datetime
@@ -18,9 +20,23 @@ from threading import Thread
 from multiprocessing import Process
 
 from schainpy.model.proc.jroproc_base import Operation, ProcessingUnit, MPDecorator
+from schainpy.model.data import jrodata
 from schainpy.model.data.jrodata import JROData
 from schainpy.utils import log
 
+try:
+    import lz4.frame
+except ImportError:
+    lz4 = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+PROTOCOL_VERSION = 1
+# arreglos mas chicos no se comprimen
+COMPRESS_MIN_BYTES = 4096
 
 PLOT_CODES = {
     'rti': 0,            # Range time intensity (RTI).
@@ -54,21 +70,157 @@ def get_plot_code(s):
         return 24
 
 
+def get_codec(compression, level=None):
+    '''
+    Compress/decompress functions for the array frames, zlib is always
+    available, lz4 and zstd need their packages.
+    '''
+
+    if compression == 'zlib':
+        level = 1 if level is None else level
+        return (lambda buf: zlib.compress(buf, level)), zlib.decompress
+    if compression == 'lz4':
+        if lz4 is None:
+            raise ImportError('lz4 compression needs the lz4 package')
+        level = 0 if level is None else level
+        return (lambda buf: lz4.frame.compress(buf, compression_level=level)), lz4.frame.decompress
+    if compression == 'zstd':
+        if zstandard is None:
+            raise ImportError('zstd compression needs the zstandard package')
+        compressor = zstandard.ZstdCompressor(level=3 if level is None else level)
+        return compressor.compress, zstandard.ZstdDecompressor().decompress
+
+    raise ValueError('compression should be zlib, lz4 or zstd not {}'.format(compression))
+
+
+def pack_data(dataOut, attrs=None, compression=None, level=None):
+    '''
+    Serialize dataOut as a multipart message:
+
+        [header (json), objects (pickle), array_0, array_1, ...]
+
+    The header has the protocol version, the class of dataOut, the scalar
+    attributes and the layout of the arrays, numpy arrays are sent as raw
+    frames (zero-copy if they are contiguous and not compressed) and any
+    other attribute (header objects, lists, dicts) goes pickled in the
+    objects frame. `attrs` selects the attributes to send.
+    '''
+
+    if attrs is None:
+        keys = list(dataOut.__dict__)
+    else:
+        keys = [key for key in ['type', 'utctime', 'flagNoData', 'finished'] + list(attrs)
+                if key in dataOut.__dict__]
+
+    if compression:
+        compress = get_codec(compression, level)[0]
+
+    scalars = {}
+    objects = {}
+    arrays = []
+    frames = []
+
+    for key in dict.fromkeys(keys):
+        value = dataOut.__dict__[key]
+        if isinstance(value, numpy.generic) and not numpy.iscomplexobj(value):
+            value = value.item()
+        if value is None or isinstance(value, (bool, int, float, str)):
+            scalars[key] = value
+        elif isinstance(value, numpy.ndarray) and not value.dtype.hasobject:
+            value = numpy.ascontiguousarray(value)
+            codec = None
+            if compression and value.nbytes >= COMPRESS_MIN_BYTES:
+                codec = compression
+                value = compress(value)
+            arrays.append((key, value.dtype.str if codec is None else dataOut.__dict__[key].dtype.str,
+                           dataOut.__dict__[key].shape, codec))
+            frames.append(value)
+        else:
+            objects[key] = value
+
+    header = {
+        'version': PROTOCOL_VERSION,
+        'class': type(dataOut).__name__,
+        'attrs': scalars,
+        'arrays': arrays,
+        }
+
+    return [json.dumps(header).encode(),
+            pickle.dumps(objects, pickle.HIGHEST_PROTOCOL) if objects else b''] + frames
+
+
+def unpack_data(frames):
+    '''
+    Rebuild dataOut from the frames of `pack_data` (zmq.Frame or bytes),
+    uncompressed arrays use the buffer of the frame without copying.
+    '''
+
+    frames = [frame.buffer if isinstance(frame, zmq.Frame) else frame for frame in frames]
+    header = json.loads(bytes(frames[0]))
+
+    if header.get('version', 0) > PROTOCOL_VERSION:
+        raise ValueError('Protocol version {} not supported (max {})'.format(
+            header.get('version'), PROTOCOL_VERSION))
+
+    dataOut = getattr(jrodata, header['class'], JROData)()
+    dataOut.__dict__.update(header['attrs'])
+
+    if len(frames[1]):
+        dataOut.__dict__.update(pickle.loads(frames[1]))
+
+    for (key, dtype, shape, codec), frame in zip(header['arrays'], frames[2:]):
+        if codec is not None:
+            frame = get_codec(codec)[1](frame)
+        value = numpy.frombuffer(frame, dtype=dtype).reshape(shape)
+        if not value.flags.writeable:
+            value = value.copy()
+        dataOut.__dict__[key] = value
+
+    return dataOut
+
+
 class PublishData(Operation):
     '''
     Operation to send data over zmq.
+
+    Parameters:
+    -----------
+    server : str
+        zmq address (tcp://...) or name of the ipc pipe
+    protocol : str
+        'pickle' sends the whole dataOut pickled, 'numpy' sends a json
+        header and the arrays as separate frames without copying them (it
+        waits until zmq has sent them)
+    attrs : list
+        only send these attributes of dataOut (numpy protocol)
+    compression : str
+        compress the arrays with zlib, lz4 or zstd (numpy protocol)
+    level : int
+        compression level
     '''
 
-    __attrs__ = ['host', 'port', 'delay', 'verbose']
+    __attrs__ = ['host', 'port', 'delay', 'verbose', 'server', 'protocol', 'attrs', 'compression', 'level']
 
-    def setup(self, server='zmq.pipe', delay=0, verbose=True, **kwargs):
+    def setup(self, server='zmq.pipe', delay=0, verbose=True, protocol='pickle', attrs=None,
+              compression=None, level=None, **kwargs):
         self.counter = 0
         self.delay = kwargs.get('delay', 0)
         self.cnt = 0
         self.verbose = verbose        
+        if protocol not in ('pickle', 'numpy'):
+            raise ValueError('protocol should be pickle or numpy')
+        if isinstance(attrs, str):
+            attrs = [attrs]
+        if compression in ('none', 'None'):
+            compression = None
+        if compression:
+            get_codec(compression, level)
+        self.protocol = protocol
+        self.attrs = attrs
+        self.compression = compression
+        self.level = level
         context = zmq.Context()
         self.zmq_socket = context.socket(zmq.PUSH)
-        server = kwargs.get('server', 'zmq.pipe')
 
         if 'tcp://' in server:
             address = server
@@ -87,7 +239,24 @@ class PublishData(Operation):
                 'Sending {} - {}'.format(self.dataOut.type, self.dataOut.datatime),
                 self.name
             )
-        self.zmq_socket.send_pyobj(self.dataOut)
+        self.send()
+
+    def send(self):
+
+        if self.protocol == 'numpy':
+            # los arreglos de dataOut se envian sin copiar, se espera a que zmq
+            # los termine de usar (send_multipart solo sigue el ultimo frame y
+            # cada zmq.Frame retiene su mensaje) antes de que la unidad los
+            # vuelva a escribir
+            frames = [zmq.Frame(frame, track=True) for frame in
+                      pack_data(self.dataOut, self.attrs, self.compression, self.level)]
+            trackers = [frame.tracker for frame in frames]
+            self.zmq_socket.send_multipart(frames, copy=False)
+            del frames
+            for tracker in trackers:
+                tracker.wait()
+        else:
+            self.zmq_socket.send_pyobj(self.dataOut)
 
     def run(self, dataOut, **kwargs):
         self.dataOut = dataOut
@@ -101,7 +270,7 @@ class PublishData(Operation):
     def close(self):
         
         self.dataOut.finished = True
-        self.zmq_socket.send_pyobj(self.dataOut)
+        self.send()
         time.sleep(0.1)
         self.zmq_socket.close()
         
@@ -112,20 +281,21 @@ class ReceiverData(ProcessingUnit):
 
     def __init__(self, **kwargs):
 
-        ProcessingUnit.__init__(self, **kwargs)
+        ProcessingUnit.__init__(self)
 
         self.isConfig = False
-        server = kwargs.get('server', 'zmq.pipe')
+        self.server = kwargs.get('server', 'zmq.pipe')
+        self.dataOut = JROData()
+
+    def setup(self, server=None):
+
+        server = server or self.server
         if 'tcp://' in server:
             address = server
         else:
             address = 'ipc:///tmp/%s' % server
 
         self.address = address
-        self.dataOut = JROData()
-
-    def setup(self):
-
         self.context = zmq.Context()
         self.receiver = self.context.socket(zmq.PULL)
         self.receiver.bind(self.address)
@@ -133,13 +303,18 @@ class ReceiverData(ProcessingUnit):
         log.success('ReceiverData from {}'.format(self.address))
 
 
-    def run(self):
+    def run(self, server=None):
 
         if not self.isConfig:
-            self.setup()
+            self.setup(server)
             self.isConfig = True
 
-        self.dataOut = self.receiver.recv_pyobj()
+        # un solo frame: dataOut serializado con pickle (send_pyobj)
+        frames = self.receiver.recv_multipart(copy=False)
+        if len(frames) == 1:
+            self.dataOut = pickle.loads(frames[0].buffer)
+        else:
+            self.dataOut = unpack_data(frames)
         log.log('{} - {}'.format(self.dataOut.type,
                                  self.dataOut.datatime.ctime(),),
                 'Receiving')
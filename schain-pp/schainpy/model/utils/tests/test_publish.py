@@ -0,0 +1,102 @@
+import os
+from threading import Thread
+
+import numpy
+import pytest
+import zmq
+
+from schainpy.model.data.jrodata import Spectra
+from schainpy.model.utils.jroutils_publish import pack_data, unpack_data, PublishData, ReceiverData
+
+
+def getSpectra():
+
+    rng = numpy.random.default_rng(0)
+    dataOut = Spectra()
+    dataOut.utctime = 1729000800.5
+    dataOut.flagNoData = False
+    dataOut.data_spc = rng.uniform(1, 2, (2, 64, 100)).astype(numpy.float32)
+    cspc = rng.normal(0, 1, (1, 100, 64)) + 1j*rng.normal(0, 1, (1, 100, 64))
+    # no contiguo (transpuesto)
+    dataOut.data_cspc = cspc.transpose(0, 2, 1)
+    # no contiguo (cada 2 alturas) y entero
+    dataOut.data_dc = numpy.arange(2*200, dtype=numpy.int16).reshape(2, 200)[:, ::2]
+    dataOut.heightList = numpy.arange(100)*0.15
+    dataOut.channelList = [0, 1]
+    return dataOut
+
+
+def check(dataOut, ref):
+
+    assert type(dataOut) is type(ref)
+    assert dataOut.utctime == ref.utctime
+    assert dataOut.channelList == ref.channelList
+    for key in ('data_spc', 'data_cspc', 'data_dc', 'heightList'):
+        value = getattr(dataOut, key)
+        assert value.dtype == getattr(ref, key).dtype
+        assert value.shape == getattr(ref, key).shape
+        assert value.flags.writeable
+        numpy.testing.assert_array_equal(value, getattr(ref, key))
+
+
+@pytest.mark.parametrize('compression', [None, 'zlib'])
+def test_pack_send_recv_unpack(compression):
+
+    ref = getSpectra()
+    context = zmq.Context()
+    receiver = context.socket(zmq.PULL)
+    port = receiver.bind_to_random_port('tcp://127.0.0.1')
+    sender = context.socket(zmq.PUSH)
+    sender.connect('tcp://127.0.0.1:{}'.format(port))
+
+    try:
+        sender.send_multipart(pack_data(ref, compression=compression), copy=False)
+        dataOut = unpack_data(receiver.recv_multipart(copy=False))
+    finally:
+        sender.close(linger=0)
+        receiver.close(linger=0)
+        context.term()
+
+    check(dataOut, ref)
+
+
+def test_pack_attrs():
+
+    ref = getSpectra()
+    dataOut = unpack_data(pack_data(ref, attrs=['data_spc']))
+
+    assert dataOut.utctime == ref.utctime
+    assert dataOut.data_cspc is None
+    numpy.testing.assert_array_equal(dataOut.data_spc, ref.data_spc)
+
+
+def test_publish_before_overwrite():
+    '''
+    Los arreglos se envian sin copiar, la unidad los vuelve a escribir
+    apenas termina PublishData
+    '''
+
+    server = 'test_publish_{}'.format(os.getpid())
+    receiver = ReceiverData(server=server)
+    receiver.setup()
+    receiver.isConfig = True
+    publisher = PublishData()
+
+    try:
+        ref = getSpectra()
+        dataOut = getSpectra()
+        # arreglos grandes, zmq no los copia
+        ref.data_spc = numpy.ones((8, 256, 1000))
+        dataOut.data_spc = numpy.ones((8, 256, 1000))
+        # el receptor lee mientras se envia (otro proceso en un proyecto)
+        thread = Thread(target=receiver.run)
+        thread.start()
+        publisher.run(dataOut, server=server, protocol='numpy', verbose=False)
+        dataOut.data_spc[:] = 0
+        dataOut.data_cspc[:] = 0
+        thread.join(30)
+    finally:
+        publisher.zmq_socket.close(linger=0)
+        receiver.receiver.close(linger=0)
+
+    check(receiver.dataOut, ref)
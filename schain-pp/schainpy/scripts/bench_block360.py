@@ -0,0 +1,114 @@
+'''
+Benchmark of Block360 on full 360 degree PPI sweeps at SOPHy resolution
+against the previous implementation (python lists, numpy.array + transpose
+of the whole sweep on each push, kept below as `Legacy`), checks that both
+give the same sweeps and reports the time per radial and the peak memory.
+
+    python bench_block360.py [nRadials] [nHeights] [nSweeps]
+'''
+
+import sys
+import time
+import tracemalloc
+import hashlib
+import numpy
+
+from schainpy.model.data.jrodata import Parameters
+from schainpy.model.proc.jroproc_parameters import Block360
+
+nRadials = int(sys.argv[1]) if len(sys.argv) > 1 else 360
+nHeights = int(sys.argv[2]) if len(sys.argv) > 2 else 1600
+nSweeps = int(sys.argv[3]) if len(sys.argv) > 3 else 10
+nChannels = 2
+nVars = 8
+angles = [2.0]
+
+
+class Legacy(object):
+    '''
+    Block360 buffers before the rework (PPI only)
+    '''
+
+    def __init__(self):
+
+        self.buffer, self.azi, self.ele, self.noise, self.time = [], [], [], [], []
+
+    def putData(self, data):
+
+        self.buffer.append(data.data_param)
+        self.azi.append(data.azimuth)
+        self.ele.append(data.elevation)
+        self.time.append(data.time_pedestal)
+        self.noise.append(data.dataPP_NOISE)
+
+    def run(self, data):
+
+        self.putData(data)
+        if len(self.azi) > 5 and numpy.nanstd(self.ele[-5:]) < .5 and self.azi[-1] - self.azi[-2] < 0:
+            for buffer in (self.buffer, self.azi, self.ele, self.time, self.noise):
+                buffer.pop()
+            sweep = (numpy.array(self.buffer).transpose(1, 2, 0, 3), numpy.array(self.azi),
+                     numpy.array(self.ele), numpy.array(self.noise), numpy.array(self.time))
+            self.__init__()
+            self.putData(data)
+            return sweep
+
+
+def getRadials():
+
+    rng = numpy.random.default_rng(0)
+    step = 360./nRadials
+    radial = rng.standard_normal((nChannels, nVars, nHeights))
+    noise = rng.standard_normal(nChannels)
+
+    for i in range(nSweeps*nRadials + 1):
+        dataOut = Parameters()
+        dataOut.data_param = radial + i
+        dataOut.dataPP_NOISE = noise + i
+        dataOut.azimuth = round((i*step) % 360, 2)
+        dataOut.elevation = angles[0]
+        dataOut.time_pedestal = i*0.05
+        dataOut.utctime = i*0.05
+        yield dataOut
+
+
+def run(func, radials, get):
+
+    sweeps = []
+    elapsed = 0
+    tracemalloc.start()
+    for dataOut in radials:
+        t0 = time.perf_counter()
+        ret = func(dataOut)
+        elapsed += time.perf_counter() - t0
+        sweep = get(ret)
+        if sweep is not None:
+            # only a digest, the sweeps given as views are reused
+            sweeps.append([hashlib.sha1(numpy.ascontiguousarray(x)).hexdigest() for x in sweep])
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return sweeps, elapsed/(nSweeps*nRadials + 1)*1e6, peak
+
+
+def getNew(dataOut):
+
+    if dataOut.flagNoData:
+        return None
+    return (dataOut.data_param, dataOut.data_azi, dataOut.data_ele, dataOut.data_noise,
+            dataOut.radar_sweep_time)
+
+
+if __name__ == '__main__':
+
+    op = Block360()
+    new, new_time, new_peak = run(
+        lambda data: op.run(data, attr_data='data_param', angles=angles), getRadials(), getNew)
+    old, old_time, old_peak = run(Legacy().run, getRadials(), lambda sweep: sweep)
+
+    print('\nBlock360: {} sweeps of {} radials x {} x {} x {}'.format(
+        nSweeps, nRadials, nChannels, nVars, nHeights))
+    print('sweeps: {} / {}, identical: {}'.format(len(new), len(old), new == old))
+    print('{:>10} {:>12} {:>10}'.format('version', 'radial [us]', 'peak [MB]'))
+    print('{:>10} {:>12.1f} {:>10.1f}'.format('previous', old_time, old_peak/1e6))
+    print('{:>10} {:>12.1f} {:>10.1f}'.format('current', new_time, new_peak/1e6))
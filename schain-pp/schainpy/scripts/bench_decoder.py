@@ -0,0 +1,76 @@
+'''
+Benchmark of the block Decoder: time domain (mode=0) vs frequency domain
+(mode=1) with the SOPHy chirp from modFreq.chirpMod.
+
+    python bench_decoder.py [nProfiles] [nHeights] [workers]
+'''
+
+import os
+import sys
+import time
+import numpy
+
+from schainpy.model.data.jrodata import Voltage
+from schainpy.model.proc.jroproc_voltage import Decoder
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..'))
+import modFreq as modf
+
+nProfiles = int(sys.argv[1]) if len(sys.argv) > 1 else 250
+nHeights = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+workers = int(sys.argv[3]) if len(sys.argv) > 3 else None
+nChannels = 2
+
+ipp = 400.0e-6
+sr_rx = 5.0e6
+dc_1 = 10.0
+_, chirp = modf.chirpMod(1.0, ipp, dc_1, sr_rx, sr_rx, 0.0, 1.0e6, t_d=0.0, window='B', mode_f=0)
+code_2 = list(chirp[:nHeights])
+
+
+def getDataOut(data):
+
+    dataOut = Voltage()
+    dataOut.data = data.copy()
+    dataOut.heightList = numpy.arange(nHeights, dtype=float)
+    dataOut.channelList = list(range(nChannels))
+    dataOut.nProfiles = nProfiles
+    dataOut.flagDataAsBlock = True
+    dataOut.flagDecodeData = False
+    dataOut.code = numpy.ones((1, 1))
+
+    return dataOut
+
+
+def decode(data, mode, n=3):
+
+    op = Decoder()
+    times = []
+
+    for i in range(n):
+        dataOut = getDataOut(data)
+        t0 = time.perf_counter()
+        op.run(dataOut, code=[[1]], nCode=1, nBaud=1, mode=mode, code_2=code_2,
+               DC_1=dc_1, workers=workers)
+        times.append(time.perf_counter() - t0)
+
+    return dataOut.data.copy(), min(times)
+
+
+if __name__ == '__main__':
+
+    rng = numpy.random.default_rng(0)
+    data = (rng.standard_normal((nChannels, nProfiles, nHeights)) +
+            1j*rng.standard_normal((nChannels, nProfiles, nHeights)))
+
+    out_time, t_time = decode(data, 0)
+    out_freq, t_freq = decode(data, 1)
+
+    err = numpy.abs(out_time - out_freq).max() / numpy.abs(out_time).max()
+
+    print('\nblock: {} x {} x {}, code: {} samples, workers: {}'.format(
+        nChannels, nProfiles, nHeights, len(code_2), workers))
+    print('{:>6} {:>10}'.format('mode', 'time [s]'))
+    print('{:>6} {:>10.3f}'.format('time', t_time))
+    print('{:>6} {:>10.3f}'.format('freq', t_freq))
+    print('speedup: {:.1f}x, max relative difference: {:.2e}'.format(t_time/t_freq, err))
@@ -0,0 +1,142 @@
+'''
+Benchmark of HDFWriter in weather mode (one file per sweep, blocksPerFile=1
+and Reset) for each codec, synchronous vs background writer (queueSize).
+Reports the throughput in MB/s of sweep data (producer without pauses), the
+pipeline stall (time spent inside `run` per sweep) with and without the
+background writer, the size of the files and checks the saved data against
+the synchronous gzip files.
+
+    python bench_hdfwriter.py [nRadials] [nHeights] [nSweeps] [interval]
+
+`interval` is the time in seconds between sweeps of the producer.
+'''
+
+import io
+import os
+import sys
+import time
+import shutil
+import tempfile
+import datetime
+import contextlib
+import numpy
+import h5py
+
+from schainpy.model.data.jrodata import Parameters
+from schainpy.model.io.jroIO_param import HDFWriter
+
+nRadials = int(sys.argv[1]) if len(sys.argv) > 1 else 360
+nHeights = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+nSweeps = int(sys.argv[3]) if len(sys.argv) > 3 else 10
+interval = float(sys.argv[4]) if len(sys.argv) > 4 else 0.05
+nChannels = 2
+
+CODECS = (
+    ('gzip', dict(compression='gzip')),
+    ('gzip+shuffle', dict(compression='gzip', shuffle=True)),
+    ('lzf', dict(compression='lzf')),
+    ('lzf+shuffle', dict(compression='lzf', shuffle=True)),
+    ('none', dict(compression='none')),
+    ('gzip float32', dict(compression='gzip', shuffle=True, dtype='float32')),
+    ('lzf float32', dict(compression='lzf', shuffle=True, dtype='float32')),
+    )
+
+
+def getSweeps():
+
+    rng = numpy.random.default_rng(0)
+    azi = numpy.linspace(0, 360, nRadials, endpoint=False)
+    ele = numpy.full(nRadials, 4.0)
+    t0 = datetime.datetime(2024, 10, 15, 12).timestamp()
+
+    for i in range(nSweeps):
+        data = numpy.full((nChannels, 8, nRadials, nHeights), numpy.nan)
+        # eco en la mitad de los radiales cuantizado como los productos reales
+        echo = numpy.round(rng.normal(20, 10, (nChannels, nRadials//2, nHeights//2)), 2)
+        data[:, 4, :nRadials//2, :nHeights//2] = echo
+        data[:, 3, :, :] = rng.normal(5, 10, (nChannels, nRadials, nHeights))
+        dataOut = Parameters()
+        dataOut.data_param = data
+        dataOut.weather_vars = None
+        dataOut.channelList = list(range(nChannels))
+        dataOut.heightList = numpy.arange(nHeights)*0.015
+        dataOut.data_azi = azi
+        dataOut.data_ele = ele
+        dataOut.flagMode = 1
+        dataOut.utctime = t0 + 60*i
+        yield dataOut
+
+
+def run(path, sweeps, queueSize, interval, **kwargs):
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        return write(path, sweeps, queueSize, interval, **kwargs)
+
+
+def write(path, sweeps, queueSize, interval, **kwargs):
+
+    # clase sin MPDecorator, se ejecuta en este proceso
+    writer = HDFWriter.__bases__[0]()
+    stall = 0
+    t0 = time.perf_counter()
+    for dataOut in sweeps:
+        t1 = time.perf_counter()
+        writer.run(dataOut, path, blocksPerFile=1, metadataList=['heightList', 'data_azi', 'data_ele'],
+                   dataList=['data_param', 'utctime'], setType='weather', Reset=True,
+                   description={'Data': {'data_param': {'Z': ['H', 'V']}, 'utctime': 'time'},
+                                'Metadata': {'heightList': 'range', 'data_azi': 'azimuth', 'data_ele': 'elevation'}},
+                   weather_var='Z', mask=0, localtime=False, queueSize=queueSize, **kwargs)
+        stall += time.perf_counter() - t1
+        # tiempo del productor hasta el siguiente barrido
+        if interval:
+            time.sleep(interval)
+    writer.close()
+    elapsed = time.perf_counter() - t0
+
+    return elapsed, stall/len(sweeps)
+
+
+def read(path):
+
+    data = {}
+    size = 0
+    for root, dirs, files in os.walk(path):
+        for name in sorted(files):
+            size += os.path.getsize(os.path.join(root, name))
+            with h5py.File(os.path.join(root, name), 'r') as fp:
+                data[name] = numpy.array([fp['Data']['Z'][ch][:] for ch in ('H', 'V')])
+
+    return data, size
+
+
+if __name__ == '__main__':
+
+    sweeps = list(getSweeps())
+    nbytes = nChannels*nRadials*nHeights*8*nSweeps
+    tmp = tempfile.mkdtemp()
+    ref = None
+
+    print('\nHDFWriter weather mode: {} sweeps of {} x {} x {}, {:.0f} MB, producer interval {} s'.format(
+        nSweeps, nChannels, nRadials, nHeights, nbytes/1e6, interval))
+    print('{:>14} {:>8} {:>10} {:>12} {:>12} {:>10}'.format(
+        'codec', 'MB/s', 'size[MB]', 'stall[ms]', 'queue[ms]', 'max diff'))
+
+    try:
+        for label, kwargs in CODECS:
+            path = os.path.join(tmp, label.replace(' ', '_'))
+            elapsed, _ = run(path, sweeps, 0, 0, **kwargs)
+            data, size = read(path)
+            if ref is None:
+                ref = data
+            diff = max(numpy.nanmax(numpy.abs(data[key]-ref[key])) for key in ref)
+            shutil.rmtree(path)
+            _, stall = run(path, sweeps, 0, interval, **kwargs)
+            shutil.rmtree(path)
+            _, queued = run(path, sweeps, 4, interval, **kwargs)
+            same = all(numpy.array_equal(a, b, equal_nan=True) for a, b in zip(data.values(), read(path)[0].values()))
+            shutil.rmtree(path)
+            print('{:>14} {:>8.1f} {:>10.2f} {:>12.2f} {:>12.2f} {:>10.2e}{}'.format(
+                label, nbytes/1e6/elapsed, size/1e6, stall*1e3, queued*1e3, diff,
+                '' if same else '  (queue output differs)'))
+    finally:
+        shutil.rmtree(tmp)
@@ -0,0 +1,73 @@
+'''
+Micro-benchmark of the Hildebrand-Sekhon noise estimation: loop over the
+channels (numpy.sort + hildebrand_sekhon, as the operations did) vs one call
+to hildebrand_sekhon_batch, per channel and per channel and height.
+
+    python bench_noise.py [nHeights] [threads]
+'''
+
+import sys
+import time
+import numpy
+from concurrent.futures import ThreadPoolExecutor
+
+from schainpy.model.data.jrodata import hildebrand_sekhon, hildebrand_sekhon_batch
+
+nHeights = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+threads = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+navg = 10
+
+
+def timeit(func, n=20):
+
+    times = []
+    for i in range(n):
+        t0 = time.perf_counter()
+        ret = func()
+        times.append(time.perf_counter() - t0)
+
+    return ret, min(times)*1e3
+
+
+def byChannel(data):
+
+    noise = numpy.zeros(len(data))
+    for channel in range(len(data)):
+        noise[channel] = hildebrand_sekhon(numpy.sort(data[channel], axis=None), navg)
+
+    return noise
+
+
+def byHeight(data):
+
+    noise = numpy.zeros((data.shape[0], data.shape[2]))
+    for channel in range(data.shape[0]):
+        for height in range(data.shape[2]):
+            noise[channel, height] = hildebrand_sekhon(data[channel, :, height], navg)
+
+    return noise
+
+
+if __name__ == '__main__':
+
+    rng = numpy.random.default_rng(0)
+
+    print('\n{:>8} {:>8} {:>10} {:>10} {:>10} {:>10} {:>6}'.format(
+        'channels', 'points', 'mode', 'loop[ms]', 'batch[ms]', 'thr[ms]', 'equal'))
+
+    # hilos reutilizados en todas las llamadas, como en una operacion
+    with ThreadPoolExecutor(threads) as executor:
+        for nChannels in (2, 4, 8, 16):
+            for nPoints in (64, 256, 1024, 2048):
+                # noise with a signal in a third of the points
+                data = rng.exponential(navg, (nChannels, nPoints, nHeights))
+                data[:, :nPoints//3, :nHeights//2] *= 20
+
+                for mode, loop, axis in (('channel', byChannel, (1, 2)), ('height', byHeight, 1)):
+                    ref, t_loop = timeit(lambda: loop(data), 3 if mode == 'height' else 20)
+                    out, t_batch = timeit(lambda: hildebrand_sekhon_batch(data, navg, axis=axis))
+                    thr, t_thr = timeit(lambda: hildebrand_sekhon_batch(data, navg, axis=axis, threads=threads,
+                                                                        executor=executor))
+                    equal = numpy.array_equal(ref, out) and numpy.array_equal(ref, thr)
+                    print('{:>8} {:>8} {:>10} {:>10.2f} {:>10.2f} {:>10.2f} {:>6}'.format(
+                        nChannels, nPoints, mode, t_loop, t_batch, t_thr, str(equal)))
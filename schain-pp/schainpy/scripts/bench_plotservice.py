@@ -0,0 +1,149 @@
+'''
+Benchmark of the plot operations of a unit running as one process per plot
+(MPDecorator) vs the PlotService pool of headless workers. A unit sends a
+PPI sweep every `period` seconds to WeatherParamsPlot operations (one per
+weather variable, save only) through OperationConf.createObject as the
+controller does. Reports the time the unit is blocked sending the sweeps,
+the time until all plots are saved, the figures saved, the frames
+coalesced and dropped by the pool, the plot processes and their peak
+memory (sum of maxrss).
+
+    python bench_plotservice.py [nRadials] [nHeights] [nSweeps] [period]
+'''
+
+import io
+import os
+import sys
+import time
+import glob
+import shutil
+import tempfile
+import datetime
+import contextlib
+from multiprocessing import Queue
+
+# el logo se busca en la carpeta actual
+os.chdir(os.path.dirname(os.path.abspath(__file__)))
+os.environ['BACKEND'] = 'Agg'
+
+import numpy
+
+from schainpy.controller import OperationConf
+from schainpy.model.data.jrodata import Parameters, WEATHER_VARS
+from schainpy.model.proc.jroproc_base import ProcessingUnit
+from schainpy.model.graphics.jroplot_service import PlotService
+
+nRadials = int(sys.argv[1]) if len(sys.argv) > 1 else 360
+nHeights = int(sys.argv[2]) if len(sys.argv) > 2 else 400
+nSweeps = int(sys.argv[3]) if len(sys.argv) > 3 else 20
+period = float(sys.argv[4]) if len(sys.argv) > 4 else 0.1
+xrange = 60
+
+VARIABLES = {
+    'Z': (-10, 70, 'sophy_z'),
+    'V': (-20, 20, 'sophy_v'),
+    'W': (0, 6, 'sophy_w'),
+    'D': (-9, 12, 'sophy_d'),
+    'P': (-180, 180, 'sophy_p'),
+    'R': (0, 1, 'sophy_r'),
+    }
+
+MODES = [('process', None), ('pool x1', 1), ('pool x2', 2), ('pool x3', 3)]
+
+
+def getSweep(i):
+
+    rng = numpy.random.default_rng(i)
+    dataOut = Parameters()
+    data = rng.normal(0, 1, (2, 8, nRadials, nHeights))
+    data[:, 3] = 10
+    dataOut.data_param = data
+    dataOut.weather_vars = dict(WEATHER_VARS)
+    dataOut.heightList = numpy.arange(nHeights)*xrange/nHeights
+    dataOut.channelList = [0, 1]
+    dataOut.data_azi = numpy.linspace(0, 360, nRadials, endpoint=False)
+    dataOut.data_ele = numpy.full(nRadials, 4.0)
+    dataOut.mode_op = 'PPI'
+    dataOut.paramInterval = 60
+    dataOut.utctime = datetime.datetime(2024, 10, 15, 12).timestamp() + 60*i
+    dataOut.flagNoData = False
+    return dataOut
+
+
+class SweepUnit(ProcessingUnit):
+
+    def __init__(self, sweeps):
+
+        ProcessingUnit.__init__(self)
+        self.sweeps = iter(sweeps)
+
+    def run(self):
+
+        try:
+            self.dataOut = next(self.sweeps)
+        except StopIteration:
+            self.dataOut = Parameters()
+            self.dataOut.error = True
+            self.dataOut.flagNoData = True
+
+
+def run(sweeps, workers, path, policy=None):
+
+    unit = SweepUnit(sweeps)
+    unit.enableStats('1')
+    service = PlotService(workers) if workers else None
+    ops = []
+    for n, (var, (zmin, zmax, colormap)) in enumerate(VARIABLES.items()):
+        conf = OperationConf()
+        conf.setup('1{}'.format(n + 1), 'WeatherParamsPlot', '0', '1', Queue(), policy=policy)
+        conf.parameters = dict(save=path, save_code=var, channels=[0], zmin=zmin, zmax=zmax,
+                               xrange=xrange, yrange=20, attr_data=var, labels=[var],
+                               colormap=colormap, localtime=False, mode='PPI', show=False)
+        ops.append(conf.createObject(stats=True, service=service))
+        unit.addOperation(conf, ops[-1])
+    if service is not None:
+        service.start()
+
+    # los procesos importan y crean las figuras antes de recibir datos
+    time.sleep(3)
+    blocked = 0
+    t0 = time.perf_counter()
+    for i in range(len(sweeps) + 1):
+        t1 = time.perf_counter()
+        unit.call()
+        blocked += time.perf_counter() - t1
+        time.sleep(max(0, period - (time.perf_counter() - t1)))
+    rows = unit.getStats(timeout=300)[1:]
+    for op in ops:
+        op.join()
+    elapsed = time.perf_counter() - t0
+
+    # una figura por sweep en las subcarpetas, la ultima en `path`
+    saved = len(glob.glob(os.path.join(path, '**', '*.png'), recursive=True)) - len(glob.glob(os.path.join(path, '*.png')))
+    dropped = sum(row['dropped'] for row in rows)
+    coalesced = sum(row['coalesced'] for row in rows)
+    if service is None:
+        procs = len(ops)
+        rss = sum(row['maxrss'] for row in rows)
+    else:
+        procs = len([worker for worker in service.workers if worker.operations])
+        rss = sum(max(row['maxrss'] for row, op in zip(rows, ops) if op.worker is worker)
+                  for worker in service.workers if worker.operations)
+    return blocked, elapsed, saved, coalesced, dropped, procs, rss
+
+
+if __name__ == '__main__':
+
+    sweeps = [getSweep(i) for i in range(nSweeps)]
+    print('\n{} WeatherParamsPlot (save only) x {} sweeps of {} radials x {} gates, a sweep every {} s'.format(
+        len(VARIABLES), nSweeps, nRadials, nHeights, period))
+    print('{:>10} {:>12} {:>12} {:>7} {:>10} {:>8} {:>6} {:>9}'.format(
+        'mode', 'blocked[s]', 'elapsed[s]', 'saved', 'coalesced', 'dropped', 'procs', 'rss[MB]'))
+    for label, workers in MODES:
+        tmp = tempfile.mkdtemp()
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                result = run(sweeps, workers, tmp)
+            print('{:>10} {:>12.2f} {:>12.2f} {:>7} {:>10} {:>8} {:>6} {:>9.0f}'.format(label, *result))
+        finally:
+            shutil.rmtree(tmp)
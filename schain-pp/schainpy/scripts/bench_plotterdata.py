@@ -0,0 +1,86 @@
+'''
+Benchmark of PlotterData along a simulated 24 h run of an RTI plot (a new
+time every `interval` seconds, each frame updates the buffer and reads the
+product and the times as RTIPlot.plot does). Compares the previous
+dict-of-times implementation (taken from git) with the ring buffer and
+reports the cost per frame for each hour of the run, the memory of the
+buffers (tracemalloc) and checks the last frame read.
+
+    python bench_plotterdata.py [nChannels] [nHeights] [interval] [max_memory]
+'''
+
+import os
+import sys
+import time
+import types
+import subprocess
+import tracemalloc
+import numpy
+
+from schainpy.model.data.jrodata import PlotterData
+
+nChannels = int(sys.argv[1]) if len(sys.argv) > 1 else 2
+nHeights = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+interval = float(sys.argv[3]) if len(sys.argv) > 3 else 10
+max_memory = float(sys.argv[4]) if len(sys.argv) > 4 else 1024
+nFrames = int(24*3600/interval)
+
+
+def getOldPlotterData():
+    '''
+    PlotterData de la version anterior de jrodata.py en git
+    '''
+
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    commit = subprocess.check_output(
+        ['git', 'log', '-1', '--format=%H', '--grep', 'Ring-buffer PlotterData'], text=True, cwd=cwd).strip()
+    code = subprocess.check_output(
+        ['git', 'show', '{}:./../model/data/jrodata.py'.format(commit + '^' if commit else 'HEAD')],
+        text=True, cwd=cwd)
+    module = types.ModuleType('schainpy.model.data.jrodata_old')
+    module.__package__ = 'schainpy.model.data'
+    exec(compile(code, 'jrodata_old.py', 'exec'), module.__dict__)
+    return module.PlotterData
+
+
+def run(cls, **kwargs):
+
+    rng = numpy.random.default_rng(0)
+    heights = numpy.arange(nHeights)*0.15
+    meta = {'yrange': heights, 'interval': interval}
+    data = cls('rti', None, **kwargs)
+    data.setup()
+    t0 = 1729000000.
+    perFrame = numpy.zeros(nFrames)
+
+    tracemalloc.start()
+    for i in range(nFrames):
+        frame = {'rti': rng.normal(20, 5, (nChannels, nHeights))}
+        t1 = time.perf_counter()
+        data.update(frame, t0 + i*interval, meta)
+        x = data.times
+        z = data['rti']
+        perFrame[i] = time.perf_counter() - t1
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    last = numpy.array_equal(z[:, -1], frame['rti']) and x[-1] == t0 + (nFrames - 1)*interval
+    return perFrame, memory, len(x), last
+
+
+if __name__ == '__main__':
+
+    hours = numpy.arange(nFrames)*interval//3600
+    print('\nPlotterData: {} frames ({} s) of {} x {} float64, max_memory {} MB'.format(
+        nFrames, interval, nChannels, nHeights, max_memory))
+
+    results = [('dict', getOldPlotterData(), {}),
+               ('ring', PlotterData, {'max_memory': max_memory})]
+
+    print('{:>14} {:>8} {:>10} {:>10} {:>10} {:>10} {:>8} {:>6}'.format(
+        'class', 'total[s]', '1h[ms]', '6h[ms]', '12h[ms]', '24h[ms]', 'mem[MB]', 'check'))
+    for label, cls, kwargs in results:
+        perFrame, memory, n, last = run(cls, **kwargs)
+        cost = [perFrame[hours == h].mean()*1e3 for h in (0, 5, 11, 23)]
+        print('{:>14} {:>8.2f} {:>10.3f} {:>10.3f} {:>10.3f} {:>10.3f} {:>8.1f} {:>6}'.format(
+            label, perFrame.sum(), *cost, memory/1e6, 'ok' if last else 'FAIL'))
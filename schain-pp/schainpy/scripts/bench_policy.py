@@ -0,0 +1,39 @@
+'''
+Benchmark of the delivery policies of the queues of the external
+operations (block, drop-oldest, keep-latest, coalesce and coalesce to a
+time window) with the plots of bench_plotservice.py, one process per plot
+and the PlotService pool. Reports the time the unit is blocked sending the
+sweeps (a sweep every `period` seconds, 60 s of data each), the time until
+all plots are saved and the figures saved, coalesced and dropped.
+
+    python bench_policy.py [nRadials] [nHeights] [nSweeps] [period]
+'''
+
+import io
+import shutil
+import tempfile
+import contextlib
+
+from bench_plotservice import getSweep, run, nRadials, nHeights, nSweeps, period, VARIABLES
+
+POLICIES = ['block', 'drop-oldest', 'keep-latest', 'coalesce', 'coalesce:180']
+MODES = [('process', None), ('pool x1', 1)]
+
+
+if __name__ == '__main__':
+
+    sweeps = [getSweep(i) for i in range(nSweeps)]
+    print('\n{} WeatherParamsPlot (save only) x {} sweeps of {} radials x {} gates, a sweep every {} s'.format(
+        len(VARIABLES), nSweeps, nRadials, nHeights, period))
+    print('{:>10} {:>13} {:>12} {:>12} {:>7} {:>10} {:>8}'.format(
+        'mode', 'policy', 'blocked[s]', 'elapsed[s]', 'saved', 'coalesced', 'dropped'))
+    for label, workers in MODES:
+        for policy in POLICIES:
+            tmp = tempfile.mkdtemp()
+            try:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    result = run(sweeps, workers, tmp, policy)
+                print('{:>10} {:>13} {:>12.2f} {:>12.2f} {:>7} {:>10} {:>8}'.format(
+                    label, policy, *result[:5]))
+            finally:
+                shutil.rmtree(tmp)
@@ -0,0 +1,122 @@
+'''
+Single (complex64) vs double (complex128) precision of the voltage pipeline:
+PulsePair_vRF moments and SpectraProc spectra of a synthetic weather echo,
+reports the difference of the products, the time and the peak memory.
+
+    python bench_precision.py [nProfiles] [nHeights] [n]
+'''
+
+import sys
+import time
+import tracemalloc
+import numpy
+
+from schainpy.model.data.jrodata import Voltage
+from schainpy.model.proc.jroproc_base import PRECISIONS
+from schainpy.model.proc.jroproc_voltage import PulsePair_vRF
+from schainpy.model.proc.jroproc_spectra import SpectraProc
+
+nProfiles = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+nHeights = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+n = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+nChannels = 2
+ipp = 400.0e-6
+
+
+def getData():
+    '''
+    Echo with a doppler shift and SNR changing with range plus white noise
+    '''
+
+    rng = numpy.random.default_rng(0)
+    t = numpy.arange(nProfiles).reshape(1, -1, 1) * ipp
+    fd = numpy.linspace(-800, 800, nHeights).reshape(1, 1, -1)
+    amp = 10**(numpy.linspace(-2, 4, nHeights)/20.).reshape(1, 1, -1)
+    noise = (rng.standard_normal((nChannels, nProfiles, nHeights)) +
+             1j*rng.standard_normal((nChannels, nProfiles, nHeights)))/numpy.sqrt(2)
+
+    return amp*numpy.exp(2j*numpy.pi*fd*t) + noise
+
+
+def getDataOut(data, precision):
+
+    dataOut = Voltage()
+    dataOut.data = data.astype(PRECISIONS[precision])
+    dataOut.precision = precision
+    dataOut.heightList = numpy.arange(nHeights, dtype=float)
+    dataOut.channelList = list(range(nChannels))
+    dataOut.nProfiles = nProfiles
+    dataOut.ippSeconds = ipp
+    dataOut.nCohInt = 1
+    dataOut.flagDataAsBlock = True
+    dataOut.flagDecodeData = False
+    dataOut.utctime = 0
+
+    return dataOut
+
+
+def pulsepair(data, precision):
+
+    op = PulsePair_vRF()
+    dataOut = getDataOut(data, precision)
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    dataOut = op.run(dataOut)
+    elapsed = time.perf_counter() - t0
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        'power': 10*numpy.log10(dataOut.dataPP_POWER),
+        'velocity': dataOut.dataPP_DOP,
+        'width': dataOut.dataPP_WIDTH,
+        'snr': 10*numpy.log10(dataOut.dataPP_SNR),
+        }, elapsed, peak
+
+
+def spectra(data, precision):
+
+    proc = SpectraProc()
+    proc.dataIn = getDataOut(data, precision)
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    proc.run(nFFTPoints=nProfiles, pairsList=[(0, 1)])
+    elapsed = time.perf_counter() - t0
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        'spc': 10*numpy.log10(proc.dataOut.data_spc),
+        'cspc': numpy.angle(proc.dataOut.data_cspc),
+        }, elapsed, peak
+
+
+def compare(name, func, data):
+
+    times = {}
+    peaks = {}
+    for precision in PRECISIONS:
+        ret = [func(data, precision) for i in range(n)]
+        products = ret[0][0]
+        times[precision] = min(r[1] for r in ret)
+        peaks[precision] = ret[0][2]
+        if precision == 'double':
+            ref = products
+        else:
+            out = products
+
+    print('\n{} ({} x {} x {})'.format(name, nChannels, nProfiles, nHeights))
+    print('{:>10} {:>14} {:>14}'.format('product', 'max abs diff', 'dtype'))
+    for key in ref:
+        diff = numpy.abs(numpy.nan_to_num(out[key]) - numpy.nan_to_num(ref[key]))
+        print('{:>10} {:>14.3e} {:>14}'.format(key, numpy.nanmax(diff), str(out[key].dtype)))
+    print('{:>10} {:>10} {:>10}'.format('precision', 'time [s]', 'peak [MB]'))
+    for precision in PRECISIONS:
+        print('{:>10} {:>10.3f} {:>10.1f}'.format(precision, times[precision], peaks[precision]/1e6))
+
+
+if __name__ == '__main__':
+
+    data = getData()
+    compare('PulsePair_vRF', pulsepair, data)
+    compare('SpectraProc', spectra, data)
@@ -0,0 +1,116 @@
+'''
+Benchmark of PublishData -> ReceiverData with the pickle protocol vs the
+numpy multipart protocol (json header + raw array frames), with attribute
+selection and compression, over ipc:// and tcp://localhost. The receiver
+runs in another process and reports the throughput (blocks sent back to
+back) and the latency (send -> dataOut rebuilt, blocks paced every 20 ms),
+and checks the received data.
+
+    python bench_publish.py [nChannels] [nProfiles] [nHeights] [nBlocks]
+'''
+
+import io
+import sys
+import time
+import contextlib
+import multiprocessing
+import numpy
+
+from schainpy.model.data.jrodata import Voltage
+from schainpy.model.utils.jroutils_publish import PublishData, ReceiverData, lz4, zstandard
+
+nChannels = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+nProfiles = int(sys.argv[2]) if len(sys.argv) > 2 else 128
+nHeights = int(sys.argv[3]) if len(sys.argv) > 3 else 1000
+nBlocks = int(sys.argv[4]) if len(sys.argv) > 4 else 100
+nPaced = 50
+
+SERVERS = ('bench_publish', 'tcp://127.0.0.1:5599')
+
+PROTOCOLS = [
+    ('pickle', dict(protocol='pickle')),
+    ('numpy', dict(protocol='numpy')),
+    ('numpy attrs', dict(protocol='numpy', attrs=['data', 'heightList', 'channelList', 'sendtime'])),
+    ('numpy zlib', dict(protocol='numpy', compression='zlib')),
+    ]
+if lz4 is not None:
+    PROTOCOLS.append(('numpy lz4', dict(protocol='numpy', compression='lz4')))
+if zstandard is not None:
+    PROTOCOLS.append(('numpy zstd', dict(protocol='numpy', compression='zstd')))
+
+
+def getData():
+
+    rng = numpy.random.default_rng(0)
+    dataOut = Voltage()
+    # voltajes cuantizados como los del ADC
+    data = numpy.round(rng.normal(0, 50, (2, nChannels, nProfiles, nHeights)))
+    dataOut.data = (data[0] + 1j*data[1]).astype(numpy.complex64)
+    dataOut.heightList = numpy.arange(nHeights)*0.15
+    dataOut.channelList = list(range(nChannels))
+    dataOut.nProfiles = nProfiles
+    dataOut.flagNoData = False
+    dataOut.utctime = time.time()
+    return dataOut
+
+
+def receive(server, n, conn):
+
+    receiver = ReceiverData(server=server)
+    times = []
+    latency = []
+    checksum = 0
+    with contextlib.redirect_stdout(io.StringIO()):
+        conn.send('ready')
+        for i in range(n):
+            receiver.run()
+            now = time.time()
+            times.append(now)
+            latency.append(now - receiver.dataOut.sendtime)
+            checksum += complex(receiver.dataOut.data[:, -1, -1].sum())
+    conn.send((times, latency, checksum))
+
+
+def run(server, kwargs, dataOut):
+
+    ctx = multiprocessing.get_context('spawn')
+    parent, child = ctx.Pipe()
+    proc = ctx.Process(target=receive, args=(server, nBlocks + nPaced, child))
+    proc.start()
+    parent.recv()
+
+    publisher = PublishData()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i in range(nBlocks):
+            dataOut.sendtime = time.time()
+            publisher.run(dataOut, server=server, verbose=False, **kwargs)
+        # el receptor termina la rafaga antes de medir la latencia
+        time.sleep(1)
+        for i in range(nPaced):
+            time.sleep(0.02)
+            dataOut.sendtime = time.time()
+            publisher.run(dataOut, server=server, verbose=False, **kwargs)
+
+    times, latency, checksum = parent.recv()
+    proc.join()
+    publisher.zmq_socket.close()
+
+    elapsed = times[nBlocks - 1] - times[0]
+    return (nBlocks - 1)/elapsed, numpy.median(latency[nBlocks:]), numpy.percentile(latency[nBlocks:], 95), checksum
+
+
+if __name__ == '__main__':
+
+    dataOut = getData()
+    nbytes = dataOut.data.nbytes
+    expected = complex(dataOut.data[:, -1, -1].sum())*(nBlocks + nPaced)
+
+    for server in SERVERS:
+        print('\n{}: {} blocks of {} x {} x {} complex64 ({:.1f} MB)'.format(
+            server if '://' in server else 'ipc:///tmp/' + server, nBlocks, nChannels, nProfiles, nHeights, nbytes/1e6))
+        print('{:>12} {:>10} {:>8} {:>14} {:>12} {:>6}'.format(
+            'protocol', 'blocks/s', 'MB/s', 'latency[ms]', 'p95[ms]', 'check'))
+        for label, kwargs in PROTOCOLS:
+            rate, latency, p95, checksum = run(server, kwargs, dataOut)
+            print('{:>12} {:>10.1f} {:>8.1f} {:>14.2f} {:>12.2f} {:>6}'.format(
+                label, rate, rate*nbytes/1e6, latency*1e3, p95*1e3, 'ok' if checksum == expected else 'FAIL'))
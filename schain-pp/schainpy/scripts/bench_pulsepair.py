@@ -0,0 +1,162 @@
+'''
+Benchmark of PulsePair_vRF against the previous implementation (tiled
+pwcode/noise buffers, copy of the block and new buffer on each push, kept
+below as `legacy`), checks that both give the same products and reports
+blocks/s and the peak memory of each one.
+
+    python bench_pulsepair.py [nProfiles] [nHeights] [nBlocks] [single|double]
+'''
+
+import sys
+import math
+import time
+import tracemalloc
+import numpy
+
+from schainpy.model.data.jrodata import Voltage, hildebrand_sekhon
+from schainpy.model.proc.jroproc_base import PRECISIONS
+from schainpy.model.proc.jroproc_voltage import PulsePair_vRF
+
+nProfiles = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+nHeights = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+nBlocks = int(sys.argv[3]) if len(sys.argv) > 3 else 10
+precision = sys.argv[4] if len(sys.argv) > 4 else 'double'
+nChannels = 2
+ipp = 400.0e-6
+lambda_ = 3.0e8/(9345.0e6)
+
+PRODUCTS = ('dataPP_POWER', 'dataPP_POW', 'dataPP_DOP', 'dataPP_SNR',
+            'dataPP_WIDTH', 'dataPP_CCF', 'dataPP_NOISE')
+
+
+def legacy(dataOut, removeDC=False):
+    '''
+    PulsePair_vRF.pushData before the rework
+    '''
+
+    nch, nProf, nHeis = dataOut.data.shape
+    nCohInt = dataOut.nCohInt
+    buffer = numpy.zeros((nch, nProf, nHeis), dtype=dataOut.data.dtype)
+    buffer[:] = dataOut.data
+
+    if removeDC:
+        mean = numpy.nanmean(buffer, 1)
+        tmp = mean.reshape(nch, 1, nHeis)
+        dc = numpy.tile(tmp, [1, nProf, 1])
+        buffer = buffer - dc
+
+    pair0 = buffer*numpy.conj(buffer)
+    pair0 = pair0.real
+    cspc_pair01 = buffer[0]*numpy.conjugate(buffer[1])
+    pwcode = 1
+    if dataOut.flagDecodeData:
+        pwcode = numpy.sum(numpy.abs(dataOut.code[0])**2)
+
+    pwcode_bins = numpy.zeros(nHeis, dtype=pair0.dtype)
+    pwcode_bins[:] = pwcode
+    pwcode_buffer = numpy.tile(pwcode_bins.reshape(1, 1, nHeis), [nch, nProf, 1])
+    pair0_norm = pair0/pwcode_buffer
+
+    noise = numpy.zeros(nch, dtype=pair0.dtype)
+    for i in range(nch):
+        noise[i] = hildebrand_sekhon(numpy.sort(pair0_norm[i, :, :], axis=None), nCohInt)
+
+    data_noise = noise
+    noise = numpy.tile(noise.reshape(nch, 1), [1, nHeis])
+    noise_buffer = numpy.tile(noise.reshape(nch, 1, nHeis), [1, nProf, 1])
+    noise_buffer_norm = noise_buffer/pwcode_buffer
+
+    data_power = numpy.nanmean(pair0_norm, axis=1)/nCohInt
+    data_ccf = numpy.nanmean(cspc_pair01, axis=0)/(numpy.sqrt(numpy.nanmean(pair0[0], axis=0)*numpy.nanmean(pair0[1], axis=0)))
+    data_intensity = numpy.nanmean((pair0_norm-noise_buffer_norm*nCohInt)/nCohInt, axis=1)
+
+    pair1 = buffer[:, :-1, :]*numpy.conjugate(buffer[:, 1:, :])
+    pair1_norm = pair1/pwcode_buffer[:, :-1, :]
+    lag_1 = numpy.sum(pair1_norm, 1)
+    data_freq = (-1/(2.0*math.pi*dataOut.ippSeconds*nCohInt))*numpy.angle(lag_1)
+    data_velocity = (lambda_/2.0)*data_freq
+
+    S = data_power - noise
+    lag_1 = lag_1/((nProf-1)*nCohInt)
+    R1 = numpy.abs(lag_1)
+    data_snrPP = S/noise
+    data_snrPP[data_snrPP < 1.e-20] = 1.e-20
+    L = numpy.log(numpy.where(S/R1 < 0, numpy.nan, S/R1))
+    data_specwidth = (lambda_/(2*math.sqrt(2)*math.pi*dataOut.ippSeconds*nCohInt))*numpy.sqrt(numpy.absolute(L))
+
+    dataOut.dataPP_POWER = data_power
+    dataOut.dataPP_POW = data_intensity
+    dataOut.dataPP_DOP = data_velocity
+    dataOut.dataPP_SNR = data_snrPP
+    dataOut.dataPP_WIDTH = data_specwidth
+    dataOut.dataPP_CCF = data_ccf
+    dataOut.dataPP_NOISE = data_noise
+
+    return dataOut
+
+
+def getBlocks():
+
+    rng = numpy.random.default_rng(0)
+    t = numpy.arange(nProfiles).reshape(1, -1, 1) * ipp
+    fd = numpy.linspace(-800, 800, nHeights).reshape(1, 1, -1)
+    amp = 10**(numpy.linspace(-2, 4, nHeights)/20.).reshape(1, 1, -1)
+
+    for i in range(nBlocks):
+        noise = (rng.standard_normal((nChannels, nProfiles, nHeights)) +
+                 1j*rng.standard_normal((nChannels, nProfiles, nHeights)))/numpy.sqrt(2)
+        yield (amp*numpy.exp(2j*numpy.pi*fd*t + 1j*i) + noise).astype(PRECISIONS[precision])
+
+
+def getDataOut(data, code):
+
+    dataOut = Voltage()
+    dataOut.data = data
+    dataOut.heightList = numpy.arange(nHeights, dtype=float)
+    dataOut.channelList = list(range(nChannels))
+    dataOut.nProfiles = nProfiles
+    dataOut.ippSeconds = ipp
+    dataOut.nCohInt = 1
+    dataOut.flagDataAsBlock = True
+    dataOut.flagDecodeData = True
+    dataOut.code = code
+    dataOut.utctime = 0
+
+    return dataOut
+
+
+def run(func, blocks, code):
+
+    outputs = []
+    elapsed = 0
+    tracemalloc.start()
+    for data in blocks:
+        dataOut = getDataOut(data, code)
+        t0 = time.perf_counter()
+        dataOut = func(dataOut)
+        elapsed += time.perf_counter() - t0
+        outputs.append({key: getattr(dataOut, key) for key in PRODUCTS})
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return outputs, len(blocks)/elapsed, peak
+
+
+if __name__ == '__main__':
+
+    code = numpy.exp(1j*numpy.linspace(0, 3, 40)).reshape(1, -1)
+    blocks = list(getBlocks())
+
+    op = PulsePair_vRF()
+    new, new_rate, new_peak = run(op.run, blocks, code)
+    old, old_rate, old_peak = run(legacy, blocks, code)
+
+    print('\nPulsePair_vRF: {} blocks of {} x {} x {} ({})'.format(
+        nBlocks, nChannels, nProfiles, nHeights, precision))
+    print('{:>14} {:>16}'.format('product', 'identical'))
+    for key in PRODUCTS:
+        same = all(numpy.array_equal(a[key], b[key], equal_nan=True) for a, b in zip(new, old))
+        print('{:>14} {:>16}'.format(key, str(same)))
+    print('{:>14} {:>10} {:>10}'.format('version', 'blocks/s', 'peak [MB]'))
+    print('{:>14} {:>10.2f} {:>10.1f}'.format('previous', old_rate, old_peak/1e6))
+    print('{:>14} {:>10.2f} {:>10.1f}'.format('current', new_rate, new_peak/1e6))
@@ -0,0 +1,142 @@
+'''
+Benchmark of WeatherParamsPlot PPI rendering with pcolormesh (default) vs
+the lookup table raster (raster=True), without map (grid) and with map
+(map=True, synthetic shapefiles as in bench_weatherplot.py). The sweeps are
+storm cells (smooth reflectivity, empty cells below 5 dBZ) with the same
+geometry in every sweep or with the azimuths moved in every sweep (the
+lookup table is computed again). Reports the time of the first sweep
+(figure layers for the raster), the next sweeps (plot + format +
+canvas.draw, Agg) and the PNG written from the figure, and the difference
+of the images against pcolormesh: percentage of pixels with a difference
+larger than 16 in any channel, also allowing the color of a neighbour
+pixel, and mean absolute difference.
+
+    python bench_raster_ppi.py [nRadials] [nHeights] [nSweeps] [range]
+'''
+
+import io
+import os
+import sys
+import time
+import shutil
+import tempfile
+import datetime
+import contextlib
+
+os.environ['BACKEND'] = 'Agg'
+
+import numpy
+
+from bench_weatherplot import writeShapes, LONGITUDE, LATITUDE
+from schainpy.model.data.jrodata import Parameters
+from schainpy.model.graphics.jroplot_base import Plot, plt
+from schainpy.model.graphics.jroplot_parameters import WeatherParamsPlot
+
+nRadials = int(sys.argv[1]) if len(sys.argv) > 1 else 360
+nHeights = int(sys.argv[2]) if len(sys.argv) > 2 else 400
+nSweeps = int(sys.argv[3]) if len(sys.argv) > 3 else 8
+xrange = int(sys.argv[4]) if len(sys.argv) > 4 else 60
+
+
+def getSweep(i, move):
+
+    rng = numpy.random.default_rng(i)
+    azi = numpy.linspace(0, 360, nRadials, endpoint=False)
+    if move:
+        azi = (azi + rng.uniform(0, 360/nRadials) + rng.normal(0, 0.05, nRadials)) % 360
+    r = numpy.arange(nHeights)*xrange/nHeights
+    R, A = numpy.meshgrid(r, numpy.radians(azi))
+    x, y = R*numpy.sin(A), R*numpy.cos(A)
+
+    z = numpy.zeros((nRadials, nHeights))
+    for n in range(6):
+        x0, y0 = rng.uniform(-0.8*xrange, 0.8*xrange, 2)
+        width = rng.uniform(3, 10)
+        z += rng.uniform(30, 60)*numpy.exp(-((x - x0)**2 + (y - y0)**2)/(2*width**2))
+    z += rng.normal(0, 1, z.shape)
+    z[z < 5] = numpy.nan
+
+    dataOut = Parameters()
+    data = numpy.full((2, 8, nRadials, nHeights), numpy.nan)
+    data[:, 4] = z
+    data[:, 3] = 10
+    dataOut.data_param = data
+    dataOut.weather_vars = None
+    dataOut.heightList = r
+    dataOut.channelList = [0, 1]
+    dataOut.data_azi = azi
+    dataOut.data_ele = numpy.full(nRadials, 4.0)
+    dataOut.mode_op = 'PPI'
+    dataOut.paramInterval = 60
+    dataOut.utctime = datetime.datetime(2024, 10, 15, 12).timestamp() + 60*i
+    return dataOut
+
+
+def run(sweeps, **kwargs):
+
+    # clase sin MPDecorator, se ejecuta en este proceso
+    plot = object.__new__(WeatherParamsPlot)
+    Plot.__bases__[0].__init__(plot)
+    kwargs.update(show=False, save=False, channels=[0], zmin=-10, zmax=70, xrange=xrange, yrange=20,
+                  attr_data='Z', labels=['Z'], colormap='sophy_z', bgcolor='black', localtime=False,
+                  latitude=LATITUDE, longitude=LONGITUDE, mode='PPI')
+
+    times = []
+    pngs = []
+    images = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for dataOut in sweeps:
+            t0 = time.perf_counter()
+            Plot.__bases__[0].run(plot, dataOut, **kwargs)
+            t1 = time.perf_counter()
+            fig = plot.figures['PPI'][0]
+            fig.savefig(io.BytesIO(), format='png')
+            times.append(t1 - t0)
+            pngs.append(time.perf_counter() - t1)
+            images.append(numpy.asarray(fig.canvas.buffer_rgba())[..., :3].astype(int))
+    plt.close(plot.figures['PPI'][0])
+    plt.close(plot.figures['RHI'][0])
+    return times, pngs, images
+
+
+def compare(ref, images):
+    '''
+    Pixels that differ, also allowing the color of a neighbour pixel (the
+    gates smaller than a pixel are sampled in other places), and the mean
+    absolute difference
+    '''
+
+    ref = numpy.array(ref)
+    images = numpy.array(images)
+    diff = numpy.abs(ref - images)
+    near = diff.max(axis=-1)
+    for dy in (-1, 0, 1):
+        for dx in (-1, 0, 1):
+            shifted = numpy.roll(ref, (dy, dx), axis=(1, 2))
+            near = numpy.minimum(near, numpy.abs(shifted - images).max(axis=-1))
+    return 100*(diff.max(axis=-1) > 16).mean(), 100*(near > 16).mean(), diff.mean()
+
+
+if __name__ == '__main__':
+
+    tmp = tempfile.mkdtemp()
+    try:
+        writeShapes(tmp)
+        print('\nWeatherParamsPlot PPI: {} radials x {} gates, range {} km, {} sweeps, sophy_z'.format(
+            nRadials, nHeights, xrange, nSweeps))
+        print('{:>6} {:>9} {:>12} {:>10} {:>10} {:>9} {:>10} {:>11} {:>9}'.format(
+            'map', 'geometry', 'renderer', 'first[ms]', 'next[ms]', 'png[ms]', 'diff[%px]', '+-1px[%px]', 'mean diff'))
+        for basemap in (False, True):
+            for move in (False, True):
+                sweeps = [getSweep(i, move) for i in range(nSweeps)]
+                ref = None
+                for raster in (False, True):
+                    times, pngs, images = run(sweeps, map=basemap, raster=raster, shapes=tmp)
+                    if ref is None:
+                        ref = images
+                    pixels, near, mean = compare(ref, images)
+                    print('{:>6} {:>9} {:>12} {:>10.1f} {:>10.1f} {:>9.1f} {:>10.3f} {:>11.3f} {:>9.3f}'.format(
+                        'yes' if basemap else 'no', 'moved' if move else 'fixed', 'raster' if raster else 'pcolormesh',
+                        times[0]*1e3, numpy.mean(times[1:])*1e3, numpy.mean(pngs)*1e3, pixels, near, mean))
+    finally:
+        shutil.rmtree(tmp)
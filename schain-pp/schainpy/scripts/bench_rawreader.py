@@ -0,0 +1,209 @@
+'''
+Benchmark of VoltageReader and SpectraReader block reading with
+numpy.fromfile (default) vs the file mapped in memory (mmap=True), with and
+without channel/height selection (selChannels, selHeights) and single
+precision. Each mode runs in its own process and reports the throughput in
+MB/s of the file, the allocations per block (tracemalloc peak), the peak
+RSS (VmHWM, includes the pages of the mapped file) and the anonymous RSS at
+the end, and checks the blocks against the fromfile reader.
+
+    python bench_rawreader.py [nChannels] [nProfiles] [nHeights] [nBlocks]
+'''
+
+import io
+import os
+import sys
+import time
+import shutil
+import tempfile
+import datetime
+import contextlib
+import tracemalloc
+import multiprocessing
+import numpy
+
+from schainpy.model.io.jroIO_simulator import SimulatorReader
+from schainpy.model.io.jroIO_voltage import VoltageReader, VoltageWriter
+from schainpy.model.io.jroIO_spectra import SpectraReader, SpectraWriter
+from schainpy.model.proc.jroproc_spectra import SpectraProc
+
+nChannels = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+nProfiles = int(sys.argv[2]) if len(sys.argv) > 2 else 256
+nHeights = int(sys.argv[3]) if len(sys.argv) > 3 else 1000
+nBlocks = int(sys.argv[4]) if len(sys.argv) > 4 else 20
+blocksPerFile = 10
+
+MODES = (
+    ('fromfile', dict()),
+    ('mmap', dict(mmap=True)),
+    ('mmap single', dict(mmap=True, precision='single')),
+    ('mmap sel', dict(mmap=True, selChannels=[0, 1], selHeights=[0, nHeights//4 - 1])),
+    )
+
+
+def writeRaw(path):
+    '''
+    Archivos .r (int16) con ruido, las cabeceras se toman del simulador
+    '''
+
+    sim = SimulatorReader()
+    writer = VoltageWriter.__bases__[0]()
+    rng = numpy.random.default_rng(0)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        sim.run(samples=nHeights, channels=nChannels, profilesPerBlock=nProfiles,
+                dataBlocksPerFile=blocksPerFile, FixRCP_IPP=60)
+        dataOut = sim.dataOut
+        for n in range(nBlocks*nProfiles):
+            dataOut.data = rng.normal(0, 500, (nChannels, nHeights)) + 1j*rng.normal(0, 500, (nChannels, nHeights))
+            dataOut.flagDiscontinuousBlock = False
+            writer.run(dataOut, path, blocksPerFile=blocksPerFile, profilesPerBlock=nProfiles, datatype=1)
+            dataOut.utctime += dataOut.ippSeconds
+
+
+def writeSpectra(rawpath, path):
+
+    reader = VoltageReader()
+    proc = SpectraProc()
+    writer = SpectraWriter.__bases__[0]()
+    pairs = [(i, i + 1) for i in range(0, nChannels - 1, 2)]
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        while True:
+            try:
+                reader.run(path=rawpath, startDate=datetime.date(2000, 1, 1), endDate=datetime.date(2100, 1, 1),
+                           startTime=datetime.time(0, 0), endTime=datetime.time(23, 59, 59))
+            except Exception:
+                break
+            proc.dataIn = reader.dataOut
+            proc.run(nFFTPoints=nProfiles, pairsList=pairs)
+            if not proc.dataOut.flagNoData:
+                writer.run(proc.dataOut, path, blocksPerFile=blocksPerFile)
+
+
+def getBlocks(reader):
+
+    dataOut = reader.dataOut
+    if isinstance(reader, VoltageReader):
+        return {'data': dataOut.data.copy()}
+    blocks = {'spc': dataOut.data_spc.copy(), 'dc': dataOut.data_dc.copy(), 'pairs': list(dataOut.pairsList)}
+    if dataOut.data_cspc is not None:
+        blocks['cspc'] = dataOut.data_cspc.copy()
+    return blocks
+
+
+def read(cls, path, keep, kwargs, conn):
+
+    kwargs = dict(kwargs)
+    reader = cls()
+    reader.precision = kwargs.pop('precision', 'double')
+    blocks = []
+    elapsed = 0
+    peaks = []
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        tracemalloc.start()
+        while True:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            t0 = time.perf_counter()
+            try:
+                reader.run(path=path, startDate=datetime.date(2000, 1, 1), endDate=datetime.date(2100, 1, 1),
+                           startTime=datetime.time(0, 0), endTime=datetime.time(23, 59, 59), getByBlock=True,
+                           **kwargs)
+            except Exception:
+                break
+            elapsed += time.perf_counter() - t0
+            peaks.append(tracemalloc.get_traced_memory()[1] - before)
+            if keep:
+                blocks.append(getBlocks(reader))
+        tracemalloc.stop()
+
+    conn.send((elapsed, numpy.median(peaks), getMemory(), blocks))
+
+
+def getMemory():
+    '''
+    Pico de RSS y RSS anonimo (sin paginas de archivos) en MB
+    '''
+
+    status = {}
+    with open('/proc/self/status') as fp:
+        for line in fp:
+            key, value = line.split(':', 1)
+            status[key] = value
+    return tuple(int(status[key].split()[0])/1e3 for key in ('VmHWM', 'RssAnon'))
+
+
+def run(cls, path, keep, kwargs):
+
+    # proceso nuevo para que el RSS sea solo el de la lectura
+    ctx = multiprocessing.get_context('spawn')
+    parent, child = ctx.Pipe()
+    proc = ctx.Process(target=read, args=(cls, path, keep, kwargs, child))
+    proc.start()
+    result = parent.recv()
+    proc.join()
+    return result
+
+
+def check(ref, blocks, kwargs):
+
+    channels = kwargs.get('selChannels', None)
+    heights = kwargs.get('selHeights', None)
+    maxdiff = 0
+    if len(ref) != len(blocks):
+        return numpy.inf
+    for a, b in zip(ref, blocks):
+        for key in b:
+            if key == 'pairs':
+                continue
+            x = a[key]
+            if channels is not None:
+                if key == 'cspc':
+                    x = x[[n for n, pair in enumerate(a['pairs']) if pair in b['pairs']]]
+                else:
+                    x = x[channels]
+            if heights is not None:
+                x = x[..., heights[0]:heights[1] + 1]
+            if x.shape != b[key].shape:
+                return numpy.inf
+            maxdiff = max(maxdiff, numpy.abs(x - b[key]).max())
+    return maxdiff
+
+
+def getSize(path):
+
+    return sum(os.path.getsize(os.path.join(root, name)) for root, dirs, files in os.walk(path) for name in files)
+
+
+if __name__ == '__main__':
+
+    tmp = tempfile.mkdtemp()
+    rawpath = os.path.join(tmp, 'raw')
+    spcpath = os.path.join(tmp, 'pdata')
+
+    try:
+        writeRaw(rawpath)
+        writeSpectra(rawpath, spcpath)
+
+        for label, cls, path in (('VoltageReader', VoltageReader, rawpath), ('SpectraReader', SpectraReader, spcpath)):
+            size = getSize(path)
+            print('\n{}: {} blocks, {} x {} x {}, {:.0f} MB'.format(
+                label, nBlocks, nChannels, nProfiles, nHeights, size/1e6))
+            print('{:>12} {:>8} {:>14} {:>10} {:>10} {:>10}'.format(
+                'mode', 'MB/s', 'alloc/blk[MB]', 'HWM[MB]', 'anon[MB]', 'max diff'))
+            ref = None
+            for mode, kwargs in MODES:
+                if cls is SpectraReader and 'precision' in kwargs:
+                    continue
+                elapsed, alloc, rss, blocks = run(cls, path, True, kwargs)
+                if ref is None:
+                    ref = blocks
+                diff = check(ref, blocks, kwargs)
+                # sin guardar los bloques para medir el RSS
+                elapsed, alloc, (hwm, anon), _ = run(cls, path, False, kwargs)
+                print('{:>12} {:>8.1f} {:>14.2f} {:>10.1f} {:>10.1f} {:>10.2e}'.format(
+                    mode, size/1e6/elapsed, alloc/1e6, hwm, anon, diff))
+    finally:
+        shutil.rmtree(tmp)
@@ -0,0 +1,136 @@
+'''
+Benchmark of the RTI rendering with the whole pcolormesh rebuilt every
+frame (previous RTIPlot) vs the incremental RTIMesh, along a 24 h window
+(a new profile every `interval` seconds). For some hours of the window the
+buffer is filled and the cost of the next frames (plot + canvas.draw, Agg)
+is measured, for RTIMesh also the cost of the first frame (full redraw, as
+when the window shifts). Checks that the PNGs are the same pixel by pixel.
+
+    python bench_rtiplot.py [nChannels] [nHeights] [interval] [nFrames]
+'''
+
+import io
+import os
+import sys
+import time
+
+os.environ['BACKEND'] = 'Agg'
+
+import numpy
+import matplotlib.image as image
+
+from schainpy.model.data.jrodata import PlotterData
+from schainpy.model.graphics.jroplot_base import Plot, plt
+from schainpy.model.graphics.jroplot_spectra import RTIPlot
+
+nChannels = int(sys.argv[1]) if len(sys.argv) > 1 else 2
+nHeights = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+interval = float(sys.argv[3]) if len(sys.argv) > 3 else 10
+nFrames = int(sys.argv[4]) if len(sys.argv) > 4 else 5
+HOURS = (1, 6, 12, 24)
+
+
+class OldRTI(object):
+    '''
+    pcolormesh nuevo en cada cuadro como el RTIPlot anterior
+    '''
+
+    _Plot__missing = 1E30
+
+    def plot(self):
+
+        x, y, z = Plot.fill_gaps(self, self.data.times, self.data.yrange,
+                                 numpy.ma.masked_invalid(self.data['rti']))
+        for n, ax in enumerate(self.axes):
+            self.zmin = self.zmin if self.zmin else numpy.min(z)
+            self.zmax = self.zmax if self.zmax else numpy.max(z)
+            if not ax.firsttime:
+                ax.plt.remove()
+            ax.plt = ax.pcolormesh(x, y, z[n].T, vmin=self.zmin, vmax=self.zmax,
+                                   cmap=plt.get_cmap(self.colormap))
+
+
+def getPlot(cls, data):
+
+    plot = object.__new__(cls) if cls is RTIPlot else cls()
+    plot.data = data
+    plot.decimation = None
+    plot.zmin = None
+    plot.zmax = None
+    plot.colormap = 'jet'
+    plot.showprofile = False
+    plot.fig, axes = plt.subplots(nChannels, 1, figsize=(8, 1.4*nChannels + 1))
+    plot.axes = list(axes)
+    for ax in plot.axes:
+        ax.firsttime = True
+    return plot
+
+
+def frame(plot, tmin):
+
+    plot.plot()
+    for n, ax in enumerate(plot.axes):
+        if ax.firsttime:
+            ax.set_xlim(tmin, tmin + 24*3600)
+            ax.set_ylim(0, plot.data.yrange[-1])
+            ax.firsttime = False
+        ax.set_title('RTI Channel {} {:.0f}'.format(n, plot.data.max_time), size=8)
+    plot.fig.canvas.draw()
+
+
+def getPNG(plot):
+
+    buf = io.BytesIO()
+    plot.fig.savefig(buf, format='png')
+    buf.seek(0)
+    return image.imread(buf)
+
+
+def run(hours):
+
+    rng = numpy.random.default_rng(0)
+    heights = numpy.arange(nHeights)*0.15
+    meta = {'yrange': heights, 'interval': interval}
+    tmin = 1729000000.
+    n = int(hours*3600/interval)
+    data = PlotterData('rti', None)
+    data.setup()
+
+    def add(i):
+        rti = rng.normal(20, 5, (nChannels, nHeights))
+        rti[:, rng.integers(0, nHeights, 5)] = numpy.nan
+        data.update({'rti': rti, 'noise': numpy.zeros(nChannels)}, tmin + i*interval, meta)
+
+    for i in range(n - nFrames):
+        add(i)
+
+    costs = {}
+    plots = {'old': getPlot(OldRTI, data), 'new': getPlot(RTIPlot, data)}
+    for key, plot in plots.items():
+        t0 = time.perf_counter()
+        frame(plot, tmin)
+        costs[key + ' first'] = time.perf_counter() - t0
+        costs[key] = 0
+    for i in range(n - nFrames, n):
+        add(i)
+        for key, plot in plots.items():
+            t0 = time.perf_counter()
+            frame(plot, tmin)
+            costs[key] += (time.perf_counter() - t0)/nFrames
+
+    same = numpy.array_equal(getPNG(plots['old']), getPNG(plots['new']))
+    for plot in plots.values():
+        plt.close(plot.fig)
+    return n, costs, same
+
+
+if __name__ == '__main__':
+
+    print('\nRTI: {} channels x {} heights, 24 h window, a profile every {} s, Agg'.format(
+        nChannels, nHeights, interval))
+    print('{:>6} {:>8} {:>16} {:>16} {:>16} {:>6}'.format(
+        'hours', 'profiles', 'pcolormesh[ms]', 'RTIMesh[ms]', 'full redraw[ms]', 'png'))
+    for hours in HOURS:
+        n, costs, same = run(hours)
+        print('{:>6} {:>8} {:>16.1f} {:>16.1f} {:>16.1f} {:>6}'.format(
+            hours, n, costs['old']*1e3, costs['new']*1e3, costs['new first']*1e3, 'ok' if same else 'FAIL'))
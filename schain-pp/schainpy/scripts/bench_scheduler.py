@@ -0,0 +1,75 @@
+'''
+Benchmark of the Project schedulers: 'sequential' (all the units in one
+process) vs 'parallel' (one process per unit or group of units). The
+parallel scheduler needs a free core per worker, on one core it is slower
+(~0.85x) and it is not the default.
+
+    python bench_scheduler.py [nBlocks]
+'''
+
+import sys
+import time
+from schainpy.controller import Project
+
+nBlocks = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+
+
+def build(scheduler):
+
+    project = Project()
+    project.setup(id='10', name='Bench Scheduler', description='Scheduler benchmark',
+                  scheduler=scheduler)
+
+    read_unit = project.addReadUnit(datatype='SimulatorReader',
+                                    group='acquisition',
+                                    frequency=9.345e9,
+                                    FixRCP_IPP=60,
+                                    Tau_0=30,
+                                    AcqH0_0=0,
+                                    samples=330,
+                                    AcqDH_0=0.15,
+                                    FixRCP_TXA=0.15,
+                                    FixRCP_TXB=0.15,
+                                    Fdoppler=200.0,
+                                    Hdoppler=36,
+                                    Adoppler=300,
+                                    profilesPerBlock=256,
+                                    dataBlocksPerFile=nBlocks,
+                                    nTotalReadFiles=1,
+                                    delay=0,
+                                    online=0,
+                                    walk=0)
+
+    # the simulator gives one profile per call, the spectra are computed in
+    # the same process and only the blocks are sent to the other units
+    proc_spc = project.addProcUnit(datatype='SpectraProc', inputId=read_unit.getId(),
+                                   group='acquisition')
+    proc_spc.addParameter(name='nFFTPoints', value=256, format='int')
+    proc_spc.addParameter(name='nProfiles', value=256, format='int')
+
+    proc_int = project.addProcUnit(datatype='SpectraProc', inputId=proc_spc.getId())
+    op = proc_int.addOperation(name='removeInterference', optype='other')
+    op.addParameter(name='mode', value='2', format='int')
+
+    proc_dc = project.addProcUnit(datatype='SpectraProc', inputId=proc_spc.getId())
+    op = proc_dc.addOperation(name='removeDC', optype='other')
+    op.addParameter(name='mode', value='2', format='int')
+    op = proc_dc.addOperation(name='removeInterference', optype='other')
+
+    return project
+
+
+if __name__ == '__main__':
+
+    results = {}
+
+    for scheduler in ('sequential', 'parallel'):
+        project = build(scheduler)
+        t0 = time.time()
+        project.run()
+        results[scheduler] = time.time() - t0
+
+    print('\n{:>12} {:>10} {:>10}'.format('scheduler', 'time [s]', 'blocks/s'))
+    for scheduler, elapsed in results.items():
+        print('{:>12} {:>10.2f} {:>10.2f}'.format(scheduler, elapsed, nBlocks/elapsed))
+    print('speedup: {:.2f}x'.format(results['sequential']/results['parallel']))
@@ -0,0 +1,193 @@
+'''
+Benchmark of WeatherParamsPlot PPI rendering with map (map=True): the
+previous version (shapefiles read and filtered and the sweep mesh computed
+again for every figure, taken from git) vs the cached basemap layers and
+sweep mesh. Synthetic shapefiles with the fields of the real ones are
+written in a temporary folder. Reports the time to render one PPI (plot +
+format + canvas.draw, Agg) for the first sweep, the next sweeps with the
+same geometry and the first sweep of a new process that finds the layers
+in the cache folder. Checks that the figures are the same pixel by pixel.
+
+    python bench_weatherplot.py [nRadials] [nHeights] [nSweeps] [range]
+'''
+
+import io
+import os
+import sys
+import time
+import types
+import shutil
+import tempfile
+import datetime
+import subprocess
+import contextlib
+import multiprocessing
+
+os.environ['BACKEND'] = 'Agg'
+
+import numpy
+import shapefile
+
+nRadials = int(sys.argv[1]) if len(sys.argv) > 1 else 360
+nHeights = int(sys.argv[2]) if len(sys.argv) > 2 else 400
+nSweeps = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+xrange = int(sys.argv[4]) if len(sys.argv) > 4 else 60
+LONGITUDE = -80.6
+LATITUDE = -5.2
+
+
+def ring(lon, lat, radius, n, rng):
+
+    # sentido horario, anillo exterior en el formato shapefile
+    angle = numpy.linspace(2*numpy.pi, 0, n)
+    radius = radius*(1 + 0.2*rng.random(n))
+    points = numpy.c_[lon + radius*numpy.cos(angle), lat + radius*numpy.sin(angle)]
+    points[-1] = points[0]
+    return points.tolist()
+
+
+def writeShapes(path):
+    '''
+    Distritos, provincias, carreteras y capitales en una region de 20 x 20
+    grados alrededor del radar
+    '''
+
+    rng = numpy.random.default_rng(0)
+    centers = lambda n: zip(LONGITUDE + rng.uniform(-10, 10, n), LATITUDE + rng.uniform(-10, 10, n))
+
+    os.makedirs(os.path.join(path, 'Distritos'))
+    with shapefile.Writer(os.path.join(path, 'Distritos/PER_adm3'), shapeType=shapefile.POLYGON) as w:
+        w.field('NAME_1', 'C', 40)
+        for i, (lon, lat) in enumerate(centers(1800)):
+            w.poly([ring(lon, lat, 0.15, 300, rng)])
+            w.record('Piura' if i % 2 else 'Lima')
+
+    os.makedirs(os.path.join(path, 'PER_ADM2'))
+    with shapefile.Writer(os.path.join(path, 'PER_ADM2/PER_ADM2'), shapeType=shapefile.POLYGON) as w:
+        w.field('NAME_2', 'C', 40)
+        for i, (lon, lat) in enumerate(centers(200)):
+            w.poly([ring(lon, lat, 0.6, 1000, rng)])
+            w.record('P{}'.format(i))
+
+    os.makedirs(os.path.join(path, 'Carreteras'))
+    with shapefile.Writer(os.path.join(path, 'Carreteras/VIAS_NACIONAL_250000'), shapeType=shapefile.POLYLINE) as w:
+        w.field('NAME', 'C', 40)
+        for i, (lon, lat) in enumerate(centers(500)):
+            steps = rng.normal(0, 0.01, (500, 2)).cumsum(axis=0)
+            w.line([(steps + (lon, lat)).tolist()])
+            w.record('V{}'.format(i))
+
+    os.makedirs(os.path.join(path, 'CAPITALES'))
+    with shapefile.Writer(os.path.join(path, 'CAPITALES/cap_distrito'), shapeType=shapefile.POINT) as w:
+        for name in ('DEPARTA', 'CATEGORIA', 'NOMBRE'):
+            w.field(name, 'C', 40)
+        w.field('X', 'N', 12, 6)
+        w.field('Y', 'N', 12, 6)
+        names = ['HUANCAYO', 'JAUJA', 'NEGRITOS', 'CATACAOS', 'OTRO']
+        for i, (lon, lat) in enumerate(centers(2000)):
+            w.point(lon, lat)
+            w.record('JUNIN' if i % 3 else 'PIURA', 'CIUDAD', names[i % 5], lon, lat)
+
+
+def getModule(old):
+    '''
+    jroplot_parameters actual o el de la version anterior en git
+    '''
+
+    if not old:
+        from schainpy.model.graphics import jroplot_parameters
+        return jroplot_parameters
+
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    commit = subprocess.check_output(
+        ['git', 'log', '-1', '--format=%H', '--grep', 'Cache the basemap layers'], text=True, cwd=cwd).strip()
+    code = subprocess.check_output(
+        ['git', 'show', '{}:./../model/graphics/jroplot_parameters.py'.format(commit + '^' if commit else 'HEAD')],
+        text=True, cwd=cwd)
+    module = types.ModuleType('schainpy.model.graphics.jroplot_parameters_old')
+    module.__package__ = 'schainpy.model.graphics'
+    exec(compile(code, 'jroplot_parameters_old.py', 'exec'), module.__dict__)
+    return module
+
+
+def getSweep(i):
+
+    from schainpy.model.data.jrodata import Parameters
+
+    rng = numpy.random.default_rng(i)
+    dataOut = Parameters()
+    data = numpy.full((2, 8, nRadials, nHeights), numpy.nan)
+    data[:, 0] = numpy.round(rng.normal(20, 10, (2, nRadials, nHeights)), 2)
+    data[:, 3] = rng.normal(5, 10, (2, nRadials, nHeights))
+    dataOut.data_param = data
+    dataOut.weather_vars = None
+    dataOut.heightList = numpy.arange(nHeights)*xrange/nHeights
+    dataOut.channelList = [0, 1]
+    dataOut.data_azi = numpy.linspace(0, 360, nRadials, endpoint=False)
+    dataOut.data_ele = numpy.full(nRadials, 4.0)
+    dataOut.mode_op = 'PPI'
+    dataOut.paramInterval = 60
+    dataOut.utctime = datetime.datetime(2024, 10, 15, 12).timestamp() + 60*i
+    return dataOut
+
+
+def render(old, shapes, conn):
+
+    from schainpy.model.graphics.jroplot_base import Plot
+
+    module = getModule(old)
+    # clase sin MPDecorator, se ejecuta en este proceso
+    plot = object.__new__(module.WeatherParamsPlot)
+    Plot.__bases__[0].__init__(plot)
+    kwargs = dict(show=False, save=False, channels=[0], zmin=-10, zmax=60, xrange=xrange, yrange=20,
+                  attr_data='Z', labels=['Z'], colormap='jet', bgcolor='black', localtime=False,
+                  shapes=shapes, latitude=LATITUDE, longitude=LONGITUDE, map=True, mode='PPI')
+
+    times = []
+    images = []
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            for i in range(nSweeps):
+                t0 = time.perf_counter()
+                Plot.__bases__[0].run(plot, getSweep(i), **kwargs)
+                times.append(time.perf_counter() - t0)
+                fig = plot.figures['PPI'][0]
+                images.append(numpy.asarray(fig.canvas.buffer_rgba()).copy())
+    except Exception as e:
+        conn.send(e)
+        return
+
+    conn.send((times, images))
+
+
+def run(old, shapes):
+
+    # proceso nuevo para que las capas no esten en memoria
+    ctx = multiprocessing.get_context('spawn')
+    parent, child = ctx.Pipe()
+    proc = ctx.Process(target=render, args=(old, shapes, child))
+    proc.start()
+    result = parent.recv()
+    proc.join()
+    if isinstance(result, Exception):
+        raise result
+    return result
+
+
+if __name__ == '__main__':
+
+    tmp = tempfile.mkdtemp()
+    try:
+        writeShapes(tmp)
+        print('\nWeatherParamsPlot PPI with map: {} radials x {} gates, range {} km, {} sweeps'.format(
+            nRadials, nHeights, xrange, nSweeps))
+        print('{:>22} {:>12} {:>14} {:>8}'.format('version', 'first[ms]', 'next[ms]', 'pixels'))
+        ref, images = run(True, tmp)
+        print('{:>22} {:>12.1f} {:>14.1f} {:>8}'.format('reload every figure', ref[0]*1e3, numpy.mean(ref[1:])*1e3, '-'))
+        for label in ('cached', 'cached (cache file)'):
+            times, new = run(False, tmp)
+            same = all(numpy.array_equal(a, b) for a, b in zip(images, new))
+            print('{:>22} {:>12.1f} {:>14.1f} {:>8}'.format(
+                label, times[0]*1e3, numpy.mean(times[1:])*1e3, 'ok' if same else 'differ'))
+    finally:
+        shutil.rmtree(tmp)
@@ -27,6 +27,20 @@ META = ['heightList', 'data_azi', 'data_ele', 'mode_op', 'latitude', 'longitude'
     'snr_threshold', 'data_noise']
 
 
+def writer_vars(names, single_file):
+    '''
+    weather_var, data_param description and labels of a HDFWriter with the
+    parameters `names`, in one file per sweep or one file per parameter
+    '''
+
+    if single_file:
+        return (names, {p: {PARAM[p]['wrname']: ['H', 'V']} for p in names},
+                [PARAM[p]['label'] for p in names], [PARAM[p]['cb_label'] for p in names])
+
+    p = names[0]
+    return p, {PARAM[p]['wrname']: ['H', 'V']}, PARAM[p]['label'], PARAM[p]['cb_label']
+
+
 def max_index(r, sample_rate, ipp, h0,ipp_km):
 
     return int(sample_rate*ipp*1e6 * r / ipp_km) + int(sample_rate*ipp*1e6 * -h0 / ipp_km)
@@ -73,6 +87,8 @@ def main(args):
     RMIX = 6.0          # 4.8          #5.8  #4.8#5.68#4.8#4.8#2.64#10#2.64
     H0   = -2.0         #-1.68        #-1.68# -1.2#-1.68#-1.2#0.5#-1.2
     MASK = args.mask
+    # variables guardadas por Block360, el SNR se usa para la mascara
+    sweep_vars = list(parameters) + (['SNR'] if MASK and 'SNR' not in parameters else [])
 
     from schainpy.controller import Project
 
@@ -146,14 +162,14 @@ def main(args):
         op.addParameter(name='mode', value=args.mode)
         op.addParameter(name='heading', value=conf['heading'])
 
-        for param in parameters:
-            op = proc.addOperation(name='Block360')
-            op.addParameter(name='runNextOp', value=True)
-            op.addParameter(name='attr_data', value='data_param')
-            op.addParameter(name='angles', value=angles)
-            op.addParameter(name='heading', value=conf['heading'])
-
+        # un solo barrido con todas las variables para los graficos y archivos
+        op = proc.addOperation(name='Block360')
+        op.addParameter(name='attr_data', value='data_param')
+        op.addParameter(name='parameters', value=','.join(sweep_vars))
+        op.addParameter(name='angles', value=angles)
+        op.addParameter(name='heading', value=conf['heading'])
 
+        for param in parameters:
             op= proc.addOperation(name='WeatherParamsPlot')
             if args.save: op.addParameter(name='save', value=path_plots, format='str')
             op.addParameter(name='save_period', value=-1)
@@ -180,9 +196,13 @@ def main(args):
                 op.addParameter(name='server', value='190.187.237.239:4444')
                 op.addParameter(name='exp_code', value='400')
 
+        # un archivo por barrido con todas las variables o uno por variable
+        for names in ([parameters] if args.single_file else [[p] for p in parameters]):
+            weather_var, data_desc, variable, variable_unit = writer_vars(names, args.single_file)
+
             desc = {
                     'Data': {
-                        'data_param': {PARAM[param]['wrname']: ['H', 'V']},
+                        'data_param': data_desc,
                         'utctime': 'time'
                     },
                      'Metadata': {
@@ -204,7 +224,7 @@ def main(args):
                 writer.addParameter(name='blocksPerFile', value='1',format='int')
                 writer.addParameter(name='metadataList', value=','.join(META))
                 writer.addParameter(name='dataList', value='data_param,utctime')
-                writer.addParameter(name='weather_var', value=param)
+                writer.addParameter(name='weather_var', value=weather_var)
                 writer.addParameter(name='mask', value=MASK, format='float')
                 writer.addParameter(name='localtime', value=False)
                 # meta
@@ -219,8 +239,8 @@ def main(args):
                 writer.addParameter(name='range_unit', value='km')
                 writer.addParameter(name='prf', value=1/ipp)
                 writer.addParameter(name='prf_unit', value='hertz')
-                writer.addParameter(name='variable', value=PARAM[param]['label'])
-                writer.addParameter(name='variable_unit', value=PARAM[param]['cb_label'])
+                writer.addParameter(name='variable', value=variable)
+                writer.addParameter(name='variable_unit', value=variable_unit)
                 writer.addParameter(name='n_pulses', value=n_pulses)
                 writer.addParameter(name='pulse1_range', value=RMIX)
                 writer.addParameter(name='pulse1_width', value=pulse_1_width)
@@ -298,6 +318,7 @@ def main(args):
 
             op = proc1.addOperation(name='Block360')
             op.addParameter(name='attr_data', value='data_param')
+            op.addParameter(name='parameters', value=','.join(sweep_vars))
             op.addParameter(name='runNextOp', value=True)
             op.addParameter(name='angles', value=angles)
             #op.addParameter(name='horario',value=False)
@@ -362,6 +383,7 @@ def main(args):
 
             op = proc2.addOperation(name='Block360')
             op.addParameter(name='attr_data', value='data_param')
+            op.addParameter(name='parameters', value=','.join(sweep_vars))
             op.addParameter(name='runNextOp', value=True)
             op.addParameter(name='angles', value=angles)
             op.addParameter(name='heading', value=conf['heading'])
@@ -411,9 +433,13 @@ def main(args):
                     op.addParameter(name='server', value='190.187.237.239:4444')
                     op.addParameter(name='exp_code', value='400')
 
+        # un archivo por barrido con todas las variables o uno por variable
+        for names in ([parameters] if args.single_file else [[p] for p in parameters]):
+            weather_var, data_desc, variable, variable_unit = writer_vars(names, args.single_file)
+
             desc = {
                     'Data': {
-                        'data_param': {PARAM[param]['wrname']: ['H', 'V']},
+                        'data_param': data_desc,
                         'utctime': 'time'
                     },
                      'Metadata': {
@@ -436,7 +462,7 @@ def main(args):
                 writer.addParameter(name='blocksPerFile', value='1',format='int')
                 writer.addParameter(name='metadataList', value=','.join(META))
                 writer.addParameter(name='dataList', value='data_param,utctime')
-                writer.addParameter(name='weather_var', value=param)
+                writer.addParameter(name='weather_var', value=weather_var)
                 writer.addParameter(name='mask', value=MASK, format='float')
                 writer.addParameter(name='localtime', value=False)
                 # meta
@@ -451,8 +477,8 @@ def main(args):
                 writer.addParameter(name='range_unit', value='km')
                 writer.addParameter(name='prf', value=1/ipp)
                 writer.addParameter(name='prf_unit', value='hertz')
-                writer.addParameter(name='variable', value=PARAM[param]['label'])
-                writer.addParameter(name='variable_unit', value=PARAM[param]['cb_label'])
+                writer.addParameter(name='variable', value=variable)
+                writer.addParameter(name='variable_unit', value=variable_unit)
                 writer.addParameter(name='n_pulses', value=n_pulses)
                 writer.addParameter(name='pulse1_range', value=RMIX)
                 writer.addParameter(name='pulse1_width', value=pulse_1_width)
@@ -502,6 +528,8 @@ if __name__ == '__main__':
                         help='Type of scan')
     parser.add_argument('--rmDC', action='store_true',
                         help='Apply remove DC.')
+    parser.add_argument('--single_file', action='store_true',
+                        help='Save all the parameters of a sweep in one HDF5 file.')
     args = parser.parse_args()
 
     project = main(args)
@@ -0,0 +1,108 @@
+import os
+import time
+from multiprocessing import Queue
+
+import pytest
+
+from schainpy.controller import Project, OperationConf, UnitWorker, SCHEDULERS
+from schainpy.model.data.jrodata import Voltage
+
+
+@pytest.mark.parametrize('scheduler', (None, ) + SCHEDULERS)
+def test_scheduler(scheduler):
+
+    project = Project()
+    project.setup(id=1, name='test', scheduler=scheduler)
+    assert project.scheduler == scheduler
+
+
+def test_invalid_scheduler():
+
+    with pytest.raises(ValueError):
+        Project().setup(id=1, name='test', scheduler='paralel')
+
+
+def test_invalid_scheduler_xml(tmp_path):
+
+    filename = str(tmp_path / 'project.xml')
+    project = Project()
+    project.setup(id=1, name='test', scheduler='parallel')
+    project.writeXml(filename)
+
+    with open(filename) as fp:
+        xml = fp.read().replace('scheduler="parallel"', 'scheduler="paralel"')
+    with open(filename, 'w') as fp:
+        fp.write(xml)
+
+    project = Project()
+    with pytest.raises(ValueError):
+        project.readXml(filename)
+
+
+def test_read_unit_group(tmp_path):
+
+    filename = str(tmp_path / 'project.xml')
+    project = Project()
+    project.setup(id=1, name='test', scheduler='parallel')
+    read_unit = project.addReadUnit(datatype='SimulatorReader', group='acquisition', samples=100)
+    assert read_unit.group == 'acquisition'
+    assert 'group' not in read_unit.parameters
+    project.writeXml(filename)
+
+    project = Project()
+    project.readXml(filename)
+    assert project.getReadUnit().group == 'acquisition'
+
+
+@pytest.mark.parametrize('policy, expected', [('coalesce', 'keep-latest'), ('coalesce:60', 'keep-latest'),
+                                              ('drop-oldest', 'drop-oldest')])
+def test_policy_without_add_frame(policy, expected):
+
+    conf = OperationConf()
+    conf.setup('11', 'printAttribute', '0', '1', Queue(), policy=policy)
+    conf.parameters = dict(attributes='utctime')
+    op = conf.createObject()
+    dataOut = Voltage()
+    dataOut.error = True
+    op.queue.put(dataOut)
+    op.join(timeout=30)
+
+    # printAttribute no tiene add_frame, no puede combinar cuadros
+    assert op.queue.policy == expected
+    assert not op.is_alive()
+
+
+@pytest.mark.parametrize('profile_file', [None, 'stats.json'])
+def test_profile_switch_and_file(tmp_path, monkeypatch, profile_file):
+
+    monkeypatch.chdir(tmp_path)
+    filename = str(tmp_path / 'project.xml')
+    project = Project()
+    project.setup(id=1, name='test', profile=True, profile_file=profile_file)
+    project.writeXml(filename)
+    project = Project()
+    project.readXml(filename)
+    assert project.profile is True
+    assert project.profile_file == profile_file
+
+    # sin unidades, solo se imprimen/guardan las estadisticas
+    monkeypatch.setattr(project, 'createObjects', lambda profile: None)
+    monkeypatch.setattr(project, 'runProcs', lambda: None)
+    monkeypatch.setattr(project, 'printStats', lambda rows, elapsed: None)
+    project.run()
+
+    assert sorted(os.listdir(str(tmp_path))) == sorted(['project.xml'] + ([profile_file] if profile_file else []))
+
+
+def test_parallel_worker_killed(monkeypatch):
+
+    project = Project()
+    project.setup(id=1, name='test', scheduler='parallel')
+    project.addReadUnit(datatype='SimulatorReader', samples=100)
+
+    # el proceso termina sin enviar el fin (como un segfault)
+    monkeypatch.setattr(UnitWorker, 'run', lambda self: os._exit(3))
+
+    t0 = time.time()
+    assert project.runWorkers() == []
+    assert time.time() - t0 < 10
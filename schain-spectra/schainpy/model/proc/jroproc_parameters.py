@@ -4258,6 +4258,116 @@ class PedestalInformation(Operation):
 
         return dataOut
 
+class SweepBuffer(object):
+    '''
+    Buffer de los radiales de un barrido (PPI/RHI) reservado una sola vez.
+
+    Cada variable se guarda con el eje de los radiales antes del eje de
+    alturas, (..., nRadials, nHeights), los escalares como (nRadials,) y los
+    vectores (ej. ruido por canal) como (nRadials, nch), de esta forma el
+    barrido se entrega como vistas sin copiar ni transponer. Se usan
+    `nBuffers` juegos de arreglos por turnos, las vistas que devuelve flush
+    son validas hasta que se complete el siguiente barrido. La capacidad se
+    duplica si un barrido tiene mas radiales.
+    '''
+
+    def __init__(self, nRadials=512, nBuffers=2):
+
+        self.nRadials = nRadials
+        self.nBuffers = nBuffers
+        self.buffers = [{} for i in range(nBuffers)]
+        self.index = 0
+        self.n = 0
+
+    def __len__(self):
+
+        return self.n
+
+    @staticmethod
+    def getIndex(array, start, stop=None):
+        '''
+        Index of the radials start:stop (or only start if stop is None)
+        '''
+
+        axis = max(array.ndim - 2, 0)
+        if stop is None:
+            return (slice(None), )*axis + (start, )
+        return (slice(None), )*axis + (slice(start, stop), )
+
+    def allocate(self, value, nRadials):
+
+        value = numpy.asarray(value)
+        axis = max(value.ndim - 1, 0)
+        shape = value.shape[:axis] + (nRadials, ) + value.shape[axis:]
+
+        return numpy.empty(shape, dtype=value.dtype)
+
+    def append(self, **values):
+        '''
+        Add one radial, the values are given by name (data=..., azi=...)
+        '''
+
+        arrays = self.buffers[self.index]
+
+        for name, value in values.items():
+            array = arrays.get(name)
+            if array is None or (self.n == 0 and array.shape[max(array.ndim - 2, 0)] < self.nRadials):
+                array = arrays[name] = self.allocate(value, self.nRadials)
+            elif array.shape[max(array.ndim - 2, 0)] == self.n:
+                # los siguientes barridos se reservan con la nueva capacidad
+                self.nRadials = 2*self.n
+                new = self.allocate(value, self.nRadials)
+                new[self.getIndex(new, 0, self.n)] = array[self.getIndex(array, 0, self.n)]
+                array = arrays[name] = new
+            array[self.getIndex(array, self.n)] = value
+
+        self.n += 1
+
+    def last(self, name, k=1):
+        '''
+        View of the last k radials of a variable
+        '''
+
+        array = self.buffers[self.index][name]
+
+        return array[self.getIndex(array, max(self.n - k, 0), self.n)]
+
+    def pop(self):
+        '''
+        Erase the last radial
+        '''
+
+        self.n = max(self.n - 1, 0)
+
+    def popFirst(self):
+        '''
+        Erase the first radial
+        '''
+
+        for array in self.buffers[self.index].values():
+            array[self.getIndex(array, 0, self.n - 1)] = array[self.getIndex(array, 1, self.n)]
+
+        self.n = max(self.n - 1, 0)
+
+    def flush(self, carry=0):
+        '''
+        Return the sweep as a dict of views (without the last `carry` radials)
+        and the number of radials, the next sweep starts with the last `carry`
+        radials in the other buffer.
+        '''
+
+        n = self.n - carry
+        arrays = self.buffers[self.index]
+        sweep = {name: array[self.getIndex(array, 0, n)] for name, array in arrays.items()}
+
+        self.index = (self.index + 1) % self.nBuffers
+        self.n = 0
+
+        for i in range(n, n + carry):
+            self.append(**{name: array[self.getIndex(array, i)] for name, array in arrays.items()})
+
+        return sweep, n
+
 class Block360(Operation):
     '''
     '''
@@ -4305,9 +4415,7 @@ class Block360(Operation):
         self.mode    = mode
         #print("self.mode",self.mode)
         #print("nHeights")
-        self.__buffer  = numpy.zeros(( dataOut.nChannels,n, dataOut.nHeights))
-        self.__buffer2 = numpy.zeros(n)
-        self.__buffer3 = numpy.zeros(n)
+        self.__sweep   = SweepBuffer(n)
 
 
 
@@ -4319,21 +4427,9 @@ class Block360(Operation):
         #print("line 4049",data.dataPP_POW.shape,data.dataPP_POW[:10])
         #print("line 4049",data.azimuth.shape,data.azimuth)
         if self.mode==0:
-            self.__buffer[:,self.__profIndex,:]= data.dataPP_POWER# PRIMER MOMENTO
+            self.__sweep.append(data=data.dataPP_POWER, azi=data.azimuth, ele=data.elevation)# PRIMER MOMENTO
         if self.mode==1:
-            self.__buffer[:,self.__profIndex,:]= data.data_pow
-        #print("me casi",self.index,data.azimuth[self.index])
-        #print(self.__profIndex, self.index , data.azimuth[self.index] )
-        #print("magic",data.profileIndex)
-        #print(data.azimuth[self.index])
-        #print("index",self.index)
-
-        #####self.__buffer2[self.__profIndex] = data.azimuth[self.index]
-        self.__buffer2[self.__profIndex] = data.azimuth
-        self.__buffer3[self.__profIndex] = data.elevation
-        #print("q pasa")
-        #####self.index+=1
-        #print("index",self.index,data.azimuth[:10])
+            self.__sweep.append(data=data.data_pow, azi=data.azimuth, ele=data.elevation)
         self.__profIndex      += 1
         return        #················· Remove DC···································
 
@@ -4344,14 +4440,12 @@ class Block360(Operation):
         '''
         #print("pushData")
 
-        data_360 = self.__buffer
-        data_p   = self.__buffer2
-        data_e   = self.__buffer3
-        n                = self.__profIndex
+        # vistas del buffer, validas hasta que se complete el siguiente bloque
+        sweep, n = self.__sweep.flush()
+        data_360 = sweep['data']
+        data_p   = sweep['azi']
+        data_e   = sweep['ele']
 
-        self.__buffer    = numpy.zeros((self.__nch, self.n,self.__nHeis))
-        self.__buffer2 = numpy.zeros(self.n)
-        self.__buffer3 = numpy.zeros(self.n)
         self.__profIndex = 0
         #print("pushData")
         return data_360,n,data_p,data_e
@@ -4469,9 +4563,7 @@ class Block360_vRF(Operation):
         self.mode    = mode
         #print("self.mode",self.mode)
         #print("nHeights")
-        self.__buffer  = numpy.zeros(( dataOut.nChannels,n, dataOut.nHeights))
-        self.__buffer2 = numpy.zeros(n)
-        self.__buffer3 = numpy.zeros(n)
+        self.__sweep   = SweepBuffer(n)
 
 
 
@@ -4483,21 +4575,9 @@ class Block360_vRF(Operation):
         #print("line 4049",data.dataPP_POW.shape,data.dataPP_POW[:10])
         #print("line 4049",data.azimuth.shape,data.azimuth)
         if self.mode==0:
-            self.__buffer[:,self.__profIndex,:]= data.dataPP_POWER# PRIMER MOMENTO
+            self.__sweep.append(data=data.dataPP_POWER, azi=data.azimuth, ele=data.elevation)# PRIMER MOMENTO
         if self.mode==1:
-            self.__buffer[:,self.__profIndex,:]= data.data_pow
-        #print("me casi",self.index,data.azimuth[self.index])
-        #print(self.__profIndex, self.index , data.azimuth[self.index] )
-        #print("magic",data.profileIndex)
-        #print(data.azimuth[self.index])
-        #print("index",self.index)
-
-        #####self.__buffer2[self.__profIndex] = data.azimuth[self.index]
-        self.__buffer2[self.__profIndex] = data.azimuth
-        self.__buffer3[self.__profIndex] = data.elevation
-        #print("q pasa")
-        #####self.index+=1
-        #print("index",self.index,data.azimuth[:10])
+            self.__sweep.append(data=data.data_pow, azi=data.azimuth, ele=data.elevation)
         self.__profIndex      += 1
         return        #················· Remove DC···································
 
@@ -4508,14 +4588,12 @@ class Block360_vRF(Operation):
         '''
         #print("pushData")
 
-        data_360 = self.__buffer
-        data_p   = self.__buffer2
-        data_e   = self.__buffer3
-        n                = self.__profIndex
+        # vistas del buffer, validas hasta que se complete el siguiente bloque
+        sweep, n = self.__sweep.flush()
+        data_360 = sweep['data']
+        data_p   = sweep['azi']
+        data_e   = sweep['ele']
 
-        self.__buffer    = numpy.zeros((self.__nch, self.n,self.__nHeis))
-        self.__buffer2 = numpy.zeros(self.n)
-        self.__buffer3 = numpy.zeros(self.n)
         self.__profIndex = 0
         #print("pushData")
         return data_360,n,data_p,data_e
@@ -4661,28 +4739,21 @@ class Block360_vRF2(Operation):
         self.mode    = mode
         #print("self.mode",self.mode)
         #print("nHeights")
-        self.__buffer  = []
-        self.__buffer2 = []
-        self.__buffer3 = []
-        self.__buffer4 = []
+        self.__sweep   = SweepBuffer()
 
     def putData(self,data,mode):
         '''
         Add a profile to he __buffer and increase in one the __profiel Index
         '''
 
-        if self.mode==0:
-            self.__buffer.append(data.dataPP_POWER)# PRIMER MOMENTO
         if self.mode==1:
-            self.__buffer.append(data.data_pow)
-
-        self.__buffer4.append(data.dataPP_DOP)
+            power = data.data_pow
+        else:
+            power = data.dataPP_POWER# PRIMER MOMENTO
 
-        self.__buffer2.append(data.azimuth)
-        self.__buffer3.append(data.elevation)
-        self.__profIndex      += 1
+        self.__sweep.append(power=power, velocity=data.dataPP_DOP, azi=data.azimuth, ele=data.elevation)
 
-        return numpy.array(self.__buffer3)        #················· Remove DC···································
+        return self.__sweep.last('ele', 2)        #················· Remove DC···································
 
     def pushData(self,data):
         '''
@@ -4690,17 +4761,11 @@ class Block360_vRF2(Operation):
         Affected :  self.__profileIndex
         '''
 
-        data_360_Power = numpy.array(self.__buffer).transpose(1,0,2)
-        data_360_Velocity = numpy.array(self.__buffer4).transpose(1,0,2)
-        data_p   = numpy.array(self.__buffer2)
-        data_e   = numpy.array(self.__buffer3)
-        n                = self.__profIndex
-
-        self.__buffer = []
-        self.__buffer4 = []
-        self.__buffer2 = []
-        self.__buffer3 = []
-        self.__profIndex = 0
+        sweep, n = self.__sweep.flush()
+        data_360_Power = sweep['power']
+        data_360_Velocity = sweep['velocity']
+        data_p   = sweep['azi']
+        data_e   = sweep['ele']
         return data_360_Power,data_360_Velocity,n,data_p,data_e
 
 
@@ -4714,24 +4779,17 @@ class Block360_vRF2(Operation):
 
         elevations = self.putData(data=dataOut,mode = self.mode)
 
-        if self.__profIndex > 1:
+        if len(self.__sweep) > 1:
             case_flag = self.checkcase(elevations)
 
             if case_flag == 0: #Subida
 
-                if len(self.__buffer) == 2: #Cuando está de subida
+                if len(self.__sweep) == 2: #Cuando está de subida
                     #Se borra el dato anterior para liberar buffer y comparar el dato actual con el siguiente
-                    self.__buffer.pop(0) #Erase first data
-                    self.__buffer2.pop(0)
-                    self.__buffer3.pop(0)
-                    self.__buffer4.pop(0)
-                    self.__profIndex -= 1
+                    self.__sweep.popFirst() #Erase first data
                 else: #Cuando ha estado de bajada y ha vuelto a subir
                     #Se borra el último dato
-                    self.__buffer.pop() #Erase last data
-                    self.__buffer2.pop()
-                    self.__buffer3.pop()
-                    self.__buffer4.pop()
+                    self.__sweep.pop() #Erase last data
                     data_360_Power,data_360_Velocity,n,data_p,data_e  = self.pushData(data=dataOut)
 
                     self.__dataReady = True
@@ -4822,21 +4880,16 @@ class Block360_vRF3(Operation):
         self.attr = attr
         #print("self.mode",self.mode)
         #print("nHeights")
-        self.__buffer  = []
-        self.__buffer2 = []
-        self.__buffer3 = []
+        self.__sweep   = SweepBuffer()
 
     def putData(self, data, attr):
         '''
         Add a profile to he __buffer and increase in one the __profiel Index
         '''
 
-        self.__buffer.append(getattr(data, attr))
-        self.__buffer2.append(data.azimuth)
-        self.__buffer3.append(data.elevation)
-        self.__profIndex  += 1
+        self.__sweep.append(data=getattr(data, attr), azi=data.azimuth, ele=data.elevation)
 
-        return numpy.array(self.__buffer3)
+        return self.__sweep.last('ele', 2)
 
     def pushData(self, data):
         '''
@@ -4844,15 +4897,10 @@ class Block360_vRF3(Operation):
         Affected :  self.__profileIndex
         '''
 
-        data_360 = numpy.array(self.__buffer).transpose(1, 0, 2)
-        data_p   = numpy.array(self.__buffer2)
-        data_e   = numpy.array(self.__buffer3)
-        n   = self.__profIndex
-
-        self.__buffer = []
-        self.__buffer2 = []
-        self.__buffer3 = []
-        self.__profIndex = 0
+        sweep, n = self.__sweep.flush()
+        data_360 = sweep['data']
+        data_p   = sweep['azi']
+        data_e   = sweep['ele']
         return data_360, n, data_p, data_e
 
 
@@ -4865,22 +4913,17 @@ class Block360_vRF3(Operation):
 
         elevations = self.putData(data=dataOut, attr = self.attr)
 
-        if self.__profIndex > 1:
+        if len(self.__sweep) > 1:
             case_flag = self.checkcase(elevations)
 
             if case_flag == 0: #Subida
 
-                if len(self.__buffer) == 2: #Cuando está de subida
+                if len(self.__sweep) == 2: #Cuando está de subida
                     #Se borra el dato anterior para liberar buffer y comparar el dato actual con el siguiente
-                    self.__buffer.pop(0) #Erase first data
-                    self.__buffer2.pop(0)
-                    self.__buffer3.pop(0)
-                    self.__profIndex -= 1
+                    self.__sweep.popFirst() #Erase first data
                 else: #Cuando ha estado de bajada y ha vuelto a subir
                     #Se borra el último dato
-                    self.__buffer.pop() #Erase last data
-                    self.__buffer2.pop()
-                    self.__buffer3.pop()
+                    self.__sweep.pop() #Erase last data
                     data_360, n, data_p, data_e  = self.pushData(data=dataOut)
 
                     self.__dataReady = True
@@ -4965,9 +5008,7 @@ class Block360_vRF4(Operation):
 
         self.attr = attr
 
-        self.__buffer  = []
-        self.__buffer2 = []
-        self.__buffer3 = []
+        self.__sweep   = SweepBuffer()
 
     def putData(self, data, attr, flagMode):
         '''
@@ -4978,15 +5019,12 @@ class Block360_vRF4(Operation):
             size_tmp= tmp.shape[0]
             tmp=tmp.reshape(1,size_tmp)
 
-        self.__buffer.append(tmp)
-        self.__buffer2.append(data.azimuth)
-        self.__buffer3.append(data.elevation)
-        self.__profIndex  += 1
+        self.__sweep.append(data=tmp, azi=data.azimuth, ele=data.elevation)
 
         if flagMode == 1: #'AZI'
-            return numpy.array(self.__buffer2)
+            return self.__sweep.last('azi', 2)
         elif flagMode == 0: #'ELE'
-            return numpy.array(self.__buffer3)
+            return self.__sweep.last('ele', 2)
 
     def pushData(self, data,flagMode,case_flag):
         '''
@@ -4994,18 +5032,13 @@ class Block360_vRF4(Operation):
         Affected :  self.__profileIndex
         '''
 
-        data_360 = numpy.array(self.__buffer).transpose(1, 0, 2)
-        data_p   = numpy.array(self.__buffer2)
-        data_e   = numpy.array(self.__buffer3)
-        n   = self.__profIndex
-
-        self.__buffer = []
-        self.__buffer2 = []
-        self.__buffer3 = []
-        self.__profIndex = 0
+        # en 'AZI' si ha girado el ultimo dato empieza el siguiente barrido
+        carry = 1 if flagMode == 1 and case_flag == 0 else 0
 
-        if flagMode == 1 and case_flag == 0: #'AZI' y ha girado
-            self.putData(data=data, attr = self.attr, flagMode=flagMode)
+        sweep, n = self.__sweep.flush(carry=carry)
+        data_360 = sweep['data']
+        data_p   = sweep['azi']
+        data_e   = sweep['ele']
 
         return data_360, n, data_p, data_e
 
@@ -5019,14 +5052,11 @@ class Block360_vRF4(Operation):
 
         angles = self.putData(data=dataOut, attr = self.attr, flagMode=flagMode)
         #print("ANGLES",angles)
-        if self.__profIndex > 1:
+        if len(self.__sweep) > 1:
             case_flag = self.checkcase(angles,flagMode)
 
             if flagMode == 1: #'AZI':
                 if case_flag == 0: #Ya giró
-                    self.__buffer.pop() #Erase last data
-                    self.__buffer2.pop()
-                    self.__buffer3.pop()
                     data_360,n,data_p,data_e  = self.pushData(data=dataOut,flagMode=flagMode,case_flag=case_flag)
 
                     self.__dataReady = True
@@ -5035,17 +5065,12 @@ class Block360_vRF4(Operation):
 
                 if case_flag == 0: #Subida
 
-                    if len(self.__buffer) == 2: #Cuando está de subida
+                    if len(self.__sweep) == 2: #Cuando está de subida
                         #Se borra el dato anterior para liberar buffer y comparar el dato actual con el siguiente
-                        self.__buffer.pop(0) #Erase first data
-                        self.__buffer2.pop(0)
-                        self.__buffer3.pop(0)
-                        self.__profIndex -= 1
+                        self.__sweep.popFirst() #Erase first data
                     else: #Cuando ha estado de bajada y ha vuelto a subir
                         #Se borra el último dato
-                        self.__buffer.pop() #Erase last data
-                        self.__buffer2.pop()
-                        self.__buffer3.pop()
+                        self.__sweep.pop() #Erase last data
                         data_360, n, data_p, data_e  = self.pushData(data=dataOut,flagMode=flagMode,case_flag=case_flag)
 
                         self.__dataReady = True
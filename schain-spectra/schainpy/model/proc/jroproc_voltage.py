@@ -5,6 +5,7 @@ from schainpy.model.proc.jroproc_base import ProcessingUnit, Operation, MPDecora
 from schainpy.model.data.jrodata import Voltage,hildebrand_sekhon
 from schainpy.utils import log
 from time import time
+from scipy import fft as sp_fft
 
 import matplotlib.pyplot as plt
 
@@ -695,6 +696,8 @@ class Decoder(Operation):
     #         self.__setValues = False
         self.isConfig = False
         self.setupReq = False
+        self.__fftCodeBlock = None
+        self.__fftCodeKey = None
     def setup(self, code, osamp, dataOut):
 
         self.__profIndex = 0
@@ -752,7 +755,14 @@ class Decoder(Operation):
 
         raise NotImplementedError
 
-    def __convolutionInTime(self, data, code_1, code_2, DC_1, H0, RMIX):
+    def __getMixIndex(self, nHeis, H0, RMIX, range_km):
+        '''
+        Index where the short pulse (near range) is replaced by the long one
+        '''
+
+        return int((RMIX + -(H0))*nHeis/range_km)
+
+    def __convolutionInTime(self, data, code_1, code_2, DC_1, H0, RMIX, range_km=60):
 
         print("Conv By Profile")
 
@@ -786,8 +796,7 @@ class Decoder(Operation):
 
             corr_2 = numpy.roll(corr_2, d)
 
-            range_km = 60
-            r = int((RMIX + -(H0))*len(data[i,:])/range_km)
+            r = self.__getMixIndex(len(data[i,:]), H0, RMIX, range_km)
             self.datadecTime[i,:] = numpy.concatenate((corr_2[:r], corr_1[r:]))
 
         return self.datadecTime
@@ -808,23 +817,65 @@ class Decoder(Operation):
                 self.datadecTime[i,j,:] = numpy.correlate(data[i,j,:], code_block[j,:], mode='full')[self.nBaud-1:]
         return self.datadecTime
 
-    def __convolutionByBlockInFreq(self, data):
+    def __convolutionByBlockInFreq(self, data, code_1=None, code_2=None, DC_1=None, H0=None, RMIX=None,
+                                   range_km=60, workers=None):
+        '''
+        Decode the whole block with one FFT along range, with code_1 (long
+        pulse) and code_2 (short pulse) the spectrum of the block is used by
+        both matched filters and the result is the short pulse correlation
+        (shifted by DC_1) up to RMIX and the long one after it, for all the
+        channels and profiles at once.
+        '''
 
-        raise NotImplementedError("Decoder by frequency fro Blocks not implemented")
+        nHeis = data.shape[-1]
 
+        if code_1 is not None and code_2 is not None:
+            codes = [numpy.array(code_2).reshape(1, -1), numpy.array(code_1).reshape(1, -1)]
+        else:
+            codes = [self.code[numpy.arange(self.__nProfiles) % self.nCode]]
 
-        fft_code = self.fft_code[self.__profIndex].reshape(1,-1)
+        nfft = sp_fft.next_fast_len(nHeis + max([code.shape[-1] for code in codes]) - 1)
 
-        fft_data = numpy.fft.fft(data, axis=2)
+        # the FFT of the codes is kept while the codes, the FFT length and the
+        # dtype do not change
+        codes = [code.astype(numpy.result_type(data, code)) for code in codes]
+        key = (nfft, ) + tuple((code.shape, code.dtype.str, code.tobytes()) for code in codes)
+        if self.__fftCodeKey != key:
+            self.__fftCodeBlock = [numpy.conj(sp_fft.fft(code, nfft, axis=-1, workers=workers))
+                                   for code in codes]
+            self.__fftCodeKey = key
 
-        conv = fft_data*fft_code
+        fft_data = sp_fft.fft(data, nfft, axis=-1, workers=workers)
 
-        data = numpy.fft.ifft(conv,axis=2)
+        if len(codes) == 1:
+            fft_data *= self.__fftCodeBlock[0]
+            self.datadecTime[...] = sp_fft.ifft(fft_data, axis=-1, overwrite_x=True, workers=workers)[..., :nHeis]
+            return self.datadecTime
 
-        return data
+        r = min(self.__getMixIndex(nHeis, H0, RMIX, range_km), nHeis)
+        # corr_2 is shifted as numpy.roll(corr_2, -int(DC_1*nHeis/100)) in the profile path
+        d = int(DC_1*nHeis/100) % nHeis if DC_1 is not None else 0
+
+        corr_2 = sp_fft.ifft(fft_data*self.__fftCodeBlock[0], axis=-1, overwrite_x=True, workers=workers)
+        n = min(r, nHeis-d)
+        self.datadecTime[..., :n] = corr_2[..., d:d+n]
+        self.datadecTime[..., n:r] = corr_2[..., :r-n]
+
+        fft_data *= self.__fftCodeBlock[1]
+        corr_1 = sp_fft.ifft(fft_data, axis=-1, overwrite_x=True, workers=workers)
+        self.datadecTime[..., r:] = corr_1[..., r:nHeis]
+
+        return self.datadecTime
 
 
-    def run(self, dataOut, code=None, nCode=None, nBaud=None, mode = 0, osamp=None, times=None, code_1=None, code_2=None, DC_1=None, H0=None, RMIX=None):
+    def run(self, dataOut, code=None, nCode=None, nBaud=None, mode = 0, osamp=None, times=None, code_1=None, code_2=None, DC_1=None, H0=None, RMIX=None,
+            range_km=60, workers=None):
+        '''
+        code_1/code_2 are the long/short pulse codes, the short one is used up
+        to RMIX (relative to H0 over `range_km`), block data is decoded with
+        both codes in the frequency domain with mode=1, `workers` is the
+        number of threads used by scipy.fft
+        '''
 
         if dataOut.flagDecodeData:
             print("This data is already decoded, recoding again ...")
@@ -866,14 +917,14 @@ class Decoder(Operation):
             if mode == 0:
                 datadec = self.__convolutionByBlockInTime(dataOut.data)
             if mode == 1:
-                datadec = self.__convolutionByBlockInFreq(dataOut.data)
+                datadec = self.__convolutionByBlockInFreq(dataOut.data, code_1, code_2, DC_1, H0, RMIX, range_km, workers)
         else:
             """
             Decoding when data have been read profile by profile
             """
             if mode == 0:
                 # Función que estamos usando
-                datadec = self.__convolutionInTime(dataOut.data, code_1, code_2, DC_1, H0, RMIX)
+                datadec = self.__convolutionInTime(dataOut.data, code_1, code_2, DC_1, H0, RMIX, range_km)
 
             if mode == 1:
                 datadec = self.__convolutionInFreq(dataOut.data)
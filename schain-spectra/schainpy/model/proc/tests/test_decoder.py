@@ -0,0 +1,100 @@
+import numpy
+import pytest
+
+from schainpy.model.data.jrodata import Voltage
+from schainpy.model.proc.jroproc_voltage import Decoder
+
+nChannels = 2
+nProfiles = 8
+nHeights = 120
+nBaud = 16
+
+# pulso corto hasta RMIX y largo despues
+H0 = 0
+RMIX = 20
+RANGE_KM = 60
+DC_1 = 10.
+
+
+def getChirp(bw):
+
+    t = numpy.arange(nBaud)/nBaud
+    return numpy.exp(1j*numpy.pi*bw*t**2)
+
+
+def getData():
+
+    rng = numpy.random.default_rng(0)
+    return (rng.normal(0, 1, (nChannels, nProfiles, nHeights)) +
+            1j*rng.normal(0, 1, (nChannels, nProfiles, nHeights)))
+
+
+def getDataOut(data, block=True):
+
+    dataOut = Voltage()
+    dataOut.data = data.copy()
+    dataOut.heightList = numpy.arange(data.shape[-1], dtype=float)
+    dataOut.channelList = list(range(nChannels))
+    dataOut.nProfiles = nProfiles
+    dataOut.flagDataAsBlock = block
+    dataOut.flagDecodeData = False
+    return dataOut
+
+
+def dualChirp(data, code_1, code_2):
+    '''
+    Correlacion de cada perfil con el pulso corto (desplazada por DC_1) hasta
+    RMIX y con el largo despues
+    '''
+
+    out = numpy.zeros(data.shape, dtype=complex)
+    r = int((RMIX - H0)*nHeights/RANGE_KM)
+    for i in range(data.shape[0]):
+        for j in range(data.shape[1]):
+            corr_1 = numpy.correlate(data[i, j], code_1, mode='full')[nBaud - 1:]
+            corr_2 = numpy.correlate(data[i, j], code_2, mode='full')[nBaud - 1:]
+            corr_2 = numpy.roll(corr_2, -int(DC_1*nHeights/100))
+            out[i, j] = numpy.concatenate((corr_2[:r], corr_1[r:]))
+    return out
+
+
+def run(dataOut, code_1, code_2, mode):
+
+    Decoder().run(dataOut, code=[code_1], nCode=1, nBaud=nBaud, mode=mode, code_1=code_1,
+                  code_2=code_2, DC_1=DC_1, H0=H0, RMIX=RMIX, range_km=RANGE_KM)
+    return dataOut.data
+
+
+def test_dual_chirp_block():
+
+    code_1, code_2 = getChirp(8), getChirp(2)
+    data = getData()
+
+    out = run(getDataOut(data), code_1, code_2, 1)
+
+    assert out.shape == (nChannels, nProfiles, nHeights)
+    numpy.testing.assert_allclose(out, dualChirp(data, code_1, code_2), atol=1e-12)
+
+
+def test_dual_chirp_block_as_profiles():
+
+    code_1, code_2 = getChirp(8), getChirp(2)
+    data = getData()
+
+    out = run(getDataOut(data), code_1, code_2, 1).copy()
+    for j in range(nProfiles):
+        profile = run(getDataOut(data[:, j], block=False), code_1, code_2, 0)
+        numpy.testing.assert_allclose(out[:, j], profile, atol=1e-12)
+
+
+def test_dual_chirp_block_code_change():
+
+    data = getData()
+    decoder = Decoder()
+    # el mismo decodificador con otros chirps de igual tamaño no reutiliza la
+    # FFT de los codigos anteriores
+    for code_1, code_2 in [(getChirp(8), getChirp(2)), (getChirp(8), getChirp(-4)), (getChirp(8), getChirp(2))]:
+        dataOut = getDataOut(data)
+        decoder.run(dataOut, code=[code_1], nCode=1, nBaud=nBaud, mode=1, code_1=code_1,
+                    code_2=code_2, DC_1=DC_1, H0=H0, RMIX=RMIX, range_km=RANGE_KM)
+        numpy.testing.assert_allclose(dataOut.data, dualChirp(data, code_1, code_2), atol=1e-12)